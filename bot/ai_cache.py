@@ -0,0 +1,145 @@
+"""
+In-process L1 in front of the ai_cache table (the SQLite L2).
+
+AI results are read far more often than they are produced: the same pack
+sentence, word card or conjugation is asked for by many users. bot.db checks
+this LRU first and only reads SQLite on an L1 miss.
+
+Entries are keyed by the sha256 cache key and hold
+    (value_json, expires_at)
+with expires_at in epoch seconds, the same value stored in the ai_cache row.
+Values stay serialized so every reader gets its own dict to mutate.
+
+L1 hits never touch SQLite, so the last-used time they imply is kept in a
+"touched" map and written back in one batch by bot.db.compact_ai_cache(),
+which is what keeps the table's LRU eviction honest.
+
+Counters (hits per tier, misses, expirations, writes, evictions) are exposed
+through stats().
+
+bot.db owns the SQL, the TTL policy and the compaction; this module only
+holds the rows and the counters.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+
+_lock = threading.Lock()
+_entries: OrderedDict[str, tuple[str, float]] = OrderedDict()  # cache_key -> (value_json, expires_at)
+_touched: dict[str, float] = {}                                 # cache_key -> last used (epoch)
+
+max_size = 2_000
+
+_counters = {
+    "l1_hits": 0,
+    "l2_hits": 0,
+    "misses": 0,
+    "expired": 0,
+    "writes": 0,
+    "negative_writes": 0,
+    "l1_evictions": 0,
+    "l2_expired_rows": 0,
+    "l2_evicted_rows": 0,
+}
+
+
+def configure(size: int | None = None):
+    global max_size
+    with _lock:
+        if size is not None:
+            max_size = max(0, int(size))
+        _evict()
+
+
+def get(cache_key: str) -> str | None:
+    """value_json on an L1 hit (and mark the key used), else None."""
+    now = time.time()
+    with _lock:
+        entry = _entries.get(cache_key)
+        if entry is None:
+            return None
+        value_json, expires_at = entry
+        if expires_at <= now:
+            del _entries[cache_key]   # bot.db finds the L2 row expired too and counts it
+            return None
+        _entries.move_to_end(cache_key)
+        _touched[cache_key] = now
+        _counters["l1_hits"] += 1
+        return value_json
+
+
+def fill(cache_key: str, value_json: str, expires_at: float):
+    """Cache a row just read from L2 (counts as an L2 hit)."""
+    with _lock:
+        _counters["l2_hits"] += 1
+        _store(cache_key, value_json, expires_at)
+
+
+def put(cache_key: str, value_json: str, expires_at: float, negative: bool = False):
+    """Cache a freshly written result."""
+    with _lock:
+        _counters["writes"] += 1
+        if negative:
+            _counters["negative_writes"] += 1
+        _touched.pop(cache_key, None)
+        _store(cache_key, value_json, expires_at)
+
+
+def discard(cache_key: str):
+    with _lock:
+        _entries.pop(cache_key, None)
+        _touched.pop(cache_key, None)
+
+
+def miss(expired: bool = False):
+    """Neither tier had a usable row."""
+    with _lock:
+        _counters["misses"] += 1
+        if expired:
+            _counters["expired"] += 1
+
+
+def take_touched() -> list[tuple[float, str]]:
+    """Hand over (last_used, cache_key) for every key served from L1 since the last call."""
+    with _lock:
+        out = [(used, key) for key, used in _touched.items()]
+        _touched.clear()
+        return out
+
+
+def note_compaction(expired_rows: int, evicted_rows: int):
+    with _lock:
+        _counters["l2_expired_rows"] += expired_rows
+        _counters["l2_evicted_rows"] += evicted_rows
+
+
+def stats() -> dict:
+    with _lock:
+        out = dict(_counters)
+        out["l1_size"] = len(_entries)
+    lookups = out["l1_hits"] + out["l2_hits"] + out["misses"]
+    out["hit_ratio"] = round((out["l1_hits"] + out["l2_hits"]) / lookups, 4) if lookups else 0.0
+    return out
+
+
+def clear():
+    """Forget every entry and pending touch (counters are kept)."""
+    with _lock:
+        _entries.clear()
+        _touched.clear()
+
+
+def _store(cache_key: str, value_json: str, expires_at: float):
+    # caller holds _lock
+    _entries[cache_key] = (value_json, expires_at)
+    _entries.move_to_end(cache_key)
+    _evict()
+
+
+def _evict():
+    # caller holds _lock; least recently used first
+    while len(_entries) > max_size:
+        _entries.popitem(last=False)
+        _counters["l1_evictions"] += 1
@@ -1,10 +1,18 @@
 import sqlite3
 from pathlib import Path
 
+import os
 import json
+import hashlib
+import random
+import threading
+import time
+from contextlib import contextmanager
 from datetime import date, datetime, timezone, timedelta
 import math
 
+from bot import ai_cache, pack_sampler, session_cache
+
 
 
 REPO_ROOT = Path(__file__).resolve().parents[1]  # LingoDojo/
@@ -12,21 +20,176 @@ DATA_DIR = REPO_ROOT / "data"
 DB_PATH = DATA_DIR / "app.db"
 PACKS_DIR = DATA_DIR / "packs"
 
+# How many due cards a review session prefetches at a time (see get_due_queue).
+REVIEW_QUEUE_SIZE = int(os.getenv("REVIEW_QUEUE_SIZE", "20"))
+
+# Connection tuning (applied once per pooled connection).
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_KIB = int(os.getenv("SQLITE_CACHE_KIB", "16384"))          # 16 MiB page cache
+SQLITE_MMAP_BYTES = int(os.getenv("SQLITE_MMAP_BYTES", str(128 * 1024 * 1024)))
+
+# Session cache (see bot/session_cache.py). Writes go straight to SQLite until
+# enable_session_write_behind() is called; then flush_sessions() batches them.
+session_cache.configure(
+    size=int(os.getenv("SESSION_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("SESSION_CACHE_TTL_SECONDS", "1800")),
+)
+_session_write_behind = False
+
+# AI result cache (see bot/ai_cache.py for the in-process L1). Results with
+# ok=False (AI off, quota, bad JSON) get the short negative TTL so a transient
+# failure is retried soon instead of sticking to the key.
+AI_CACHE_TTL_SECONDS = float(os.getenv("AI_CACHE_TTL_SECONDS", str(30 * 86400)))
+AI_CACHE_NEGATIVE_TTL_SECONDS = float(os.getenv("AI_CACHE_NEGATIVE_TTL_SECONDS", "600"))
+AI_CACHE_MAX_ROWS = int(os.getenv("AI_CACHE_MAX_ROWS", "50000"))
+ai_cache.configure(size=int(os.getenv("AI_CACHE_L1_SIZE", "2000")))
+
+_local = threading.local()
+_pool_lock = threading.Lock()
+_pool: list[sqlite3.Connection] = []
+_generation = 0
+
+
+def _configure(conn: sqlite3.Connection) -> sqlite3.Connection:
+    conn.execute("PRAGMA journal_mode = WAL;")
+    conn.execute("PRAGMA synchronous = NORMAL;")
+    conn.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS};")
+    conn.execute(f"PRAGMA cache_size = -{SQLITE_CACHE_KIB};")
+    conn.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_BYTES};")
+    conn.execute("PRAGMA temp_store = MEMORY;")
+    conn.execute("PRAGMA foreign_keys = ON;")
+    return conn
+
 
 def get_connection():
+    """
+    Open a fresh, fully configured connection owned by the caller (must be closed).
+    Query helpers should use db_conn() instead, which reuses a pooled connection.
+    """
     DATA_DIR.mkdir(parents=True, exist_ok=True)
 
     conn = sqlite3.connect(DB_PATH)
-    conn.execute("PRAGMA foreign_keys = ON;")
+    return _configure(conn)
+
+
+def _pooled(attr: str, query_only: bool) -> sqlite3.Connection:
+    conn = getattr(_local, attr, None)
+    if conn is None or getattr(_local, "generation", None) != _generation:
+        if getattr(_local, "generation", None) != _generation:
+            _local.conn = _local.ro_conn = None
+            _local.depth = 0
+            _local.generation = _generation
+        DATA_DIR.mkdir(parents=True, exist_ok=True)
+        # check_same_thread=False only so close_all_connections() can close it at
+        # shutdown; each connection is still used by its owning thread alone.
+        conn = _configure(sqlite3.connect(DB_PATH, check_same_thread=False))
+        if query_only:
+            conn.execute("PRAGMA query_only = ON;")
+        setattr(_local, attr, conn)
+        with _pool_lock:
+            _pool.append(conn)
     return conn
 
 
-def init_db():
-    conn = get_connection()
-    cursor = conn.cursor()
+def _thread_connection() -> sqlite3.Connection:
+    return _pooled("conn", query_only=False)
+
 
-    
+@contextmanager
+def db_conn(readonly: bool = False):
+    """
+    Borrow this thread's long-lived connection.
+
+    The outermost block commits on success and rolls back on error; nested blocks
+    join the surrounding transaction, so helpers can be composed atomically.
+
+    readonly=True hands out a separate query_only connection that never takes the
+    write lock (WAL readers don't block the writer). Inside an open read-write block
+    it joins that connection instead, so it still sees the pending writes.
+    """
+    if readonly and getattr(_local, "depth", 0) == 0:
+        yield _pooled("ro_conn", query_only=True)
+        return
 
+    conn = _thread_connection()
+    _local.depth += 1
+    try:
+        yield conn
+        if _local.depth == 1:
+            conn.commit()
+    except BaseException:
+        if _local.depth == 1:
+            conn.rollback()
+        raise
+    finally:
+        _local.depth -= 1
+
+
+def close_all_connections():
+    """Close every pooled connection (shutdown, or before swapping DB_PATH)."""
+    global _generation
+    with _pool_lock:
+        _generation += 1
+        conns = list(_pool)
+        _pool.clear()
+    for conn in conns:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+def _table_columns(cursor, table: str) -> set[str]:
+    cursor.execute(f"PRAGMA table_info({table})")
+    return {row[1] for row in cursor.fetchall()}
+
+
+# Columns that were bolted onto existing tables before migrations were versioned.
+# Older databases may lack any of them, so the baseline step backfills what's missing.
+# New columns go into a new numbered migration instead of this list.
+_BASELINE_LATE_COLUMNS = [
+    ("users", "target_language", "TEXT NOT NULL DEFAULT 'it'"),
+    ("users", "ui_language", "TEXT NOT NULL DEFAULT 'en'"),
+    ("users", "learn_since_scene", "INTEGER NOT NULL DEFAULT 0"),
+    ("users", "alter_ego_name", "TEXT"),
+    ("users", "alter_ego_city", "TEXT"),
+    ("users", "alter_ego_role", "TEXT"),
+    ("users", "journey_current_pack_id", "TEXT"),
+    ("users", "journey_updated_at", "TEXT"),
+    ("packs", "pack_type", "TEXT"),
+    ("packs", "chunk_size", "INTEGER"),
+    ("packs", "missions_enabled", "INTEGER"),
+    ("reviews", "prev_status", "TEXT"),
+    ("reviews", "prev_interval_days", "INTEGER"),
+    ("reviews", "prev_due_date", "TEXT"),
+    ("reviews", "prev_last_reviewed_at", "TEXT"),
+    ("reviews", "prev_reps", "INTEGER"),
+    ("reviews", "prev_lapses", "INTEGER"),
+    ("reviews", "undo_available", "INTEGER NOT NULL DEFAULT 0"),
+    ("users", "helper_language", "TEXT DEFAULT NULL"),
+    ("pack_items", "level", "TEXT"),
+    ("pack_items", "category", "TEXT"),
+    ("pack_items", "tags_json", "TEXT"),
+    ("pack_items", "cultural_note", "TEXT"),
+    ("pack_items", "pronunciation_text", "TEXT"),
+    ("pack_items", "translation_helper", "TEXT"),
+    ("pack_items", "focus", "TEXT"),                               # word | phrase
+    ("pack_items", "lemma", "TEXT"),                               # if focus=word
+    ("pack_items", "phrase", "TEXT"),                              # if focus=phrase
+    ("pack_items", "phrase_hint", "TEXT"),                         # optional suggested chunk
+    ("pack_items", "register", "TEXT"),
+    ("pack_items", "risk", "TEXT"),
+    ("pack_items", "trap", "TEXT"),
+    ("pack_items", "native_sauce", "TEXT"),
+    ("pack_items", "components_json", "TEXT"),
+    ("pack_items", "media_json", "TEXT"),
+    ("pack_items", "drills_json", "TEXT"),
+    ("pack_items", "source_uid", "TEXT"),
+]
+
+
+def _migration_001_baseline(cursor):
+    """Schema as it stood before versioned migrations (idempotent on old databases)."""
     # users
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS users (
@@ -119,56 +282,10 @@ def init_db():
         fetched_at TEXT NOT NULL
     )
     """)
-
-
-
-
-
-    def _add_column_if_missing(cursor, table: str, column: str, col_def: str):
-        cursor.execute(f"PRAGMA table_info({table})")
-        cols = [row[1] for row in cursor.fetchall()]
-        if column not in cols:
-            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {col_def}")
-    
-    _add_column_if_missing(cursor, "users", "target_language", "TEXT NOT NULL DEFAULT 'it'")
-    _add_column_if_missing(cursor, "users", "ui_language", "TEXT NOT NULL DEFAULT 'en'")
-    _add_column_if_missing(cursor, "users", "learn_since_scene", "INTEGER NOT NULL DEFAULT 0")
-    _add_column_if_missing(cursor, "users", "alter_ego_name", "TEXT")
-    _add_column_if_missing(cursor, "users", "alter_ego_city", "TEXT")
-    _add_column_if_missing(cursor, "users", "alter_ego_role", "TEXT")
-    _add_column_if_missing(cursor, "users", "journey_current_pack_id", "TEXT")
-    _add_column_if_missing(cursor, "users", "journey_updated_at", "TEXT")
-    _add_column_if_missing(cursor, "packs", "pack_type", "TEXT")
-    _add_column_if_missing(cursor, "packs", "chunk_size", "INTEGER")
-    _add_column_if_missing(cursor, "packs", "missions_enabled", "INTEGER")
-        # --- reviews undo support ---
-    _add_column_if_missing(cursor, "reviews", "prev_status", "TEXT")
-    _add_column_if_missing(cursor, "reviews", "prev_interval_days", "INTEGER")
-    _add_column_if_missing(cursor, "reviews", "prev_due_date", "TEXT")
-    _add_column_if_missing(cursor, "reviews", "prev_last_reviewed_at", "TEXT")
-    _add_column_if_missing(cursor, "reviews", "prev_reps", "INTEGER")
-    _add_column_if_missing(cursor, "reviews", "prev_lapses", "INTEGER")
-    _add_column_if_missing(cursor, "reviews", "undo_available", "INTEGER NOT NULL DEFAULT 0")
-    _add_column_if_missing(cursor, "users", "helper_language", "TEXT DEFAULT NULL")
-    _add_column_if_missing(cursor, "pack_items", "level", "TEXT")
-    _add_column_if_missing(cursor, "pack_items", "category", "TEXT")
-    _add_column_if_missing(cursor, "pack_items", "tags_json", "TEXT")
-    _add_column_if_missing(cursor, "pack_items", "cultural_note", "TEXT")
-    _add_column_if_missing(cursor, "pack_items", "pronunciation_text", "TEXT")
-    _add_column_if_missing(cursor, "pack_items", "translation_helper", "TEXT")
-    # --- pack_items: holographic card fields (backward-compatible) ---
-    _add_column_if_missing(cursor, "pack_items", "focus", "TEXT")              # word | phrase
-    _add_column_if_missing(cursor, "pack_items", "lemma", "TEXT")              # if focus=word
-    _add_column_if_missing(cursor, "pack_items", "phrase", "TEXT")             # if focus=phrase
-    _add_column_if_missing(cursor, "pack_items", "phrase_hint", "TEXT")        # optional suggested chunk
-    _add_column_if_missing(cursor, "pack_items", "register", "TEXT")
-    _add_column_if_missing(cursor, "pack_items", "risk", "TEXT")
-    _add_column_if_missing(cursor, "pack_items", "trap", "TEXT")
-    _add_column_if_missing(cursor, "pack_items", "native_sauce", "TEXT")
-    _add_column_if_missing(cursor, "pack_items", "components_json", "TEXT")
-    _add_column_if_missing(cursor, "pack_items", "media_json", "TEXT")
-    _add_column_if_missing(cursor, "pack_items", "drills_json", "TEXT")
-    _add_column_if_missing(cursor, "pack_items", "source_uid", "TEXT")
+
+    for table, column, col_def in _BASELINE_LATE_COLUMNS:
+        if column not in _table_columns(cursor, table):
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {col_def}")
     cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_pack_items_source_uid ON pack_items(pack_id, source_uid)")
 
 
@@ -255,412 +372,825 @@ def init_db():
         updated_at TEXT
     )
     """)
-
-
-
-
-
-
-    conn.commit()
-    conn.close()
-
+
+
+def _migration_002_hot_query_indexes(cursor):
+    """Indexes behind the review/learn hot paths (see bot/tools/check_query_plans.py)."""
+    # get_due_item / due counts: equality on user_id, range + ORDER BY on due_date,
+    # item_id carried in the index so the lookup never touches the table.
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_reviews_user_due ON reviews(user_id, due_date, item_id)")
+    # contexts are always fetched per card
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_card_contexts_item ON card_contexts(item_id, lang)")
+    # reverse lookup "who has this pack active" (pack removal / cleanup)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_user_packs_pack ON user_packs(pack_id)")
+    # My Words lookups by exact term within a pack
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_pack_items_pack_term ON pack_items(pack_id, term)")
+    # pack_items(pack_id) and pack_scenes(pack_id) are already served by the leading
+    # column of idx_pack_items_source_uid and UNIQUE(pack_id, scene_id).
+
+
+def _migration_003_pack_manifest(cursor):
+    """What each pack file looked like when it was last imported (see import_packs_from_folder)."""
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS pack_manifest (
+        path TEXT PRIMARY KEY,            -- relative to data/packs, forward slashes
+        pack_id TEXT NOT NULL,
+        mtime_ns INTEGER NOT NULL,
+        size INTEGER NOT NULL,
+        content_hash TEXT NOT NULL,       -- sha256 of the file bytes
+        imported_at TEXT NOT NULL
+    )
+    """)
+
+
+def _migration_004_ai_cache_ttl(cursor):
+    """Expiry and last-use columns for ai_cache TTLs and LRU compaction (see compact_ai_cache)."""
+    # epoch seconds rather than ISO text: compared on every cache read
+    cursor.execute("ALTER TABLE ai_cache ADD COLUMN expires_at REAL")
+    cursor.execute("ALTER TABLE ai_cache ADD COLUMN last_used_at REAL")
+    # failures used to be cached forever; drop them so those keys are retried
+    cursor.execute("""DELETE FROM ai_cache WHERE value_json LIKE '%"ok": false%'""")
+    cursor.execute("""
+        UPDATE ai_cache
+        SET last_used_at = CAST(strftime('%s', created_at) AS REAL),
+            expires_at = CAST(strftime('%s', created_at) AS REAL) + ?
+    """, (AI_CACHE_TTL_SECONDS,))
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_ai_cache_expires ON ai_cache(expires_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_ai_cache_last_used ON ai_cache(last_used_at)")
+
+
+def _migration_005_ai_metrics(cursor):
+    """Latest AI telemetry snapshot per process, published by the bot for the webapp."""
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS ai_metrics (
+        process TEXT PRIMARY KEY,
+        snapshot_json TEXT NOT NULL,
+        updated_at REAL NOT NULL
+    )
+    """)
+
+
+def _migration_006_tts_media(cursor):
+    """Telegram file_id of every uploaded TTS clip, so each clip is uploaded once."""
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS tts_media (
+        cache_key TEXT PRIMARY KEY,       -- tts_edge.cache_key(text)
+        media_type TEXT NOT NULL,         -- voice | audio
+        file_id TEXT NOT NULL,
+        created_at TEXT NOT NULL
+    )
+    """)
+
+
+# Numbered schema steps. Each runs once, in its own transaction, and is recorded in
+# schema_version. Never edit a step that has shipped; append a new one.
+MIGRATIONS = [
+    (1, "baseline schema", _migration_001_baseline),
+    (2, "indexes for review/learn hot queries", _migration_002_hot_query_indexes),
+    (3, "pack file manifest for incremental import", _migration_003_pack_manifest),
+    (4, "ai_cache expiry and LRU columns", _migration_004_ai_cache_ttl),
+    (5, "ai_metrics snapshots", _migration_005_ai_metrics),
+    (6, "tts_media file_id cache", _migration_006_tts_media),
+]
+
+
+def get_schema_version(conn) -> int:
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return int(row[0] or 0)
+
+
+def init_db():
+    conn = get_connection()
+    try:
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TEXT NOT NULL
+        )
+        """)
+        conn.commit()
+
+        for version, description, step in MIGRATIONS:
+            # BEGIN IMMEDIATE takes the write lock before re-reading the version, so the
+            # bot and the webapp starting together can't both apply the same step.
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if get_schema_version(conn) >= version:
+                    conn.rollback()
+                    continue
+                step(conn.cursor())
+                conn.execute(
+                    "INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                    (version, description, utc_now_iso()),
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        conn.execute("PRAGMA optimize;")
+    finally:
+        conn.close()
+
+
 def utc_now_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
 
 def get_user_languages(user_id: int):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT target_language, ui_language FROM users WHERE user_id = ?", (user_id,))
-    row = cursor.fetchone()
-    conn.close()
+    with db_conn() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT target_language, ui_language FROM users WHERE user_id = ?", (user_id,))
+        row = cursor.fetchone()
     return row  # (target_language, ui_language) or None
 
 
 def ai_cache_get(cache_key: str) -> dict | None:
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT value_json FROM ai_cache WHERE cache_key = ?", (cache_key,))
-    row = cur.fetchone()
-    conn.close()
-    if not row:
-        return None
+    """Cached AI result, from the in-process L1 or the ai_cache table; None if missing or expired."""
+    value_json = ai_cache.get(cache_key)
+    if value_json is None:
+        with db_conn(readonly=True) as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT value_json, expires_at FROM ai_cache WHERE cache_key = ?", (cache_key,))
+            row = cur.fetchone()
+        if not row:
+            ai_cache.miss()
+            return None
+        value_json, expires_at = row
+        if expires_at is None or expires_at <= time.time():
+            ai_cache.miss(expired=True)
+            return None
+        ai_cache.fill(cache_key, value_json, expires_at)
     try:
-        return json.loads(row[0])
+        return json.loads(value_json)
     except Exception:
         return None
 
 
 def ai_cache_set(cache_key: str, value: dict):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        INSERT INTO ai_cache (cache_key, value_json, created_at)
-        VALUES (?, ?, ?)
-        ON CONFLICT(cache_key) DO UPDATE SET
-            value_json=excluded.value_json,
-            created_at=excluded.created_at
-    """, (cache_key, json.dumps(value, ensure_ascii=False), utc_now_iso()))
-    conn.commit()
-    conn.close()
+    """
+    Store an AI result. ok=False results live AI_CACHE_NEGATIVE_TTL_SECONDS,
+    everything else AI_CACHE_TTL_SECONDS; a TTL <= 0 disables caching for that kind.
+    """
+    negative = isinstance(value, dict) and value.get("ok") is False
+    ttl = AI_CACHE_NEGATIVE_TTL_SECONDS if negative else AI_CACHE_TTL_SECONDS
+    if ttl <= 0:
+        ai_cache.discard(cache_key)
+        with db_conn() as conn:
+            conn.execute("DELETE FROM ai_cache WHERE cache_key = ?", (cache_key,))
+        return
+    now = time.time()
+    value_json = json.dumps(value, ensure_ascii=False)
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            INSERT INTO ai_cache (cache_key, value_json, created_at, expires_at, last_used_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(cache_key) DO UPDATE SET
+                value_json=excluded.value_json,
+                created_at=excluded.created_at,
+                expires_at=excluded.expires_at,
+                last_used_at=excluded.last_used_at
+        """, (cache_key, value_json, utc_now_iso(), now + ttl, now))
+    ai_cache.put(cache_key, value_json, now + ttl, negative=negative)
+
+
+def compact_ai_cache() -> tuple[int, int]:
+    """
+    Maintenance pass over ai_cache: write back last-use times of L1 hits, drop
+    expired rows, then evict least recently used rows above AI_CACHE_MAX_ROWS.
+    Returns (expired, evicted).
+    """
+    touched = ai_cache.take_touched()
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.executemany("UPDATE ai_cache SET last_used_at = ? WHERE cache_key = ?", touched)
+        cur.execute("DELETE FROM ai_cache WHERE expires_at <= ?", (time.time(),))
+        expired = cur.rowcount or 0
+        cur.execute("SELECT COUNT(*) FROM ai_cache")
+        (rows,) = cur.fetchone()
+        evicted = 0
+        if rows > AI_CACHE_MAX_ROWS:
+            cur.execute("""
+                DELETE FROM ai_cache
+                WHERE cache_key IN (
+                    SELECT cache_key FROM ai_cache ORDER BY last_used_at LIMIT ?
+                )
+            """, (rows - AI_CACHE_MAX_ROWS,))
+            evicted = cur.rowcount or 0
+    ai_cache.note_compaction(expired, evicted)
+    return expired, evicted
+
+
+def ai_cache_stats() -> dict:
+    """Hit/miss counters of the AI cache plus the current table size."""
+    out = ai_cache.stats()
+    with db_conn(readonly=True) as conn:
+        (out["l2_rows"],) = conn.execute("SELECT COUNT(*) FROM ai_cache").fetchone()
+    return out
+
+
+def save_ai_metrics(process: str, snapshot: dict):
+    with db_conn() as conn:
+        conn.execute("""
+            INSERT INTO ai_metrics (process, snapshot_json, updated_at)
+            VALUES (?, ?, ?)
+            ON CONFLICT(process) DO UPDATE SET
+                snapshot_json=excluded.snapshot_json,
+                updated_at=excluded.updated_at
+        """, (process, json.dumps(snapshot, ensure_ascii=False), time.time()))
+
+
+def get_ai_metrics() -> dict[str, dict]:
+    """process -> its last published snapshot (with "updated_at")."""
+    with db_conn(readonly=True) as conn:
+        rows = conn.execute("SELECT process, snapshot_json, updated_at FROM ai_metrics").fetchall()
+    out = {}
+    for process, snapshot_json, updated_at in rows:
+        try:
+            out[process] = {**json.loads(snapshot_json), "updated_at": updated_at}
+        except Exception:
+            continue
+    return out
+
+
+def get_tts_media(cache_key: str) -> tuple[str, str] | None:
+    """(media_type, file_id) of an already uploaded TTS clip, or None."""
+    with db_conn(readonly=True) as conn:
+        row = conn.execute(
+            "SELECT media_type, file_id FROM tts_media WHERE cache_key = ?", (cache_key,)
+        ).fetchone()
+    return (row[0], row[1]) if row else None
+
+
+def set_tts_media(cache_key: str, media_type: str, file_id: str):
+    with db_conn() as conn:
+        conn.execute("""
+            INSERT INTO tts_media (cache_key, media_type, file_id, created_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(cache_key) DO UPDATE SET
+                media_type=excluded.media_type,
+                file_id=excluded.file_id,
+                created_at=excluded.created_at
+        """, (cache_key, media_type, file_id, utc_now_iso()))
+
+
+def delete_tts_media(cache_key: str):
+    with db_conn() as conn:
+        conn.execute("DELETE FROM tts_media WHERE cache_key = ?", (cache_key,))
 
 
 def get_learn_since_scene(user_id: int) -> int:
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT learn_since_scene FROM users WHERE user_id = ?", (user_id,))
-    row = cur.fetchone()
-    conn.close()
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT learn_since_scene FROM users WHERE user_id = ?", (user_id,))
+        row = cur.fetchone()
     return int(row[0]) if row and row[0] is not None else 0
 
 
 def set_learn_since_scene(user_id: int, value: int):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("UPDATE users SET learn_since_scene = ? WHERE user_id = ?", (int(value), user_id))
-    conn.commit()
-    conn.close()
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("UPDATE users SET learn_since_scene = ? WHERE user_id = ?", (int(value), user_id))
 
 
-def import_packs_from_folder():
+# json.dumps(..., ensure_ascii=False) builds a new encoder per call; the importer
+# serialises several fields per card, so reuse one.
+_json_encoder = json.JSONEncoder(ensure_ascii=False)
+
+
+def _safe_json(x):
+    return _json_encoder.encode(x) if x is not None else None
+
+
+def _pack_meta_row(pack: dict) -> tuple:
+    """Values for the packs row, inferring pack_type/chunk_size/missions_enabled when missing."""
+    pack_id = pack["pack_id"]
+    level = pack.get("level")
+    pack_type = pack.get("pack_type")
+    chunk_size = pack.get("chunk_size")
+    missions_enabled = pack.get("missions_enabled")
+
+    # Infer pack type if not provided
+    if not pack_type:
+        cards = pack.get("cards") or []
+        if cards:
+            phrase_count = sum(1 for c in cards if (c.get("focus") or "").lower() == "phrase")
+            pack_type = "phrase" if phrase_count >= max(1, len(cards) // 2) else "word"
+        else:
+            pack_type = "word"
+
+    if chunk_size is None and pack_type == "phrase":
+        chunk_size = 5
+    if missions_enabled is None:
+        missions_enabled = 1 if pack_type == "phrase" else 0
+
+    return (
+        pack_id,
+        pack.get("target_language", "it"),
+        level,
+        pack.get("title", pack_id),
+        pack.get("description", ""),
+        pack_type,
+        chunk_size,
+        missions_enabled,
+    )
+
+
+def _pack_card_rows(pack: dict) -> dict[str, tuple[tuple, list[tuple]]]:
     """
-    Loads all JSON packs from data/packs into SQLite.
+    source_uid -> (pack_items content values, [(sentence, source), ...] contexts)
+    for every card of a pack file. Content values follow the column order used by
+    _apply_pack. The first card wins when a file repeats a source_uid.
     Supports:
       - legacy schema: { items: [...] }
       - v2 mission schema: { cards: [...], scenes: [...] }
     """
-    conn = get_connection()
-    cursor = conn.cursor()
+    level = pack.get("level")
+    cards = pack.get("cards")
+    items = pack.get("items")
+    rows = {}
+
+    if cards:
+        for c in cards:
+            focus = c.get("focus", "word")  # word | phrase
+
+            lemma = c.get("lemma")
+            phrase = c.get("phrase")
+            phrase_hint = c.get("phrase_hint")
+
+            # Backward-compatible "term" and "chunk" (what Learn expects)
+            if focus == "phrase":
+                term = phrase or (phrase_hint or "")
+                chunk = phrase or (phrase_hint or term)
+            else:
+                term = lemma or ""
+                chunk = phrase_hint or term
 
-    PACKS_DIR.mkdir(parents=True, exist_ok=True)
+            meaning_en = c.get("meaning_en") or c.get("translation_en")
+            meaning_helper = c.get("meaning_helper") or c.get("translation_helper")
 
-    # Load all pack files first so we can clean up removed packs
-    packs = []
-    for path in PACKS_DIR.rglob("*.json"):
-        with open(path, "r", encoding="utf-8") as f:
-            pack = json.load(f)
-            packs.append(pack)
-
-    # Remove packs that no longer exist on disk (ignore user-created packs)
-    pack_ids_in_files = {p.get("pack_id") for p in packs if p.get("pack_id")}
-    if pack_ids_in_files:
-        cursor.execute("SELECT pack_id FROM packs")
-        all_ids = [r[0] for r in cursor.fetchall()]
-        stale = []
-        for pid in all_ids:
-            if pid in pack_ids_in_files:
-                continue
-            # keep user packs: <lang>_user_<id>_mywords
-            if "_user_" in pid and pid.endswith("_mywords"):
+            meta = c.get("meta") or {}
+            tags = meta.get("tags") or []
+            components = c.get("components") or []
+
+            source_uid = c.get("source_uid") or c.get("id") or c.get("card_id") or ""
+            if not source_uid:
+                source_uid = f"{term}\n{chunk}".strip()
+            if source_uid in rows:
                 continue
-            stale.append(pid)
-        if stale:
-            cursor.execute(
-                "DELETE FROM pack_items WHERE pack_id IN ({})".format(
-                    ",".join("?" for _ in stale)
-                ),
-                tuple(stale),
-            )
-            cursor.execute(
-                "DELETE FROM pack_scenes WHERE pack_id IN ({})".format(
-                    ",".join("?" for _ in stale)
-                ),
-                tuple(stale),
+
+            values = (
+                term,
+                chunk,
+                meaning_en,
+                "",
+
+                focus,
+                lemma,
+                phrase,
+                phrase_hint,
+
+                c.get("level", level),
+                meta.get("category"),
+                meta.get("register"),
+                meta.get("risk"),
+
+                meta.get("trap"),
+                meta.get("native_sauce"),
+                meta.get("cultural_note"),
+
+                _safe_json(tags),
+                _safe_json(components),
+                _safe_json(c.get("media") or {}),
+                _safe_json(c.get("drills") or {}),
+
+                meaning_helper,
+                c.get("pronunciation_text") or chunk or term,
             )
-            cursor.execute(
-                "DELETE FROM user_packs WHERE pack_id IN ({})".format(
-                    ",".join("?" for _ in stale)
-                ),
-                tuple(stale),
+            source = c.get("context_source") or None
+            contexts = [(sent, source) for sent in (c.get("contexts_it") or [])]
+            rows[source_uid] = (values, contexts)
+
+    elif items:
+        # legacy packs: keep your current schema but store extra fields if present
+        for item in items:
+            tags = item.get("tags") or []
+            source_uid = item.get("source_uid") or item.get("id") or item.get("card_id")
+            if not source_uid:
+                source_uid = f"{item.get('term','')}\n{(item.get('chunk') or item.get('term',''))}".strip()
+            if source_uid in rows:
+                continue
+
+            values = (
+                item["term"],
+                item.get("chunk") or item["term"],
+                item.get("translation_en"),
+                item.get("note", ""),
+
+                "word",
+                item.get("term"),
+                None,
+                None,
+
+                item.get("level", level),
+                item.get("category"),
+                None,
+                None,
+
+                None,
+                None,
+                item.get("cultural_note"),
+
+                _safe_json(tags),
+                None,
+                None,
+                None,
+
+                item.get("translation_helper"),
+                item.get("pronunciation_text", item.get("chunk") or item["term"]),
             )
-            cursor.execute(
-                "DELETE FROM packs WHERE pack_id IN ({})".format(
-                    ",".join("?" for _ in stale)
-                ),
-                tuple(stale),
+            rows[source_uid] = (values, [])
+
+    return rows
+
+
+def _apply_pack(cursor, pack: dict):
+    """
+    Bring one pack's rows in line with its file: upsert the pack row, insert new
+    cards, update edited ones in place (item_id and reviews survive), drop cards
+    and scenes that left the file. Reviews of dropped cards are left to
+    sweep_stale_reviews.
+    """
+    pack_id = pack["pack_id"]
+    cursor.execute("""
+        INSERT INTO packs (pack_id, target_language, level, title, description, pack_type, chunk_size, missions_enabled)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(pack_id) DO UPDATE SET
+            target_language=excluded.target_language,
+            level=excluded.level,
+            title=excluded.title,
+            description=excluded.description,
+            pack_type=excluded.pack_type,
+            chunk_size=excluded.chunk_size,
+            missions_enabled=excluded.missions_enabled
+    """, _pack_meta_row(pack))
+
+    wanted = _pack_card_rows(pack)
+
+    cursor.execute("""
+        SELECT item_id, source_uid,
+               term, chunk, translation_en, note,
+               focus, lemma, phrase, phrase_hint,
+               level, category, register, risk,
+               trap, native_sauce, cultural_note,
+               tags_json, components_json, media_json, drills_json,
+               translation_helper, pronunciation_text
+        FROM pack_items
+        WHERE pack_id = ?
+    """, (pack_id,))
+    existing = {row[1]: (row[0], tuple(row[2:])) for row in cursor.fetchall()}
+
+    cursor.execute("""
+        SELECT cc.item_id, cc.sentence, cc.source
+        FROM pack_items pi
+        JOIN card_contexts cc ON cc.item_id = pi.item_id AND cc.lang = 'it'
+        WHERE pi.pack_id = ?
+        ORDER BY cc.context_id
+    """, (pack_id,))
+    existing_contexts: dict[int, list[tuple]] = {}
+    for item_id, sentence, source in cursor.fetchall():
+        existing_contexts.setdefault(item_id, []).append((sentence, source))
+
+    dropped = [(item_id,) for uid, (item_id, _) in existing.items() if uid not in wanted]
+    cursor.executemany("DELETE FROM card_contexts WHERE item_id = ?", dropped)
+    cursor.executemany("DELETE FROM pack_items WHERE item_id = ?", dropped)
+
+    # Sort the file into row arrays first, then write each kind with one executemany.
+    inserts = []          # pack_items rows for new cards
+    updates = []          # (values..., item_id) for edited cards
+    stale_contexts = []   # (item_id,) whose context sentences changed
+    context_rows = []     # (item_id, sentence, source)
+    for source_uid, (values, contexts) in wanted.items():
+        if source_uid not in existing:
+            inserts.append((pack_id, source_uid, *values))
+            continue
+        item_id, current = existing[source_uid]
+        if current != values:
+            updates.append((*values, item_id))
+        if existing_contexts.get(item_id, []) != contexts:
+            stale_contexts.append((item_id,))
+            context_rows.extend((item_id, sentence, source) for sentence, source in contexts)
+
+    cursor.executemany("""
+        UPDATE pack_items SET
+            term = ?, chunk = ?, translation_en = ?, note = ?,
+            focus = ?, lemma = ?, phrase = ?, phrase_hint = ?,
+            level = ?, category = ?, register = ?, risk = ?,
+            trap = ?, native_sauce = ?, cultural_note = ?,
+            tags_json = ?, components_json = ?, media_json = ?, drills_json = ?,
+            translation_helper = ?, pronunciation_text = ?
+        WHERE item_id = ?
+    """, updates)
+    cursor.executemany("DELETE FROM card_contexts WHERE item_id = ? AND lang = 'it'", stale_contexts)
+
+    if inserts:
+        cursor.executemany("""
+            INSERT INTO pack_items (
+                pack_id, source_uid,
+                term, chunk, translation_en, note,
+                focus, lemma, phrase, phrase_hint,
+                level, category, register, risk,
+                trap, native_sauce, cultural_note,
+                tags_json, components_json, media_json, drills_json,
+                translation_helper, pronunciation_text
             )
+            VALUES (?, ?,
+                    ?, ?, ?, ?,
+                    ?, ?, ?, ?,
+                    ?, ?, ?, ?,
+                    ?, ?, ?,
+                    ?, ?, ?, ?,
+                    ?, ?)
+        """, inserts)
+        # executemany gives no lastrowid per row; one lookup resolves every new item_id
+        cursor.execute("SELECT source_uid, item_id FROM pack_items WHERE pack_id = ?", (pack_id,))
+        item_ids = dict(cursor.fetchall())
+        for row in inserts:
+            source_uid = row[1]
+            item_id = item_ids[source_uid]
+            context_rows.extend((item_id, sentence, source) for sentence, source in wanted[source_uid][1])
+
+    # Context sentences
+    cursor.executemany("""
+        INSERT INTO card_contexts (item_id, lang, sentence, source)
+        VALUES (?, 'it', ?, ?)
+    """, context_rows)
+
+    # --------- Import scenes (optional) ---------
+    scenes = pack.get("scenes") or []
+    cursor.executemany("""
+        INSERT INTO pack_scenes (pack_id, scene_id, unlock_rule_json, roleplay_json)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(pack_id, scene_id) DO UPDATE SET
+            unlock_rule_json=excluded.unlock_rule_json,
+            roleplay_json=excluded.roleplay_json
+    """, [
+        (
+            pack_id,
+            s.get("scene_id"),
+            _safe_json(s.get("unlock_rule") or {}),
+            _safe_json(s.get("roleplay") or {})
+        )
+        for s in scenes
+    ])
+    # a NULL in NOT IN (...) matches nothing, so drop missing ids and never pass an empty list
+    scene_ids = [s.get("scene_id") for s in scenes if s.get("scene_id") is not None]
+    if not scene_ids:
+        cursor.execute("DELETE FROM pack_scenes WHERE pack_id = ?", (pack_id,))
+    else:
+        placeholders = ",".join("?" for _ in scene_ids)
+        cursor.execute(
+            f"DELETE FROM pack_scenes WHERE pack_id = ? AND scene_id NOT IN ({placeholders})",
+            (pack_id, *scene_ids),
+        )
 
-    for pack in packs:
-        pack_id = pack["pack_id"]
-        target_language = pack.get("target_language", "it")
-        level = pack.get("level")
-        title = pack.get("title", pack_id)
-        description = pack.get("description", "")
-        pack_type = pack.get("pack_type")
-        chunk_size = pack.get("chunk_size")
-        missions_enabled = pack.get("missions_enabled")
-
-        # Infer pack type if not provided
-        if not pack_type:
-            cards = pack.get("cards") or []
-            if cards:
-                phrase_count = sum(1 for c in cards if (c.get("focus") or "").lower() == "phrase")
-                pack_type = "phrase" if phrase_count >= max(1, len(cards) // 2) else "word"
-            else:
-                pack_type = "word"
 
-        if chunk_size is None and pack_type == "phrase":
-            chunk_size = 5
-        if missions_enabled is None:
-            missions_enabled = 1 if pack_type == "phrase" else 0
+def import_packs_from_folder(force: bool = False) -> tuple[list[str], list[str], list[str]]:
+    """
+    Sync data/packs into SQLite, touching only files that changed since the last run.
 
-        # Upsert pack metadata
-        cursor.execute("""
-            INSERT INTO packs (pack_id, target_language, level, title, description, pack_type, chunk_size, missions_enabled)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ON CONFLICT(pack_id) DO UPDATE SET
-                target_language=excluded.target_language,
-                level=excluded.level,
-                title=excluded.title,
-                description=excluded.description,
-                pack_type=excluded.pack_type,
-                chunk_size=excluded.chunk_size,
-                missions_enabled=excluded.missions_enabled
-        """, (pack_id, target_language, level, title, description, pack_type, chunk_size, missions_enabled))
-
-        # --------- Import legacy items OR v2 cards ---------
-        cards = pack.get("cards")
-        items = pack.get("items")
-
-        def _safe_json(x):
-            return json.dumps(x, ensure_ascii=False) if x is not None else None
-
-        if cards:
-            for c in cards:
-                focus = c.get("focus", "word")  # word | phrase
-
-                lemma = c.get("lemma")
-                phrase = c.get("phrase")
-                phrase_hint = c.get("phrase_hint")
-
-                # Backward-compatible "term" and "chunk" (what Learn expects)
-                if focus == "phrase":
-                    term = phrase or (phrase_hint or "")
-                    chunk = phrase or (phrase_hint or term)
-                else:
-                    term = lemma or ""
-                    chunk = phrase_hint or term
-
-                meaning_en = c.get("meaning_en") or c.get("translation_en")
-                meaning_helper = c.get("meaning_helper") or c.get("translation_helper")
-
-                meta = c.get("meta") or {}
-                tags = meta.get("tags") or []
-                components = c.get("components") or []
-
-                source_uid = c.get("source_uid") or c.get("id") or c.get("card_id") or ""
-                if not source_uid:
-                    source_uid = f"{term}\n{chunk}".strip()
-
-                cursor.execute("""
-                    INSERT OR IGNORE INTO pack_items (
-                        pack_id, source_uid, term, chunk, translation_en, note,
-                        focus, lemma, phrase, phrase_hint,
-                        level, category, register, risk,
-                        trap, native_sauce, cultural_note,
-                        tags_json, components_json, media_json, drills_json,
-                        translation_helper, pronunciation_text
-                    )
-                    VALUES (?, ?, ?, ?, ?, ?,
-                            ?, ?, ?, ?,
-                            ?, ?, ?, ?,
-                            ?, ?, ?,
-                            ?, ?, ?, ?,
-                            ?, ?)
-                """, (
-                    pack_id,
-                    source_uid,
-                    term,
-                    chunk,
-                    meaning_en,
-                    "",
-
-                    focus,
-                    lemma,
-                    phrase,
-                    phrase_hint,
-
-                    c.get("level", level),
-                    meta.get("category"),
-                    meta.get("register"),
-                    meta.get("risk"),
-
-                    meta.get("trap"),
-                    meta.get("native_sauce"),
-                    meta.get("cultural_note"),
-
-                    _safe_json(tags),
-                    _safe_json(components),
-                    _safe_json(c.get("media") or {}),
-                    _safe_json(c.get("drills") or {}),
-
-                    meaning_helper,
-                    c.get("pronunciation_text") or chunk or term
-                ))
-
-                if cursor.rowcount == 0:
-                    continue
+    pack_manifest remembers path, mtime, size and sha256 per file. A file whose
+    mtime and size match is skipped without being opened; one that was only
+    touched (same hash) just refreshes its manifest row; anything else is parsed
+    and diffed into the DB by _apply_pack. Packs whose file disappeared are
+    removed. force=True re-applies every file regardless of the manifest.
+
+    Returns (imported pack_ids, unchanged pack_ids, removed pack_ids).
+    """
+    PACKS_DIR.mkdir(parents=True, exist_ok=True)
 
-                item_id = cursor.lastrowid
-
-                # Context sentences
-                for sent in (c.get("contexts_it") or []):
-                    cursor.execute("""
-                        INSERT INTO card_contexts (item_id, lang, sentence, source)
-                        VALUES (?, 'it', ?, ?)
-                    """, (item_id, sent, (c.get("context_source") or None)))
-
-        elif items:
-            # legacy packs: keep your current schema but store extra fields if present
-            for item in items:
-                tags = item.get("tags") or []
-                source_uid = item.get("source_uid") or item.get("id") or item.get("card_id")
-                if not source_uid:
-                    source_uid = f"{item.get('term','')}\n{(item.get('chunk') or item.get('term',''))}".strip()
-
-                cursor.execute("""
-                    INSERT OR IGNORE INTO pack_items (
-                        pack_id, source_uid, term, chunk, translation_en, note,
-                        level, category, tags_json, cultural_note,
-                        pronunciation_text, translation_helper,
-                        focus, lemma, phrase
-                    )
-                    VALUES (?, ?, ?, ?, ?, ?,
-                            ?, ?, ?, ?,
-                            ?, ?,
-                            'word', ?, NULL)
-                """, (
-                    pack_id,
-                    source_uid,
-                    item["term"],
-                    item.get("chunk") or item["term"],
-                    item.get("translation_en"),
-                    item.get("note", ""),
-
-                    item.get("level", level),
-                    item.get("category"),
-                    json.dumps(tags, ensure_ascii=False),
-                    item.get("cultural_note"),
-
-                    item.get("pronunciation_text", item.get("chunk") or item["term"]),
-                    item.get("translation_helper"),
-
-                    item.get("term")
-                ))
-
-        # --------- Import scenes (optional) ---------
-        for s in (pack.get("scenes") or []):
-            cursor.execute("""
-                INSERT INTO pack_scenes (pack_id, scene_id, unlock_rule_json, roleplay_json)
-                VALUES (?, ?, ?, ?)
-                ON CONFLICT(pack_id, scene_id) DO UPDATE SET
-                    unlock_rule_json=excluded.unlock_rule_json,
-                    roleplay_json=excluded.roleplay_json
-            """, (
-                pack_id,
-                s.get("scene_id"),
-                _safe_json(s.get("unlock_rule") or {}),
-                _safe_json(s.get("roleplay") or {})
-            ))
-
-    conn.commit()
-    conn.close()
+    with db_conn(readonly=True) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT path, pack_id, mtime_ns, size, content_hash FROM pack_manifest")
+        manifest = {row[0]: row[1:] for row in cursor.fetchall()}
+
+    # Walk the folder outside the write transaction; only changed files are read.
+    on_disk: dict[str, str] = {}           # manifest path -> pack_id
+    touched: list[tuple] = []              # (mtime_ns, size, path): same content, new stat
+    changed: list[tuple] = []              # (path, pack_id, mtime_ns, size, content_hash, pack)
+    unchanged: list[str] = []
+    for path in sorted(PACKS_DIR.rglob("*.json")):
+        key = path.relative_to(PACKS_DIR).as_posix()
+        st = path.stat()
+        known = None if force else manifest.get(key)
+        if known and known[1] == st.st_mtime_ns and known[2] == st.st_size:
+            on_disk[key] = known[0]
+            unchanged.append(known[0])
+            continue
+        raw = path.read_bytes()
+        content_hash = hashlib.sha256(raw).hexdigest()
+        if known and known[3] == content_hash:
+            on_disk[key] = known[0]
+            unchanged.append(known[0])
+            touched.append((st.st_mtime_ns, st.st_size, key))
+            continue
+        pack = json.loads(raw.decode("utf-8"))
+        on_disk[key] = pack["pack_id"]
+        changed.append((key, pack["pack_id"], st.st_mtime_ns, st.st_size, content_hash, pack))
+
+    gone_paths = [p for p in manifest if p not in on_disk]
+    if not (changed or touched or gone_paths):
+        return [], unchanged, []
+
+    removed: list[str] = []
+    with db_conn() as conn:
+        cursor = conn.cursor()
+
+        # Remove packs that no longer exist on disk (ignore user-created packs)
+        pack_ids_in_files = set(on_disk.values())
+        if pack_ids_in_files:
+            cursor.execute("SELECT pack_id FROM packs")
+            all_ids = [r[0] for r in cursor.fetchall()]
+            for pid in all_ids:
+                if pid in pack_ids_in_files:
+                    continue
+                # keep user packs: <lang>_user_<id>_mywords
+                if "_user_" in pid and pid.endswith("_mywords"):
+                    continue
+                removed.append(pid)
+            if removed:
+                placeholders = ",".join("?" for _ in removed)
+                _purge_pack_reviews(cursor, removed)
+                cursor.execute(f"DELETE FROM card_contexts WHERE item_id IN (SELECT item_id FROM pack_items WHERE pack_id IN ({placeholders}))", tuple(removed))
+                cursor.execute(f"DELETE FROM pack_items WHERE pack_id IN ({placeholders})", tuple(removed))
+                cursor.execute(f"DELETE FROM pack_scenes WHERE pack_id IN ({placeholders})", tuple(removed))
+                cursor.execute(f"DELETE FROM user_packs WHERE pack_id IN ({placeholders})", tuple(removed))
+                cursor.execute(f"DELETE FROM packs WHERE pack_id IN ({placeholders})", tuple(removed))
+
+        cursor.executemany("UPDATE pack_manifest SET mtime_ns = ?, size = ? WHERE path = ?", touched)
+        cursor.executemany("DELETE FROM pack_manifest WHERE path = ?", [(p,) for p in gone_paths])
+
+    # One transaction per pack: a large pack never holds the write lock for the whole
+    # import, and a file that fails to apply leaves the packs before it committed.
+    for key, pack_id, mtime_ns, size, content_hash, pack in changed:
+        with db_conn() as conn:
+            cursor = conn.cursor()
+            _apply_pack(cursor, pack)
+            cursor.execute("""
+                INSERT INTO pack_manifest (path, pack_id, mtime_ns, size, content_hash, imported_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(path) DO UPDATE SET
+                    pack_id=excluded.pack_id,
+                    mtime_ns=excluded.mtime_ns,
+                    size=excluded.size,
+                    content_hash=excluded.content_hash,
+                    imported_at=excluded.imported_at
+            """, (key, pack_id, mtime_ns, size, content_hash, utc_now_iso()))
+
+    imported = [c[1] for c in changed]
+    for pack_id in (*imported, *removed):
+        invalidate_pack_samples(pack_id)
+    return imported, unchanged, removed
 
 
 def list_packs(target_language: str):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT pack_id, level, title, description
-        FROM packs
-        WHERE target_language = ?
-        ORDER BY level, title
-    """, (target_language,))
-    rows = cursor.fetchall()
-    conn.close()
+    with db_conn() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT pack_id, level, title, description
+            FROM packs
+            WHERE target_language = ?
+            ORDER BY level, title
+        """, (target_language,))
+        rows = cursor.fetchall()
     return rows
 
 
 def get_pack_info(pack_id: str):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT pack_id, level, title, description, pack_type, chunk_size, missions_enabled, target_language
-        FROM packs
-        WHERE pack_id = ?
-    """, (pack_id,))
-    row = cursor.fetchone()
-    conn.close()
+    with db_conn() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT pack_id, level, title, description, pack_type, chunk_size, missions_enabled, target_language
+            FROM packs
+            WHERE pack_id = ?
+        """, (pack_id,))
+        row = cursor.fetchone()
     return row
 
 def activate_pack(user_id: int, pack_id: str):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT OR IGNORE INTO user_packs (user_id, pack_id, activated_at)
-        VALUES (?, ?, ?)
-    """, (user_id, pack_id, utc_now_iso()))
-    conn.commit()
-    conn.close()
+    with db_conn() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT OR IGNORE INTO user_packs (user_id, pack_id, activated_at)
+            VALUES (?, ?, ?)
+        """, (user_id, pack_id, utc_now_iso()))
 
 def get_user_active_packs(user_id: int):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT pack_id FROM user_packs WHERE user_id = ?
-    """, (user_id,))
-    rows = cursor.fetchall()
-    conn.close()
+    with db_conn() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT pack_id FROM user_packs WHERE user_id = ?
+        """, (user_id,))
+        rows = cursor.fetchall()
+    return [r[0] for r in rows]
+
+
+def _active_pack_ids(user_id: int, target_language: str | None = None) -> list[str]:
+    with db_conn() as conn:
+        cur = conn.cursor()
+        if target_language is None:
+            cur.execute("SELECT pack_id FROM user_packs WHERE user_id = ?", (user_id,))
+        else:
+            cur.execute("""
+                SELECT up.pack_id
+                FROM user_packs up
+                JOIN packs p ON p.pack_id = up.pack_id
+                WHERE up.user_id = ? AND p.target_language = ?
+            """, (user_id, target_language))
+        rows = cur.fetchall()
     return [r[0] for r in rows]
 
+
+def _load_pack_sample(pack_id: str) -> dict:
+    """Build the in-memory sampling arrays for one pack (see bot/pack_sampler.py)."""
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT item_id, term, chunk, translation_en, note, pack_id, focus, level
+            FROM pack_items
+            WHERE pack_id = ?
+        """, (pack_id,))
+        item_rows = cur.fetchall()
+        cur.execute("""
+            SELECT pack_id, scene_id, unlock_rule_json, roleplay_json
+            FROM pack_scenes
+            WHERE pack_id = ?
+        """, (pack_id,))
+        scenes = cur.fetchall()
+
+    items, terms, meanings = [], [], []
+    items_by_level: dict[str, list[tuple]] = {}
+    for row in item_rows:
+        item_id, term, _, translation_en = row[:4]
+        item = row[:7]
+        items.append(item)
+        items_by_level.setdefault(row[7] or "", []).append(item)
+        if term and term.strip():
+            terms.append((item_id, term))
+        if translation_en and translation_en.strip():
+            meanings.append((item_id, translation_en))
+    return {
+        "items": items,
+        "items_by_level": items_by_level,
+        "terms": terms,
+        "meanings": meanings,
+        "scenes": scenes,
+    }
+
+
+def _pack_sample(pack_id: str) -> dict:
+    return pack_sampler.get_pack_sample(pack_id, _load_pack_sample)
+
+
+def invalidate_pack_samples(pack_id: str | None = None):
+    """Drop cached sampling arrays after pack contents change (None = all packs)."""
+    pack_sampler.invalidate(pack_id)
+
+
 def pick_one_item_from_pack(pack_id: str):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT item_id, term, chunk, translation_en, note
-        FROM pack_items
-        WHERE pack_id = ?
-        ORDER BY RANDOM()
-        LIMIT 1
-    """, (pack_id,))
-    row = cursor.fetchone()
-    conn.close()
-    return row
+    rows = pack_sampler.sample_distinct(_pack_sample(pack_id)["items"], 1)
+    return rows[0][:5] if rows else None
 
 def set_session(user_id: int, mode: str, item_id: int | None, stage: str, meta: dict | None = None):
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    meta_json = json.dumps(meta or {}, ensure_ascii=False)
+    meta_json = json.dumps(meta or {}, ensure_ascii=False)
+    row = (mode, item_id, stage, meta_json, utc_now_iso())
+    session_cache.put(user_id, row)
+    if not _session_write_behind:
+        flush_sessions()
 
-    cursor.execute("""
-        INSERT INTO user_session (user_id, mode, item_id, stage, meta_json, updated_at)
-        VALUES (?, ?, ?, ?, ?, ?)
-        ON CONFLICT(user_id) DO UPDATE SET
-            mode=excluded.mode,
-            item_id=excluded.item_id,
-            stage=excluded.stage,
-            meta_json=excluded.meta_json,
-            updated_at=excluded.updated_at
-    """, (user_id, mode, item_id, stage, meta_json, utc_now_iso()))
-
-    conn.commit()
-    conn.close()
 
 def get_session(user_id: int):
-    conn = get_connection()
-    cursor = conn.cursor()
+    """
+    (mode, item_id, stage, meta) or None. Served from session_cache; SQLite is only
+    read on a miss. meta is parsed per call, so each caller owns its dict: load it
+    once per update and hand the tuple on rather than calling this again.
+    """
+    hit, row = session_cache.get(user_id)
+    if not hit:
+        with db_conn(readonly=True) as conn:
+            cursor = conn.cursor()
 
-    cursor.execute(
-        "SELECT mode, item_id, stage, meta_json FROM user_session WHERE user_id = ?",
-        (user_id,)
-    )
-    row = cursor.fetchone()
-    conn.close()
+            cursor.execute(
+                "SELECT mode, item_id, stage, meta_json, updated_at FROM user_session WHERE user_id = ?",
+                (user_id,)
+            )
+            row = cursor.fetchone()
+        session_cache.fill(user_id, row)
 
     if not row:
         return None
 
-    mode, item_id, stage, meta_json = row
+    mode, item_id, stage, meta_json, _ = row
 
     try:
         meta = json.loads(meta_json) if meta_json else {}
@@ -670,43 +1200,75 @@ def get_session(user_id: int):
     return mode, item_id, stage, meta
 
 def clear_session(user_id: int):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM user_session WHERE user_id = ?", (user_id,))
-    conn.commit()
-    conn.close()
+    session_cache.put(user_id, None)
+    if not _session_write_behind:
+        flush_sessions()
+
+
+def enable_session_write_behind():
+    """
+    Stop writing sessions to SQLite on every set/clear; the caller promises to run
+    flush_sessions() periodically and at shutdown (bot/main.py does).
+    """
+    global _session_write_behind
+    _session_write_behind = True
+
+
+def flush_sessions() -> int:
+    """
+    Write every dirty cached session in one transaction: a user whose stage changed
+    five times since the last flush costs one row. Returns the number of rows written.
+    """
+    batch = session_cache.take_dirty()
+    if not batch:
+        return 0
+    upserts = [(user_id, *row) for user_id, row in batch if row is not None]
+    deletes = [(user_id,) for user_id, row in batch if row is None]
+    try:
+        with db_conn() as conn:
+            cursor = conn.cursor()
+            cursor.executemany("""
+                INSERT INTO user_session (user_id, mode, item_id, stage, meta_json, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(user_id) DO UPDATE SET
+                    mode=excluded.mode,
+                    item_id=excluded.item_id,
+                    stage=excluded.stage,
+                    meta_json=excluded.meta_json,
+                    updated_at=excluded.updated_at
+            """, upserts)
+            cursor.executemany("DELETE FROM user_session WHERE user_id = ?", deletes)
+    except Exception:
+        session_cache.restore_dirty(batch)
+        raise
+    return len(batch)
 
 def get_item_by_id(item_id: int):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT item_id, term, chunk, translation_en, note, pack_id, focus
-        FROM pack_items
-        WHERE item_id = ?
-    """, (item_id,))
-    row = cursor.fetchone()
-    conn.close()
+    with db_conn() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT item_id, term, chunk, translation_en, note, pack_id, focus
+            FROM pack_items
+            WHERE item_id = ?
+        """, (item_id,))
+        row = cursor.fetchone()
     return row
 
 def set_user_target_language(user_id: int, target_language: str):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "UPDATE users SET target_language = ? WHERE user_id = ?",
-        (target_language, user_id)
-    )
-    conn.commit()
-    conn.close()
+    with db_conn() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "UPDATE users SET target_language = ? WHERE user_id = ?",
+            (target_language, user_id)
+        )
 
 def set_user_ui_language(user_id: int, ui_language: str):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "UPDATE users SET ui_language = ? WHERE user_id = ?",
-        (ui_language, user_id)
-    )
-    conn.commit()
-    conn.close()
+    with db_conn() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "UPDATE users SET ui_language = ? WHERE user_id = ?",
+            (ui_language, user_id)
+        )
 
 
 def today_str() -> str:
@@ -718,123 +1280,110 @@ def ensure_review_row(user_id: int, item_id: int):
     Make sure an item exists in the user's review queue.
     If it doesn't exist, create it as 'new' due today.
     """
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT OR IGNORE INTO reviews (user_id, item_id, status, interval_days, due_date, last_reviewed_at, reps, lapses)
-        VALUES (?, ?, 'new', 0, ?, NULL, 0, 0)
-    """, (user_id, item_id, today_str()))
-    conn.commit()
-    conn.close()
+    with db_conn() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT OR IGNORE INTO reviews (user_id, item_id, status, interval_days, due_date, last_reviewed_at, reps, lapses)
+            VALUES (?, ?, 'new', 0, ?, NULL, 0, 0)
+        """, (user_id, item_id, today_str()))
 
 def get_due_item(user_id: int):
     """
     Return one item_id that is due today (or overdue), else None.
-    Skips and cleans stale review rows that point to missing pack_items.
+    Review rows whose card no longer exists are skipped (the sweeper removes them).
     """
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    # loop until we find a valid item or run out
-    while True:
+    with db_conn(readonly=True) as conn:
+        cursor = conn.cursor()
         cursor.execute("""
-            SELECT item_id
-            FROM reviews
-            WHERE user_id = ? AND due_date <= ?
-            ORDER BY due_date ASC
+            SELECT r.item_id
+            FROM reviews r
+            JOIN pack_items pi ON pi.item_id = r.item_id
+            WHERE r.user_id = ? AND r.due_date <= ?
+            ORDER BY r.due_date ASC
             LIMIT 1
         """, (user_id, today_str()))
         row = cursor.fetchone()
-        if not row:
-            conn.close()
-            return None
-
-        item_id = row[0]
-        cursor.execute("SELECT 1 FROM pack_items WHERE item_id = ?", (item_id,))
-        if cursor.fetchone():
-            conn.close()
-            return item_id
-
-        # stale review row -> delete and continue
-        cursor.execute("DELETE FROM reviews WHERE user_id = ? AND item_id = ?", (user_id, item_id))
-        conn.commit()
+    return row[0] if row else None
 
 
 def get_due_item_in_pack(user_id: int, pack_id: str):
     """
     Return one due item_id from a specific pack.
     """
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    while True:
-        cursor.execute("""
-            SELECT r.item_id
-            FROM reviews r
-            JOIN pack_items pi ON pi.item_id = r.item_id
-            WHERE r.user_id = ? AND r.due_date <= ? AND pi.pack_id = ?
-            ORDER BY r.due_date ASC
-            LIMIT 1
-        """, (user_id, today_str(), pack_id))
-        row = cursor.fetchone()
-        if not row:
-            conn.close()
-            return None
-
-        item_id = row[0]
-        cursor.execute("SELECT 1 FROM pack_items WHERE item_id = ?", (item_id,))
-        if cursor.fetchone():
-            conn.close()
-            return item_id
-
-        cursor.execute("DELETE FROM reviews WHERE user_id = ? AND item_id = ?", (user_id, item_id))
-        conn.commit()
+    with db_conn(readonly=True) as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT r.item_id
+            FROM reviews r
+            JOIN pack_items pi ON pi.item_id = r.item_id
+            WHERE r.user_id = ? AND r.due_date <= ? AND pi.pack_id = ?
+            ORDER BY r.due_date ASC
+            LIMIT 1
+        """, (user_id, today_str(), pack_id))
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+def get_due_queue(user_id: int, pack_id: str | None = None, limit: int | None = None) -> list[dict]:
+    """
+    Next `limit` due cards (oldest due first) with everything the review screen
+    needs, in one query: the item row, its review status and, for phrase cards,
+    two distractor terms from the in-memory pack sampler.
+    Same selection as get_due_item / get_due_item_in_pack.
+    """
+    limit = limit or REVIEW_QUEUE_SIZE
+    with db_conn(readonly=True) as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT r.item_id, pi.term, pi.chunk, pi.translation_en, pi.note, pi.pack_id, pi.focus, r.status
+            FROM reviews r
+            JOIN pack_items pi ON pi.item_id = r.item_id
+            WHERE r.user_id = ? AND r.due_date <= ?
+              AND (? IS NULL OR pi.pack_id = ?)
+            ORDER BY r.due_date ASC
+            LIMIT ?
+        """, (user_id, today_str(), pack_id, pack_id, limit))
+        rows = cursor.fetchall()
+
+    queue = []
+    for item_id, term, chunk, translation_en, note, item_pack_id, focus, status in rows:
+        is_phrase = (focus == "phrase") or bool(chunk and len(chunk.split()) > 1)
+        distractors = []
+        if is_phrase:
+            picked = pack_sampler.sample_distinct(_pack_sample(item_pack_id)["terms"], 2, item_id)
+            distractors = [text for _, text in picked]
+        queue.append({
+            "item_id": item_id,
+            "term": term,
+            "chunk": chunk,
+            "translation_en": translation_en,
+            "note": note,
+            "pack_id": item_pack_id,
+            "focus": focus,
+            "status": status or "new",
+            "distractors": distractors,
+        })
+    return queue
+
 
 def get_review_state(user_id: int, item_id: int):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT status, interval_days, due_date, reps, lapses
-        FROM reviews
-        WHERE user_id = ? AND item_id = ?
-    """, (user_id, item_id))
-    row = cursor.fetchone()
-    conn.close()
+    with db_conn() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT status, interval_days, due_date, reps, lapses
+            FROM reviews
+            WHERE user_id = ? AND item_id = ?
+        """, (user_id, item_id))
+        row = cursor.fetchone()
     return row
 
-def apply_grade(user_id: int, item_id: int, grade: str):
+def _schedule(grade: str, interval_days: int, reps: int, lapses: int) -> tuple[str, int, str, int, int]:
     """
     grade: 'good' | 'hard' | 'again'
     Minimal scheduling:
       - good  -> interval grows, due moves forward
       - again -> interval resets, due today (repeat soon)
+    Returns (status, interval_days, due_date, reps, lapses).
     """
-    state = get_review_state(user_id, item_id)
-    if not state:
-        ensure_review_row(user_id, item_id)
-        state = get_review_state(user_id, item_id)
-
-    status, interval_days, due_date, reps, lapses = state
-
-    # Save "previous state" for Undo
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        UPDATE reviews
-        SET
-            prev_status = ?,
-            prev_interval_days = ?,
-            prev_due_date = ?,
-            prev_last_reviewed_at = last_reviewed_at,
-            prev_reps = ?,
-            prev_lapses = ?,
-            undo_available = 1
-        WHERE user_id = ? AND item_id = ?
-    """, (status, interval_days, due_date, reps, lapses, user_id, item_id))
-    conn.commit()
-    conn.close()
-
-
     if grade == "good":
         # good -> grows fast (double)
         new_interval = 1 if interval_days < 1 else interval_days * 2
@@ -863,176 +1412,242 @@ def apply_grade(user_id: int, item_id: int, grade: str):
         new_status = "learning"
         new_due = date.today().isoformat()
 
+    return new_status, new_interval, new_due, new_reps, new_lapses
 
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        UPDATE reviews
-        SET status = ?, interval_days = ?, due_date = ?, last_reviewed_at = ?, reps = ?, lapses = ?
-        WHERE user_id = ? AND item_id = ?
-    """, (new_status, new_interval, new_due, utc_now_iso(), new_reps, new_lapses, user_id, item_id))
-    conn.commit()
-    conn.close()
 
-    return new_status, new_interval, new_due
+def grade_item(user_id: int, item_id: int, grade: str, practice_kind: str | None = "review"):
+    """
+    Grade one card in a single write transaction:
+    ensure the review row, read it, snapshot it for Undo and store the new
+    schedule in one UPDATE ... RETURNING, then bump practice stats
+    (practice_kind=None skips that).
+
+    BEGIN IMMEDIATE takes the write lock before the read, so a double-tap
+    can't grade from a stale state. Returns (status, interval_days, due_date).
+    """
+    with db_conn() as conn:
+        cur = conn.cursor()
+        if not conn.in_transaction:
+            cur.execute("BEGIN IMMEDIATE")
+        cur.execute("""
+            INSERT OR IGNORE INTO reviews (user_id, item_id, status, interval_days, due_date, last_reviewed_at, reps, lapses)
+            VALUES (?, ?, 'new', 0, ?, NULL, 0, 0)
+        """, (user_id, item_id, today_str()))
+        cur.execute("""
+            SELECT interval_days, reps, lapses
+            FROM reviews
+            WHERE user_id = ? AND item_id = ?
+        """, (user_id, item_id))
+        interval_days, reps, lapses = cur.fetchone()
+
+        new_status, new_interval, new_due, new_reps, new_lapses = _schedule(grade, interval_days, reps, lapses)
+
+        # right-hand sides see the pre-update row, so prev_* get the old values
+        cur.execute("""
+            UPDATE reviews
+            SET
+                prev_status = status,
+                prev_interval_days = interval_days,
+                prev_due_date = due_date,
+                prev_last_reviewed_at = last_reviewed_at,
+                prev_reps = reps,
+                prev_lapses = lapses,
+                undo_available = 1,
+                status = ?,
+                interval_days = ?,
+                due_date = ?,
+                last_reviewed_at = ?,
+                reps = ?,
+                lapses = ?
+            WHERE user_id = ? AND item_id = ?
+            RETURNING status, interval_days, due_date
+        """, (new_status, new_interval, new_due, utc_now_iso(), new_reps, new_lapses, user_id, item_id))
+        row = cur.fetchone()
+
+        if practice_kind:
+            _bump_practice(cur, user_id, practice_kind, grade != "again")
+
+    return row
+
+
+def apply_grade(user_id: int, item_id: int, grade: str):
+    """Reschedule a card without touching practice stats (see grade_item)."""
+    return grade_item(user_id, item_id, grade, practice_kind=None)
 
 
 def mark_item_mature(user_id: int, item_id: int):
     """
     Mark item as mature with a long interval so it won't appear again soon.
     """
-    # Ensure row exists first
-    ensure_review_row(user_id, item_id)
-
     new_status = "mature"
     new_interval = 3650  # ~10 years
     new_due = (date.today() + timedelta(days=new_interval)).isoformat()
 
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        UPDATE reviews
-        SET status = ?, interval_days = ?, due_date = ?, last_reviewed_at = ?, reps = reps + 1
-        WHERE user_id = ? AND item_id = ?
-    """, (new_status, new_interval, new_due, utc_now_iso(), user_id, item_id))
-    conn.commit()
-    conn.close()
+    with db_conn() as conn:
+        # Ensure row exists first (same transaction)
+        ensure_review_row(user_id, item_id)
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE reviews
+            SET status = ?, interval_days = ?, due_date = ?, last_reviewed_at = ?, reps = reps + 1
+            WHERE user_id = ? AND item_id = ?
+        """, (new_status, new_interval, new_due, utc_now_iso(), user_id, item_id))
 
 def undo_last_grade(user_id: int, item_id: int):
     """
     Restores the previous review state if undo is available.
     Returns (status, interval_days, due_date) after undo, or None if not possible.
     """
-    conn = get_connection()
-    cursor = conn.cursor()
+    with db_conn() as conn:
+        cursor = conn.cursor()
 
-    cursor.execute("""
-        SELECT
+        cursor.execute("""
+            SELECT
+                undo_available,
+                prev_status, prev_interval_days, prev_due_date,
+                prev_last_reviewed_at, prev_reps, prev_lapses
+            FROM reviews
+            WHERE user_id = ? AND item_id = ?
+        """, (user_id, item_id))
+        row = cursor.fetchone()
+
+        if not row:
+            return None
+
+        (
             undo_available,
             prev_status, prev_interval_days, prev_due_date,
             prev_last_reviewed_at, prev_reps, prev_lapses
-        FROM reviews
-        WHERE user_id = ? AND item_id = ?
-    """, (user_id, item_id))
-    row = cursor.fetchone()
-
-    if not row:
-        conn.close()
-        return None
+        ) = row
 
-    (
-        undo_available,
-        prev_status, prev_interval_days, prev_due_date,
-        prev_last_reviewed_at, prev_reps, prev_lapses
-    ) = row
+        if int(undo_available or 0) != 1 or prev_status is None:
+            return None
 
-    if int(undo_available or 0) != 1 or prev_status is None:
-        conn.close()
-        return None
+        # Restore previous values
+        cursor.execute("""
+            UPDATE reviews
+            SET
+                status = ?,
+                interval_days = ?,
+                due_date = ?,
+                last_reviewed_at = ?,
+                reps = ?,
+                lapses = ?,
+                -- Clear undo snapshot so it can't be spammed repeatedly
+                prev_status = NULL,
+                prev_interval_days = NULL,
+                prev_due_date = NULL,
+                prev_last_reviewed_at = NULL,
+                prev_reps = NULL,
+                prev_lapses = NULL,
+                undo_available = 0
+            WHERE user_id = ? AND item_id = ?
+        """, (
+            prev_status, prev_interval_days, prev_due_date,
+            prev_last_reviewed_at, prev_reps, prev_lapses,
+            user_id, item_id
+        ))
 
-    # Restore previous values
-    cursor.execute("""
-        UPDATE reviews
-        SET
-            status = ?,
-            interval_days = ?,
-            due_date = ?,
-            last_reviewed_at = ?,
-            reps = ?,
-            lapses = ?,
-            -- Clear undo snapshot so it can't be spammed repeatedly
-            prev_status = NULL,
-            prev_interval_days = NULL,
-            prev_due_date = NULL,
-            prev_last_reviewed_at = NULL,
-            prev_reps = NULL,
-            prev_lapses = NULL,
-            undo_available = 0
-        WHERE user_id = ? AND item_id = ?
-    """, (
-        prev_status, prev_interval_days, prev_due_date,
-        prev_last_reviewed_at, prev_reps, prev_lapses,
-        user_id, item_id
-    ))
-
-    conn.commit()
 
-    cursor.execute("""
-        SELECT status, interval_days, due_date
-        FROM reviews
-        WHERE user_id = ? AND item_id = ?
-    """, (user_id, item_id))
-    restored = cursor.fetchone()
-    conn.close()
+        cursor.execute("""
+            SELECT status, interval_days, due_date
+            FROM reviews
+            WHERE user_id = ? AND item_id = ?
+        """, (user_id, item_id))
+        restored = cursor.fetchone()
 
     return restored  # (status, interval_days, due_date)
 
 
-def _cleanup_stale_reviews(conn, user_id: int):
+def _purge_pack_reviews(cur, pack_ids: list[str], user_id: int | None = None):
+    """
+    Delete review rows for cards of the given packs (for one user, or everyone).
+    Call before the pack_items rows go away, while the item_ids can still be found.
+    """
+    if not pack_ids:
+        return
+    placeholders = ",".join("?" for _ in pack_ids)
+    items_sql = f"SELECT item_id FROM pack_items WHERE pack_id IN ({placeholders})"
+    if user_id is None:
+        cur.execute(f"DELETE FROM reviews WHERE item_id IN ({items_sql})", tuple(pack_ids))
+    else:
+        cur.execute(
+            f"DELETE FROM reviews WHERE user_id = ? AND item_id IN ({items_sql})",
+            (user_id, *pack_ids),
+        )
+
+
+# A review counts (and survives the sweeper) when its card is in a pack the user
+# has active, or in their personal My Words pack (<lang>_user_<id>_mywords),
+# which is never "activated". Expects reviews/pack_items aliased r/pi.
+_REVIEWABLE_PACK_SQL = """(
+    pi.pack_id LIKE '%\\_user\\_%\\_mywords' ESCAPE '\\'
+    OR EXISTS (
+        SELECT 1 FROM user_packs up
+        WHERE up.user_id = r.user_id AND up.pack_id = pi.pack_id
+    )
+)"""
+
+
+def sweep_stale_reviews() -> int:
     """
-    Remove reviews that point to missing pack_items or inactive packs.
+    Safety net behind the event-driven cleanup (pack deactivation, pack removal on
+    import, My Words deletion): remove reviews whose card is gone or whose pack is
+    no longer active for that user. Personal My Words packs are never "activated",
+    so their reviews are kept. Returns the number of rows removed.
     """
-    cur = conn.cursor()
-    cur.execute("""
-        DELETE FROM reviews
-        WHERE user_id = ?
-          AND item_id NOT IN (
-            SELECT pi.item_id
-            FROM pack_items pi
-            JOIN user_packs up ON up.pack_id = pi.pack_id
-            WHERE up.user_id = ?
-          )
-    """, (user_id, user_id))
-    conn.commit()
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(f"""
+            DELETE FROM reviews AS r
+            WHERE NOT EXISTS (
+                SELECT 1
+                FROM pack_items pi
+                WHERE pi.item_id = r.item_id AND {_REVIEWABLE_PACK_SQL}
+            )
+        """)
+        return cur.rowcount or 0
 
 
 def get_due_count(user_id: int) -> int:
-    """How many items are due today (or overdue) for this user (active packs only)."""
-    conn = get_connection()
-    _cleanup_stale_reviews(conn, user_id)
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT COUNT(*)
-        FROM reviews r
-        JOIN pack_items pi ON pi.item_id = r.item_id
-        JOIN user_packs up ON up.pack_id = pi.pack_id
-        WHERE r.user_id = ? AND up.user_id = ? AND r.due_date <= ?
-    """, (user_id, user_id, date.today().isoformat()))
-    (count,) = cursor.fetchone()
-    conn.close()
+    """How many items are due today (or overdue) for this user (active packs and My Words)."""
+    with db_conn(readonly=True) as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT COUNT(*)
+            FROM reviews r
+            JOIN pack_items pi ON pi.item_id = r.item_id
+            WHERE r.user_id = ? AND r.due_date <= ? AND {_REVIEWABLE_PACK_SQL}
+        """, (user_id, date.today().isoformat()))
+        (count,) = cursor.fetchone()
     return int(count)
 
 
 def get_due_count_in_pack(user_id: int, pack_id: str) -> int:
     """How many items are due today (or overdue) for a specific pack."""
-    conn = get_connection()
-    _cleanup_stale_reviews(conn, user_id)
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT COUNT(*)
-        FROM reviews r
-        JOIN pack_items pi ON pi.item_id = r.item_id
-        WHERE r.user_id = ? AND pi.pack_id = ? AND r.due_date <= ?
-    """, (user_id, pack_id, date.today().isoformat()))
-    (count,) = cursor.fetchone()
-    conn.close()
+    with db_conn(readonly=True) as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT COUNT(*)
+            FROM reviews r
+            JOIN pack_items pi ON pi.item_id = r.item_id
+            WHERE r.user_id = ? AND pi.pack_id = ? AND r.due_date <= ?
+        """, (user_id, pack_id, date.today().isoformat()))
+        (count,) = cursor.fetchone()
     return int(count)
 
 def get_status_counts(user_id: int) -> dict:
-    """Return counts grouped by status for active packs only."""
-    conn = get_connection()
-    _cleanup_stale_reviews(conn, user_id)
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT r.status, COUNT(*)
-        FROM reviews r
-        JOIN pack_items pi ON pi.item_id = r.item_id
-        JOIN user_packs up ON up.pack_id = pi.pack_id
-        WHERE r.user_id = ? AND up.user_id = ?
-        GROUP BY r.status
-    """, (user_id, user_id))
-    rows = cursor.fetchall()
-    conn.close()
+    """Return counts grouped by status for active packs and My Words."""
+    with db_conn(readonly=True) as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT r.status, COUNT(*)
+            FROM reviews r
+            JOIN pack_items pi ON pi.item_id = r.item_id
+            WHERE r.user_id = ? AND {_REVIEWABLE_PACK_SQL}
+            GROUP BY r.status
+        """, (user_id,))
+        rows = cursor.fetchall()
 
     # default 0 for missing statuses
     out = {"new": 0, "learning": 0, "mature": 0}
@@ -1043,170 +1658,148 @@ def get_status_counts(user_id: int) -> dict:
 
 
 def get_random_meanings_from_active_packs(user_id: int, target_language: str, exclude_item_id: int, limit: int = 2) -> list[str]:
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT pi.translation_en
-        FROM pack_items pi
-        JOIN user_packs up ON up.pack_id = pi.pack_id
-        JOIN packs p ON p.pack_id = pi.pack_id
-        WHERE up.user_id = ?
-          AND p.target_language = ?
-          AND pi.item_id != ?
-          AND pi.translation_en IS NOT NULL
-          AND TRIM(pi.translation_en) != ''
-        ORDER BY RANDOM()
-        LIMIT ?
-    """, (user_id, target_language, exclude_item_id, limit))
-    rows = cur.fetchall()
-    conn.close()
-    return [r[0] for r in rows if r and r[0]]
+    samples = [_pack_sample(pid) for pid in _active_pack_ids(user_id, target_language)]
+    rows = pack_sampler.sample_across([s["meanings"] for s in samples], limit, exclude_item_id)
+    return [text for _, text in rows]
 
 
 def get_random_meanings_from_pack(pack_id: str, exclude_item_id: int, limit: int = 2) -> list[str]:
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT translation_en
-        FROM pack_items
-        WHERE pack_id = ?
-          AND item_id != ?
-          AND translation_en IS NOT NULL
-          AND TRIM(translation_en) != ''
-        ORDER BY RANDOM()
-        LIMIT ?
-    """, (pack_id, exclude_item_id, limit))
-    rows = cur.fetchall()
-    conn.close()
-    return [r[0] for r in rows if r and r[0]]
+    rows = pack_sampler.sample_distinct(_pack_sample(pack_id)["meanings"], limit, exclude_item_id)
+    return [text for _, text in rows]
 
 def get_lexicon_cache_it(term: str):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT data_json FROM lexicon_cache_it WHERE term = ?", (term,))
-    row = cur.fetchone()
-    conn.close()
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT data_json FROM lexicon_cache_it WHERE term = ?", (term,))
+        row = cur.fetchone()
     if not row:
         return None
     return json.loads(row[0])
 
 def set_lexicon_cache_it(term: str, data: dict):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        "INSERT OR REPLACE INTO lexicon_cache_it(term, data_json, fetched_at) VALUES(?,?,?)",
-        (term, json.dumps(data, ensure_ascii=False), datetime.utcnow().isoformat()),
-    )
-    conn.commit()
-    conn.close()
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "INSERT OR REPLACE INTO lexicon_cache_it(term, data_json, fetched_at) VALUES(?,?,?)",
+            (term, json.dumps(data, ensure_ascii=False), datetime.utcnow().isoformat()),
+        )
 
 def get_user_profile(user_id: int):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        "SELECT target_language, ui_language, helper_language FROM users WHERE user_id = ?",
-        (user_id,)
-    )
-    row = cur.fetchone()
-    conn.close()
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT target_language, ui_language, helper_language FROM users WHERE user_id = ?",
+            (user_id,)
+        )
+        row = cur.fetchone()
     return row  # (target, ui, helper) or None
 
 
+def ensure_user(user_id: int, first_name: str | None):
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            INSERT OR IGNORE INTO users (user_id, first_name, created_at, target_language, ui_language, helper_language)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            (user_id, first_name, utc_now_iso(), "it", "en", None),
+        )
+
+
+def get_user_signup(user_id: int):
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT first_name, created_at FROM users WHERE user_id = ?", (user_id,))
+        row = cur.fetchone()
+    return row  # (first_name, created_at) or None
+
+
 def get_user_persona(user_id: int):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        "SELECT alter_ego_name, alter_ego_city, alter_ego_role FROM users WHERE user_id = ?",
-        (user_id,)
-    )
-    row = cur.fetchone()
-    conn.close()
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT alter_ego_name, alter_ego_city, alter_ego_role FROM users WHERE user_id = ?",
+            (user_id,)
+        )
+        row = cur.fetchone()
     return row  # (name, city, role) or None
 
 
 def set_user_persona(user_id: int, name: str | None, city: str | None, role: str | None):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        "UPDATE users SET alter_ego_name = ?, alter_ego_city = ?, alter_ego_role = ? WHERE user_id = ?",
-        (name, city, role, user_id)
-    )
-    conn.commit()
-    conn.close()
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "UPDATE users SET alter_ego_name = ?, alter_ego_city = ?, alter_ego_role = ? WHERE user_id = ?",
+            (name, city, role, user_id)
+        )
 
 
 def set_user_journey_progress(user_id: int, pack_id: str | None):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        "UPDATE users SET journey_current_pack_id = ?, journey_updated_at = ? WHERE user_id = ?",
-        (pack_id, utc_now_iso(), user_id)
-    )
-    conn.commit()
-    conn.close()
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "UPDATE users SET journey_current_pack_id = ?, journey_updated_at = ? WHERE user_id = ?",
+            (pack_id, utc_now_iso(), user_id)
+        )
 
 
 def get_user_journey_progress(user_id: int):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        "SELECT journey_current_pack_id, journey_updated_at FROM users WHERE user_id = ?",
-        (user_id,)
-    )
-    row = cur.fetchone()
-    conn.close()
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT journey_current_pack_id, journey_updated_at FROM users WHERE user_id = ?",
+            (user_id,)
+        )
+        row = cur.fetchone()
     return row  # (pack_id, updated_at) or None
 
 
 def upsert_user_pack_progress(user_id: int, pack_id: str, introduced: int, total: int):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT INTO user_pack_progress (user_id, pack_id, started_at, last_activity_at, introduced_count, total_items)
-        VALUES (?, ?, ?, ?, ?, ?)
-        ON CONFLICT(user_id, pack_id) DO UPDATE SET
-            started_at = COALESCE(user_pack_progress.started_at, excluded.started_at),
-            last_activity_at = excluded.last_activity_at,
-            introduced_count = excluded.introduced_count,
-            total_items = excluded.total_items
-        """,
-        (user_id, pack_id, utc_now_iso(), utc_now_iso(), int(introduced), int(total))
-    )
-    conn.commit()
-    conn.close()
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            INSERT INTO user_pack_progress (user_id, pack_id, started_at, last_activity_at, introduced_count, total_items)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(user_id, pack_id) DO UPDATE SET
+                started_at = COALESCE(user_pack_progress.started_at, excluded.started_at),
+                last_activity_at = excluded.last_activity_at,
+                introduced_count = excluded.introduced_count,
+                total_items = excluded.total_items
+            """,
+            (user_id, pack_id, utc_now_iso(), utc_now_iso(), int(introduced), int(total))
+        )
 
 
 def get_user_pack_progress(user_id: int, pack_id: str):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT introduced_count, total_items, started_at, last_activity_at
-        FROM user_pack_progress
-        WHERE user_id = ? AND pack_id = ?
-        """,
-        (user_id, pack_id)
-    )
-    row = cur.fetchone()
-    conn.close()
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT introduced_count, total_items, started_at, last_activity_at
+            FROM user_pack_progress
+            WHERE user_id = ? AND pack_id = ?
+            """,
+            (user_id, pack_id)
+        )
+        row = cur.fetchone()
     return row  # (introduced, total, started_at, last_activity_at) or None
 
 
 def get_practice_stats(user_id: int) -> dict:
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT total_practice, total_reviews, total_learn, total_correct, total_wrong,
-               last_practice_date, current_streak, longest_streak
-        FROM user_practice_stats
-        WHERE user_id = ?
-        """,
-        (user_id,)
-    )
-    row = cur.fetchone()
-    conn.close()
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT total_practice, total_reviews, total_learn, total_correct, total_wrong,
+                   last_practice_date, current_streak, longest_streak
+            FROM user_practice_stats
+            WHERE user_id = ?
+            """,
+            (user_id,)
+        )
+        row = cur.fetchone()
     if not row:
         return {
             "total_practice": 0,
@@ -1230,37 +1823,15 @@ def get_practice_stats(user_id: int) -> dict:
     }
 
 
-def record_practice(user_id: int, kind: str, ok: bool):
+def _bump_practice(cur, user_id: int, kind: str, ok: bool):
     """
-    kind: 'review' | 'learn'
-    ok: True if correct/success, False otherwise
+    Add one practice event to user_practice_stats as a single upsert, so the
+    counters and the daily streak can't lose updates to a concurrent writer.
     """
-    stats = get_practice_stats(user_id)
-    total_practice = stats["total_practice"] + 1
-    total_reviews = stats["total_reviews"] + (1 if kind == "review" else 0)
-    total_learn = stats["total_learn"] + (1 if kind == "learn" else 0)
-    total_correct = stats["total_correct"] + (1 if ok else 0)
-    total_wrong = stats["total_wrong"] + (0 if ok else 1)
-
     today = date.today().isoformat()
-    last = stats["last_practice_date"]
-    current_streak = stats["current_streak"]
-    longest_streak = stats["longest_streak"]
-
-    if last == today:
-        # streak unchanged
-        pass
-    else:
-        yesterday = (date.today() - timedelta(days=1)).isoformat()
-        if last == yesterday:
-            current_streak = current_streak + 1 if current_streak > 0 else 1
-        else:
-            current_streak = 1
-        if current_streak > longest_streak:
-            longest_streak = current_streak
-
-    conn = get_connection()
-    cur = conn.cursor()
+    yesterday = (date.today() - timedelta(days=1)).isoformat()
+    is_review = 1 if kind == "review" else 0
+    is_learn = 1 if kind == "learn" else 0
     cur.execute(
         """
         INSERT INTO user_practice_stats (
@@ -1268,91 +1839,90 @@ def record_practice(user_id: int, kind: str, ok: bool):
             total_correct, total_wrong, last_practice_date,
             current_streak, longest_streak
         )
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        VALUES (?, 1, ?, ?, ?, ?, ?, 1, 1)
         ON CONFLICT(user_id) DO UPDATE SET
-            total_practice = excluded.total_practice,
-            total_reviews = excluded.total_reviews,
-            total_learn = excluded.total_learn,
-            total_correct = excluded.total_correct,
-            total_wrong = excluded.total_wrong,
+            total_practice = total_practice + 1,
+            total_reviews = total_reviews + excluded.total_reviews,
+            total_learn = total_learn + excluded.total_learn,
+            total_correct = total_correct + excluded.total_correct,
+            total_wrong = total_wrong + excluded.total_wrong,
             last_practice_date = excluded.last_practice_date,
-            current_streak = excluded.current_streak,
-            longest_streak = excluded.longest_streak
+            current_streak = CASE
+                WHEN last_practice_date = excluded.last_practice_date THEN current_streak
+                WHEN last_practice_date = ? THEN MAX(current_streak, 0) + 1
+                ELSE 1
+            END,
+            longest_streak = MAX(longest_streak, CASE
+                WHEN last_practice_date = excluded.last_practice_date THEN current_streak
+                WHEN last_practice_date = ? THEN MAX(current_streak, 0) + 1
+                ELSE 1
+            END)
         """,
-        (
-            user_id,
-            total_practice,
-            total_reviews,
-            total_learn,
-            total_correct,
-            total_wrong,
-            today,
-            current_streak,
-            longest_streak,
-        ),
+        (user_id, is_review, is_learn, 1 if ok else 0, 0 if ok else 1, today, yesterday, yesterday),
     )
-    conn.commit()
-    conn.close()
+
+
+def record_practice(user_id: int, kind: str, ok: bool):
+    """
+    kind: 'review' | 'learn'
+    ok: True if correct/success, False otherwise
+    """
+    with db_conn() as conn:
+        _bump_practice(conn.cursor(), user_id, kind, ok)
 
 
 def get_story_progress(user_id: int) -> tuple[int, int]:
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        "SELECT arc_index, beat_index FROM user_story_progress WHERE user_id = ?",
-        (user_id,)
-    )
-    row = cur.fetchone()
-    conn.close()
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT arc_index, beat_index FROM user_story_progress WHERE user_id = ?",
+            (user_id,)
+        )
+        row = cur.fetchone()
     if not row:
         return 0, 0
     return int(row[0] or 0), int(row[1] or 0)
 
 
 def set_story_progress(user_id: int, arc_index: int, beat_index: int):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT INTO user_story_progress (user_id, arc_index, beat_index, updated_at)
-        VALUES (?, ?, ?, ?)
-        ON CONFLICT(user_id) DO UPDATE SET
-            arc_index = excluded.arc_index,
-            beat_index = excluded.beat_index,
-            updated_at = excluded.updated_at
-        """,
-        (user_id, int(arc_index), int(beat_index), utc_now_iso())
-    )
-    conn.commit()
-    conn.close()
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            INSERT INTO user_story_progress (user_id, arc_index, beat_index, updated_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET
+                arc_index = excluded.arc_index,
+                beat_index = excluded.beat_index,
+                updated_at = excluded.updated_at
+            """,
+            (user_id, int(arc_index), int(beat_index), utc_now_iso())
+        )
 
 def set_user_helper_language(user_id: int, helper_language: str | None):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        "UPDATE users SET helper_language = ? WHERE user_id = ?",
-        (helper_language, user_id)
-    )
-    conn.commit()
-    conn.close()
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "UPDATE users SET helper_language = ? WHERE user_id = ?",
+            (helper_language, user_id)
+        )
 
 
 def toggle_pack(user_id: int, pack_id: str):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT 1 FROM user_packs WHERE user_id=? AND pack_id=?", (user_id, pack_id))
-    exists = cur.fetchone() is not None
-
-    if exists:
-        cur.execute("DELETE FROM user_packs WHERE user_id=? AND pack_id=?", (user_id, pack_id))
-    else:
-        cur.execute(
-            "INSERT OR IGNORE INTO user_packs (user_id, pack_id, activated_at) VALUES (?, ?, ?)",
-            (user_id, pack_id, utc_now_iso())
-        )
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT 1 FROM user_packs WHERE user_id=? AND pack_id=?", (user_id, pack_id))
+        exists = cur.fetchone() is not None
+
+        if exists:
+            cur.execute("DELETE FROM user_packs WHERE user_id=? AND pack_id=?", (user_id, pack_id))
+            _purge_pack_reviews(cur, [pack_id], user_id)
+        else:
+            cur.execute(
+                "INSERT OR IGNORE INTO user_packs (user_id, pack_id, activated_at) VALUES (?, ?, ?)",
+                (user_id, pack_id, utc_now_iso())
+            )
 
-    conn.commit()
-    conn.close()
     return (not exists)
 
 
@@ -1362,68 +1932,57 @@ def pick_one_item_for_user(user_id: int, target_language: str):
     """
     user_level = get_user_level(user_id)
 
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT pi.item_id, pi.term, pi.chunk, pi.translation_en, pi.note, pi.pack_id, pi.focus
-        FROM pack_items pi
-        JOIN packs p ON p.pack_id = pi.pack_id
-        JOIN user_packs up ON up.pack_id = p.pack_id
-        WHERE up.user_id = ?
-          AND p.target_language = ?
-          AND (pi.level IS NULL OR pi.level = '' OR pi.level <= ?)
-        ORDER BY RANDOM()
-        LIMIT 1
-    """, (user_id, target_language, user_level))
-    row = cur.fetchone()
-    conn.close()
-    return row
+    samples = [_pack_sample(pid) for pid in _active_pack_ids(user_id, target_language)]
+    # same rule as before: unlevelled items, or levels up to the user's
+    pools = [
+        rows
+        for sample in samples
+        for level, rows in sample["items_by_level"].items()
+        if not level or level <= user_level
+    ]
+    rows = pack_sampler.sample_across(pools, 1)
+    return rows[0] if rows else None
 
 
 def get_user_level(user_id: int) -> str:
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT user_level FROM users WHERE user_id = ?", (user_id,))
-    row = cur.fetchone()
-    conn.close()
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT user_level FROM users WHERE user_id = ?", (user_id,))
+        row = cur.fetchone()
     return (row[0] if row and row[0] else "A1")
 
 
 def set_user_level(user_id: int, level: str):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("UPDATE users SET user_level = ? WHERE user_id = ?", (level, user_id))
-    conn.commit()
-    conn.close()
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("UPDATE users SET user_level = ? WHERE user_id = ?", (level, user_id))
 
 
 def get_active_items_total(user_id: int, target_language: str) -> int:
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT COUNT(*)
-        FROM pack_items pi
-        JOIN packs p ON p.pack_id = pi.pack_id
-        WHERE p.target_language = ?
-    """, (target_language,))
-    (cnt,) = cur.fetchone()
-    conn.close()
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT COUNT(*)
+            FROM pack_items pi
+            JOIN packs p ON p.pack_id = pi.pack_id
+            WHERE p.target_language = ?
+        """, (target_language,))
+        (cnt,) = cur.fetchone()
     return int(cnt)
 
 
 def get_active_items_introduced(user_id: int, target_language: str) -> int:
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT COUNT(DISTINCT pi.item_id)
-        FROM reviews r
-        JOIN pack_items pi ON pi.item_id = r.item_id
-        JOIN packs p ON p.pack_id = pi.pack_id
-        WHERE r.user_id = ?
-          AND p.target_language = ?
-    """, (user_id, target_language))
-    (cnt,) = cur.fetchone()
-    conn.close()
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT COUNT(DISTINCT pi.item_id)
+            FROM reviews r
+            JOIN pack_items pi ON pi.item_id = r.item_id
+            JOIN packs p ON p.pack_id = pi.pack_id
+            WHERE r.user_id = ?
+              AND p.target_language = ?
+        """, (user_id, target_language))
+        (cnt,) = cur.fetchone()
     return int(cnt)
 
 
@@ -1436,27 +1995,26 @@ def pick_next_new_item_for_user(user_id: int, target_language: str):
     """
     user_level = get_user_level(user_id)
 
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT pi.item_id, pi.term, pi.chunk, pi.translation_en, pi.note, pi.pack_id, pi.focus
-        FROM pack_items pi
-        JOIN packs p ON p.pack_id = pi.pack_id
-        WHERE p.target_language = ?
-          AND (p.level IS NULL OR p.level = '' OR p.level <= ?)
-          AND NOT EXISTS (
-              SELECT 1 FROM reviews r
-              WHERE r.user_id = ? AND r.item_id = pi.item_id
-          )
-        ORDER BY
-          COALESCE(p.level, 'Z') ASC,
-          p.title ASC,
-          pi.item_id ASC
-        LIMIT 1
-    """, (target_language, user_level, user_id))
-
-    row = cur.fetchone()
-    conn.close()
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT pi.item_id, pi.term, pi.chunk, pi.translation_en, pi.note, pi.pack_id, pi.focus
+            FROM pack_items pi
+            JOIN packs p ON p.pack_id = pi.pack_id
+            WHERE p.target_language = ?
+              AND (p.level IS NULL OR p.level = '' OR p.level <= ?)
+              AND NOT EXISTS (
+                  SELECT 1 FROM reviews r
+                  WHERE r.user_id = ? AND r.item_id = pi.item_id
+              )
+            ORDER BY
+              COALESCE(p.level, 'Z') ASC,
+              p.title ASC,
+              pi.item_id ASC
+            LIMIT 1
+        """, (target_language, user_level, user_id))
+
+        row = cur.fetchone()
     return row
 
 
@@ -1464,21 +2022,20 @@ def pick_next_new_item_for_user_in_pack(user_id: int, pack_id: str):
     """
     Pick the next *not-yet-introduced* item from a specific pack.
     """
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT pi.item_id, pi.term, pi.chunk, pi.translation_en, pi.note, pi.pack_id, pi.focus
-        FROM pack_items pi
-        WHERE pi.pack_id = ?
-          AND NOT EXISTS (
-              SELECT 1 FROM reviews r
-              WHERE r.user_id = ? AND r.item_id = pi.item_id
-          )
-        ORDER BY pi.item_id ASC
-        LIMIT 1
-    """, (pack_id, user_id))
-    row = cur.fetchone()
-    conn.close()
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT pi.item_id, pi.term, pi.chunk, pi.translation_en, pi.note, pi.pack_id, pi.focus
+            FROM pack_items pi
+            WHERE pi.pack_id = ?
+              AND NOT EXISTS (
+                  SELECT 1 FROM reviews r
+                  WHERE r.user_id = ? AND r.item_id = pi.item_id
+              )
+            ORDER BY pi.item_id ASC
+            LIMIT 1
+        """, (pack_id, user_id))
+        row = cur.fetchone()
     return row
 
 
@@ -1486,121 +2043,137 @@ def get_pack_item_counts(user_id: int, pack_id: str) -> tuple[int, int]:
     """
     Return (total_items, introduced_items) for a specific pack.
     """
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT COUNT(*)
-        FROM pack_items
-        WHERE pack_id = ?
-    """, (pack_id,))
-    (total,) = cur.fetchone()
-
-    cur.execute("""
-        SELECT COUNT(DISTINCT pi.item_id)
-        FROM reviews r
-        JOIN pack_items pi ON pi.item_id = r.item_id
-        WHERE r.user_id = ? AND pi.pack_id = ?
-    """, (user_id, pack_id))
-    (introduced,) = cur.fetchone()
-    conn.close()
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT COUNT(*)
+            FROM pack_items
+            WHERE pack_id = ?
+        """, (pack_id,))
+        (total,) = cur.fetchone()
+
+        cur.execute("""
+            SELECT COUNT(DISTINCT pi.item_id)
+            FROM reviews r
+            JOIN pack_items pi ON pi.item_id = r.item_id
+            WHERE r.user_id = ? AND pi.pack_id = ?
+        """, (user_id, pack_id))
+        (introduced,) = cur.fetchone()
     return int(total or 0), int(introduced or 0)
 
 
 def get_learned_terms_for_pack(user_id: int, pack_id: str) -> set[str]:
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT pi.term
-        FROM reviews r
-        JOIN pack_items pi ON pi.item_id = r.item_id
-        WHERE r.user_id = ?
-          AND pi.pack_id = ?
-          AND pi.term IS NOT NULL
-          AND TRIM(pi.term) != ''
-    """, (user_id, pack_id))
-    rows = cur.fetchall()
-    conn.close()
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT pi.term
+            FROM reviews r
+            JOIN pack_items pi ON pi.item_id = r.item_id
+            WHERE r.user_id = ?
+              AND pi.pack_id = ?
+              AND pi.term IS NOT NULL
+              AND TRIM(pi.term) != ''
+        """, (user_id, pack_id))
+        rows = cur.fetchall()
     return {r[0] for r in rows if r and r[0]}
 
 
 def has_completed_scenario(user_id: int, scenario_id: str) -> bool:
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT status
-        FROM scenario_progress
-        WHERE user_id = ? AND scenario_id = ?
-    """, (user_id, scenario_id))
-    row = cur.fetchone()
-    conn.close()
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT status
+            FROM scenario_progress
+            WHERE user_id = ? AND scenario_id = ?
+        """, (user_id, scenario_id))
+        row = cur.fetchone()
     return bool(row and row[0] == "completed")
 
 
 def mark_scenario_completed(user_id: int, scenario_id: str):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        INSERT INTO scenario_progress (user_id, scenario_id, status, completed_at)
-        VALUES (?, ?, 'completed', ?)
-        ON CONFLICT(user_id, scenario_id) DO UPDATE SET
-            status='completed',
-            completed_at=excluded.completed_at
-    """, (user_id, scenario_id, utc_now_iso()))
-    conn.commit()
-    conn.close()
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            INSERT INTO scenario_progress (user_id, scenario_id, status, completed_at)
+            VALUES (?, ?, 'completed', ?)
+            ON CONFLICT(user_id, scenario_id) DO UPDATE SET
+                status='completed',
+                completed_at=excluded.completed_at
+        """, (user_id, scenario_id, utc_now_iso()))
 
 
 def count_completed_scenarios(user_id: int, scenario_ids: list[str]) -> int:
     if not scenario_ids:
         return 0
-    conn = get_connection()
-    cur = conn.cursor()
-    placeholders = ",".join(["?"] * len(scenario_ids))
-    cur.execute(
-        f"""
-        SELECT COUNT(*)
-        FROM scenario_progress
-        WHERE user_id = ?
-          AND scenario_id IN ({placeholders})
-          AND status = 'completed'
-        """,
-        [user_id] + scenario_ids
-    )
-    (cnt,) = cur.fetchone()
-    conn.close()
+    with db_conn() as conn:
+        cur = conn.cursor()
+        placeholders = ",".join(["?"] * len(scenario_ids))
+        cur.execute(
+            f"""
+            SELECT COUNT(*)
+            FROM scenario_progress
+            WHERE user_id = ?
+              AND scenario_id IN ({placeholders})
+              AND status = 'completed'
+            """,
+            [user_id] + scenario_ids
+        )
+        (cnt,) = cur.fetchone()
     return int(cnt or 0)
 
 def get_random_context_for_item(item_id: int, lang: str = "it") -> str | None:
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT sentence
-        FROM card_contexts
-        WHERE item_id = ? AND lang = ?
-        ORDER BY RANDOM()
-        LIMIT 1
-    """, (item_id, lang))
-    row = cur.fetchone()
-    conn.close()
-    return row[0] if row else None
+    # A card only has a handful of contexts: fetch them via the index and pick
+    # in Python instead of sorting with ORDER BY RANDOM().
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT sentence
+            FROM card_contexts
+            WHERE item_id = ? AND lang = ?
+        """, (item_id, lang))
+        rows = cur.fetchall()
+    return random.choice(rows)[0] if rows else None
+
+
+def get_contexts_for_item(item_id: int, lang: str = "it") -> list[str]:
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT sentence
+            FROM card_contexts
+            WHERE item_id = ? AND lang = ?
+        """, (item_id, lang))
+        return [r[0] for r in cur.fetchall()]
+
+
+def get_pronunciation_texts(pack_ids: list[str] | None = None) -> list[str]:
+    """Every distinct text a pack card can be spoken with (term, chunk, pronunciation_text)."""
+    with db_conn(readonly=True) as conn:
+        cur = conn.cursor()
+        if pack_ids:
+            placeholders = ",".join("?" for _ in pack_ids)
+            cur.execute(f"""
+                SELECT term, chunk, pronunciation_text
+                FROM pack_items
+                WHERE pack_id IN ({placeholders})
+            """, tuple(pack_ids))
+        else:
+            cur.execute("SELECT term, chunk, pronunciation_text FROM pack_items")
+        rows = cur.fetchall()
+    seen = set()
+    out = []
+    for row in rows:
+        for text in row:
+            text = (text or "").strip()
+            if text and text not in seen:
+                seen.add(text)
+                out.append(text)
+    return out
 
 
 def get_random_terms_from_pack(pack_id: str, exclude_item_id: int, limit: int = 2) -> list[str]:
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT term
-        FROM pack_items
-        WHERE pack_id = ?
-          AND item_id != ?
-          AND term IS NOT NULL
-          AND TRIM(term) != ''
-        ORDER BY RANDOM()
-        LIMIT ?
-    """, (pack_id, exclude_item_id, limit))
-    rows = cur.fetchall()
-    conn.close()
-    return [r[0] for r in rows if r and r[0]]
+    rows = pack_sampler.sample_distinct(_pack_sample(pack_id)["terms"], limit, exclude_item_id)
+    return [text for _, text in rows]
 
 
 def ensure_my_words_pack(user_id: int, target_language: str) -> str:
@@ -1611,17 +2184,15 @@ def ensure_my_words_pack(user_id: int, target_language: str) -> str:
     pack_id = f"{target_language}_user_{user_id}_mywords"
     title = "My Words"
     description = "Words and phrases you saved."
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        INSERT INTO packs (pack_id, target_language, level, title, description, pack_type, chunk_size, missions_enabled)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ON CONFLICT(pack_id) DO UPDATE SET
-            title=excluded.title,
-            description=excluded.description
-    """, (pack_id, target_language, None, title, description, "mixed", None, 0))
-    conn.commit()
-    conn.close()
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            INSERT INTO packs (pack_id, target_language, level, title, description, pack_type, chunk_size, missions_enabled)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(pack_id) DO UPDATE SET
+                title=excluded.title,
+                description=excluded.description
+        """, (pack_id, target_language, None, title, description, "mixed", None, 0))
     return pack_id
 
 
@@ -1649,159 +2220,185 @@ def upsert_my_word_item(
     lemma = term if focus == "word" else None
     phrase = term if focus == "phrase" else None
 
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        INSERT INTO pack_items (
-            pack_id, term, chunk, translation_en, note,
-            level, category, tags_json, cultural_note, translation_helper,
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            INSERT INTO pack_items (
+                pack_id, term, chunk, translation_en, note,
+                level, category, tags_json, cultural_note, translation_helper,
+                focus, lemma, phrase, register, risk, trap, native_sauce, source_uid
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(pack_id, source_uid) DO UPDATE SET
+                term=excluded.term,
+                chunk=excluded.chunk,
+                translation_en=excluded.translation_en,
+                note=excluded.note,
+                category=excluded.category,
+                tags_json=excluded.tags_json,
+                cultural_note=excluded.cultural_note,
+                translation_helper=excluded.translation_helper,
+                focus=excluded.focus,
+                lemma=excluded.lemma,
+                phrase=excluded.phrase,
+                register=excluded.register,
+                risk=excluded.risk,
+                trap=excluded.trap,
+                native_sauce=excluded.native_sauce
+        """, (
+            pack_id, term, chunk, meaning_en, note_json,
+            None, category, tags_json, cultural_note, meaning_helper,
             focus, lemma, phrase, register, risk, trap, native_sauce, source_uid
-        )
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ON CONFLICT(pack_id, source_uid) DO UPDATE SET
-            term=excluded.term,
-            chunk=excluded.chunk,
-            translation_en=excluded.translation_en,
-            note=excluded.note,
-            category=excluded.category,
-            tags_json=excluded.tags_json,
-            cultural_note=excluded.cultural_note,
-            translation_helper=excluded.translation_helper,
-            focus=excluded.focus,
-            lemma=excluded.lemma,
-            phrase=excluded.phrase,
-            register=excluded.register,
-            risk=excluded.risk,
-            trap=excluded.trap,
-            native_sauce=excluded.native_sauce
-    """, (
-        pack_id, term, chunk, meaning_en, note_json,
-        None, category, tags_json, cultural_note, meaning_helper,
-        focus, lemma, phrase, register, risk, trap, native_sauce, source_uid
-    ))
-    conn.commit()
-    cur.execute("SELECT item_id FROM pack_items WHERE pack_id = ? AND source_uid = ?", (pack_id, source_uid))
-    row = cur.fetchone()
-    conn.close()
+        ))
+        cur.execute("SELECT item_id FROM pack_items WHERE pack_id = ? AND source_uid = ?", (pack_id, source_uid))
+        row = cur.fetchone()
+    invalidate_pack_samples(pack_id)
     return int(row[0]) if row else 0
 
 
 def upsert_card_context(item_id: int, sentence: str, lang: str = "it"):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        INSERT INTO card_contexts (item_id, lang, sentence)
-        VALUES (?, ?, ?)
-    """, (item_id, lang, sentence))
-    conn.commit()
-    conn.close()
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            INSERT INTO card_contexts (item_id, lang, sentence)
+            VALUES (?, ?, ?)
+        """, (item_id, lang, sentence))
 
 
 def list_my_words_categories(pack_id: str) -> list[tuple[str, int]]:
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT COALESCE(NULLIF(category, ''), 'General') AS cat, COUNT(*)
-        FROM pack_items
-        WHERE pack_id = ?
-        GROUP BY cat
-        ORDER BY COUNT(*) DESC
-    """, (pack_id,))
-    rows = cur.fetchall()
-    conn.close()
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT COALESCE(NULLIF(category, ''), 'General') AS cat, COUNT(*)
+            FROM pack_items
+            WHERE pack_id = ?
+            GROUP BY cat
+            ORDER BY COUNT(*) DESC
+        """, (pack_id,))
+        rows = cur.fetchall()
     return [(r[0] or "General", int(r[1] or 0)) for r in rows]
 
 
 def list_my_words_in_category(pack_id: str, category: str | None = None) -> list[str]:
-    conn = get_connection()
-    cur = conn.cursor()
-    if category:
+    with db_conn() as conn:
+        cur = conn.cursor()
+        if category:
+            cur.execute("""
+                SELECT term
+                FROM pack_items
+                WHERE pack_id = ? AND category = ?
+                ORDER BY term ASC
+            """, (pack_id, category))
+        else:
+            cur.execute("""
+                SELECT term
+                FROM pack_items
+                WHERE pack_id = ?
+                ORDER BY term ASC
+            """, (pack_id,))
+        rows = cur.fetchall()
+    return [r[0] for r in rows if r and r[0]]
+
+
+def list_my_words_search(pack_id: str, query: str) -> list[str]:
+    q = f"%{(query or '').strip()}%"
+    with db_conn() as conn:
+        cur = conn.cursor()
         cur.execute("""
             SELECT term
             FROM pack_items
-            WHERE pack_id = ? AND category = ?
+            WHERE pack_id = ?
+              AND term LIKE ?
             ORDER BY term ASC
-        """, (pack_id, category))
-    else:
+        """, (pack_id, q))
+        rows = cur.fetchall()
+    return [r[0] for r in rows if r and r[0]]
+
+
+def list_my_words_all(pack_id: str, limit: int = 50) -> tuple[list[str], int]:
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT COUNT(*) FROM pack_items WHERE pack_id = ?", (pack_id,))
+        total = int((cur.fetchone() or [0])[0] or 0)
         cur.execute("""
             SELECT term
             FROM pack_items
             WHERE pack_id = ?
             ORDER BY term ASC
-        """, (pack_id,))
-    rows = cur.fetchall()
-    conn.close()
-    return [r[0] for r in rows if r and r[0]]
+            LIMIT ?
+        """, (pack_id, limit))
+        rows = cur.fetchall()
+    return [r[0] for r in rows if r and r[0]], total
 
 
-def list_my_words_search(pack_id: str, query: str) -> list[str]:
-    q = f"%{(query or '').strip()}%"
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT term
-        FROM pack_items
-        WHERE pack_id = ?
-          AND term LIKE ?
-        ORDER BY term ASC
-    """, (pack_id, q))
-    rows = cur.fetchall()
-    conn.close()
-    return [r[0] for r in rows if r and r[0]]
+def rename_my_words_category(pack_id: str, old_category: str, new_category: str) -> int:
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "UPDATE pack_items SET category = ? WHERE pack_id = ? AND category = ?",
+            (new_category, pack_id, old_category),
+        )
+        changed = cur.rowcount or 0
+    return int(changed)
 
 
-def list_my_words_all(pack_id: str, limit: int = 50) -> tuple[list[str], int]:
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT COUNT(*) FROM pack_items WHERE pack_id = ?", (pack_id,))
-    total = int((cur.fetchone() or [0])[0] or 0)
-    cur.execute("""
-        SELECT term
-        FROM pack_items
-        WHERE pack_id = ?
-        ORDER BY term ASC
-        LIMIT ?
-    """, (pack_id, limit))
-    rows = cur.fetchall()
-    conn.close()
-    return [r[0] for r in rows if r and r[0]], total
+def set_my_word_category(item_id: int, category: str):
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("UPDATE pack_items SET category = ? WHERE item_id = ?", (category, item_id))
 
 
-def rename_my_words_category(pack_id: str, old_category: str, new_category: str) -> int:
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        "UPDATE pack_items SET category = ? WHERE pack_id = ? AND category = ?",
-        (new_category, pack_id, old_category),
-    )
-    conn.commit()
-    changed = cur.rowcount or 0
-    conn.close()
-    return int(changed)
-
+def delete_my_words_terms(user_id: int, pack_id: str, terms: list[str]) -> tuple[list[str], list[str]]:
+    """
+    Delete the given terms (and their contexts/reviews) from a My Words pack.
+    Returns (deleted_terms, missing_terms).
+    """
+    if not terms:
+        return [], []
+    with db_conn() as conn:
+        cur = conn.cursor()
+        placeholders = ",".join("?" for _ in terms)
+        cur.execute(
+            f"SELECT item_id, term FROM pack_items WHERE pack_id = ? AND term IN ({placeholders})",
+            (pack_id, *terms),
+        )
+        found = {r[1]: r[0] for r in cur.fetchall()}
+        item_ids = list(found.values())
+        if item_ids:
+            id_placeholders = ",".join("?" for _ in item_ids)
+            cur.execute(f"DELETE FROM pack_items WHERE item_id IN ({id_placeholders})", item_ids)
+            cur.execute(f"DELETE FROM card_contexts WHERE item_id IN ({id_placeholders})", item_ids)
+            cur.execute(
+                f"DELETE FROM reviews WHERE user_id = ? AND item_id IN ({id_placeholders})",
+                (user_id, *item_ids),
+            )
+    if item_ids:
+        invalidate_pack_samples(pack_id)
+    missing = [t for t in terms if t not in found]
+    return list(found.keys()), missing
+
 
 def get_item_holographic_meta(item_id: int) -> dict:
     """
     Returns a dict of holographic fields for Learn deconstruct + drills.
     Safe defaults if missing.
     """
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT
-            register,
-            risk,
-            trap,
-            native_sauce,
-            cultural_note,
-            tags_json,
-            drills_json,
-            media_json
-        FROM pack_items
-        WHERE item_id = ?
-    """, (item_id,))
-    row = cur.fetchone()
-    conn.close()
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT
+                register,
+                risk,
+                trap,
+                native_sauce,
+                cultural_note,
+                tags_json,
+                drills_json,
+                media_json
+            FROM pack_items
+            WHERE item_id = ?
+        """, (item_id,))
+        row = cur.fetchone()
 
     if not row:
         return {
@@ -1844,27 +2441,24 @@ def get_item_holographic_meta(item_id: int) -> dict:
     }
 
 def reset_user_learning_progress(user_id: int, target_language: str = "it"):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        DELETE FROM reviews
-        WHERE user_id = ?
-          AND item_id IN (
-            SELECT pi.item_id
-            FROM pack_items pi
-            JOIN packs p ON p.pack_id = pi.pack_id
-            WHERE p.target_language = ?
-          )
-    """, (user_id, target_language))
-    conn.commit()
-    conn.close()
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            DELETE FROM reviews
+            WHERE user_id = ?
+              AND item_id IN (
+                SELECT pi.item_id
+                FROM pack_items pi
+                JOIN packs p ON p.pack_id = pi.pack_id
+                WHERE p.target_language = ?
+              )
+        """, (user_id, target_language))
 
 def get_pack_id_for_item(item_id: int) -> str | None:
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT pack_id FROM pack_items WHERE item_id = ?", (item_id,))
-    row = cur.fetchone()
-    conn.close()
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT pack_id FROM pack_items WHERE item_id = ?", (item_id,))
+        row = cur.fetchone()
     return row[0] if row else None
 
 
@@ -1873,17 +2467,8 @@ def pick_one_scene_for_pack(pack_id: str) -> dict | None:
     Returns one random scene for a pack as dict:
     { scene_id, unlock_rule, roleplay }
     """
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT scene_id, unlock_rule_json, roleplay_json
-        FROM pack_scenes
-        WHERE pack_id = ?
-        ORDER BY RANDOM()
-        LIMIT 1
-    """, (pack_id,))
-    row = cur.fetchone()
-    conn.close()
+    rows = pack_sampler.sample_distinct(_pack_sample(pack_id)["scenes"], 1)
+    row = rows[0][1:] if rows else None
 
     if not row:
         return None
@@ -1906,18 +2491,9 @@ def pick_one_scene_for_user_active_packs(user_id: int) -> dict | None:
     """
     Pick one random scene among all scenes belonging to packs the user activated.
     """
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT ps.pack_id, ps.scene_id, ps.unlock_rule_json, ps.roleplay_json
-        FROM pack_scenes ps
-        JOIN user_packs up ON up.pack_id = ps.pack_id
-        WHERE up.user_id = ?
-        ORDER BY RANDOM()
-        LIMIT 1
-    """, (user_id,))
-    row = cur.fetchone()
-    conn.close()
+    samples = [_pack_sample(pid) for pid in _active_pack_ids(user_id)]
+    rows = pack_sampler.sample_across([s["scenes"] for s in samples], 1)
+    row = rows[0] if rows else None
 
     if not row:
         return None
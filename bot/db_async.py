@@ -0,0 +1,57 @@
+# bot/db_async.py
+"""
+Async facade over bot.db for the Telegram handlers.
+
+Every helper in bot.db is exposed here as a coroutine that runs on one
+dedicated DB thread, so a slow query never stalls the PTB event loop:
+
+    from bot import db_async as db
+    row = await db.get_due_item(user_id)
+
+The DB thread owns a single pooled connection (see bot.db.db_conn), which also
+makes it the one writer for the bot process. Blocking code that touches the DB
+through plain bot.db calls (scenario pickers, storyline helpers) can be shipped
+to the same thread with `await db.run(fn, *args)`.
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from bot import db as _db
+
+# Pure helpers with no I/O stay synchronous.
+_SYNC_PASSTHROUGH = {"today_str", "utc_now_iso"}
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="lingodojo-db")
+
+
+async def run(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking callable on the DB thread and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(fn, *args, **kwargs))
+
+
+def _wrap(fn: Callable[..., Any]):
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        return await run(fn, *args, **kwargs)
+
+    return wrapper
+
+
+def __getattr__(name: str):
+    attr = getattr(_db, name)
+    if name.startswith("_") or not callable(attr) or isinstance(attr, type) or name in _SYNC_PASSTHROUGH:
+        return attr
+    wrapped = _wrap(attr)
+    globals()[name] = wrapped  # cache so later lookups skip __getattr__
+    return wrapped
+
+
+async def shutdown():
+    """Close the DB thread's connection and stop the executor."""
+    await run(_db.close_all_connections)
+    _executor.shutdown(wait=True)
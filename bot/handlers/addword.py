@@ -1,10 +1,11 @@
 from __future__ import annotations
 
+import asyncio
 from typing import List
 import json
 import re
 from html import escape
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputFile
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
 from telegram.error import BadRequest
@@ -12,25 +13,11 @@ from telegram.error import BadRequest
 from bot.utils.telegram import get_chat_sender
 from bot.services.dictionary_it import validate_it_term
 from bot.services.lexicon_it import get_or_fetch_lexicon_it
-from bot.services.ai_feedback import generate_word_card, generate_phrase_scenario, generate_learn_feedback, generate_sentence_upgrade, generate_conjugation
+from bot.services.ai_feedback import generate_word_card, generate_phrase_scenario, generate_learn_feedback, generate_sentence_upgrade, generate_conjugation, prefetch_word_cards
+from bot.services import ai_client
 from bot.services.validation import validate_sentence
-from bot.services.tts_edge import tts_it
-from bot.db import (
-    get_user_profile,
-    get_user_level,
-    set_session,
-    get_session,
-    clear_session,
-    ensure_my_words_pack,
-    upsert_my_word_item,
-    upsert_card_context,
-    ensure_review_row,
-    list_my_words_categories,
-    list_my_words_in_category,
-    list_my_words_search,
-    list_my_words_all,
-    rename_my_words_category,
-)
+from bot.utils.tts import send_tts
+from bot import db_async as db
 
 CATEGORIES = [
     "Verbs",
@@ -239,8 +226,8 @@ def _category_keyboard(suggestions: List[str]) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(rows)
 
 
-def _mywords_menu(pack_id: str) -> tuple[str, InlineKeyboardMarkup]:
-    categories = list_my_words_categories(pack_id)
+async def _mywords_menu(pack_id: str) -> tuple[str, InlineKeyboardMarkup]:
+    categories = await db.list_my_words_categories(pack_id)
     lines = ["🗂 <b>My Words</b>"]
     kb = []
     if not categories:
@@ -311,37 +298,27 @@ def _conjugation_keyboard() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(rows)
 
 
-async def _send_tts(message, text: str):
-    audio_path = await tts_it(text)
-    suffix = audio_path.suffix.lower()
-    with open(audio_path, "rb") as f:
-        if suffix == ".ogg":
-            await message.reply_voice(voice=InputFile(f, filename=f"{text}.ogg"))
-        else:
-            await message.reply_audio(audio=InputFile(f, filename=f"{text}{suffix}"), title=text)
-
-
 async def add_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     msg = get_chat_sender(update)
-    clear_session(update.effective_user.id)
-    set_session(update.effective_user.id, mode="addword", item_id=None, stage="await_input", meta={})
+    await db.clear_session(update.effective_user.id)
+    await db.set_session(update.effective_user.id, mode="addword", item_id=None, stage="await_input", meta={})
     await msg.reply_text("Send 1 word or a comma-separated list.")
 
 
 async def mywords_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     msg = get_chat_sender(update)
-    profile = get_user_profile(user.id)
+    profile = await db.get_user_profile(user.id)
     if not profile:
         await msg.reply_text("Use /start first.")
         return
     target, ui, helper = profile
-    pack_id = ensure_my_words_pack(user.id, target)
-    categories = list_my_words_categories(pack_id)
+    pack_id = await db.ensure_my_words_pack(user.id, target)
+    categories = await db.list_my_words_categories(pack_id)
     if not categories:
         await msg.reply_text("No saved words yet. Use /add to save your first word.")
         return
-    text, kb = _mywords_menu(pack_id)
+    text, kb = await _mywords_menu(pack_id)
     await msg.reply_text(text, parse_mode=ParseMode.HTML, reply_markup=kb)
 
 
@@ -353,15 +330,15 @@ async def on_mywords_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if len(parts) < 2:
         return
     action = parts[1]
-    profile = get_user_profile(user.id)
+    profile = await db.get_user_profile(user.id)
     if not profile:
         await query.edit_message_text("Use /start first.")
         return
     target, ui, helper = profile
-    pack_id = ensure_my_words_pack(user.id, target)
+    pack_id = await db.ensure_my_words_pack(user.id, target)
 
     if action == "BACK":
-        text, kb = _mywords_menu(pack_id)
+        text, kb = await _mywords_menu(pack_id)
         await query.edit_message_text(text, parse_mode=ParseMode.HTML, reply_markup=kb)
         return
 
@@ -372,22 +349,22 @@ async def on_mywords_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     if action == "DELETE":
-        set_session(user.id, mode="addword", item_id=None, stage="await_delete", meta={})
+        await db.set_session(user.id, mode="addword", item_id=None, stage="await_delete", meta={})
         await query.message.reply_text("Send the word or phrase to delete.")
         return
 
     if action == "BULK":
-        set_session(user.id, mode="addword", item_id=None, stage="await_bulk_delete", meta={})
+        await db.set_session(user.id, mode="addword", item_id=None, stage="await_bulk_delete", meta={})
         await query.message.reply_text("Send a comma-separated list of words/phrases to delete.")
         return
 
     if action == "SEARCH":
-        set_session(user.id, mode="addword", item_id=None, stage="await_search", meta={})
+        await db.set_session(user.id, mode="addword", item_id=None, stage="await_search", meta={})
         await query.message.reply_text("Send a word to search.")
         return
 
     if action == "CATS":
-        categories = list_my_words_categories(pack_id)
+        categories = await db.list_my_words_categories(pack_id)
         if not categories:
             await query.edit_message_text("No categories yet.")
             return
@@ -401,7 +378,7 @@ async def on_mywords_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     if action == "ALL":
-        terms, total = list_my_words_all(pack_id, limit=50)
+        terms, total = await db.list_my_words_all(pack_id, limit=50)
         if not terms:
             await query.edit_message_text("No saved words yet.")
             return
@@ -416,7 +393,7 @@ async def on_mywords_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     if action == "RENAME":
-        categories = list_my_words_categories(pack_id)
+        categories = await db.list_my_words_categories(pack_id)
         if not categories:
             await query.edit_message_text("No categories to rename yet.")
             return
@@ -427,26 +404,26 @@ async def on_mywords_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     if action == "RENFROM" and len(parts) == 3:
         old_cat = parts[2]
-        set_session(user.id, mode="addword", item_id=None, stage="rename_category", meta={"rename_from": old_cat})
+        await db.set_session(user.id, mode="addword", item_id=None, stage="rename_category", meta={"rename_from": old_cat})
         kb = _category_select_keyboard(CATEGORIES, "MYWORDS|RENTO|")
         await query.edit_message_text(f"Rename <b>{h(old_cat)}</b> to:", parse_mode=ParseMode.HTML, reply_markup=kb)
         return
 
     if action == "RENTO" and len(parts) == 3:
-        session = get_session(user.id)
+        session = await db.get_session(user.id)
         old_cat = (session[3] or {}).get("rename_from") if session else None
         new_cat = parts[2]
         if not old_cat:
             await query.edit_message_text("Rename session expired. Try again.")
             return
-        changed = rename_my_words_category(pack_id, old_cat, new_cat)
-        clear_session(user.id)
+        changed = await db.rename_my_words_category(pack_id, old_cat, new_cat)
+        await db.clear_session(user.id)
         await query.edit_message_text(f"Renamed {changed} items to <b>{h(new_cat)}</b>.", parse_mode=ParseMode.HTML)
         return
 
     if action == "CAT" and len(parts) == 3:
         cat = parts[2]
-        terms = list_my_words_in_category(pack_id, cat)
+        terms = await db.list_my_words_in_category(pack_id, cat)
         if not terms:
             await query.edit_message_text("No words in this category yet.")
             return
@@ -457,12 +434,13 @@ async def on_mywords_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
 
-async def on_addword_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def on_addword_text(update: Update, context: ContextTypes.DEFAULT_TYPE, session=None):
     user = update.effective_user
     msg = get_chat_sender(update)
     text = (update.message.text or "").strip()
 
-    session = get_session(user.id)
+    if session is None:
+        session = await db.get_session(user.id)
     if not session:
         return
     mode, item_id, stage, meta = session
@@ -475,37 +453,26 @@ async def on_addword_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await msg.reply_text("Please send at least one word.")
             return
         meta = {"queue": terms, "index": 0}
-        set_session(user.id, mode="addword", item_id=None, stage="show_card", meta=meta)
+        await db.set_session(user.id, mode="addword", item_id=None, stage="show_card", meta=meta)
         await _process_current_word(update, context, meta)
         return
 
     if stage == "await_delete":
-        profile = get_user_profile(user.id)
+        profile = await db.get_user_profile(user.id)
         if not profile:
             await msg.reply_text("Use /start first.")
             return
         target, ui, helper = profile
-        pack_id = ensure_my_words_pack(user.id, target)
+        pack_id = await db.ensure_my_words_pack(user.id, target)
         term = text.strip()
         if not term:
             await msg.reply_text("Send the exact word or phrase to delete.")
             return
-        from bot.db import get_connection
-        conn = get_connection()
-        cur = conn.cursor()
-        cur.execute("SELECT item_id FROM pack_items WHERE pack_id = ? AND term = ?", (pack_id, term))
-        row = cur.fetchone()
-        if not row:
-            conn.close()
+        deleted, _missing = await db.delete_my_words_terms(user.id, pack_id, [term])
+        if not deleted:
             await msg.reply_text("Not found in your My Words.")
             return
-        item_id = row[0]
-        cur.execute("DELETE FROM pack_items WHERE item_id = ?", (item_id,))
-        cur.execute("DELETE FROM card_contexts WHERE item_id = ?", (item_id,))
-        cur.execute("DELETE FROM reviews WHERE item_id = ? AND user_id = ?", (item_id, user.id))
-        conn.commit()
-        conn.close()
-        clear_session(user.id)
+        await db.clear_session(user.id)
         await msg.reply_text(
             f"Deleted: {term}",
             reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("⬅️ Back", callback_data="MYWORDS|BACK")]]),
@@ -513,40 +480,19 @@ async def on_addword_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     if stage == "await_bulk_delete":
-        profile = get_user_profile(user.id)
+        profile = await db.get_user_profile(user.id)
         if not profile:
             await msg.reply_text("Use /start first.")
             return
         target, ui, helper = profile
-        pack_id = ensure_my_words_pack(user.id, target)
+        pack_id = await db.ensure_my_words_pack(user.id, target)
         terms = _parse_terms(text)
         if not terms:
             await msg.reply_text("Send a comma-separated list of words to delete.")
             return
-        from bot.db import get_connection
-        conn = get_connection()
-        cur = conn.cursor()
-        placeholders = ",".join("?" for _ in terms)
-        cur.execute(
-            f"SELECT item_id, term FROM pack_items WHERE pack_id = ? AND term IN ({placeholders})",
-            (pack_id, *terms),
-        )
-        rows = cur.fetchall()
-        found = {r[1]: r[0] for r in rows}
-        missing = [t for t in terms if t not in found]
-        item_ids = list(found.values())
-        if item_ids:
-            id_placeholders = ",".join("?" for _ in item_ids)
-            cur.execute(f"DELETE FROM pack_items WHERE item_id IN ({id_placeholders})", item_ids)
-            cur.execute(f"DELETE FROM card_contexts WHERE item_id IN ({id_placeholders})", item_ids)
-            cur.execute(
-                f"DELETE FROM reviews WHERE user_id = ? AND item_id IN ({id_placeholders})",
-                (user.id, *item_ids),
-            )
-        conn.commit()
-        conn.close()
-        clear_session(user.id)
-        lines = [f"Deleted: {len(item_ids)}"]
+        deleted, missing = await db.delete_my_words_terms(user.id, pack_id, terms)
+        await db.clear_session(user.id)
+        lines = [f"Deleted: {len(deleted)}"]
         if missing:
             lines.append("Not found: " + ", ".join(missing[:10]))
         await msg.reply_text(
@@ -556,17 +502,17 @@ async def on_addword_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     if stage == "await_search":
-        profile = get_user_profile(user.id)
+        profile = await db.get_user_profile(user.id)
         if not profile:
             await msg.reply_text("Use /start first.")
             return
         target, ui, helper = profile
-        pack_id = ensure_my_words_pack(user.id, target)
+        pack_id = await db.ensure_my_words_pack(user.id, target)
         q = text.strip()
         if not q:
             await msg.reply_text("Send a word to search.")
             return
-        terms = list_my_words_search(pack_id, q)
+        terms = await db.list_my_words_search(pack_id, q)
         if not terms:
             await msg.reply_text(
                 "No matches.",
@@ -588,14 +534,16 @@ async def on_addword_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if not ok:
             await msg.reply_text(f"⚠️ Your sentence must include <b>{h(term)}</b>.", parse_mode=ParseMode.HTML)
             return
-        level_from = get_user_level(user.id)
+        level_from = await db.get_user_level(user.id)
         level_to = _next_level(level_from)
-        upgrade = await generate_sentence_upgrade(
+        upgrade = await ai_client.run_latest(user.id, generate_sentence_upgrade(
             term=term,
             user_sentence=text,
             level_from=level_from,
             level_to=level_to,
-        )
+        ))
+        if upgrade is None:
+            return  # superseded: the user already sent something newer
         out = [
             f"✅ <b>{h(term)}</b>",
             "",
@@ -611,14 +559,16 @@ async def on_addword_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
             if upgrade.get("tip"):
                 out.append(f"\nTip:\n{h(upgrade['tip'])}")
         else:
-            fb = await generate_learn_feedback(
+            fb = await ai_client.run_latest(user.id, generate_learn_feedback(
                 target_language="it",
                 term=term,
                 chunk=term,
                 translation_en=card.get("meaning_en"),
                 user_sentence=text,
-                lexicon=get_or_fetch_lexicon_it(term),
-            )
+                lexicon=await asyncio.to_thread(get_or_fetch_lexicon_it, term),
+            ))
+            if fb is None:
+                return  # superseded: the user already sent something newer
             if fb.get("correction"):
                 out.append(f"\nFix:\n{h(fb['correction'])}")
             elif fb.get("rewrite"):
@@ -651,7 +601,7 @@ async def on_addword_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def _process_current_word(update: Update, context: ContextTypes.DEFAULT_TYPE, meta: dict):
     user = update.effective_user
     msg = get_chat_sender(update)
-    profile = get_user_profile(user.id)
+    profile = await db.get_user_profile(user.id)
     if not profile:
         await msg.reply_text("Use /start first.")
         return
@@ -660,21 +610,26 @@ async def _process_current_word(update: Update, context: ContextTypes.DEFAULT_TY
     queue = meta.get("queue") or []
     idx = int(meta.get("index") or 0)
     if idx >= len(queue):
-        clear_session(user.id)
+        await db.clear_session(user.id)
         await msg.reply_text("All done.")
         return
 
     term = queue[idx]
     focus = "phrase" if _is_phrase(term) else "word"
+    # validate and generate the next cards while the user looks at this one
+    prefetch_word_cards(
+        [(t, "phrase" if _is_phrase(t) else "word") for t in queue[idx + 1:]],
+        helper_language=helper or "fa",
+    )
     skip_validation = bool(meta.get("skip_validation")) and meta.get("skip_term") == term
     if not skip_validation:
-        v = validate_it_term(term)
+        v = await asyncio.to_thread(validate_it_term, term)
         if not v.get("ok") and focus == "word":
             sug = v.get("suggestion")
             if sug:
                 meta["suggestion"] = sug
                 meta["skip_term"] = term
-                set_session(user.id, mode="addword", item_id=None, stage="show_card", meta=meta)
+                await db.set_session(user.id, mode="addword", item_id=None, stage="show_card", meta=meta)
                 await msg.reply_text(
                     f"Did you mean <b>{h(sug)}</b>?",
                     parse_mode=ParseMode.HTML,
@@ -705,7 +660,7 @@ async def _process_current_word(update: Update, context: ContextTypes.DEFAULT_TY
 
     meta["helper_lang"] = helper
     meta["card"] = card
-    set_session(user.id, mode="addword", item_id=None, stage="show_card", meta=meta)
+    await db.set_session(user.id, mode="addword", item_id=None, stage="show_card", meta=meta)
 
     text = _phrase_card_text(card, helper) if focus == "phrase" else _word_card_text(card, helper)
     has_next = idx + 1 < len(queue)
@@ -714,11 +669,11 @@ async def _process_current_word(update: Update, context: ContextTypes.DEFAULT_TY
 
 async def _save_current_word(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     user = update.effective_user
-    profile = get_user_profile(user.id)
+    profile = await db.get_user_profile(user.id)
     if not profile:
         return 0
     target, ui, helper = profile
-    session = get_session(user.id)
+    session = await db.get_session(user.id)
     if not session:
         return 0
     mode, item_id, stage, meta = session
@@ -726,14 +681,14 @@ async def _save_current_word(update: Update, context: ContextTypes.DEFAULT_TYPE)
     term = card.get("term") or ""
     focus = card.get("focus") or ("phrase" if _is_phrase(term) else "word")
 
-    pack_id = ensure_my_words_pack(user.id, target)
+    pack_id = await db.ensure_my_words_pack(user.id, target)
     source_uid = f"user_{user.id}_{focus}_{_slugify(term)}"
 
     note_json = None
     if card:
         note_json = json.dumps(card, ensure_ascii=False)
 
-    item_id = upsert_my_word_item(
+    item_id = await db.upsert_my_word_item(
         pack_id=pack_id,
         focus=focus,
         term=term,
@@ -754,17 +709,17 @@ async def _save_current_word(update: Update, context: ContextTypes.DEFAULT_TYPE)
     for ex in (card.get("examples") or []):
         it = ex.get("it") or ""
         if it:
-            upsert_card_context(item_id, it, lang="it")
+            await db.upsert_card_context(item_id, it, lang="it")
 
-    ensure_review_row(user.id, item_id)
+    await db.ensure_review_row(user.id, item_id)
     meta["saved_item_id"] = item_id
-    set_session(user.id, mode="addword", item_id=item_id, stage="show_card", meta=meta)
+    await db.set_session(user.id, mode="addword", item_id=item_id, stage="show_card", meta=meta)
     return item_id
 
 
 async def _set_category(update: Update, context: ContextTypes.DEFAULT_TYPE, category: str):
     user = update.effective_user
-    session = get_session(user.id)
+    session = await db.get_session(user.id)
     if not session:
         return
     mode, item_id, stage, meta = session
@@ -777,13 +732,7 @@ async def _set_category(update: Update, context: ContextTypes.DEFAULT_TYPE, cate
     if not item_id:
         return
 
-    # update category directly
-    from bot.db import get_connection
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("UPDATE pack_items SET category = ? WHERE item_id = ?", (category, item_id))
-    conn.commit()
-    conn.close()
+    await db.set_my_word_category(item_id, category)
 
     await get_chat_sender(update).reply_text(f"Saved under category: {category}")
 
@@ -792,7 +741,7 @@ async def on_addword_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await _safe_answer(query)
     user = query.from_user
-    session = get_session(user.id)
+    session = await db.get_session(user.id)
     if not session:
         await query.edit_message_text("Session expired. Use /add again.")
         return
@@ -891,7 +840,7 @@ async def on_addword_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
         card = (meta or {}).get("card") or {}
         term = card.get("term") or ""
         try:
-            await _send_tts(query.message, term)
+            await send_tts(query.message, term)
         except Exception as e:
             await query.message.reply_text(
                 f"Pronunciation unavailable ({type(e).__name__}).",
@@ -912,11 +861,11 @@ async def on_addword_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     term=card.get("term"),
                     meaning_en=card.get("meaning_en"),
                     helper_language=(meta or {}).get("helper_lang") or "fa",
-                    level=get_user_level(user.id),
+                    level=await db.get_user_level(user.id),
                 )
             meta["expected_phrase"] = card.get("term")
             meta["scenario"] = scenario
-            set_session(user.id, mode="addword", item_id=None, stage="await_phrase", meta=meta)
+            await db.set_session(user.id, mode="addword", item_id=None, stage="await_phrase", meta=meta)
             text = (
                 "🎭 Mini Scene\n"
                 f"{h((scenario or {}).get('setting') or 'Real life')}\n\n"
@@ -927,7 +876,7 @@ async def on_addword_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
             ]))
             return
         # word learn
-        set_session(user.id, mode="addword", item_id=None, stage="await_sentence", meta=meta)
+        await db.set_session(user.id, mode="addword", item_id=None, stage="await_sentence", meta=meta)
         await query.message.reply_text(
             f"Use the word: <b>{h(card.get('term'))}</b>\nWrite a short, real sentence (up to 12 words).",
             parse_mode=ParseMode.HTML
@@ -971,14 +920,14 @@ async def on_addword_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
         idx = int(meta.get("index") or 0) + 1
         meta["index"] = idx
         if idx >= len(queue):
-            clear_session(user.id)
+            await db.clear_session(user.id)
             await query.message.reply_text("All done.")
             return
         await _process_current_word(update, context, meta)
         return
 
     if action == "CANCEL":
-        clear_session(user.id)
+        await db.clear_session(user.id)
         await query.message.reply_text("Cancelled.")
         return
 
@@ -3,7 +3,7 @@ from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
 
 from bot.utils.telegram import get_chat_sender
-from bot.db import get_session, get_user_profile
+from bot import db_async as db
 from bot.handlers.learn import h
 
 
@@ -13,7 +13,7 @@ async def hint_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not user:
         return
 
-    session = get_session(user.id)
+    session = await db.get_session(user.id)
     if not session:
         await msg.reply_text("No active card.")
         return
@@ -62,7 +62,7 @@ async def why_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not user:
         return
 
-    session = get_session(user.id)
+    session = await db.get_session(user.id)
     if not session:
         await msg.reply_text("No active card.")
         return
@@ -5,7 +5,7 @@ from telegram.constants import ParseMode
 from bot.utils.telegram import get_chat_sender
 from bot.handlers.learn import start_pack_learn, send_scene_prompt
 from bot.handlers.review import review
-from bot.db import get_due_item, get_pack_info, get_pack_item_counts, count_completed_scenarios, set_session, get_user_persona, get_due_count, pick_next_new_item_for_user, get_user_profile
+from bot import db_async as db
 from bot.scenarios import list_scenarios_by_pack_key
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 
@@ -59,20 +59,20 @@ def _stage_scenarios(stage: dict) -> list[str]:
         ids.extend([s.get("scenario_id") for s in scenarios if s.get("scenario_id")])
     return ids
 
-def _stage_progress(user_id: int, stage: dict) -> tuple[int, int]:
+async def _stage_progress(user_id: int, stage: dict) -> tuple[int, int]:
     total = 0
     done = 0
     for pid in stage.get("packs") or []:
-        t, d = get_pack_item_counts(user_id, pid)
+        t, d = await db.get_pack_item_counts(user_id, pid)
         total += max(t, 0)
         done += max(d, 0)
     return total, done
 
-def _gatekeeper_done(user_id: int, stage: dict) -> bool:
+async def _gatekeeper_done(user_id: int, stage: dict) -> bool:
     ids = _stage_scenarios(stage)
     if not ids:
         return True
-    return count_completed_scenarios(user_id, ids) >= 1
+    return await db.count_completed_scenarios(user_id, ids) >= 1
 
 
 async def journey(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -83,43 +83,43 @@ async def journey(update: Update, context: ContextTypes.DEFAULT_TYPE):
     stage_current = None
     stage_gatekeeper_pending = False
     for stage in STAGES:
-        total, done = _stage_progress(user.id, stage)
+        total, done = await _stage_progress(user.id, stage)
         if total <= 0:
             continue
-        if done < total or not _gatekeeper_done(user.id, stage):
+        if done < total or not await _gatekeeper_done(user.id, stage):
             stage_current = stage
-            if done >= total and not _gatekeeper_done(user.id, stage):
+            if done >= total and not await _gatekeeper_done(user.id, stage):
                 stage_gatekeeper_pending = True
             break
 
     # Next pack in journey path
     next_pack = None
     for pid in JOURNEY_PATH:
-        total, introduced = get_pack_item_counts(user.id, pid)
+        total, introduced = await db.get_pack_item_counts(user.id, pid)
         if total > 0 and introduced < total:
             next_pack = pid
             break
 
     stage_code = stage_current["code"] if stage_current else "Complete"
     stage_title = stage_current["title"] if stage_current else "Complete"
-    total_stage, done_stage = _stage_progress(user.id, stage_current) if stage_current else (0, 0)
+    total_stage, done_stage = await _stage_progress(user.id, stage_current) if stage_current else (0, 0)
     pct = int(round((done_stage / total_stage) * 100)) if total_stage else 0
     bar = _progress_bar(done_stage, total_stage, width=10)
 
-    due_count = get_due_count(user.id)
-    profile = get_user_profile(user.id)
+    due_count = await db.get_due_count(user.id)
+    profile = await db.get_user_profile(user.id)
     target_lang = profile[0] if profile else "it"
-    learn_available = bool(pick_next_new_item_for_user(user.id, target_lang))
+    learn_available = bool(await db.pick_next_new_item_for_user(user.id, target_lang))
 
     mission_line = "🎭 Mission: -"
     if next_pack:
-        info = get_pack_info(next_pack)
+        info = await db.get_pack_info(next_pack)
         title = info[2] if info else "Mission"
         pack_key = _pack_key_for_id(next_pack)
         scenarios = list_scenarios_by_pack_key(pack_key)
         if scenarios:
             ids = [s.get("scenario_id") for s in scenarios if s.get("scenario_id")]
-            done_s = count_completed_scenarios(user.id, ids)
+            done_s = await db.count_completed_scenarios(user.id, ids)
             mission_line = f"🎭 Mission: {title} ({done_s}/{len(ids)})"
 
     lines = [
@@ -157,7 +157,7 @@ async def on_journey_choice(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await review(update, context)
         return
     if action == "CONTINUE":
-        due_count = get_due_count(query.from_user.id)
+        due_count = await db.get_due_count(query.from_user.id)
         if due_count > 0:
             await query.edit_message_text("🔁 Starting review…", parse_mode=ParseMode.HTML)
             await review(update, context)
@@ -166,12 +166,12 @@ async def on_journey_choice(update: Update, context: ContextTypes.DEFAULT_TYPE):
         stage_current = None
         stage_gatekeeper_pending = False
         for stage in STAGES:
-            total, done = _stage_progress(query.from_user.id, stage)
+            total, done = await _stage_progress(query.from_user.id, stage)
             if total <= 0:
                 continue
-            if done < total or not _gatekeeper_done(query.from_user.id, stage):
+            if done < total or not await _gatekeeper_done(query.from_user.id, stage):
                 stage_current = stage
-                if done >= total and not _gatekeeper_done(query.from_user.id, stage):
+                if done >= total and not await _gatekeeper_done(query.from_user.id, stage):
                     stage_gatekeeper_pending = True
                 break
         if stage_current and stage_gatekeeper_pending:
@@ -185,7 +185,7 @@ async def on_journey_choice(update: Update, context: ContextTypes.DEFAULT_TYPE):
         # otherwise start next pack
         next_pack = None
         for pid in JOURNEY_PATH:
-            total, introduced = get_pack_item_counts(query.from_user.id, pid)
+            total, introduced = await db.get_pack_item_counts(query.from_user.id, pid)
             if total > 0 and introduced < total:
                 next_pack = pid
                 break
@@ -212,7 +212,7 @@ async def on_journey_choice(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 sid = s.get("scenario_id")
                 if not sid:
                     continue
-                if count_completed_scenarios(query.from_user.id, [sid]) == 0:
+                if await db.count_completed_scenarios(query.from_user.id, [sid]) == 0:
                     scenario = s
                     break
             if not scenario:
@@ -220,7 +220,7 @@ async def on_journey_choice(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if not scenario:
             await query.edit_message_text("No gatekeeper scene available yet.")
             return
-        persona = get_user_persona(query.from_user.id) or (None, None, None)
+        persona = await db.get_user_persona(query.from_user.id) or (None, None, None)
         p_name, p_city, p_role = persona
         meta = {
             "persona": {"name": p_name, "city": p_city, "role": p_role},
@@ -233,7 +233,7 @@ async def on_journey_choice(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 "idx": 0,
             }
         }
-        set_session(query.from_user.id, mode="learn", item_id=None, stage="scene_turn", meta=meta)
+        await db.set_session(query.from_user.id, mode="learn", item_id=None, stage="scene_turn", meta=meta)
         await query.edit_message_text("🎭 Gatekeeper starting…", parse_mode=ParseMode.HTML)
         msg = get_chat_sender(update)
         await send_scene_prompt(msg, meta)
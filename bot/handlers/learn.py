@@ -1,48 +1,24 @@
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputFile
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.error import BadRequest
 from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
 from html import escape
 
-from bot.utils.telegram import get_chat_sender
+from bot.utils.telegram import get_chat_sender, reply_or_edit, stream_reply
+from bot.utils.tts import send_tts
 from bot.config import SHOW_DICT_DEBUG
 
 
-from bot.db import (
-    list_packs, activate_pack, get_user_active_packs,
-    pick_one_item_from_pack, set_session, get_session,
-    clear_session, get_item_by_id, ensure_review_row,
-    get_user_languages, get_lexicon_cache_it,pick_one_item_for_user,
-    pick_next_new_item_for_user,
-    pick_next_new_item_for_user_in_pack,
-    get_active_items_total,
-    get_active_items_introduced,get_user_profile,
-    get_random_context_for_item, get_item_holographic_meta,
-    get_learn_since_scene,
-    set_learn_since_scene,
-    pick_one_scene_for_user_active_packs,
-    get_random_meanings_from_active_packs,
-    get_random_meanings_from_pack,
-    get_pack_info,
-    get_pack_item_counts,
-    mark_item_mature,
-    get_learned_terms_for_pack,
-    mark_scenario_completed,
-    record_practice,
-    upsert_user_pack_progress,
-    set_user_journey_progress,
-    get_user_persona,
-
-)
+from bot import db_async as db
 from bot.scenarios import pick_scenario_for_pack, list_scenarios_by_pack_key
 from bot.storyline import get_current_story_beat, advance_story
 
 from bot.services.dictionary_it import validate_it_term
-from bot.services.ai_feedback import generate_learn_feedback,generate_reverse_context_quiz,generate_roleplay_feedback 
+from bot.services.ai_feedback import generate_learn_feedback,generate_reverse_context_quiz,stream_learn_feedback,stream_roleplay_feedback
+from bot.services import ai_client, learn_prefetch
+from bot.services.feedback_rules import quick_feedback
 from bot.services.validation import validate_sentence, build_anchors
 import random
-from bot.services.lexicon_it import get_or_fetch_lexicon_it
-from bot.services.tts_edge import tts_it
 
 
 SCENE_EVERY_N_NEW_ITEMS = 3
@@ -113,6 +89,39 @@ def h(text: str) -> str:
     return escape(text or "")
 
 
+def _partial_feedback_line(snap: dict) -> str | None:
+    """First feedback line of a streamed answer that is still being written."""
+    for key, label in (("correction", "⚠️ Fix:"), ("rewrite", "👍 Better:"), ("notes", "✅")):
+        value = snap.get(key)
+        if value and isinstance(value, str):
+            return f"{label} {h(value)} ✍️"
+    return None
+
+
+def _learn_feedback_reply(term: str, user_sentence: str, debug_line: str, fb: dict) -> str:
+    """Feedback card for a learn sentence (rule-based or AI), without the Next line."""
+    reply = (
+        f"✅ <b>{h(term)}</b>\n"
+        f"“{h(user_sentence)}”\n"
+        f"{h(debug_line)}"
+    )
+    if fb.get("correction"):
+        reply += f"\n⚠️ Fix: {h(fb['correction'])}"
+        if fb.get("provider") == "rules":
+            reply += "".join(f"\n• {h(reason)}" for reason in fb.get("why") or [])
+    elif fb.get("rewrite"):
+        reply += f"\n👍 Better: {h(fb['rewrite'])}"
+    elif fb.get("notes"):
+        reply += f"\n✅ {h(fb['notes'])}"
+    else:
+        reply += f"\n✅ Good."
+    if fb.get("provider") == "rules":
+        for note in fb.get("grammar_notes") or []:
+            if note != fb.get("notes"):
+                reply += f"\n💡 {h(note)}"
+    return reply
+
+
 def _role_for_pack(pack_id: str) -> str:
     pid = (pack_id or "").lower()
     if "airport" in pid:
@@ -127,7 +136,7 @@ async def _start_phrase_mission(user, msg, meta: dict):
     if not chunk_items:
         return
 
-    persona = get_user_persona(user.id) or (None, None, None)
+    persona = await db.get_user_persona(user.id) or (None, None, None)
     p_name, p_city, p_role = persona
     if p_name or p_city or p_role:
         meta = meta or {}
@@ -135,9 +144,9 @@ async def _start_phrase_mission(user, msg, meta: dict):
 
     pack_id = (meta or {}).get("pack_id") or ""
     chunk_terms = [ci.get("phrase") or "" for ci in chunk_items]
-    learned_terms = list(get_learned_terms_for_pack(user.id, pack_id))
-    scenario = pick_scenario_for_pack(user.id, pack_id, chunk_terms + learned_terms)
-    pack_info = get_pack_info(pack_id) if pack_id else None
+    learned_terms = list(await db.get_learned_terms_for_pack(user.id, pack_id))
+    scenario = await db.run(pick_scenario_for_pack, user.id, pack_id, chunk_terms + learned_terms)
+    pack_info = await db.get_pack_info(pack_id) if pack_id else None
     pack_level = pack_info[1] if pack_info and len(pack_info) > 1 else None
     if scenario:
         turns = scenario.get("turns") or []
@@ -177,20 +186,20 @@ async def _start_phrase_mission(user, msg, meta: dict):
         }
     meta["chunk_items"] = []
 
-    set_session(user.id, mode="learn", item_id=meta.get("item_id"), stage="scene_turn", meta=meta)
+    await db.set_session(user.id, mode="learn", item_id=meta.get("item_id"), stage="scene_turn", meta=meta)
     await send_scene_prompt(msg, meta)
 
 
 async def _send_next_learn_card(user, msg, target: str, pack_id: str | None, meta: dict | None = None) -> bool:
     meta_in = meta or {}
-    if pack_id:
-        item = pick_next_new_item_for_user_in_pack(user.id, pack_id)
-    else:
-        item = pick_next_new_item_for_user(user.id, target_language=target)
+    # staged while the user was answering the previous card, if still valid
+    card = await learn_prefetch.take(user.id, target, pack_id)
+    if card is None:
+        card = await learn_prefetch.prepare(user.id, target, pack_id)
 
-    if not item:
+    if not card:
         if pack_id:
-            total, introduced = get_pack_item_counts(user.id, pack_id)
+            total, introduced = await db.get_pack_item_counts(user.id, pack_id)
             next_pack = PACK_PROGRESS.get(pack_id)
             kb = None
             journey_path = meta_in.get("journey_path") if meta_in else None
@@ -199,7 +208,7 @@ async def _send_next_learn_card(user, msg, target: str, pack_id: str | None, met
                 next_pack = journey_path[journey_index + 1]
 
             if next_pack:
-                next_info = get_pack_info(next_pack)
+                next_info = await db.get_pack_info(next_pack)
                 if next_info:
                     _, next_level, next_title, _, _, _, _, _ = next_info
                     kb = InlineKeyboardMarkup([
@@ -213,7 +222,7 @@ async def _send_next_learn_card(user, msg, target: str, pack_id: str | None, met
                         parse_mode=ParseMode.HTML,
                         reply_markup=kb
                     )
-                    clear_session(user.id)
+                    await db.clear_session(user.id)
                     return False
 
             await msg.reply_text(
@@ -223,56 +232,36 @@ async def _send_next_learn_card(user, msg, target: str, pack_id: str | None, met
                 reply_markup=kb
             )
         else:
-            total = get_active_items_total(user.id, target)
-            introduced = get_active_items_introduced(user.id, target)
+            total = await db.get_active_items_total(user.id, target)
+            introduced = await db.get_active_items_introduced(user.id, target)
             await msg.reply_text(
                 f"✅ You finished all NEW items in your packs.\n"
                 f"Progress: {introduced}/{total}\n\n"
                 f"Now go /review 🔁"
             )
-        clear_session(user.id)
+        await db.clear_session(user.id)
         return False
 
+    item = card["item"]
     # Support older tuple shapes
     if len(item) >= 7:
         item_id, term, chunk, translation_en, note, pack_id_row, focus = item[:7]
     else:
         item_id, term, chunk, translation_en, note = item[:5]
-        pack_id_row = None
         focus = None
 
-    if not pack_id and pack_id_row:
-        pack_id = pack_id_row
+    request_pack_id = pack_id   # what the next call will most likely ask for again
+    pack_id = card["pack_id"]
+    ctx_it = card["ctx_it"]
+    holo = card["holo"]
+    quiz = card["quiz"]
+    pack_info = card["pack_info"]
 
-    ctx_it = get_random_context_for_item(item_id)
-    holo = get_item_holographic_meta(item_id)
+    await db.ensure_review_row(user.id, item_id)
 
-    try:
-        get_or_fetch_lexicon_it(term)
-    except Exception:
-        pass
-
-    ensure_review_row(user.id, item_id)
-
-    lexicon = get_lexicon_cache_it(term)
     if pack_id:
-        total, introduced = get_pack_item_counts(user.id, pack_id)
-        upsert_user_pack_progress(user.id, pack_id, introduced, total)
-    if pack_id:
-        distractors = get_random_meanings_from_pack(pack_id, item_id, limit=2)
-    else:
-        distractors = get_random_meanings_from_active_packs(user.id, target, item_id, limit=2)
-
-    quiz = await generate_reverse_context_quiz(
-        term=term,
-        chunk=chunk,
-        translation_en=translation_en,
-        lexicon=lexicon,
-        context_it=ctx_it,
-        distractors_en=distractors,
-    )
-
-    pack_info = get_pack_info(pack_id) if pack_id else None
+        total, introduced = await db.get_pack_item_counts(user.id, pack_id)
+        await db.upsert_user_pack_progress(user.id, pack_id, introduced, total)
     if pack_info and len(pack_info) > 4 and pack_info[4]:
         pack_type = pack_info[4]
     elif focus:
@@ -312,7 +301,7 @@ async def _send_next_learn_card(user, msg, target: str, pack_id: str | None, met
             "translation_en": translation_en,
             "context_it": ctx_it,
         }
-        set_session(user.id, mode="learn", item_id=item_id, stage="await_ai_choice", meta=meta)
+        await db.set_session(user.id, mode="learn", item_id=item_id, stage="await_ai_choice", meta=meta)
         kb = InlineKeyboardMarkup([
             [InlineKeyboardButton("🔁 Try again", callback_data="AI|RETRY_QUIZ")],
             [InlineKeyboardButton("⏭ Skip quiz", callback_data="AI|SKIP_QUIZ")]
@@ -323,19 +312,22 @@ async def _send_next_learn_card(user, msg, target: str, pack_id: str | None, met
             parse_mode=ParseMode.HTML,
             reply_markup=kb
         )
+        learn_prefetch.schedule(user.id, target, request_pack_id)
         return True
 
     if pack_id:
-        total, introduced = get_pack_item_counts(user.id, pack_id)
+        total, introduced = await db.get_pack_item_counts(user.id, pack_id)
         progress_line = f"📦 Progress: {introduced}/{total}"
     else:
-        total = get_active_items_total(user.id, target)
-        introduced = get_active_items_introduced(user.id, target)
+        total = await db.get_active_items_total(user.id, target)
+        introduced = await db.get_active_items_introduced(user.id, target)
         progress_line = f"📦 Progress: {introduced}/{total}"
 
-    set_session(user.id, mode="learn", item_id=item_id, stage="await_guess", meta=meta)
+    await db.set_session(user.id, mode="learn", item_id=item_id, stage="await_guess", meta=meta)
     text, keyboard = _build_quiz_message(term, quiz, progress_line)
     await msg.reply_text(text, parse_mode=ParseMode.HTML, reply_markup=keyboard)
+    # card N is on screen: stage card N+1 while the user answers
+    learn_prefetch.schedule(user.id, target, request_pack_id)
     return True
 
 def _build_quiz_message(term: str, quiz: dict, progress_line: str | None = None):
@@ -359,7 +351,7 @@ async def offer_scene(msg, user_id: int, item_id: int, meta: dict):
     """
     Save a pending scene in session and ask user to Start/Skip.
     """
-    scene = pick_one_scene_for_user_active_packs(user_id)
+    scene = await db.pick_one_scene_for_user_active_packs(user_id)
     if not scene:
         await msg.reply_text("🎭 No scenes found in your packs yet.")
         return
@@ -380,7 +372,7 @@ async def offer_scene(msg, user_id: int, item_id: int, meta: dict):
     }
 
     # Set session to await scene decision
-    set_session(user_id, mode="learn", item_id=item_id, stage="await_scene_choice", meta=meta)
+    await db.set_session(user_id, mode="learn", item_id=item_id, stage="await_scene_choice", meta=meta)
 
     kb = InlineKeyboardMarkup([
         [InlineKeyboardButton("🎭 Start Scene", callback_data="SCENE|START")],
@@ -466,14 +458,14 @@ async def learn(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     msg = get_chat_sender(update)
 
-    profile = get_user_profile(user.id)
+    profile = await db.get_user_profile(user.id)
     if not profile:
         await msg.reply_text("Use /start first.")
         return
     
     target, ui, helper = profile
 
-    langs = get_user_languages(user.id)
+    langs = await db.get_user_languages(user.id)
     if not langs:
         msg = get_chat_sender(update)
         await msg.reply_text("Use /start first.")
@@ -481,7 +473,7 @@ async def learn(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     target_language, ui_language = langs
 
-    session = get_session(user.id)
+    session = await db.get_session(user.id)
     if session:
         mode, item_id, stage, meta = session
         if mode == "learn" and item_id is not None and stage in ("await_guess", "await_sentence"):
@@ -532,7 +524,7 @@ async def learn(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 )
                 return
 
-    active_packs = get_user_active_packs(user.id)
+    active_packs = await db.get_user_active_packs(user.id)
     if not active_packs:
         kb = InlineKeyboardMarkup([
             [InlineKeyboardButton("⚙️ Open Settings → Packs", callback_data="HOME|SETTINGS")]
@@ -548,12 +540,13 @@ async def learn(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 
-async def on_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def on_text(update: Update, context: ContextTypes.DEFAULT_TYPE, session=None):
     user = update.effective_user
     text = (update.message.text or "").strip()
     msg = get_chat_sender(update)
 
-    session = get_session(user.id)
+    if session is None:
+        session = await db.get_session(user.id)
     if not session:
         return
     
@@ -569,9 +562,9 @@ async def on_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     # 1) Load item (fallback source)
-    item = get_item_by_id(item_id)
+    item = await db.get_item_by_id(item_id)
     if not item:
-        clear_session(user.id)
+        await db.clear_session(user.id)
         msg = get_chat_sender(update)
         await msg.reply_text("Session error. Try /learn again.")
         return
@@ -585,7 +578,7 @@ async def on_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
     translation_en = meta.get("translation_en") or translation_en_db
 
     # 3) Cached lexicon facts (silent grounding)
-    lexicon = get_lexicon_cache_it(term)
+    lexicon = await db.get_lexicon_cache_it(term)
 
     # Optional debug only
     debug_line = ""
@@ -621,93 +614,60 @@ async def on_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
             return
 
-    # 4) AI feedback
+    # 4) Instant offline feedback, then the AI upgrades it in place as it streams in
+    contexts = await db.get_contexts_for_item(item_id)
+    quick = quick_feedback(term=term, chunk=chunk, user_sentence=text, contexts=contexts)
+    quick_reply = _learn_feedback_reply(term, text, debug_line, quick)
+    sent = await msg.reply_text(f"{quick_reply}\n\n⏳ <i>Asking the AI…</i>", parse_mode=ParseMode.HTML)
+
+    def render_partial(snap: dict) -> str | None:
+        line = _partial_feedback_line(snap)
+        return f"✅ <b>{h(term)}</b>\n“{h(text)}”\n\n{line}" if line else None
+
     try:
-        ai = await generate_learn_feedback(
-            target_language="it",
-            term=term,
-            chunk=chunk,
-            translation_en=translation_en,
-            user_sentence=text,
-            lexicon=lexicon,
-        )
-    except Exception:
-        # Save what we need to retry
-        meta = meta or {}
-        meta["pending_ai"] = {
-            "kind": "learn_feedback",
-            "term": term,
-            "chunk": chunk,
-            "translation_en": translation_en,
-            "user_sentence": text
-        }
-        set_session(user.id, mode="learn", item_id=item_id, stage="await_ai_choice", meta=meta)
-
-        kb = InlineKeyboardMarkup([
-            [InlineKeyboardButton("🔁 Try again", callback_data="AI|RETRY_LEARN")],
-            [InlineKeyboardButton("⏭ Skip AI feedback", callback_data="AI|SKIP_LEARN")]
-        ])
-
-        await msg.reply_text(
-            "⚠️ <b>AI is not available right now.</b>\n"
-            "Do you want to try again, or skip feedback and continue?",
+        streamed = await ai_client.run_latest(user.id, stream_reply(
+            msg,
+            stream_learn_feedback(
+                target_language="it",
+                term=term,
+                chunk=chunk,
+                translation_en=translation_en,
+                user_sentence=text,
+                lexicon=lexicon,
+            ),
+            render_partial,
             parse_mode=ParseMode.HTML,
-            reply_markup=kb
-        )
-        return
-
-    # ✅ If AI returned fallback, offer Retry/Skip
-    if not ai.get("ok"):
-        meta = meta or {}
-        meta["pending_ai"] = {
-            "kind": "learn_feedback",
-            "term": term,
-            "chunk": chunk,
-            "translation_en": translation_en,
-            "user_sentence": text,
-        }
-        set_session(user.id, mode="learn", item_id=item_id, stage="await_ai_choice", meta=meta)
-
-        kb = InlineKeyboardMarkup([
-            [InlineKeyboardButton("🔁 Try again", callback_data="AI|RETRY_LEARN")],
-            [InlineKeyboardButton("⏭ Skip feedback", callback_data="AI|SKIP_LEARN")]
-        ])
-
-        reason = ai.get("notes") or "AI not available."
-        await msg.reply_text(
-            f"⚠️ <b>AI not available</b>\n{h(reason)}\n\nWhat do you want to do?",
-            parse_mode=ParseMode.HTML,
-            reply_markup=kb
-        )
-        return
+            sent=sent,
+        ))
+        # None: superseded, the user already sent something newer. The quick answer
+        # stands and the item still counts as done, so that message isn't graded
+        # against this card again.
+        ai = None
+        if streamed is not None:
+            sent, ai = streamed
+    except Exception:
+        ai = {"ok": False}
 
-    reply = (
-        f"✅ <b>{h(term)}</b>\n"
-        f"“{h(text)}”\n"
-        f"{h(debug_line)}"
-    )
-
-    if ai.get("correction"):
-        reply += f"\n⚠️ Fix: {h(ai['correction'])}"
-    elif ai.get("rewrite"):
-        reply += f"\n👍 Better: {h(ai['rewrite'])}"
-    elif ai.get("notes"):
-        reply += f"\n✅ {h(ai['notes'])}"
+    if ai is None:
+        reply = quick_reply
+    elif ai.get("ok"):
+        reply = _learn_feedback_reply(term, text, debug_line, ai)
     else:
-        reply += f"\n✅ Good."
+        # no Retry/Skip detour: the offline check already answered
+        reply = quick_reply + "\n\n<i>(quick offline check — AI feedback unavailable)</i>"
 
     reply += "\n\nNext: /learn or /review."
 
     msg = get_chat_sender(update)
-    await msg.reply_text(reply, parse_mode=ParseMode.HTML)
+    await reply_or_edit(msg, sent, reply, parse_mode=ParseMode.HTML)
     
     # ✅ persistent counter (survives clear_session)
-    count = get_learn_since_scene(user.id) + 1
-    set_learn_since_scene(user.id, count)
+    count = await db.get_learn_since_scene(user.id) + 1
+    await db.set_learn_since_scene(user.id, count)
 
     meta = _increment_continue_used(meta or {})
     if _continue_quota_reached(meta):
-        clear_session(user.id)
+        await db.clear_session(user.id)
         await msg.reply_text(
             "✅ Continue complete. Back to Journey.",
             reply_markup=InlineKeyboardMarkup([
@@ -718,11 +678,11 @@ async def on_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     # If it's time, offer scene (do NOT auto-start)
     if count >= SCENE_EVERY_N_NEW_ITEMS:
-        set_learn_since_scene(user.id, 0)
+        await db.set_learn_since_scene(user.id, 0)
         await offer_scene(msg, user.id, item_id, meta)
         return
 
-    clear_session(user.id)
+    await db.clear_session(user.id)
 
 
 async def on_scene_choice(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -730,7 +690,7 @@ async def on_scene_choice(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
     user = query.from_user
 
-    session = get_session(user.id)
+    session = await db.get_session(user.id)
     if not session:
         await query.edit_message_text("Session expired. Type /learn again.")
         return
@@ -743,7 +703,7 @@ async def on_scene_choice(update: Update, context: ContextTypes.DEFAULT_TYPE):
     _, action = data.split("|", 1)
 
     if action == "SKIP":
-        clear_session(user.id)
+        await db.clear_session(user.id)
         await query.edit_message_text(
             "⏭ Skipped. No worries.\nType /learn to continue or /review to practice.",
             parse_mode=ParseMode.HTML
@@ -753,14 +713,14 @@ async def on_scene_choice(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # START
     pending = (meta or {}).get("pending_scene")
     if not pending:
-        clear_session(user.id)
+        await db.clear_session(user.id)
         await query.edit_message_text("No pending scene found. Type /learn again.")
         return
 
     meta["scene"] = pending
     meta.pop("pending_scene", None)
 
-    set_session(user.id, mode="learn", item_id=item_id, stage="scene_turn", meta=meta)
+    await db.set_session(user.id, mode="learn", item_id=item_id, stage="scene_turn", meta=meta)
 
     # Replace the offer message with “starting…”
     await query.edit_message_text("🎭 Starting scene…", parse_mode=ParseMode.HTML)
@@ -776,7 +736,7 @@ async def on_scene_action(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = query.from_user
     action = (query.data or "").split("|", 1)[1] if "|" in (query.data or "") else ""
 
-    session = get_session(user.id)
+    session = await db.get_session(user.id)
     if not session:
         await query.edit_message_text("No active scene.")
         return
@@ -830,8 +790,8 @@ async def on_scene_action(update: Update, context: ContextTypes.DEFAULT_TYPE):
             out.append("\n🏁 <b>Scene complete.</b>")
             scene_id = scene.get("scene_id")
             if scene_id:
-                mark_scenario_completed(user.id, scene_id)
-            clear_session(user.id)
+                await db.mark_scenario_completed(user.id, scene_id)
+            await db.clear_session(user.id)
             kb = InlineKeyboardMarkup([
                 [InlineKeyboardButton("🔁 Try again", callback_data=f"SCENEREPLAY|{scene.get('pack_id') or ''}")],
                 [InlineKeyboardButton("▶️ Continue", callback_data="home:journey")],
@@ -841,7 +801,7 @@ async def on_scene_action(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         scene["idx"] = idx
         meta["scene"] = scene
-        set_session(user.id, mode="learn", item_id=item_id, stage="scene_turn", meta=meta)
+        await db.set_session(user.id, mode="learn", item_id=item_id, stage="scene_turn", meta=meta)
         await query.message.reply_text("\n".join(out), parse_mode=ParseMode.HTML)
 
 
@@ -870,7 +830,7 @@ async def start_pack_scene(update: Update, context: ContextTypes.DEFAULT_TYPE, p
         return
     scenario = scenarios[0]
 
-    persona = get_user_persona(user.id) or (None, None, None)
+    persona = await db.get_user_persona(user.id) or (None, None, None)
     p_name, p_city, p_role = persona
     meta = {
         "persona": {"name": p_name, "city": p_city, "role": p_role},
@@ -883,7 +843,7 @@ async def start_pack_scene(update: Update, context: ContextTypes.DEFAULT_TYPE, p
             "idx": 0,
         }
     }
-    set_session(user.id, mode="learn", item_id=None, stage="scene_turn", meta=meta)
+    await db.set_session(user.id, mode="learn", item_id=None, stage="scene_turn", meta=meta)
     await send_scene_prompt(msg, meta)
 
 
@@ -904,7 +864,7 @@ async def on_ai_choice(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
     user = query.from_user
 
-    session = get_session(user.id)
+    session = await db.get_session(user.id)
     if not session:
         await query.edit_message_text("Session expired. Type /learn again.")
         return
@@ -929,13 +889,13 @@ async def on_ai_choice(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
             meta = meta or {}
             meta["quiz"] = quiz
-            set_session(user.id, mode="learn", item_id=item_id, stage="await_guess", meta=meta)
+            await db.set_session(user.id, mode="learn", item_id=item_id, stage="await_guess", meta=meta)
 
-            profile = get_user_profile(user.id)
+            profile = await db.get_user_profile(user.id)
             if profile:
                 target_lang = profile[0]
-                total = get_active_items_total(user.id, target_lang)
-                introduced = get_active_items_introduced(user.id, target_lang)
+                total = await db.get_active_items_total(user.id, target_lang)
+                introduced = await db.get_active_items_introduced(user.id, target_lang)
                 progress_line = f"📦 Progress: {introduced}/{total}"
             else:
                 progress_line = None
@@ -956,7 +916,7 @@ async def on_ai_choice(update: Update, context: ContextTypes.DEFAULT_TYPE):
         translation_en = pending.get("translation_en")
         context_it = pending.get("context_it")
 
-        lexicon = get_lexicon_cache_it(term)
+        lexicon = await db.get_lexicon_cache_it(term)
         quiz = await generate_reverse_context_quiz(
             term=term,
             chunk=chunk,
@@ -967,13 +927,13 @@ async def on_ai_choice(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         meta = meta or {}
         meta["quiz"] = quiz
-        set_session(user.id, mode="learn", item_id=item_id, stage="await_guess", meta=meta)
+        await db.set_session(user.id, mode="learn", item_id=item_id, stage="await_guess", meta=meta)
 
-        profile = get_user_profile(user.id)
+        profile = await db.get_user_profile(user.id)
         if profile:
             target_lang = profile[0]
-            total = get_active_items_total(user.id, target_lang)
-            introduced = get_active_items_introduced(user.id, target_lang)
+            total = await db.get_active_items_total(user.id, target_lang)
+            introduced = await db.get_active_items_introduced(user.id, target_lang)
             progress_line = f"📦 Progress: {introduced}/{total}"
         else:
             progress_line = None
@@ -989,7 +949,7 @@ async def on_ai_choice(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     if pending.get("kind") != "learn_feedback":
-        clear_session(user.id)
+        await db.clear_session(user.id)
         await query.edit_message_text("Nothing to retry. Type /learn again.")
         return
 
@@ -998,7 +958,7 @@ async def on_ai_choice(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "⏭ Skipped AI feedback.\nType /learn to continue or /review to practice.",
             parse_mode=ParseMode.HTML
         )
-        clear_session(user.id)
+        await db.clear_session(user.id)
         return
 
     term = pending.get("term")
@@ -1006,7 +966,7 @@ async def on_ai_choice(update: Update, context: ContextTypes.DEFAULT_TYPE):
     translation_en = pending.get("translation_en")
     user_sentence = pending.get("user_sentence")
 
-    lexicon = get_lexicon_cache_it(term)
+    lexicon = await db.get_lexicon_cache_it(term)
 
     try:
         ai = await generate_learn_feedback(
@@ -1022,7 +982,7 @@ async def on_ai_choice(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "⚠️ AI still not available.\nYou can /learn without feedback or try later.",
             parse_mode=ParseMode.HTML
         )
-        clear_session(user.id)
+        await db.clear_session(user.id)
         return
 
     if not ai.get("ok"):
@@ -1034,7 +994,7 @@ async def on_ai_choice(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "translation_en": translation_en,
             "user_sentence": user_sentence,
         }
-        set_session(user.id, mode="learn", item_id=item_id, stage="await_ai_choice", meta=meta)
+        await db.set_session(user.id, mode="learn", item_id=item_id, stage="await_ai_choice", meta=meta)
 
         kb = InlineKeyboardMarkup([
             [InlineKeyboardButton("🔁 Try again", callback_data="AI|RETRY_LEARN")],
@@ -1053,19 +1013,7 @@ async def on_ai_choice(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 raise
         return
 
-    reply = (
-        f"✅ <b>{h(term)}</b>\n"
-        f"“{h(user_sentence)}”\n"
-    )
-    if ai.get("correction"):
-        reply += f"\n⚠️ Fix: {h(ai['correction'])}"
-    elif ai.get("rewrite"):
-        reply += f"\n👍 Better: {h(ai['rewrite'])}"
-    elif ai.get("notes"):
-        reply += f"\n✅ {h(ai['notes'])}"
-    else:
-        reply += "\n✅ Good."
-
+    reply = _learn_feedback_reply(term, user_sentence, "", ai)
     reply += "\n\nNext: /learn or /review."
 
     try:
@@ -1076,7 +1024,7 @@ async def on_ai_choice(update: Update, context: ContextTypes.DEFAULT_TYPE):
     msg = get_chat_sender(update)
     await msg.reply_text(reply, parse_mode=ParseMode.HTML)
 
-    clear_session(user.id)
+    await db.clear_session(user.id)
     
 
 
@@ -1090,7 +1038,7 @@ async def on_guess_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
     _, idx_str = data.split("|", 1)
     picked = int(idx_str)
 
-    session = get_session(user.id)
+    session = await db.get_session(user.id)
     if not session:
         await query.edit_message_text("Session expired. Type /learn again.")
         return
@@ -1105,7 +1053,7 @@ async def on_guess_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     ok = (picked == correct)
     status = "🟢 Correct" if ok else "⚠️ Almost"
-    record_practice(user.id, "learn", ok)
+    await db.record_practice(user.id, "learn", ok)
 
     holo = (meta or {}).get("holo") or {}
     drills = holo.get("drills") or {}
@@ -1145,7 +1093,7 @@ async def on_guess_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
         last_ts = int((meta or {}).get("last_scenario_ts") or 0)
         time_trigger = (now_ts - last_ts) >= 240
 
-        pack_info = get_pack_info(pack_id) if pack_id else None
+        pack_info = await db.get_pack_info(pack_id) if pack_id else None
         level = pack_info[1] if pack_info and len(pack_info) > 1 else "A1"
         max_per_session = _max_scenarios_for_level(level)
         scenarios_done = int((meta or {}).get("scenarios_done") or 0)
@@ -1154,8 +1102,8 @@ async def on_guess_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
         streak_trigger = correct_streak >= 3
 
         chunk_terms = [ci.get("phrase") or "" for ci in chunk_items]
-        learned_terms = list(get_learned_terms_for_pack(user.id, pack_id or ""))
-        scenario_obj = pick_scenario_for_pack(user.id, pack_id or "", chunk_terms + learned_terms)
+        learned_terms = list(await db.get_learned_terms_for_pack(user.id, pack_id or ""))
+        scenario_obj = await db.run(pick_scenario_for_pack, user.id, pack_id or "", chunk_terms + learned_terms)
 
         should_trigger = False
         if scenario_obj and scenarios_done < max_per_session:
@@ -1172,7 +1120,7 @@ async def on_guess_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
         # otherwise continue to next card in this pack
         meta = _increment_continue_used(meta or {})
         if _continue_quota_reached(meta):
-            clear_session(user.id)
+            await db.clear_session(user.id)
             await msg.reply_text(
                 "✅ Continue complete. Back to Journey.",
                 reply_markup=InlineKeyboardMarkup([
@@ -1180,14 +1128,14 @@ async def on_guess_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 ])
             )
             return
-        profile = get_user_profile(user.id)
+        profile = await db.get_user_profile(user.id)
         target = profile[0] if profile else "it"
         msg = get_chat_sender(update)
         await _send_next_learn_card(user, msg, target, pack_id=pack_id, meta=meta)
         return
 
     # word packs: move to sentence stage
-    set_session(user.id, mode="learn", item_id=item_id, stage="await_sentence", meta=meta)
+    await db.set_session(user.id, mode="learn", item_id=item_id, stage="await_sentence", meta=meta)
 
     # Keep feedback minimal for word packs too
     lines.append(
@@ -1204,7 +1152,7 @@ async def on_pronounce_button(update: Update, context: ContextTypes.DEFAULT_TYPE
     query = update.callback_query
     await query.answer()
 
-    session = get_session(query.from_user.id)
+    session = await db.get_session(query.from_user.id)
     if not session:
         return
 
@@ -1220,24 +1168,7 @@ async def on_pronounce_button(update: Update, context: ContextTypes.DEFAULT_TYPE
 
 
     try:
-        path = await tts_it(say_text)
-
-        # Decide how to send based on extension
-        suffix = path.suffix.lower()
-
-        with open(path, "rb") as f:
-            if suffix == ".ogg":
-                await query.message.reply_voice(
-                    voice=InputFile(f, filename=f"{say_text}.ogg"),
-                    caption=f"🔊 {say_text}",
-                )
-            else:
-                # mp3/wav -> send as audio
-                await query.message.reply_audio(
-                    audio=InputFile(f, filename=f"{say_text}{suffix}"),
-                    title=say_text,
-                )
-
+        await send_tts(query.message, say_text, caption=f"🔊 {say_text}")
     except Exception as e:
         await query.message.reply_text(f"TTS failed: {type(e).__name__}: {e}")
 
@@ -1246,18 +1177,18 @@ async def start_pack_learn(update: Update, context: ContextTypes.DEFAULT_TYPE, p
     user = update.effective_user
     msg = get_chat_sender(update)
 
-    profile = get_user_profile(user.id)
+    profile = await db.get_user_profile(user.id)
     if not profile:
         await msg.reply_text("Use /start first.")
         return
 
     target, ui, helper = profile
-    activate_pack(user.id, pack_id)
-    total, introduced = get_pack_item_counts(user.id, pack_id)
-    upsert_user_pack_progress(user.id, pack_id, introduced, total)
+    await db.activate_pack(user.id, pack_id)
+    total, introduced = await db.get_pack_item_counts(user.id, pack_id)
+    await db.upsert_user_pack_progress(user.id, pack_id, introduced, total)
 
-    clear_session(user.id)
-    persona = get_user_persona(user.id) or (None, None, None)
+    await db.clear_session(user.id)
+    persona = await db.get_user_persona(user.id) or (None, None, None)
     p_name, p_city, p_role = persona
     meta = {
         "pack_id": pack_id,
@@ -1266,7 +1197,7 @@ async def start_pack_learn(update: Update, context: ContextTypes.DEFAULT_TYPE, p
     }
     if journey_meta:
         meta.update(journey_meta)
-        set_user_journey_progress(user.id, pack_id)
+        await db.set_user_journey_progress(user.id, pack_id)
     await _send_next_learn_card(user, msg, target, pack_id=pack_id, meta=meta)
 
 
@@ -1275,7 +1206,7 @@ async def on_learn_skip(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
 
     user = query.from_user
-    session = get_session(user.id)
+    session = await db.get_session(user.id)
     if not session:
         await query.edit_message_text("No active learn card. Type /learn.")
         return
@@ -1285,8 +1216,8 @@ async def on_learn_skip(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await query.edit_message_text("No active learn card. Type /learn.")
         return
 
-    mark_item_mature(user.id, item_id)
-    clear_session(user.id)
+    await db.mark_item_mature(user.id, item_id)
+    await db.clear_session(user.id)
 
     await query.edit_message_text("✅ Skipped. Type /learn for the next item.")
 
@@ -1301,13 +1232,13 @@ async def on_unlock_next(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     _, current_pack, next_pack = parts[0], parts[1], parts[2]
 
-    next_info = get_pack_info(next_pack)
+    next_info = await db.get_pack_info(next_pack)
     if not next_info:
         await query.edit_message_text("Next pack not found. Go to /packs.")
         return
 
     # activate and start
-    activate_pack(user.id, next_pack)
+    await db.activate_pack(user.id, next_pack)
     await query.edit_message_text("✅ Unlocked! Starting the next pack…", parse_mode=ParseMode.HTML)
     await start_pack_learn(update, context, next_pack)
 
@@ -1328,33 +1259,45 @@ async def handle_scene_reply(update, context, item_id: int, meta: dict):
         expected_phrase = turns[idx].get("expected_phrase")
 
     # tiny correction (optional but good)
-    profile = get_user_profile(user.id)
+    profile = await db.get_user_profile(user.id)
     ui_lang = profile[1] if profile else "en"
     helper_lang = profile[2] if profile else None
+    sent = None   # streamed feedback message, edited into the first final reply
     try:
-        fb = await generate_roleplay_feedback(
-            target_language="it",
-            user_sentence=user_text,
-            setting=setting,
-            bot_role=bot_role,
-            expected_phrase=expected_phrase,
-            ui_language=ui_lang,
-            helper_language=helper_lang,
-        )
+        streamed = await ai_client.run_latest(user.id, stream_reply(
+            msg,
+            stream_roleplay_feedback(
+                target_language="it",
+                user_sentence=user_text,
+                setting=setting,
+                bot_role=bot_role,
+                expected_phrase=expected_phrase,
+                ui_language=ui_lang,
+                helper_language=helper_lang,
+            ),
+            _partial_feedback_line,
+            parse_mode=ParseMode.HTML,
+        ))
+        if streamed is None:
+            return  # superseded: the user already sent something newer
+        sent, fb = streamed
     except Exception:
         fb = {}
         await msg.reply_text("⚠️ AI feedback unavailable — continuing scene.", parse_mode=ParseMode.HTML)
 
     if fb.get("ok") is False and expected_phrase:
         hint = fb.get("notes") or "Try again."
-        await msg.reply_text(
+        await reply_or_edit(
+            msg,
+            sent,
             f"⚠️ {h(hint)}\nTry this:\n<b>{h(expected_phrase)}</b>",
             parse_mode=ParseMode.HTML
         )
         return
 
     if not fb.get("ok"):
-        await msg.reply_text("⚠️ AI feedback unavailable — continuing scene.", parse_mode=ParseMode.HTML)
+        await reply_or_edit(msg, sent, "⚠️ AI feedback unavailable — continuing scene.", parse_mode=ParseMode.HTML)
+        sent = None
 
     out = []
     persona = (meta or {}).get("persona") or {}
@@ -1391,19 +1334,19 @@ async def handle_scene_reply(update, context, item_id: int, meta: dict):
         out.append("\n🏁 <b>Scene complete.</b>")
         scene_id = scene.get("scene_id")
         if scene_id:
-            mark_scenario_completed(user.id, scene_id)
-        advance_story(user.id, pack_level)
-        clear_session(user.id)
+            await db.mark_scenario_completed(user.id, scene_id)
+        await db.run(advance_story, user.id, pack_level)
+        await db.clear_session(user.id)
         kb = InlineKeyboardMarkup([
             [InlineKeyboardButton("🔁 Try again", callback_data=f"SCENEREPLAY|{scene.get('pack_id') or ''}")],
             [InlineKeyboardButton("▶️ Continue", callback_data="home:journey")],
         ])
-        await msg.reply_text("\n".join(out), parse_mode=ParseMode.HTML, reply_markup=kb)
+        await reply_or_edit(msg, sent, "\n".join(out), parse_mode=ParseMode.HTML, reply_markup=kb)
         return
 
     # Save updated index
     scene["idx"] = idx
     meta["scene"] = scene
-    set_session(user.id, mode="learn", item_id=item_id, stage="scene_turn", meta=meta)
+    await db.set_session(user.id, mode="learn", item_id=item_id, stage="scene_turn", meta=meta)
 
-    await msg.reply_text("\n".join(out), parse_mode=ParseMode.HTML)
+    await reply_or_edit(msg, sent, "\n".join(out), parse_mode=ParseMode.HTML)
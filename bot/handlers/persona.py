@@ -2,7 +2,7 @@ from telegram import Update
 from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
 
-from bot.db import get_user_persona, set_user_persona, set_session, get_session, clear_session
+from bot import db_async as db
 from bot.utils.telegram import get_chat_sender
 
 
@@ -10,7 +10,7 @@ async def persona_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     msg = get_chat_sender(update)
 
-    persona = get_user_persona(user.id) or (None, None, None)
+    persona = await db.get_user_persona(user.id) or (None, None, None)
     name, city, role = persona
     current = "not set"
     if name or city or role:
@@ -24,11 +24,11 @@ async def persona_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         parse_mode=ParseMode.HTML,
     )
 
-    clear_session(user.id)
-    set_session(user.id, mode="persona", item_id=None, stage="ask_name", meta={})
+    await db.clear_session(user.id)
+    await db.set_session(user.id, mode="persona", item_id=None, stage="ask_name", meta={})
 
 
-async def on_persona_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def on_persona_text(update: Update, context: ContextTypes.DEFAULT_TYPE, session=None):
     user = update.effective_user
     msg = get_chat_sender(update)
     text = (update.message.text or "").strip()
@@ -36,7 +36,8 @@ async def on_persona_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await msg.reply_text("Please type a short answer.")
         return
 
-    session = get_session(user.id)
+    if session is None:
+        session = await db.get_session(user.id)
     if not session:
         return
 
@@ -47,13 +48,13 @@ async def on_persona_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
     meta = meta or {}
     if stage == "ask_name":
         meta["name"] = text
-        set_session(user.id, mode="persona", item_id=None, stage="ask_role", meta=meta)
+        await db.set_session(user.id, mode="persona", item_id=None, stage="ask_role", meta=meta)
         await msg.reply_text("Great. What's your role/job?")
         return
 
     if stage == "ask_role":
         meta["role"] = text
-        set_session(user.id, mode="persona", item_id=None, stage="ask_city", meta=meta)
+        await db.set_session(user.id, mode="persona", item_id=None, stage="ask_city", meta=meta)
         await msg.reply_text("And which city are you in?")
         return
 
@@ -61,8 +62,8 @@ async def on_persona_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
         name = meta.get("name")
         role = meta.get("role")
         city = text
-        set_user_persona(user.id, name, city, role)
-        clear_session(user.id)
+        await db.set_user_persona(user.id, name, city, role)
+        await db.clear_session(user.id)
         await msg.reply_text(
             f"✅ Alter‑Ego updated:\n"
             f"<b>{name}</b> — <b>{role}</b> in <b>{city}</b>",
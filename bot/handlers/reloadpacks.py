@@ -1,8 +1,11 @@
+import asyncio
+
 from telegram import Update
 from telegram.ext import ContextTypes
 
 from bot.utils.telegram import get_chat_sender
-from bot.db import import_packs_from_folder
+from bot import db_async as db
+from bot.services import tts_bank
 
 PACKS_FOLDER = "data/packs"
 
@@ -10,8 +13,18 @@ PACKS_FOLDER = "data/packs"
 async def reloadpacks_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     msg = get_chat_sender(update)
 
+    # "/reloadpacks force" re-applies every file, ignoring the import manifest
+    force = bool(context.args) and context.args[0].lower() == "force"
     try:
-        import_packs_from_folder()
-        await msg.reply_text(f"✅ Packs reloaded from {PACKS_FOLDER}.")
+        imported, unchanged, removed = await db.import_packs_from_folder(force=force)
+        await msg.reply_text(
+            f"✅ Packs reloaded from {PACKS_FOLDER}.\n"
+            f"Updated: {len(imported)} · Unchanged: {len(unchanged)} · Removed: {len(removed)}"
+        )
+        if tts_bank.TTS_PRERENDER_ON_IMPORT and imported:
+            previous = context.application.bot_data.get("tts_prerender")
+            if previous is not None:
+                previous.cancel()
+            context.application.bot_data["tts_prerender"] = asyncio.create_task(tts_bank.prerender_packs(imported))
     except Exception as e:
         await msg.reply_text(f"❌ Reload failed: {type(e).__name__}: {e}")
@@ -1,32 +1,18 @@
+import asyncio
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
 from html import escape
-from bot.db import (
-    get_due_item, get_due_item_in_pack, get_item_by_id, set_session, get_session, clear_session,
-    apply_grade, undo_last_grade, record_practice, get_pack_item_counts, upsert_user_pack_progress,
-    get_due_count, get_due_count_in_pack, get_random_context_for_item, get_review_state, get_random_terms_from_pack,
-    get_user_level,
-)
+from bot import db_async as db
 from bot.services.ai_feedback import generate_sentence_upgrade, generate_learn_feedback
+from bot.services import ai_client
 from bot.services.lexicon_it import get_or_fetch_lexicon_it
-from bot.services.tts_edge import tts_it
-from telegram import InputFile
+from bot.utils.tts import send_tts
 from bot.utils.telegram import get_chat_sender
 
 
 def h(text: str) -> str:
     return escape(text or "")
-
-
-async def _send_tts(message, text: str):
-    audio_path = await tts_it(text)
-    suffix = audio_path.suffix.lower()
-    with open(audio_path, "rb") as f:
-        if suffix == ".ogg":
-            await message.reply_voice(voice=InputFile(f, filename=f"{text}.ogg"))
-        else:
-            await message.reply_audio(audio=InputFile(f, filename=f"{text}{suffix}"), title=text)
 
 
 def grade_keyboard(item_id: int, is_phrase: bool):
@@ -103,68 +89,63 @@ def review_actions_keyboard(item_id: int, is_phrase: bool) -> InlineKeyboardMark
 
 
 
-async def review(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user = update.effective_user
-    session = get_session(user.id)
-    msg = get_chat_sender(update)
-    if session:
-        mode, item_id, stage, meta = session
-        if mode == "learn":
-            await msg.reply_text(
-                "You're in a mission. Pause and review now?",
-                reply_markup=InlineKeyboardMarkup([
-                    [InlineKeyboardButton("🔁 Review now", callback_data="REVIEWFLOW|NOW")],
-                    [InlineKeyboardButton("▶️ Resume mission", callback_data="REVIEWFLOW|RESUME")],
-                ])
-            )
-            return
-
-    item_id = get_due_item(user.id)
-
-    if not item_id:
-        await msg.reply_text("🎉 Nothing due today. Use /journey to add more.")
-        return
-
-    item = get_item_by_id(item_id)
-    if not item:
-        await msg.reply_text("Review error. Try /review again.")
-        return
-
-    _, term, chunk, translation_en, note, pack_id, focus = item
-    due_count = get_due_count(user.id)
-    is_phrase = (focus == "phrase") or (chunk and len(chunk.split()) > 1)
-    review_state = get_review_state(user.id, item_id)
-    status = review_state[0] if review_state else "new"
+async def _next_review_card(user_id: int, meta: dict) -> dict | None:
+    """
+    Pop the next card from the session's prefetched queue (meta["queue"]),
+    refilling it from get_due_queue once it runs dry. Updates meta in place.
+    """
+    queue = meta.get("queue") or []
+    if not queue:
+        pack_id = meta.get("pack_id")
+        queue = await db.get_due_queue(user_id, pack_id)
+        if pack_id:
+            meta["due_total"] = await db.get_due_count_in_pack(user_id, pack_id)
+        else:
+            meta["due_total"] = await db.get_due_count(user_id)
+    if not queue:
+        return None
+    card = queue.pop(0)
+    meta["queue"] = queue
+    return card
+
+
+async def _send_review_card(message, user_id: int, card: dict, meta: dict):
+    """Store the review session for `card` and send its prompt."""
+    item_id = card["item_id"]
+    term, chunk, translation_en = card["term"], card["chunk"], card["translation_en"]
+    due_total = int(meta.get("due_total") or 0)
+    due_index = int(meta.get("due_index") or 1)
+    title = "Pack Review" if meta.get("pack_id") else "Review"
+    is_phrase = (card["focus"] == "phrase") or (chunk and len(chunk.split()) > 1)
     mode = "A"
     if is_phrase:
-        if due_count >= 20 or status == "new":
+        if due_total >= 20 or card["status"] == "new":
             mode = "B"
-        elif status == "mature":
+        elif card["status"] == "mature":
             mode = "C"
         else:
             mode = "A"
-
-    set_session(user.id, mode="review", item_id=item_id, stage="await_sentence", meta={"due_total": due_count, "due_index": 1, "mode": mode})
+    meta = {**meta, "mode": mode}
 
     if is_phrase:
         if mode == "B":
             opts = [chunk] if chunk else []
-            opts += get_random_terms_from_pack(pack_id, item_id, limit=2)
+            opts += card.get("distractors") or []
             opts = [o for o in opts if o]
             while len(opts) < 3:
                 opts.append("Mi scusi, può aiutarmi?")
             opts = opts[:3]
-            set_session(user.id, mode="review", item_id=item_id, stage="await_choice", meta={"options": opts, "correct": 0, "due_total": due_count, "due_index": 1, "mode": mode})
+            await db.set_session(user_id, mode="review", item_id=item_id, stage="await_choice", meta={**meta, "options": opts, "correct": 0})
             kb = InlineKeyboardMarkup([
                 [InlineKeyboardButton(f"A) {opts[0]}", callback_data=f"REVIEW|CHOICE|{item_id}|0")],
                 [InlineKeyboardButton(f"B) {opts[1]}", callback_data=f"REVIEW|CHOICE|{item_id}|1")],
                 [InlineKeyboardButton(f"C) {opts[2]}", callback_data=f"REVIEW|CHOICE|{item_id}|2")],
             ])
-            text = review_header("Review", due_count) + "\n" + "🧠 Which phrase fits?\n" + f"👉 {h(translation_en or 'Say this in Italian.')}"
-            await msg.reply_text(text, parse_mode=ParseMode.HTML, reply_markup=kb)
+            text = review_header(title, due_total) + "\n" + "🧠 Which phrase fits?\n" + f"👉 {h(translation_en or 'Say this in Italian.')}"
+            await message.reply_text(text, parse_mode=ParseMode.HTML, reply_markup=kb)
             return
         elif mode == "C":
-            npc = get_random_context_for_item(item_id) or "Il gate è cambiato."
+            npc = await db.get_random_context_for_item(item_id) or "Il gate è cambiato."
             prompt = (
                 "👮 Staff:\n"
                 f"{h(npc)}\n\n"
@@ -176,92 +157,66 @@ async def review(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 f"{h(translation_en or 'You need help in a real situation.')}\n\n"
                 "What do you say?"
             )
-        text = review_header("Review", due_count) + "\n" + prompt
+        text = review_header(title, due_total) + "\n" + prompt
     else:
-        text = review_header("Review", due_count) + "\n" + review_prompt_word(term or chunk, 1, due_count)
+        text = review_header(title, due_total) + "\n" + review_prompt_word(term or chunk, due_index, due_total)
 
-    await msg.reply_text(text, parse_mode=ParseMode.HTML, reply_markup=review_actions_keyboard(item_id, is_phrase))
+    await db.set_session(user_id, mode="review", item_id=item_id, stage="await_sentence", meta=meta)
+    await message.reply_text(text, parse_mode=ParseMode.HTML, reply_markup=review_actions_keyboard(item_id, is_phrase))
 
 
-async def review_pack(update: Update, context: ContextTypes.DEFAULT_TYPE, pack_id: str):
+async def review(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
+    session = await db.get_session(user.id)
     msg = get_chat_sender(update)
+    if session:
+        mode, item_id, stage, meta = session
+        if mode == "learn":
+            await msg.reply_text(
+                "You're in a mission. Pause and review now?",
+                reply_markup=InlineKeyboardMarkup([
+                    [InlineKeyboardButton("🔁 Review now", callback_data="REVIEWFLOW|NOW")],
+                    [InlineKeyboardButton("▶️ Resume mission", callback_data="REVIEWFLOW|RESUME")],
+                ])
+            )
+            return
 
-    item_id = get_due_item_in_pack(user.id, pack_id)
-    if not item_id:
-        await msg.reply_text("🎉 Nothing due in this pack. Use /journey or /packs.")
+    meta = {"due_index": 1}
+    card = await _next_review_card(user.id, meta)
+    if not card:
+        await msg.reply_text("🎉 Nothing due today. Use /journey to add more.")
         return
+
+    await _send_review_card(msg, user.id, card, meta)
 
-    item = get_item_by_id(item_id)
-    if not item:
-        await msg.reply_text("Review error. Try again.")
-        return
 
-    _, term, chunk, translation_en, note, pack_id, focus = item
-    total, introduced = get_pack_item_counts(user.id, pack_id)
-    upsert_user_pack_progress(user.id, pack_id, introduced, total)
-    due_count = get_due_count_in_pack(user.id, pack_id)
-    is_phrase = (focus == "phrase") or (chunk and len(chunk.split()) > 1)
-    review_state = get_review_state(user.id, item_id)
-    status = review_state[0] if review_state else "new"
-    mode = "A"
-    if is_phrase:
-        if due_count >= 20 or status == "new":
-            mode = "B"
-        elif status == "mature":
-            mode = "C"
-        else:
-            mode = "A"
-    set_session(user.id, mode="review", item_id=item_id, stage="await_sentence", meta={"due_total": due_count, "due_index": 1, "mode": mode, "pack_id": pack_id})
+async def review_pack(update: Update, context: ContextTypes.DEFAULT_TYPE, pack_id: str):
+    user = update.effective_user
+    msg = get_chat_sender(update)
 
-    if is_phrase:
-        if mode == "B":
-            opts = [chunk] if chunk else []
-            opts += get_random_terms_from_pack(pack_id, item_id, limit=2)
-            opts = [o for o in opts if o]
-            while len(opts) < 3:
-                opts.append("Mi scusi, può aiutarmi?")
-            opts = opts[:3]
-            set_session(user.id, mode="review", item_id=item_id, stage="await_choice", meta={"options": opts, "correct": 0, "due_total": due_count, "due_index": 1, "mode": mode, "pack_id": pack_id})
-            kb = InlineKeyboardMarkup([
-                [InlineKeyboardButton(f"A) {opts[0]}", callback_data=f"REVIEW|CHOICE|{item_id}|0")],
-                [InlineKeyboardButton(f"B) {opts[1]}", callback_data=f"REVIEW|CHOICE|{item_id}|1")],
-                [InlineKeyboardButton(f"C) {opts[2]}", callback_data=f"REVIEW|CHOICE|{item_id}|2")],
-            ])
-            text = review_header("Pack Review", due_count) + "\n" + "🧠 Which phrase fits?\n" + f"👉 {h(translation_en or 'Say this in Italian.')}"
-            await msg.reply_text(text, parse_mode=ParseMode.HTML, reply_markup=kb)
-            return
-        elif mode == "C":
-            npc = get_random_context_for_item(item_id) or "Il gate è cambiato."
-            prompt = (
-                "👮 Staff:\n"
-                f"{h(npc)}\n\n"
-                "How do you respond?"
-            )
-        else:
-            prompt = (
-                "🧠 Situation\n"
-                f"{h(translation_en or 'You need help in a real situation.')}\n\n"
-                "What do you say?"
-            )
-        text = review_header("Pack Review", due_count) + "\n" + prompt
-    else:
-        text = review_header("Pack Review", due_count) + "\n" + review_prompt_word(term or chunk, 1, due_count)
+    meta = {"due_index": 1, "pack_id": pack_id}
+    card = await _next_review_card(user.id, meta)
+    if not card:
+        await msg.reply_text("🎉 Nothing due in this pack. Use /journey or /packs.")
+        return
 
-    await msg.reply_text(text, parse_mode=ParseMode.HTML, reply_markup=review_actions_keyboard(item_id, is_phrase))
+    total, introduced = await db.get_pack_item_counts(user.id, pack_id)
+    await db.upsert_user_pack_progress(user.id, pack_id, introduced, total)
+    await _send_review_card(msg, user.id, card, meta)
 
 
-async def on_review_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def on_review_text(update: Update, context: ContextTypes.DEFAULT_TYPE, session=None):
     user = update.effective_user
     text = (update.message.text or "").strip()
 
-    session = get_session(user.id)
+    if session is None:
+        session = await db.get_session(user.id)
     if not session:
         return
 
     mode, item_id, stage, meta = session
     if mode == "review" and stage == "await_sentence" and item_id is not None:
-        item = get_item_by_id(item_id)
+        item = await db.get_item_by_id(item_id)
         focus = item[6] if item and len(item) > 6 else None
         term = item[1] if item else ""
         chunk = item[2] if item else ""
@@ -270,14 +225,16 @@ async def on_review_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
         msg = get_chat_sender(update)
 
         if not is_phrase:
-            level_from = get_user_level(user.id)
+            level_from = await db.get_user_level(user.id)
             level_to = _next_level(level_from)
-            upgrade = await generate_sentence_upgrade(
+            upgrade = await ai_client.run_latest(user.id, generate_sentence_upgrade(
                 term=term or chunk,
                 user_sentence=text,
                 level_from=level_from,
                 level_to=level_to,
-            )
+            ))
+            if upgrade is None:
+                return  # superseded: the user already sent something newer
             out = [
                 f"✅ <b>{h(term or chunk)}</b>",
                 "",
@@ -293,14 +250,16 @@ async def on_review_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 if upgrade.get("tip"):
                     out.append(f"\nTip:\n{h(upgrade['tip'])}")
             else:
-                fb = await generate_learn_feedback(
+                fb = await ai_client.run_latest(user.id, generate_learn_feedback(
                     target_language="it",
                     term=term or chunk,
                     chunk=chunk or term,
                     translation_en=translation_en,
                     user_sentence=text,
-                    lexicon=get_or_fetch_lexicon_it(term or chunk),
-                )
+                    lexicon=await asyncio.to_thread(get_or_fetch_lexicon_it, term or chunk),
+                ))
+                if fb is None:
+                    return  # superseded: the user already sent something newer
                 if fb.get("correction"):
                     out.append(f"\nFix:\n{h(fb['correction'])}")
                 elif fb.get("rewrite"):
@@ -319,7 +278,7 @@ async def on_review_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 await msg.reply_text("✅ Got it.")
 
         # now ask the user to rate themselves
-        set_session(user.id, mode="review", item_id=item_id, stage="await_grade", meta=meta)
+        await db.set_session(user.id, mode="review", item_id=item_id, stage="await_grade", meta=meta)
         await msg.reply_text(
             review_grade_prompt(),
             reply_markup=grade_keyboard(item_id, is_phrase)
@@ -333,7 +292,7 @@ async def on_grade_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
     _, grade_raw, item_id_str = query.data.split("|", 2)
     item_id = int(item_id_str)
 
-    session = get_session(user.id)
+    session = await db.get_session(user.id)
     if not session:
         await query.edit_message_text("No active review session. Type /review.")
         return
@@ -354,10 +313,9 @@ async def on_grade_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
         else:
             grade = "good"
 
-    new_status, new_interval, new_due = apply_grade(user.id, item_id, grade)
-    record_practice(user.id, "review", grade != "again")
+    new_status, new_interval, new_due = await db.grade_item(user.id, item_id, grade)
 
-    clear_session(user.id)
+    await db.clear_session(user.id)
 
     await query.edit_message_text(
         f"✅ Saved.\n"
@@ -365,85 +323,21 @@ async def on_grade_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
         reply_markup=undo_keyboard(item_id)
     )
 
-    # Auto-continue: immediately send the next due item (keeps the undo message intact)
-    pack_id = (meta or {}).get("pack_id")
-    if pack_id:
-        next_item_id = get_due_item_in_pack(user.id, pack_id)
-        due_total = get_due_count_in_pack(user.id, pack_id)
-    else:
-        next_item_id = get_due_item(user.id)
-        due_total = get_due_count(user.id)
+    # Auto-continue: immediately send the next queued card (keeps the undo message intact).
+    # "again" keeps the card due today, so it still counts towards due_total.
+    meta = dict(meta or {})
+    due_total = int(meta.get("due_total") or 0)
+    meta["due_total"] = due_total if grade == "again" else max(due_total - 1, 0)
+    meta["due_index"] = int(meta.get("due_index") or 1) + 1
+    meta.pop("options", None)
+    meta.pop("correct", None)
 
-    if not next_item_id:
+    next_card = await _next_review_card(user.id, meta)
+    if not next_card:
         await query.message.reply_text("🎉 All done for today. Type /journey to add more.")
         return
 
-    next_item = get_item_by_id(next_item_id)
-    if not next_item:
-        await query.message.reply_text("Review error loading next item. Type /review.")
-        return
-
-    _, term, chunk, translation_en, note, pack_id, focus = next_item
-
-    meta = meta or {}
-    due_index = int(meta.get("due_index") or 1) + 1
-    is_phrase = (focus == "phrase") or (chunk and len(chunk.split()) > 1)
-    review_state = get_review_state(user.id, next_item_id)
-    status = review_state[0] if review_state else "new"
-    mode = "A"
-    if is_phrase:
-        if due_total >= 20 or status == "new":
-            mode = "B"
-        elif status == "mature":
-            mode = "C"
-        else:
-            mode = "A"
-    set_session(user.id, mode="review", item_id=next_item_id, stage="await_sentence", meta={"due_total": due_total, "due_index": due_index, "mode": mode, "pack_id": meta.get("pack_id")})
-
-    due_count = due_total
-    title = "Pack Review" if meta.get("pack_id") else "Review"
-    if is_phrase:
-        if mode == "B":
-            opts = [chunk] if chunk else []
-            opts += get_random_terms_from_pack(pack_id, next_item_id, limit=2)
-            opts = [o for o in opts if o]
-            while len(opts) < 3:
-                opts.append("Mi scusi, può aiutarmi?")
-            opts = opts[:3]
-            set_session(user.id, mode="review", item_id=next_item_id, stage="await_choice", meta={
-                "options": opts,
-                "correct": 0,
-                "due_total": due_total,
-                "due_index": due_index,
-                "mode": mode,
-                "pack_id": meta.get("pack_id"),
-            })
-            kb = InlineKeyboardMarkup([
-                [InlineKeyboardButton(f"A) {opts[0]}", callback_data=f"REVIEW|CHOICE|{next_item_id}|0")],
-                [InlineKeyboardButton(f"B) {opts[1]}", callback_data=f"REVIEW|CHOICE|{next_item_id}|1")],
-                [InlineKeyboardButton(f"C) {opts[2]}", callback_data=f"REVIEW|CHOICE|{next_item_id}|2")],
-            ])
-            next_text = review_header(title, due_count) + "\n" + "🧠 Which phrase fits?\n" + f"👉 {h(translation_en or 'Say this in Italian.')}"
-            await query.message.reply_text(next_text, parse_mode=ParseMode.HTML, reply_markup=kb)
-            return
-        elif mode == "C":
-            npc = get_random_context_for_item(next_item_id) or "Il gate è cambiato."
-            prompt = (
-                "👮 Staff:\n"
-                f"{h(npc)}\n\n"
-                "How do you respond?"
-            )
-        else:
-            prompt = (
-                "🧠 Situation\n"
-                f"{h(translation_en or 'You need help in a real situation.')}\n\n"
-                "What do you say?"
-            )
-        next_text = review_header(title, due_count) + "\n" + prompt
-    else:
-        next_text = review_header(title, due_count) + "\n" + review_prompt_word(term or chunk, due_index, due_total)
-
-    await query.message.reply_text(next_text, parse_mode=ParseMode.HTML, reply_markup=review_actions_keyboard(next_item_id, is_phrase))
+    await _send_review_card(query.message, user.id, next_card, meta)
 
 
 
@@ -455,7 +349,7 @@ async def on_undo_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
     _, item_id_str = query.data.split("|", 1)
     item_id = int(item_id_str)
 
-    restored = undo_last_grade(user.id, item_id)
+    restored = await db.undo_last_grade(user.id, item_id)
     if not restored:
         await query.edit_message_text("⚠️ Undo not available (already used or expired). Type /review.")
         return
@@ -472,7 +366,7 @@ async def on_undo_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def resume_review(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     msg = get_chat_sender(update)
-    session = get_session(user.id)
+    session = await db.get_session(user.id)
     if not session:
         await msg.reply_text("No active review session. Type /review.")
         return
@@ -480,7 +374,7 @@ async def resume_review(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if mode != "review" or not item_id:
         await msg.reply_text("No active review session. Type /review.")
         return
-    item = get_item_by_id(item_id)
+    item = await db.get_item_by_id(item_id)
     if not item:
         await msg.reply_text("Review error. Try /review again.")
         return
@@ -488,12 +382,12 @@ async def resume_review(update: Update, context: ContextTypes.DEFAULT_TYPE):
     is_phrase = (focus == "phrase") or (chunk and len(chunk.split()) > 1)
     pack_id = (meta or {}).get("pack_id")
     if pack_id:
-        due_total = int((meta or {}).get("due_total") or get_due_count_in_pack(user.id, pack_id))
-        due_count = get_due_count_in_pack(user.id, pack_id)
+        due_total = int((meta or {}).get("due_total") or await db.get_due_count_in_pack(user.id, pack_id))
+        due_count = await db.get_due_count_in_pack(user.id, pack_id)
         title = "Pack Review"
     else:
-        due_total = int((meta or {}).get("due_total") or get_due_count(user.id))
-        due_count = get_due_count(user.id)
+        due_total = int((meta or {}).get("due_total") or await db.get_due_count(user.id))
+        due_count = await db.get_due_count(user.id)
         title = "Review"
     due_index = int((meta or {}).get("due_index") or 1)
     if stage == "await_grade":
@@ -507,7 +401,7 @@ async def resume_review(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 f"👉 {h(translation_en or 'Say this in Italian.')}"
             )
         elif mode == "C":
-            npc = get_random_context_for_item(item_id) or "Il gate è cambiato."
+            npc = await db.get_random_context_for_item(item_id) or "Il gate è cambiato."
             prompt = (
                 "👮 Staff:\n"
                 f"{h(npc)}\n\n"
@@ -535,7 +429,7 @@ async def on_review_action(update: Update, context: ContextTypes.DEFAULT_TYPE):
     action = parts[1]
     item_id = int(parts[2])
 
-    item = get_item_by_id(item_id)
+    item = await db.get_item_by_id(item_id)
     if not item:
         await query.edit_message_text("Review error. Try /review.")
         return
@@ -546,14 +440,14 @@ async def on_review_action(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await query.message.reply_text(f"💡 Hint: {h(translation_en or '-')}", parse_mode=ParseMode.HTML)
         return
     if action == "EXAMPLE":
-        ex = get_random_context_for_item(item_id) or ""
+        ex = await db.get_random_context_for_item(item_id) or ""
         if not ex:
             ex = chunk
         await query.message.reply_text(f"📝 Example: {h(ex)}", parse_mode=ParseMode.HTML)
         return
     if action == "PRON":
         try:
-            await _send_tts(query.message, chunk or term or "")
+            await send_tts(query.message, chunk or term or "")
         except Exception as e:
             await query.message.reply_text(
                 f"Pronunciation unavailable ({type(e).__name__}).",
@@ -564,22 +458,19 @@ async def on_review_action(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
         return
     if action == "OPTIONS" and is_phrase:
-        session = get_session(user.id)
+        session = await db.get_session(user.id)
         meta = session[3] if session else {}
         opts = [chunk] if chunk else []
-        opts += get_random_terms_from_pack(pack_id, item_id, limit=2)
+        opts += await db.get_random_terms_from_pack(pack_id, item_id, limit=2)
         opts = [o for o in opts if o]
         while len(opts) < 3:
             opts.append("Mi scusi, può aiutarmi?")
         opts = opts[:3]
         correct = 0
-        set_session(user.id, mode="review", item_id=item_id, stage="await_choice", meta={
+        await db.set_session(user.id, mode="review", item_id=item_id, stage="await_choice", meta={
+            **(meta or {}),
             "options": opts,
             "correct": correct,
-            "due_total": (meta or {}).get("due_total"),
-            "due_index": (meta or {}).get("due_index"),
-            "mode": (meta or {}).get("mode"),
-            "pack_id": (meta or {}).get("pack_id"),
         })
         kb = InlineKeyboardMarkup([
             [InlineKeyboardButton(f"A) {opts[0]}", callback_data=f"REVIEW|CHOICE|{item_id}|0")],
@@ -589,9 +480,8 @@ async def on_review_action(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await query.message.reply_text("Choose the best phrase:", reply_markup=kb)
         return
     if action == "SKIP":
-        apply_grade(user.id, item_id, "again")
-        record_practice(user.id, "review", False)
-        clear_session(user.id)
+        await db.grade_item(user.id, item_id, "again")
+        await db.clear_session(user.id)
         await query.message.reply_text("⏭ Skipped. Type /review to continue.")
 
     if action == "CHOICE":
@@ -607,7 +497,7 @@ async def on_review_choice(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     item_id = int(parts[2])
     picked = int(parts[3])
-    session = get_session(query.from_user.id)
+    session = await db.get_session(query.from_user.id)
     if not session:
         return
     mode, session_item_id, stage, meta = session
@@ -621,8 +511,8 @@ async def on_review_choice(update: Update, context: ContextTypes.DEFAULT_TYPE):
         right = options[correct] if correct < len(options) else ""
         await query.message.reply_text(f"❌ Correct: {h(right)}", parse_mode=ParseMode.HTML)
     # move to grade
-    set_session(query.from_user.id, mode="review", item_id=item_id, stage="await_grade", meta=meta)
-    item = get_item_by_id(item_id)
+    await db.set_session(query.from_user.id, mode="review", item_id=item_id, stage="await_grade", meta=meta)
+    item = await db.get_item_by_id(item_id)
     focus = item[6] if item and len(item) > 6 else None
     is_phrase = (focus == "phrase")
     await query.message.reply_text(review_grade_prompt(), reply_markup=grade_keyboard(item_id, is_phrase))
@@ -640,6 +530,6 @@ async def on_review_flow(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if action == "NOW":
         # End current session so review can proceed
         user = query.from_user
-        clear_session(user.id)
+        await db.clear_session(user.id)
         await query.edit_message_text("🔁 Starting review…")
         await review(update, context)
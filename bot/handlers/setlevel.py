@@ -1,7 +1,7 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from bot.utils.telegram import get_chat_sender
-from bot.db import get_user_level, set_user_level
+from bot import db_async as db
 
 LEVELS = ["A1", "A2", "B1", "B2", "C1"]
 
@@ -20,7 +20,7 @@ def _kb(current: str):
 
 async def setlevel(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
-    current = get_user_level(user.id)
+    current = await db.get_user_level(user.id)
     msg = get_chat_sender(update)
     await msg.reply_text(
         f"🎚 Choose your level (current: {current})",
@@ -37,5 +37,5 @@ async def on_setlevel_button(update: Update, context: ContextTypes.DEFAULT_TYPE)
         await query.edit_message_text("Invalid level.")
         return
 
-    set_user_level(user.id, lv)
+    await db.set_user_level(user.id, lv)
     await query.edit_message_text(f"✅ Level saved: {lv}")
@@ -3,21 +3,10 @@ from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from bot.utils.telegram import get_chat_sender
 from bot.scenarios import list_scenarios_by_pack_key
-from bot.db import count_completed_scenarios
+from bot import db_async as db
 from html import escape
 
 
-from bot.db import (
-    get_user_profile,
-    set_user_target_language,
-    set_user_ui_language,
-    set_user_helper_language,
-    list_packs,
-    get_user_level,
-    set_user_level,
-    get_pack_info,
-    get_pack_item_counts,
-)
 from bot.handlers.learn import start_pack_learn
 from bot.handlers.review import review_pack
 
@@ -229,13 +218,13 @@ def build_module_text(module_key: str, user_level: str) -> str:
     return "📦 <b>Packs</b>"
 
 
-def build_pack_detail_text(pack_info, active: bool, user_level: str, user_id: int | None = None) -> str:
+async def build_pack_detail_text(pack_info, active: bool, user_level: str, user_id: int | None = None) -> str:
     if not pack_info:
         return "Pack not found."
     pack_id, level, title, description, pack_type, chunk_size, missions_enabled, _ = pack_info
     total, introduced = (0, 0)
     if user_id is not None:
-        total, introduced = get_pack_item_counts(user_id, pack_id)
+        total, introduced = await db.get_pack_item_counts(user_id, pack_id)
     # scenario progress (if any)
     pack_key = "generic"
     pid = (pack_id or "").lower()
@@ -255,7 +244,7 @@ def build_pack_detail_text(pack_info, active: bool, user_level: str, user_id: in
     scenario_line = ""
     if scenarios and user_id is not None:
         ids = [s.get("scenario_id") for s in scenarios if s.get("scenario_id")]
-        done = count_completed_scenarios(user_id, ids)
+        done = await db.count_completed_scenarios(user_id, ids)
         scenario_line = f"\nScenes: {done}/{len(ids)}"
     elif scenarios:
         scenario_line = f"\nScenes: {len(scenarios)}"
@@ -281,8 +270,8 @@ def build_pack_detail_keyboard(pack_id: str, module_key: str, active: bool, resu
     ])
 
 
-def build_module_keyboard(user_id: int, target: str, user_level: str, module_key: str):
-    packs = list_packs(target)
+async def build_module_keyboard(user_id: int, target: str, user_level: str, module_key: str):
+    packs = await db.list_packs(target)
     pack_map = {pid: (lvl, title, desc) for pid, lvl, title, desc in packs}
 
     rows = []
@@ -360,7 +349,7 @@ def build_module_keyboard(user_id: int, target: str, user_level: str, module_key
 async def settings(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
 
-    profile = get_user_profile(user.id)
+    profile = await db.get_user_profile(user.id)
     if not profile:
         msg = get_chat_sender(update)
         await msg.reply_text("Use /start first.")
@@ -369,7 +358,7 @@ async def settings(update: Update, context: ContextTypes.DEFAULT_TYPE):
     target, ui, helper = profile
 
     msg = get_chat_sender(update)
-    level = get_user_level(user.id)
+    level = await db.get_user_level(user.id)
     await msg.reply_text(
         build_settings_text(target, ui, helper, level),
         reply_markup=build_settings_keyboard(target, ui, helper),
@@ -381,13 +370,13 @@ async def open_packs(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     if not user:
         return
-    profile = get_user_profile(user.id)
+    profile = await db.get_user_profile(user.id)
     if not profile:
         msg = get_chat_sender(update)
         await msg.reply_text("Use /start first.")
         return
     target, ui, helper = profile
-    level = get_user_level(user.id)
+    level = await db.get_user_level(user.id)
 
     msg = get_chat_sender(update)
     await msg.reply_text(
@@ -403,7 +392,7 @@ async def on_settings_button(update: Update, context: ContextTypes.DEFAULT_TYPE)
     user = query.from_user
     data = query.data
 
-    profile = get_user_profile(user.id)
+    profile = await db.get_user_profile(user.id)
     if not profile:
         await query.edit_message_text("Use /start first.")
         return
@@ -414,7 +403,7 @@ async def on_settings_button(update: Update, context: ContextTypes.DEFAULT_TYPE)
     if data == "SETTINGS|PACKS":
         await query.edit_message_text(
             build_packs_text(target),
-            reply_markup=build_packs_keyboard(get_user_level(user.id)),
+            reply_markup=build_packs_keyboard(await db.get_user_level(user.id)),
             parse_mode="HTML",
         )
         return
@@ -425,8 +414,8 @@ async def on_settings_button(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
     if data == "SETTINGS|BACK":
         # reload profile in case changed
-        target, ui, helper = get_user_profile(user.id)
-        level = get_user_level(user.id)
+        target, ui, helper = await db.get_user_profile(user.id)
+        level = await db.get_user_level(user.id)
         await query.edit_message_text(
             build_settings_text(target, ui, helper, level),
             reply_markup=build_settings_keyboard(target, ui, helper),
@@ -436,7 +425,7 @@ async def on_settings_button(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
     
     if data == "SETTINGS|LEVEL":
-        current = get_user_level(user.id)
+        current = await db.get_user_level(user.id)
         await query.edit_message_text(
             f"🎯 <b>Choose your level</b>\nCurrent: <b>{current}</b>",
             reply_markup=build_level_keyboard(current),
@@ -446,7 +435,7 @@ async def on_settings_button(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
     if data.startswith("PACKCAT|"):
         _, category = data.split("|", 1)
-        packs = list_packs(target)
+        packs = await db.list_packs(target)
         pack_ids = {pid for pid, _, _, _ in packs}
         await query.edit_message_text(
             build_category_text(category),
@@ -457,7 +446,7 @@ async def on_settings_button(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
     if data.startswith("PACKMOD|"):
         _, module_key = data.split("|", 1)
-        level = get_user_level(user.id)
+        level = await db.get_user_level(user.id)
         if module_key in ("airport_dark", "hotel_dark"):
             await query.edit_message_text(
                 build_module_text(module_key, level),
@@ -470,19 +459,19 @@ async def on_settings_button(update: Update, context: ContextTypes.DEFAULT_TYPE)
             return
         await query.edit_message_text(
             build_module_text(module_key, level),
-            reply_markup=build_module_keyboard(user.id, target, level, module_key),
+            reply_markup=await build_module_keyboard(user.id, target, level, module_key),
             parse_mode="HTML",
         )
         return
 
     if data.startswith("PACKOPEN|"):
         _, pack_id, module_key = data.split("|", 2)
-        pack_info = get_pack_info(pack_id)
-        level = get_user_level(user.id)
-        total, introduced = get_pack_item_counts(user.id, pack_id)
+        pack_info = await db.get_pack_info(pack_id)
+        level = await db.get_user_level(user.id)
+        total, introduced = await db.get_pack_item_counts(user.id, pack_id)
         resume_label = "▶️ Resume" if introduced > 0 and introduced < total else "▶️ Start"
         await query.edit_message_text(
-            build_pack_detail_text(pack_info, False, level, user.id),
+            await build_pack_detail_text(pack_info, False, level, user.id),
             parse_mode="HTML",
             reply_markup=build_pack_detail_keyboard(pack_id, module_key, False, resume_label),
         )
@@ -504,10 +493,10 @@ async def on_settings_button(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
     if data.startswith("PACKDARK|"):
         _, module_key = data.split("|", 1)
-        level = get_user_level(user.id)
+        level = await db.get_user_level(user.id)
         await query.edit_message_text(
             build_module_text(module_key, level),
-            reply_markup=build_module_keyboard(user.id, target, level, module_key),
+            reply_markup=await build_module_keyboard(user.id, target, level, module_key),
             parse_mode="HTML",
         )
         return
@@ -524,11 +513,11 @@ async def on_settings_button(update: Update, context: ContextTypes.DEFAULT_TYPE)
     
     if data.startswith("SETLEVEL|"):
         _, level_code = data.split("|", 1)
-        set_user_level(user.id, level_code)
+        await db.set_user_level(user.id, level_code)
 
         # go back to settings screen
-        target, ui, helper = get_user_profile(user.id)
-        level = get_user_level(user.id)
+        target, ui, helper = await db.get_user_profile(user.id)
+        level = await db.get_user_level(user.id)
 
         await query.edit_message_text(
             build_settings_text(target, ui, helper, level),
@@ -545,14 +534,14 @@ async def on_settings_button(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
     if action == "SET_TARGET":
         code = parts[1]
-        set_user_target_language(user.id, code)
+        await db.set_user_target_language(user.id, code)
     elif action == "SET_UI":
         code = parts[1]
-        set_user_ui_language(user.id, code)
+        await db.set_user_ui_language(user.id, code)
     elif action == "SET_HELPER":
         code = parts[1]
         helper_code = None if code == "none" else code
-        set_user_helper_language(user.id, helper_code)
+        await db.set_user_helper_language(user.id, helper_code)
     elif action == "PKTOG":
         module_key = parts[2] if len(parts) > 2 else "tools"
         await query.edit_message_text(
@@ -563,8 +552,8 @@ async def on_settings_button(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return
 
     # refresh settings view
-    target, ui, helper = get_user_profile(user.id)
-    level = get_user_level(user.id)
+    target, ui, helper = await db.get_user_profile(user.id)
+    level = await db.get_user_level(user.id)
 
     await query.edit_message_text(
         build_settings_text(target, ui, helper, level),
@@ -4,7 +4,7 @@ from telegram.ext import ContextTypes
 
 import random
 
-from bot.db import get_connection, get_user_persona, set_user_persona, set_session, clear_session, get_session
+from bot import db_async as db
 from bot.ui import home_keyboard
 from bot.ui import home_keyboard
 from bot.utils.telegram import get_chat_sender
@@ -16,7 +16,7 @@ def utc_now_iso():
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
 
-    session = get_session(user.id)
+    session = await db.get_session(user.id)
     msg = get_chat_sender(update)
     if session:
         mode, item_id, stage, meta = session
@@ -30,18 +30,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
 
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        """
-        INSERT OR IGNORE INTO users (user_id, first_name, created_at, target_language, ui_language, helper_language)
-        VALUES (?, ?, ?, ?, ?, ?)
-        """,
-        (user.id, user.first_name, utc_now_iso(), "it", "en", None)
-
-    )
-    conn.commit()
-    conn.close()
+    await db.ensure_user(user.id, user.first_name)
 
     await msg.reply_text(
         "🏠 <b>Home</b>\nChoose where to go next:",
@@ -49,10 +38,10 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         parse_mode="HTML",
     )
 
-    persona = get_user_persona(user.id)
+    persona = await db.get_user_persona(user.id)
     if not persona or not any(persona):
-        clear_session(user.id)
-        set_session(user.id, mode="onboarding", item_id=None, stage="ask_job", meta={})
+        await db.clear_session(user.id)
+        await db.set_session(user.id, mode="onboarding", item_id=None, stage="ask_job", meta={})
         await msg.reply_text(
             "🎭 <b>Alter‑Ego setup</b>\n"
             "What is your dream job? (1–3 words)",
@@ -65,7 +54,7 @@ def _pick_italian_name() -> str:
     return random.choice(names)
 
 
-async def on_onboarding_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def on_onboarding_text(update: Update, context: ContextTypes.DEFAULT_TYPE, session=None):
     user = update.effective_user
     msg = get_chat_sender(update)
     text = (update.message.text or "").strip()
@@ -73,7 +62,8 @@ async def on_onboarding_text(update: Update, context: ContextTypes.DEFAULT_TYPE)
         await msg.reply_text("Please type a short answer.")
         return
 
-    session = get_session(user.id)
+    if session is None:
+        session = await db.get_session(user.id)
     if not session:
         return
 
@@ -84,7 +74,7 @@ async def on_onboarding_text(update: Update, context: ContextTypes.DEFAULT_TYPE)
     if stage == "ask_job":
         meta = meta or {}
         meta["job"] = text
-        set_session(user.id, mode="onboarding", item_id=None, stage="ask_city", meta=meta)
+        await db.set_session(user.id, mode="onboarding", item_id=None, stage="ask_city", meta=meta)
         await msg.reply_text("Nice. Which city do you live in? (in Italy)")
         return
 
@@ -92,8 +82,8 @@ async def on_onboarding_text(update: Update, context: ContextTypes.DEFAULT_TYPE)
         job = (meta or {}).get("job") or "student"
         city = text
         name = _pick_italian_name()
-        set_user_persona(user.id, name, city, job)
-        clear_session(user.id)
+        await db.set_user_persona(user.id, name, city, job)
+        await db.clear_session(user.id)
         await msg.reply_text(
             f"✅ Done.\n"
             f"From now on, you are <b>{name}</b>, a <b>{job}</b> in <b>{city}</b>.\n"
@@ -108,11 +98,11 @@ async def on_start_choice(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = query.from_user
     msg = get_chat_sender(update)
 
-    session = get_session(user.id)
+    session = await db.get_session(user.id)
     action = (query.data or "").split("|", 1)[1] if "|" in (query.data or "") else ""
 
     if action == "END":
-        clear_session(user.id)
+        await db.clear_session(user.id)
         await query.edit_message_text("Session ended. Back to home.")
         await msg.reply_text("🏠 <b>Home</b>\nChoose where to go next:", reply_markup=home_keyboard(), parse_mode="HTML")
         return
@@ -1,7 +1,7 @@
 from datetime import datetime
 from telegram import Update
 from telegram.ext import ContextTypes
-from bot.db import get_connection,get_due_count, get_status_counts, get_user_level, get_user_persona, get_practice_stats, get_user_journey_progress, get_pack_info, get_story_progress
+from bot import db_async as db
 from bot.storyline import STORY_ARCS
 
 
@@ -14,17 +14,13 @@ def format_pretty_date(iso_str: str) -> str:
 async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
 
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT first_name, created_at FROM users WHERE user_id = ?", (user.id,))
-    row = cursor.fetchone()
-    due_today = get_due_count(user.id)
-    counts = get_status_counts(user.id)
+    row = await db.get_user_signup(user.id)
+    due_today = await db.get_due_count(user.id)
+    counts = await db.get_status_counts(user.id)
 
     new_count = counts["new"]
     learning_count = counts["learning"]
     mature_count = counts["mature"]
-    conn.close()
 
     if row is None:
         await update.effective_message.reply_text("No profile found. Use /start first.")
@@ -33,15 +29,15 @@ async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
     first_name, created_at_iso = row
     pretty = format_pretty_date(created_at_iso)
 
-    level = get_user_level(user.id)
-    persona = get_user_persona(user.id) or (None, None, None)
+    level = await db.get_user_level(user.id)
+    persona = await db.get_user_persona(user.id) or (None, None, None)
     p_name, p_city, p_role = persona
-    practice = get_practice_stats(user.id)
-    journey_row = get_user_journey_progress(user.id)
+    practice = await db.get_practice_stats(user.id)
+    journey_row = await db.get_user_journey_progress(user.id)
     journey_pack = journey_row[0] if journey_row else None
     journey_title = None
     if journey_pack:
-        info = get_pack_info(journey_pack)
+        info = await db.get_pack_info(journey_pack)
         journey_title = info[2] if info and len(info) > 2 else journey_pack
 
     persona_line = "🎭 Alter-Ego: not set"
@@ -53,7 +49,7 @@ async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if journey_title:
         journey_line = f"🧭 Journey: {journey_title}"
 
-    arc_idx, beat_idx = get_story_progress(user.id)
+    arc_idx, beat_idx = await db.get_story_progress(user.id)
     story_line = None
     if (arc_idx > 0 or beat_idx > 0) and 0 <= arc_idx < len(STORY_ARCS):
         arc = STORY_ARCS[arc_idx]
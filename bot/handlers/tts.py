@@ -1,9 +1,10 @@
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputFile
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from telegram.error import BadRequest
 
-from bot.services.tts_edge import tts_it
+from bot.services.tts_bank import TTS_CHECK_TEXT
 from bot.utils.telegram import get_chat_sender
+from bot.utils.tts import send_tts
 
 
 async def _safe_answer(query):
@@ -17,13 +18,7 @@ async def ttscheck_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     msg = get_chat_sender(update)
     await msg.reply_text("Running TTS health check…")
     try:
-        audio_path = await tts_it("Ciao! Questo è un test.")
-        suffix = audio_path.suffix.lower()
-        with open(audio_path, "rb") as f:
-            if suffix == ".ogg":
-                await msg.reply_voice(voice=InputFile(f, filename="tts_test.ogg"))
-            else:
-                await msg.reply_audio(audio=InputFile(f, filename=f"tts_test{suffix}"), title="TTS Test")
+        await send_tts(msg, TTS_CHECK_TEXT, title="TTS Test", filename="tts_test")
         await msg.reply_text("✅ TTS OK.")
     except Exception as e:
         await msg.reply_text(
@@ -41,13 +36,7 @@ async def on_tts_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if action != "CHECK":
         return
     try:
-        audio_path = await tts_it("Ciao! Questo è un test.")
-        suffix = audio_path.suffix.lower()
-        with open(audio_path, "rb") as f:
-            if suffix == ".ogg":
-                await query.message.reply_voice(voice=InputFile(f, filename="tts_test.ogg"))
-            else:
-                await query.message.reply_audio(audio=InputFile(f, filename=f"tts_test{suffix}"), title="TTS Test")
+        await send_tts(query.message, TTS_CHECK_TEXT, title="TTS Test", filename="tts_test")
         await query.message.reply_text("✅ TTS OK.")
     except Exception as e:
         await query.message.reply_text(
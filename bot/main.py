@@ -1,9 +1,14 @@
+import asyncio
+import os
+
 from telegram import BotCommand
 from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler, filters
 import logging
 
 from bot.config import BOT_TOKEN
-from bot.db import init_db, import_packs_from_folder,get_session
+from bot.db import init_db, import_packs_from_folder
+from bot import db_async as db
+from bot.services import ai_client, ai_metrics, tts_bank
 from bot.handlers.start import start, on_onboarding_text, on_start_choice
 from bot.handlers.stats import stats
 from bot.handlers.learn import on_guess_button, on_pronounce_button, on_scene_choice, on_scene_action, on_scene_replay, on_ai_choice, on_learn_skip, on_unlock_next
@@ -20,6 +25,7 @@ from bot.handlers.tts import ttscheck_command, on_tts_button
 from bot.handlers.hints import hint_command, why_command
 from dotenv import load_dotenv
 from bot.handlers.setlevel import setlevel, on_setlevel_button
+from bot.utils.telegram import PerUserUpdateProcessor
 
 
 
@@ -30,6 +36,12 @@ load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+STALE_REVIEW_SWEEP_SECONDS = int(os.getenv("STALE_REVIEW_SWEEP_SECONDS", "3600"))
+SESSION_FLUSH_SECONDS = float(os.getenv("SESSION_FLUSH_SECONDS", "1.0"))
+AI_CACHE_COMPACT_SECONDS = float(os.getenv("AI_CACHE_COMPACT_SECONDS", "3600"))
+AI_METRICS_PUBLISH_SECONDS = float(os.getenv("AI_METRICS_PUBLISH_SECONDS", "30"))
+UPDATE_CONCURRENCY = int(os.getenv("UPDATE_CONCURRENCY", "256"))
+
 async def on_error(update, context):
     logger.exception("Unhandled exception:", exc_info=context.error)
 
@@ -39,22 +51,23 @@ async def on_text_router(update, context):
     if not user:
         return
 
-    session = get_session(user.id)
+    session = await db.get_session(user.id)
     if not session:
         return
 
     mode, item_id, stage, meta = session  # meta added
 
+    # hand the loaded session on so the mode handler doesn't read it again
     if mode == "learn":
-        await on_learn_text(update, context)
+        await on_learn_text(update, context, session=session)
     elif mode == "review":
-        await on_review_text(update, context)
+        await on_review_text(update, context, session=session)
     elif mode == "onboarding":
-        await on_onboarding_text(update, context)
+        await on_onboarding_text(update, context, session=session)
     elif mode == "persona":
-        await on_persona_text(update, context)
+        await on_persona_text(update, context, session=session)
     elif mode == "addword":
-        await on_addword_text(update, context)
+        await on_addword_text(update, context, session=session)
 
 async def post_init(application):
     commands = [
@@ -74,6 +87,79 @@ async def post_init(application):
         BotCommand("reloadpacks", "Reload packs from /data/packs (dev)"),
     ]
     await application.bot.set_my_commands(commands)
+    application.bot_data["review_sweeper"] = asyncio.create_task(_review_sweeper())
+    await db.enable_session_write_behind()
+    application.bot_data["session_flusher"] = asyncio.create_task(_session_flusher())
+    application.bot_data["ai_cache_compactor"] = asyncio.create_task(_ai_cache_compactor())
+    application.bot_data["ai_metrics_publisher"] = asyncio.create_task(_ai_metrics_publisher())
+    imported = application.bot_data.pop("imported_packs", None)
+    if tts_bank.TTS_PRERENDER_ON_IMPORT and imported:
+        application.bot_data["tts_prerender"] = asyncio.create_task(tts_bank.prerender_packs(imported))
+
+
+async def _review_sweeper():
+    """Periodic safety net for review rows the event-driven cleanup missed."""
+    while True:
+        try:
+            removed = await db.sweep_stale_reviews()
+            if removed:
+                logger.info("Swept %s stale review rows", removed)
+        except Exception:
+            logger.exception("Stale review sweep failed")
+        await asyncio.sleep(STALE_REVIEW_SWEEP_SECONDS)
+
+
+async def _session_flusher():
+    """Write cached session changes to SQLite in coalesced batches."""
+    while True:
+        await asyncio.sleep(SESSION_FLUSH_SECONDS)
+        try:
+            await db.flush_sessions()
+        except Exception:
+            logger.exception("Session flush failed")
+
+
+async def _ai_cache_compactor():
+    """Expire and trim the AI cache table, and persist L1 last-use times."""
+    while True:
+        await asyncio.sleep(AI_CACHE_COMPACT_SECONDS)
+        try:
+            expired, evicted = await db.compact_ai_cache()
+            if expired or evicted:
+                logger.info("AI cache compaction: %s expired, %s evicted", expired, evicted)
+        except Exception:
+            logger.exception("AI cache compaction failed")
+
+
+async def _publish_ai_metrics():
+    snapshot = ai_metrics.snapshot()
+    snapshot["ai_cache"] = await db.ai_cache_stats()
+    snapshot["pool"] = ai_client.pool_status()
+    snapshot["tokens"] = ai_client.usage_stats()
+    await db.save_ai_metrics("bot", snapshot)
+
+
+async def _ai_metrics_publisher():
+    """Publish AI telemetry to the ai_metrics table for the webapp's /api/metrics."""
+    while True:
+        await asyncio.sleep(AI_METRICS_PUBLISH_SECONDS)
+        try:
+            await _publish_ai_metrics()
+        except Exception:
+            logger.exception("AI metrics publish failed")
+
+
+async def post_shutdown(application):
+    for name in ("review_sweeper", "session_flusher", "ai_cache_compactor", "ai_metrics_publisher", "tts_prerender"):
+        task = application.bot_data.pop(name, None)
+        if task:
+            task.cancel()
+    try:
+        await _publish_ai_metrics()
+    except Exception:
+        logger.exception("AI metrics publish failed")
+    await db.flush_sessions()
+    await db.shutdown()
 
 
 
@@ -84,9 +170,21 @@ def main():
 
 
     init_db()
-    import_packs_from_folder()
-
-    app = Application.builder().token(BOT_TOKEN).post_init(post_init).build()
+    imported, _, _ = import_packs_from_folder()
+
+    # DB access is offloaded to the db_async thread, so updates from different
+    # users can be processed concurrently instead of queueing behind each other.
+    # One user's updates still run in order; a new message first drops the
+    # user's pending AI request (it would otherwise hold up the queue).
+    app = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        .concurrent_updates(PerUserUpdateProcessor(UPDATE_CONCURRENCY, on_new_message=ai_client.cancel_user))
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
+    app.bot_data["imported_packs"] = imported   # post_init pre-renders their audio
 
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CommandHandler("stats", stats))
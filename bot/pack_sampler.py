@@ -0,0 +1,87 @@
+"""
+In-memory random sampling over pack contents.
+
+Distractors, random scenes and "any card from this pack" picks used to run
+`ORDER BY RANDOM() LIMIT k`, which sorts every candidate row on each call.
+Instead each pack is loaded once into flat arrays and k distinct rows are
+drawn by index in O(k), no matter how big the pack grows.
+
+bot.db owns the loader and the invalidation calls (pack import, My Words
+edits); this module only holds the arrays and the sampling math.
+
+A pack sample is a dict:
+    items:          [(item_id, term, chunk, translation_en, note, pack_id, focus)]
+    items_by_level: {level or "": [rows from items]}
+    terms:          [(item_id, term)]             blanks dropped
+    meanings:       [(item_id, translation_en)]   blanks dropped
+    scenes:         [(pack_id, scene_id, unlock_rule_json, roleplay_json)]
+"""
+from __future__ import annotations
+
+import bisect
+import random
+import threading
+from typing import Callable, Sequence
+
+_lock = threading.Lock()
+_packs: dict[str, dict] = {}
+_generation = 0
+
+
+def sample_across(pools: Sequence[Sequence[tuple]], k: int, exclude_item_id: int | None = None) -> list[tuple]:
+    """
+    Draw up to k distinct rows from the concatenation of `pools` without
+    copying them. Row[0] is the item_id checked against `exclude_item_id`.
+    Cost is O(k log P) for P pools, independent of pool sizes.
+    """
+    pools = [p for p in pools if p]
+    if k <= 0 or not pools:
+        return []
+    offsets = []
+    total = 0
+    for pool in pools:
+        offsets.append(total)
+        total += len(pool)
+
+    # one spare draw covers the (at most one) excluded row
+    want = min(total, k + (1 if exclude_item_id is not None else 0))
+    out = []
+    for idx in random.sample(range(total), want):
+        p = bisect.bisect_right(offsets, idx) - 1
+        row = pools[p][idx - offsets[p]]
+        if exclude_item_id is not None and row[0] == exclude_item_id:
+            continue
+        out.append(row)
+        if len(out) == k:
+            break
+    return out
+
+
+def sample_distinct(pool: Sequence[tuple], k: int, exclude_item_id: int | None = None) -> list[tuple]:
+    return sample_across([pool], k, exclude_item_id)
+
+
+def get_pack_sample(pack_id: str, loader: Callable[[str], dict]) -> dict:
+    """Cached sample for a pack, built with `loader(pack_id)` on first use."""
+    with _lock:
+        cached = _packs.get(pack_id)
+        generation = _generation
+    if cached is not None:
+        return cached
+    # load outside the lock; drop the result if an invalidation raced with us
+    sample = loader(pack_id)
+    with _lock:
+        if generation == _generation:
+            _packs[pack_id] = sample
+    return sample
+
+
+def invalidate(pack_id: str | None = None):
+    """Forget one pack, or every pack when pack_id is None."""
+    global _generation
+    with _lock:
+        _generation += 1
+        if pack_id is None:
+            _packs.clear()
+        else:
+            _packs.pop(pack_id, None)
@@ -0,0 +1,523 @@
+# bot/services/ai_client.py
+"""
+Non-blocking Gemini calls for bot.services.ai_feedback.
+
+generate_content() awaits the SDK's async client (client.aio) when it exists
+and otherwise runs the blocking call on a bounded thread pool, so a slow model
+never stalls the PTB event loop. Every call has a timeout, and at most
+AI_MAX_CONCURRENCY calls are in flight; the rest wait their turn while the
+bot keeps serving other updates.
+
+Keys and models are routed through a small pool: every (api_key, model)
+pair has a token bucket (AI_KEY_RPM requests per minute) and a cooldown
+learned from quota/rate errors. routes() hands out pairs best-first, so a
+request skips keys we already know are exhausted instead of waiting on
+another 429.
+
+generate_content_stream() is the streaming variant: it yields text chunks as
+the model writes them, under the same semaphore, pool accounting and timeout
+(applied to each chunk, so a stalled stream fails fast).
+
+single_flight() collapses identical requests: while one call for a cache key
+is in flight, other callers with the same key await that call instead of
+sending their own. single_flight_stream() does the same for streamed calls:
+every caller sees the shared stream's partial snapshots and its final result,
+and a plain single_flight() caller for the key just gets the final result.
+
+run_latest() ties a call to the user who is waiting for it: starting a new
+one for the same user, or cancel_user() (the user sent something else),
+cancels the old one and its handler gets None back.
+
+Calls may pass a fixed system instruction (bot.services.prompts). With
+AI_SYSTEM_CACHE on (off by default), an instruction of at least
+AI_SYSTEM_CACHE_MIN_TOKENS is stored once per key and model as a Gemini
+context cache and later calls reference it instead of resending it. Smaller
+instructions (the built-in ones are a few hundred tokens, below the API's
+minimum) and models or instructions the cache API rejects are sent inline as
+system_instruction. Creating a cache spends a token of the key's budget like
+any other call, and a 429 on it cools the key down. Token counts from each response's
+usage metadata are logged and summed per call kind (usage_stats()).
+Latency and outcome of every call go to bot.services.ai_metrics.
+"""
+from __future__ import annotations
+
+import asyncio
+import copy
+import functools
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator, TypeVar
+
+import google.genai as genai  # type: ignore
+
+from bot.services import ai_metrics
+from bot.services.prompts import estimate_tokens
+
+AI_TIMEOUT_SECONDS = float(os.getenv("AI_TIMEOUT_SECONDS", "30"))
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "8"))
+AI_KEY_RPM = float(os.getenv("AI_KEY_RPM", "15"))                 # per key and model
+AI_COOLDOWN_SECONDS = float(os.getenv("AI_COOLDOWN_SECONDS", "30"))
+AI_COOLDOWN_MAX_SECONDS = float(os.getenv("AI_COOLDOWN_MAX_SECONDS", "900"))
+AI_SYSTEM_CACHE = os.getenv("AI_SYSTEM_CACHE", "0").strip().lower() not in ("0", "false", "no", "off")
+AI_SYSTEM_CACHE_MIN_TOKENS = int(os.getenv("AI_SYSTEM_CACHE_MIN_TOKENS", "1024"))   # Gemini's floor for a context cache
+AI_SYSTEM_CACHE_TTL_SECONDS = int(os.getenv("AI_SYSTEM_CACHE_TTL_SECONDS", "3600"))
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_clients: dict[str, Any] = {}
+_clients_lock = threading.Lock()
+_semaphore = asyncio.Semaphore(AI_MAX_CONCURRENCY)
+_executor = ThreadPoolExecutor(max_workers=AI_MAX_CONCURRENCY, thread_name_prefix="lingodojo-ai")
+_inflight: dict[int, asyncio.Task] = {}
+_flights: dict[str, asyncio.Task] = {}        # cache key -> shared upstream call
+_flight_streams: dict[str, dict] = {}         # cache key -> {"partial", "version", "changed"} of a streamed flight
+
+# (api_key, model) -> {"tokens", "refilled_at", "cooldown_until", "strikes"}
+_pool: dict[tuple[str, str], dict] = {}
+_pool_lock = threading.Lock()
+
+# (api_key, model, sha of the instruction) -> (cache name, expires monotonic); None = not cacheable
+_system_caches: dict[tuple[str, str, str], tuple[str, float] | None] = {}
+_uncacheable: set[tuple[str, str]] = set()    # (model, sha) the cache API rejected
+
+# kind -> summed usage metadata
+_usage: dict[str, dict] = {}
+_usage_lock = threading.Lock()
+
+_RETRY_AFTER = re.compile(r"retry(?:[ _-]?delay|[ _-]?after| in)?\W{0,4}(\d+(?:\.\d+)?)\s*s", re.IGNORECASE)
+
+
+def get_client(api_key: str):
+    """One genai.Client per API key, reused across calls (keeps its HTTP pool warm)."""
+    with _clients_lock:
+        client = _clients.get(api_key)
+        if client is None:
+            client = _clients[api_key] = genai.Client(api_key=api_key)
+        return client
+
+
+def is_quota_or_rate_error(err: Exception) -> bool:
+    msg = str(err).lower()
+    return any(
+        token in msg
+        for token in [
+            "quota",
+            "rate",
+            "limit",
+            "exceeded",
+            "resource_exhausted",
+            "429",
+        ]
+    )
+
+
+def _slot(api_key: str, model: str, now: float) -> dict:
+    # caller holds _pool_lock; refills the bucket up to one minute of budget
+    slot = _pool.get((api_key, model))
+    if slot is None:
+        slot = _pool[(api_key, model)] = {
+            "tokens": AI_KEY_RPM,
+            "refilled_at": now,
+            "cooldown_until": 0.0,
+            "strikes": 0,
+        }
+    else:
+        elapsed = now - slot["refilled_at"]
+        slot["tokens"] = min(AI_KEY_RPM, slot["tokens"] + elapsed * AI_KEY_RPM / 60.0)
+        slot["refilled_at"] = now
+    return slot
+
+
+def _pick(api_keys: list[str], models: list[str], tried: set) -> tuple[str, str] | None:
+    """
+    Best untried pair that is not cooling down and has a token left, and take the
+    token. Models keep their priority order; within a model the key with the most
+    headroom wins.
+    """
+    now = time.monotonic()
+    with _pool_lock:
+        for model in models:
+            best = None
+            for api_key in api_keys:
+                if (api_key, model) in tried:
+                    continue
+                slot = _slot(api_key, model, now)
+                if slot["cooldown_until"] > now or slot["tokens"] < 1:
+                    continue
+                if best is None or slot["tokens"] > best[1]["tokens"]:
+                    best = (api_key, slot)
+            if best is not None:
+                best[1]["tokens"] -= 1
+                return best[0], model
+    return None
+
+
+def routes(api_keys: list[str], models: list[str]) -> Iterator[tuple[str, str]]:
+    """
+    (api_key, model) pairs to try for one request, best first, each at most once.
+    Re-ranked before every attempt, so a 429 on the previous try already counts.
+    Stops early when every remaining pair is cooling down or out of budget.
+    """
+    tried: set[tuple[str, str]] = set()
+    while True:
+        pair = _pick(api_keys, models, tried)
+        if pair is None:
+            return
+        tried.add(pair)
+        yield pair
+
+
+def _record(api_key: str, model: str, err: Exception | None, started: float | None = None):
+    now = time.monotonic()
+    if started is not None:
+        ai_metrics.observe_call(
+            model, api_key, now - started, error=err, quota=err is not None and is_quota_or_rate_error(err),
+        )
+    with _pool_lock:
+        slot = _slot(api_key, model, now)
+        if err is None:
+            slot["strikes"] = 0
+            return
+        if not is_quota_or_rate_error(err):
+            return
+        slot["strikes"] += 1
+        slot["tokens"] = 0.0
+        m = _RETRY_AFTER.search(str(err))
+        if m:
+            delay = float(m.group(1))
+        else:
+            delay = AI_COOLDOWN_SECONDS * 2 ** (slot["strikes"] - 1)
+        slot["cooldown_until"] = now + min(delay, AI_COOLDOWN_MAX_SECONDS)
+
+
+def pool_status() -> list[dict]:
+    """Snapshot of every (key, model) slot; keys are shortened to their last 4 chars."""
+    now = time.monotonic()
+    with _pool_lock:
+        return [
+            {
+                "key": f"...{api_key[-4:]}",
+                "model": model,
+                "tokens": round(_slot(api_key, model, now)["tokens"], 2),
+                "cooldown_s": round(max(0.0, slot["cooldown_until"] - now), 1),
+                "strikes": slot["strikes"],
+            }
+            for (api_key, model), slot in list(_pool.items())
+        ]
+
+
+def _usage_counts(resp) -> tuple[int, int, int] | None:
+    meta = getattr(resp, "usage_metadata", None)
+    if meta is None:
+        return None
+    return (
+        getattr(meta, "prompt_token_count", None) or 0,
+        getattr(meta, "candidates_token_count", None) or 0,
+        getattr(meta, "cached_content_token_count", None) or 0,
+    )
+
+
+def _note_usage(kind: str | None, model: str, counts: tuple[int, int, int] | None):
+    if counts is None:
+        return
+    prompt_tokens, output_tokens, cached_tokens = counts
+    kind = kind or "other"
+    logger.info(
+        "AI %s on %s: prompt=%d (cached=%d) output=%d tokens",
+        kind, model, prompt_tokens, cached_tokens, output_tokens,
+    )
+    with _usage_lock:
+        u = _usage.setdefault(kind, {
+            "calls": 0, "prompt_tokens": 0, "cached_tokens": 0, "output_tokens": 0, "max_prompt_tokens": 0,
+        })
+        u["calls"] += 1
+        u["prompt_tokens"] += prompt_tokens
+        u["cached_tokens"] += cached_tokens
+        u["output_tokens"] += output_tokens
+        u["max_prompt_tokens"] = max(u["max_prompt_tokens"], prompt_tokens)
+
+
+def usage_stats() -> dict[str, dict]:
+    """Token usage per call kind since start, with per-call averages."""
+    with _usage_lock:
+        out = {kind: dict(u) for kind, u in _usage.items()}
+    for u in out.values():
+        calls = u["calls"] or 1
+        u["avg_prompt_tokens"] = round(u["prompt_tokens"] / calls, 1)
+        u["avg_output_tokens"] = round(u["output_tokens"] / calls, 1)
+    return out
+
+
+async def _call_config(client, api_key: str, model: str, system: str | None) -> dict | None:
+    """
+    generate_content config for a system instruction: a reference to its context
+    cache when one can be used, else the instruction inline. Cache creation
+    failures are remembered so they are tried once per model and instruction.
+    """
+    if not system:
+        return None
+    inline = {"system_instruction": system}
+    caches = getattr(getattr(client, "aio", None), "caches", None)
+    if not AI_SYSTEM_CACHE or caches is None or estimate_tokens(system) < AI_SYSTEM_CACHE_MIN_TOKENS:
+        return inline
+    digest = hashlib.sha256(system.encode("utf-8")).hexdigest()
+    if (model, digest) in _uncacheable:
+        return inline
+    key = (api_key, model, digest)
+    now = time.monotonic()
+    cached = _system_caches.get(key)
+    if cached is not None and cached[1] > now:
+        return {"cached_content": cached[0]}
+    # caches.create is a request too: it needs a token from the pair's budget
+    with _pool_lock:
+        slot = _slot(api_key, model, now)
+        if slot["cooldown_until"] > now or slot["tokens"] < 1:
+            return inline
+        slot["tokens"] -= 1
+    try:
+        created = await asyncio.wait_for(
+            caches.create(
+                model=model,
+                config={"system_instruction": system, "ttl": f"{AI_SYSTEM_CACHE_TTL_SECONDS}s"},
+            ),
+            AI_TIMEOUT_SECONDS,
+        )
+    except Exception as e:
+        if is_quota_or_rate_error(e):
+            _record(api_key, model, e)   # cooldown: no retry until the pair recovers
+        else:
+            _uncacheable.add((model, digest))
+        logger.info("System instruction not cached on %s (%s); sending it inline", model, e)
+        return inline
+    # renew a little before the server drops it
+    _system_caches[key] = (created.name, now + AI_SYSTEM_CACHE_TTL_SECONDS * 0.9)
+    return {"cached_content": created.name}
+
+
+def _drop_system_cache(api_key: str, model: str, system: str | None, config: dict | None):
+    # a call that referenced a context cache failed: the next one recreates it
+    if system and config and "cached_content" in config:
+        digest = hashlib.sha256(system.encode("utf-8")).hexdigest()
+        _system_caches.pop((api_key, model, digest), None)
+
+
+async def generate_content(
+    model: str,
+    prompt: str,
+    *,
+    api_key: str,
+    timeout: float | None = None,
+    system: str | None = None,
+    kind: str | None = None,
+):
+    """
+    One generate_content call without blocking the event loop.
+    Raises asyncio.TimeoutError after `timeout` (default AI_TIMEOUT_SECONDS).
+    The outcome feeds the pool: quota/rate errors put the pair on cooldown.
+    `system` is the fixed instruction for this call kind; `kind` labels the
+    token usage that is logged.
+    """
+    client = get_client(api_key)
+    async with _semaphore:
+        config = await _call_config(client, api_key, model, system)
+        extra = {"config": config} if config else {}
+        aio = getattr(client, "aio", None)
+        if aio is not None:
+            call = aio.models.generate_content(model=model, contents=prompt, **extra)
+        else:
+            loop = asyncio.get_running_loop()
+            call = loop.run_in_executor(
+                _executor,
+                functools.partial(client.models.generate_content, model=model, contents=prompt, **extra),
+            )
+        started = time.monotonic()
+        try:
+            resp = await asyncio.wait_for(call, timeout or AI_TIMEOUT_SECONDS)
+        except Exception as e:
+            _record(api_key, model, e, started)
+            _drop_system_cache(api_key, model, system, config)
+            raise
+    _record(api_key, model, None, started)
+    _note_usage(kind, model, _usage_counts(resp))
+    return resp
+
+
+async def generate_content_stream(
+    model: str,
+    prompt: str,
+    *,
+    api_key: str,
+    timeout: float | None = None,
+    system: str | None = None,
+    kind: str | None = None,
+) -> AsyncIterator[str]:
+    """
+    Yield the response text chunk by chunk. Raises asyncio.TimeoutError when the
+    stream does not start, or stalls between chunks, for `timeout` seconds.
+    """
+    client = get_client(api_key)
+    timeout = timeout or AI_TIMEOUT_SECONDS
+    counts = None
+    config = None
+    async with _semaphore:
+        started = time.monotonic()
+        try:
+            config = await _call_config(client, api_key, model, system)
+            extra = {"config": config} if config else {}
+            aio = getattr(client, "aio", None)
+            if aio is not None:
+                stream = await asyncio.wait_for(
+                    aio.models.generate_content_stream(model=model, contents=prompt, **extra),
+                    timeout,
+                )
+                chunks = stream.__aiter__()
+            else:
+                chunks = _threaded_stream(client, model, prompt, extra)
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), timeout)
+                except StopAsyncIteration:
+                    break
+                counts = _usage_counts(chunk) or counts   # the last chunk carries the totals
+                text = getattr(chunk, "text", None)
+                if text:
+                    yield text
+        except Exception as e:
+            _record(api_key, model, e, started)
+            _drop_system_cache(api_key, model, system, config)
+            raise
+    _record(api_key, model, None, started)
+    _note_usage(kind, model, counts)
+
+
+async def _threaded_stream(client, model: str, prompt: str, extra: dict) -> AsyncIterator[Any]:
+    # blocking SDK stream pumped from the thread pool into the event loop
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    done = object()
+
+    def pump():
+        try:
+            for chunk in client.models.generate_content_stream(model=model, contents=prompt, **extra):
+                loop.call_soon_threadsafe(queue.put_nowait, chunk)
+            loop.call_soon_threadsafe(queue.put_nowait, done)
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+
+    loop.run_in_executor(_executor, pump)
+    while True:
+        item = await queue.get()
+        if item is done:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+
+async def single_flight(key: str, factory: Callable[[], Awaitable[T]]) -> T:
+    """
+    Run factory() at most once per key at a time. Callers that arrive while it
+    is in flight await the same task and get a deep copy of its result (or its
+    exception). The task is shielded, so one caller being cancelled (run_latest)
+    neither cancels it for the others nor loses the result it writes to ai_cache.
+    """
+    task = _flights.get(key)
+    leader = task is None
+    if leader:
+        task = asyncio.ensure_future(factory())
+        _flights[key] = task
+        task.add_done_callback(functools.partial(_flight_done, key))
+    result = await asyncio.shield(task)
+    return result if leader else copy.deepcopy(result)
+
+
+async def single_flight_stream(key: str, factory: Callable[[], AsyncIterator[dict]]) -> AsyncIterator[dict]:
+    """
+    Streaming single_flight. factory() yields partial snapshots ("partial": True)
+    and then one final result; it runs at most once per key at a time, in a
+    shielded task. Every caller gets deep copies of the snapshots (the newest
+    one when it falls behind, never a stale one) and then the final result. A
+    caller arriving while a plain single_flight() for the key is in flight gets
+    only its final result.
+    """
+    task = _flights.get(key)
+    if task is None:
+        state = {"partial": None, "version": 0, "changed": asyncio.Event()}
+
+        async def produce():
+            final = None
+            async for snapshot in factory():
+                if snapshot.get("partial"):
+                    state["partial"] = snapshot
+                    state["version"] += 1
+                    changed, state["changed"] = state["changed"], asyncio.Event()
+                    changed.set()
+                else:
+                    final = snapshot
+            return final
+
+        task = asyncio.ensure_future(produce())
+        _flights[key] = task
+        _flight_streams[key] = state
+        task.add_done_callback(functools.partial(_flight_done, key))
+
+    state = _flight_streams.get(key) if _flights.get(key) is task else None
+    seen = 0
+    while state is not None and not task.done():
+        changed = state["changed"]
+        if state["version"] != seen:
+            seen = state["version"]
+            yield copy.deepcopy(state["partial"])
+            continue
+        await changed.wait()   # set on every new snapshot and when the flight ends
+    yield copy.deepcopy(await asyncio.shield(task))
+
+
+def _flight_done(key: str, task: asyncio.Task):
+    if _flights.get(key) is task:
+        del _flights[key]
+        state = _flight_streams.pop(key, None)
+        if state is not None:
+            state["changed"].set()
+    # every waiter may be gone by now; retrieve the error so it isn't logged as unhandled
+    if not task.cancelled():
+        task.exception()
+
+
+async def run_latest(user_id: int, coro: Awaitable[T]) -> T | None:
+    """
+    Await `coro` as this user's current AI request. Returns None if it was
+    superseded (a newer run_latest for the user, or cancel_user) before finishing.
+    """
+    task = asyncio.ensure_future(coro)
+    previous = _inflight.get(user_id)
+    if previous is not None and not previous.done():
+        previous.cancel()
+    _inflight[user_id] = task
+    try:
+        return await task
+    except asyncio.CancelledError:
+        # our own handler being cancelled (shutdown) must still propagate
+        current = asyncio.current_task()
+        if current is not None and current.cancelling():
+            raise
+        return None
+    finally:
+        if _inflight.get(user_id) is task:
+            del _inflight[user_id]
+
+
+def cancel_user(user_id: int) -> bool:
+    """Cancel the user's in-flight AI request, if any. True if one was cancelled."""
+    task = _inflight.pop(user_id, None)
+    if task is None or task.done():
+        return False
+    task.cancel()
+    return True
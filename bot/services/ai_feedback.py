@@ -1,14 +1,15 @@
 # bot/services/ai_feedback.py
 from __future__ import annotations
-import google.genai as genai  # type: ignore
-
+import asyncio
 import os
 import json
 import random
 import hashlib
-from typing import Dict, Any, Optional
+from typing import AsyncIterator, Dict, Any, Optional
 
-from bot.db import ai_cache_get, ai_cache_set
+from bot import db_async as db
+from bot.services import ai_client, ai_metrics, prompts
+from bot.services.dictionary_it import validate_it_term
 
 AI_PROVIDER = os.getenv("AI_PROVIDER", "none").lower().strip()
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "").strip()
@@ -20,7 +21,11 @@ DEFAULT_GEMINI_MODELS = [
     "gemini-2.5-flash-lite",
 ]
 
+# How many upcoming cards of a multi-word /add are prepared in the background.
+WORD_CARD_PREFETCH = int(os.getenv("WORD_CARD_PREFETCH", "3"))
+
 _gemini_key_idx = 0
+_prefetching: dict[str, asyncio.Task] = {}
 
 
 def _next_gemini_key() -> str:
@@ -49,22 +54,30 @@ def _gemini_models() -> list[str]:
 
 
 def _is_quota_or_rate_error(err: Exception) -> bool:
-    msg = str(err).lower()
-    return any(
-        token in msg
-        for token in [
-            "quota",
-            "rate",
-            "limit",
-            "exceeded",
-            "resource_exhausted",
-            "429",
-        ]
-    )
+    return ai_client.is_quota_or_rate_error(err)
+
+
+def _gemini_keys() -> list[str]:
+    return GEMINI_API_KEYS or [GEMINI_API_KEY]
+
 
+def _routes(kind: str):
+    """ai_client.routes() for one request of `kind`, counting the request, its retries and exhaustion."""
+    ai_metrics.note(kind, "requests")
+    first = True
+    for pair in ai_client.routes(_gemini_keys(), _gemini_models()):
+        if not first:
+            ai_metrics.note(kind, "retries")
+        first = False
+        yield pair
+    ai_metrics.note(kind, "exhausted")
 
-def _num_keys() -> int:
-    return len(GEMINI_API_KEYS) if GEMINI_API_KEYS else 1
+
+def _parse_response(text: str, kind: str) -> Optional[dict]:
+    data = _extract_json(text)
+    if data is None:
+        ai_metrics.note(kind, "json_errors")
+    return data
 
 
 
@@ -102,6 +115,70 @@ def _extract_json(text: str) -> Optional[dict]:
         return None
 
 
+def _partial_json(text: str) -> Optional[dict]:
+    """
+    Best-effort parse of a JSON object that is still being streamed: the fields
+    complete so far, plus the string value currently being written (cut where
+    the stream is). None until the object has started.
+    """
+    start = (text or "").find("{")
+    if start == -1:
+        return None
+    s = text[start:]
+
+    closers: list[str] = []
+    in_str = False
+    esc = False
+    str_is_value = False
+    # last cut point where the object is valid once closed: (index, closers there)
+    safe = (1, ["}"])
+    prev = ""                    # last significant char outside strings
+    for i, ch in enumerate(s):
+        if in_str:
+            if esc:
+                esc = False
+            elif ch == "\\":
+                esc = True
+            elif ch == '"':
+                in_str = False
+                prev = '"'
+                if str_is_value:
+                    safe = (i + 1, list(closers))
+            continue
+        if ch.isspace():
+            continue
+        if ch == '"':
+            in_str = True
+            str_is_value = prev == ":" or (closers and closers[-1] == "]" and prev in "[,")
+        elif ch in "{[":
+            closers.append("}" if ch == "{" else "]")
+            safe = (i + 1, list(closers))
+        elif ch in "}]":
+            if closers:
+                closers.pop()
+            if not closers:
+                return _extract_json(s[:i + 1])
+            safe = (i + 1, list(closers))
+        elif ch == ",":
+            safe = (i, list(closers))
+        prev = ch
+
+    candidates = []
+    if in_str and str_is_value:
+        head = s[:-1] if esc else s
+        candidates.append(head + '"' + "".join(reversed(closers)))
+    cut, cut_closers = safe
+    candidates.append(s[:cut] + "".join(reversed(cut_closers)))
+    for candidate in candidates:
+        try:
+            data = json.loads(candidate)
+        except Exception:
+            continue
+        if isinstance(data, dict):
+            return data
+    return None
+
+
 async def generate_sentence_upgrade(
     *,
     term: str,
@@ -114,55 +191,61 @@ async def generate_sentence_upgrade(
     """
     raw_key = f"sentence_upgrade|{term}|{user_sentence}|{level_from}|{level_to}"
     cache_key = hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
-    cached = ai_cache_get(cache_key)
+    cached = await db.ai_cache_get(cache_key)
     if cached:
         return cached
 
+    return await ai_client.single_flight(
+        cache_key,
+        lambda: _generate_sentence_upgrade_ai(
+            cache_key,
+            term=term,
+            user_sentence=user_sentence,
+            level_from=level_from,
+            level_to=level_to,
+        ),
+    )
+
+
+async def _generate_sentence_upgrade_ai(
+    cache_key: str,
+    *,
+    term: str,
+    user_sentence: str,
+    level_from: str,
+    level_to: str,
+) -> Dict[str, Any]:
     if AI_PROVIDER != "gemini" or not (GEMINI_API_KEYS or GEMINI_API_KEY):
         out = {"ok": False}
-        ai_cache_set(cache_key, out)
+        await db.ai_cache_set(cache_key, out)
         return out
 
-    prompt = f"""
-You are an Italian tutor. Improve a learner sentence.
-
-TERM: "{term}"
-Learner sentence: "{user_sentence}"
-Learner level: {level_from}
-Target level: {level_to}
-
-Return JSON only:
-{{
-  "ok": true,
-  "better": "corrected or more natural same-level sentence",
-  "level_up": "more natural version at next level",
-  "native_sentence": "native-like sentence using the term",
-  "tip": "one short tip for improvement"
-}}
-""".strip()
+    system, prompt = prompts.sentence_upgrade(
+        term=term, user_sentence=user_sentence, level_from=level_from, level_to=level_to,
+    )
 
     last_err: Exception | None = None
     try:
-        for model in _gemini_models():
-            for _ in range(_num_keys()):
-                try:
-                    client = genai.Client(api_key=_next_gemini_key())
-                    resp = client.models.generate_content(model=model, contents=prompt)
-                    data = _extract_json((resp.text or "").strip())
-                    if data:
-                        data["ok"] = True
-                        ai_cache_set(cache_key, data)
-                        return data
-                except Exception as e:
-                    last_err = e
-                    if _is_quota_or_rate_error(e):
-                        continue
-                    raise
+        for api_key, model in _routes("sentence_upgrade"):
+            try:
+                resp = await ai_client.generate_content(
+                    model, prompt, api_key=api_key, system=system, kind="sentence_upgrade",
+                )
+                data = _parse_response((resp.text or "").strip(), "sentence_upgrade")
+                if data:
+                    data["ok"] = True
+                    await db.ai_cache_set(cache_key, data)
+                    return data
+            except Exception as e:
+                last_err = e
+                if _is_quota_or_rate_error(e):
+                    continue
+                raise
     except Exception:
         pass
 
     out = {"ok": False, "error": str(last_err) if last_err else "ai_failed"}
-    ai_cache_set(cache_key, out)
+    await db.ai_cache_set(cache_key, out)
     return out
 
 
@@ -179,79 +262,89 @@ async def generate_word_card(
     focus = (focus or "word").strip().lower()
     raw_key = f"word_card|{focus}|{helper_language}|{term}"
     cache_key = hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
-    cached = ai_cache_get(cache_key)
+    cached = await db.ai_cache_get(cache_key)
     if cached:
         return cached
 
+    return await ai_client.single_flight(
+        cache_key,
+        lambda: _generate_word_card_ai(
+            cache_key,
+            term=term,
+            focus=focus,
+            helper_language=helper_language,
+        ),
+    )
+
+
+async def _generate_word_card_ai(
+    cache_key: str,
+    *,
+    term: str,
+    focus: str,
+    helper_language: str,
+) -> Dict[str, Any]:
     if AI_PROVIDER != "gemini" or not (GEMINI_API_KEYS or GEMINI_API_KEY):
         out = {"ok": False, "term": term, "focus": focus}
-        ai_cache_set(cache_key, out)
+        await db.ai_cache_set(cache_key, out)
         return out
 
-    prompt = f"""
-You are a professional Italian tutor.
-Return a compact word/phrase card in JSON only.
-
-TERM: "{term}"
-FOCUS: "{focus}"  (word or phrase)
-TARGET LANGUAGE: Italian
-HELPER LANGUAGE: {helper_language}
-
-Rules:
-- Italian first, then English, then helper language.
-- Keep output short and practical.
-- If multiple meanings, return them as \"senses\" list.
-- Provide exactly 3 examples. Each example: it + en + helper.
-- Provide a short grammar note only if relevant.
-- If focus=word and it's a verb, include short conjugation note (present tense only).
-- Suggested categories: pick 2-4 from: Verbs, Travel, Food & Drink, Shopping, Daily Life, Work & Study, Emotions, Time & Dates, Politeness, General.
-- Use \"safe\" risk unless it is clearly risky slang.
-
-Output JSON schema:
-{{
-  "ok": true,
-  "term": "...",
-  "focus": "word|phrase",
-  "meaning_en": "...",
-  "meaning_helper": "...",
-  "senses": [{{"meaning_en":"...", "meaning_helper":"...", "usage":"..."}}],
-  "examples": [{{"it":"...", "en":"...", "helper":"..."}}],
-  "grammar": "...",
-  "conjugation": "...",
-  "cultural_note": "...",
-  "native_sauce": "...",
-  "trap": "...",
-  "register": "neutral|polite|slang",
-  "risk": "safe|caution|avoid",
-  "suggested_categories": ["...","..."]
-}}
-""".strip()
+    system, prompt = prompts.word_card(term=term, focus=focus, helper_language=helper_language)
 
     last_err: Exception | None = None
     try:
-        for model in _gemini_models():
-            for _ in range(_num_keys()):
-                try:
-                    client = genai.Client(api_key=_next_gemini_key())
-                    resp = client.models.generate_content(model=model, contents=prompt)
-                    data = _extract_json((resp.text or "").strip())
-                    if data:
-                        data["ok"] = True
-                        ai_cache_set(cache_key, data)
-                        return data
-                except Exception as e:
-                    last_err = e
-                    if _is_quota_or_rate_error(e):
-                        continue
-                    raise
+        for api_key, model in _routes("word_card"):
+            try:
+                resp = await ai_client.generate_content(
+                    model, prompt, api_key=api_key, system=system, kind="word_card",
+                )
+                data = _parse_response((resp.text or "").strip(), "word_card")
+                if data:
+                    data["ok"] = True
+                    await db.ai_cache_set(cache_key, data)
+                    return data
+            except Exception as e:
+                last_err = e
+                if _is_quota_or_rate_error(e):
+                    continue
+                raise
     except Exception:
         pass
 
     out = {"ok": False, "term": term, "focus": focus, "error": str(last_err) if last_err else "ai_failed"}
-    ai_cache_set(cache_key, out)
+    await db.ai_cache_set(cache_key, out)
     return out
 
 
+def prefetch_word_cards(cards: list[tuple[str, str]], *, helper_language: str = "fa"):
+    """
+    Prepare the next WORD_CARD_PREFETCH (term, focus) cards in the background so
+    tapping "Next" finds them in ai_cache. Returns at once. Words are checked
+    against Wiktionary first (that lookup is cached too); words that fail get no
+    card, since the user is asked about a suggestion before seeing one.
+    A foreground generate_word_card for a card still being prefetched joins the
+    same upstream call (single_flight).
+    """
+    for term, focus in cards[:WORD_CARD_PREFETCH]:
+        key = f"{focus}|{helper_language}|{term}"
+        if key in _prefetching:
+            continue
+        task = asyncio.ensure_future(_prefetch_word_card(term, focus, helper_language))
+        _prefetching[key] = task
+        task.add_done_callback(lambda _t, key=key: _prefetching.pop(key, None))
+
+
+async def _prefetch_word_card(term: str, focus: str, helper_language: str):
+    try:
+        if focus == "word":
+            v = await asyncio.to_thread(validate_it_term, term)
+            if not v.get("ok"):
+                return
+        await generate_word_card(term=term, focus=focus, helper_language=helper_language)
+    except Exception:
+        pass  # best effort: the foreground path retries and reports errors
+
+
 async def generate_conjugation(
     *,
     term: str,
@@ -264,50 +357,43 @@ async def generate_conjugation(
     tense = (tense or "").strip()
     raw_key = f"conjugation|{term}|{tense}"
     cache_key = hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
-    cached = ai_cache_get(cache_key)
+    cached = await db.ai_cache_get(cache_key)
     if cached:
         return cached
 
+    return await ai_client.single_flight(cache_key, lambda: _generate_conjugation_ai(cache_key, term=term, tense=tense))
+
+
+async def _generate_conjugation_ai(cache_key: str, *, term: str, tense: str) -> Dict[str, Any]:
     if AI_PROVIDER != "gemini" or not (GEMINI_API_KEYS or GEMINI_API_KEY):
         out = {"ok": False, "term": term, "tense": tense}
-        ai_cache_set(cache_key, out)
+        await db.ai_cache_set(cache_key, out)
         return out
 
-    prompt = f"""
-You are an Italian tutor. Provide the conjugation of the verb.
-Verb: "{term}"
-Tense: "{tense}"
-
-Return JSON only:
-{{
-  "ok": true,
-  "tense": "{tense}",
-  "conjugation": "io ...\\ntu ...\\nlui/lei ...\\nnoi ...\\nvoi ...\\nloro ..."
-}}
-""".strip()
+    system, prompt = prompts.conjugation(term=term, tense=tense)
 
     last_err: Exception | None = None
     try:
-        for model in _gemini_models():
-            for _ in range(_num_keys()):
-                try:
-                    client = genai.Client(api_key=_next_gemini_key())
-                    resp = client.models.generate_content(model=model, contents=prompt)
-                    data = _extract_json((resp.text or "").strip())
-                    if data:
-                        data["ok"] = True
-                        ai_cache_set(cache_key, data)
-                        return data
-                except Exception as e:
-                    last_err = e
-                    if _is_quota_or_rate_error(e):
-                        continue
-                    raise
+        for api_key, model in _routes("conjugation"):
+            try:
+                resp = await ai_client.generate_content(
+                    model, prompt, api_key=api_key, system=system, kind="conjugation",
+                )
+                data = _parse_response((resp.text or "").strip(), "conjugation")
+                if data:
+                    data["ok"] = True
+                    await db.ai_cache_set(cache_key, data)
+                    return data
+            except Exception as e:
+                last_err = e
+                if _is_quota_or_rate_error(e):
+                    continue
+                raise
     except Exception:
         pass
 
     out = {"ok": False, "term": term, "tense": tense, "error": str(last_err) if last_err else "ai_failed"}
-    ai_cache_set(cache_key, out)
+    await db.ai_cache_set(cache_key, out)
     return out
 
 async def generate_phrase_scenario(
@@ -320,57 +406,59 @@ async def generate_phrase_scenario(
     term = (term or "").strip()
     raw_key = f"phrase_scene|{helper_language}|{level}|{term}|{meaning_en or ''}"
     cache_key = hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
-    cached = ai_cache_get(cache_key)
+    cached = await db.ai_cache_get(cache_key)
     if cached:
         return cached
 
+    return await ai_client.single_flight(
+        cache_key,
+        lambda: _generate_phrase_scenario_ai(
+            cache_key,
+            term=term,
+            meaning_en=meaning_en,
+            helper_language=helper_language,
+            level=level,
+        ),
+    )
+
+
+async def _generate_phrase_scenario_ai(
+    cache_key: str,
+    *,
+    term: str,
+    meaning_en: Optional[str],
+    helper_language: str,
+    level: str,
+) -> Dict[str, Any]:
     if AI_PROVIDER != "gemini" or not (GEMINI_API_KEYS or GEMINI_API_KEY):
         out = {"ok": False, "setting": "Real life", "npc_line": "Mi dica.", "task": "Respond."}
-        ai_cache_set(cache_key, out)
+        await db.ai_cache_set(cache_key, out)
         return out
 
-    prompt = f"""
-Create a very short mini-scene to practice this Italian phrase.
-Tone: funny but real-life (not absurd).
-Level: {level} (keep vocabulary and sentence structure at this level).
-
-PHRASE: "{term}"
-Meaning (EN): "{meaning_en or ''}"
-
-Output JSON only:
-{{
-  "ok": true,
-  "setting": "one short line",
-  "npc_line": "one short line",
-  "task": "what the user should say",
-  "hint": "short hint",
-  "meaning_en": "short meaning in English",
-  "meaning_helper": "short meaning in helper language"
-}}
-""".strip()
+    system, prompt = prompts.phrase_scenario(term=term, meaning_en=meaning_en, level=level)
 
     last_err: Exception | None = None
     try:
-        for model in _gemini_models():
-            for _ in range(_num_keys()):
-                try:
-                    client = genai.Client(api_key=_next_gemini_key())
-                    resp = client.models.generate_content(model=model, contents=prompt)
-                    data = _extract_json((resp.text or "").strip())
-                    if data:
-                        data["ok"] = True
-                        ai_cache_set(cache_key, data)
-                        return data
-                except Exception as e:
-                    last_err = e
-                    if _is_quota_or_rate_error(e):
-                        continue
-                    raise
+        for api_key, model in _routes("phrase_scenario"):
+            try:
+                resp = await ai_client.generate_content(
+                    model, prompt, api_key=api_key, system=system, kind="phrase_scenario",
+                )
+                data = _parse_response((resp.text or "").strip(), "phrase_scenario")
+                if data:
+                    data["ok"] = True
+                    await db.ai_cache_set(cache_key, data)
+                    return data
+            except Exception as e:
+                last_err = e
+                if _is_quota_or_rate_error(e):
+                    continue
+                raise
     except Exception:
         pass
 
     out = {"ok": False, "setting": "Real life", "npc_line": "Mi dica.", "task": "Respond.", "error": str(last_err) if last_err else "ai_failed"}
-    ai_cache_set(cache_key, out)
+    await db.ai_cache_set(cache_key, out)
     return out
 
 
@@ -381,82 +469,57 @@ def _build_prompt(
     translation_en: Optional[str],
     user_sentence: str,
     lexicon: Optional[dict],
-) -> str:
-    lex_str = json.dumps(lexicon or {}, ensure_ascii=False)
-
-    return f"""
-You are a professional Italian language tutor.
-
-The user is a BEGINNER.
-Your role is to help them learn naturally, without overcorrecting.
-
-LEARNING CONTEXT:
-- Target word: "{term}"
-- Optional related chunk (reference only): "{chunk}"
-- English hint for the word: "{translation_en or ""}"
-- User's sentence (free form, any person allowed):
-"{user_sentence}"
-
-DICTIONARY / LEXICON FACTS (ground truth, may be partial):
-{lex_str}
-
-CORE RULES (VERY IMPORTANT):
-1) The user is practicing the WORD, not a specific tense or structure.
-2) Do NOT change the grammatical person or subject
-   (io / tu / lui / lei / Lei / noi / voi / loro)
-   unless the sentence is grammatically impossible.
-3) If the user's sentence is grammatically acceptable Italian,
-   DO NOT correct it.
-4) "correction" is ONLY for true grammar or spelling errors.
-   If the sentence is acceptable, set correction = null.
-5) Style improvements (politeness, register, naturalness)
-   MUST go in "rewrite" and are OPTIONAL suggestions.
-6) Never invent meanings or usages.
-   If dictionary grounding is missing or uncertain, say so briefly in notes.
-
-OUTPUT FORMAT:
-- Output MUST be valid JSON ONLY.
-- No markdown, no explanations outside JSON.
-- Use EXACTLY these keys:
-
-{{
-  "correction": string | null,
-  "rewrite": string | null,
-  "why": [string, string],
-  "grammar_notes": [
-    {{"issue": string, "explain": string, "example": string}},
-    {{"issue": string, "explain": string, "example": string}}
-  ],
-  "notes": string,
-  "examples": [string, string, string]
-}}
-
-RULES FOR WHY + GRAMMAR:
-- If correction is null, why MUST be [] and grammar_notes MUST be [].
-- why: max 2 items, each ONE short sentence, beginner-friendly.
-- grammar_notes: max 2 items, short, practical.
-
-FIELD GUIDELINES:
-- correction:
-  Minimal fix only (articles, prepositions, verb form, spelling).
-- rewrite:
-  A more natural or polite alternative with the SAME meaning
-  (optional; may be null).
-- notes:
-  Max 2 short lines.
-  Explain meaning, register, or a useful real-life tip.
-- examples:
-  Exactly 3 short, natural Italian examples
-  that clearly reflect the SAME meaning of the word
-  (neutral / spoken / polite if possible).
-
-TEACHING STYLE:
-- Respect correct answers.
-- Do not turn this into a grammar lecture.
-- Be supportive, clear, and practical.
-""".strip()
+) -> tuple[str, str]:
+    return prompts.learn_feedback(
+        term=term,
+        chunk=chunk,
+        translation_en=translation_en,
+        user_sentence=user_sentence,
+        lexicon=lexicon,
+    )
 
 
+def _learn_feedback_key(target_language: str, term: str, user_sentence: str) -> str:
+    # Cache key: same term + same sentence = reuse
+    raw_key = f"learn_feedback|{target_language}|{term}|{user_sentence.strip()}"
+    return hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
+
+
+def _normalize_learn_feedback(data: dict) -> Dict[str, Any]:
+    correction = data.get("correction")
+    rewrite = data.get("rewrite")
+    why = data.get("why") or []
+    if not isinstance(why, list):
+        why = []
+    why = [str(x).strip() for x in why if x][:2]
+
+    grammar_notes = data.get("grammar_notes") or []
+    if not isinstance(grammar_notes, list):
+        grammar_notes = []
+    grammar_notes = grammar_notes[:2]
+
+    notes = data.get("notes") or ""
+    examples = data.get("examples") or []
+    if not isinstance(examples, list):
+        examples = []
+
+    # Ensure 3 examples
+    examples = [str(x) for x in examples][:3]
+    while len(examples) < 3:
+        examples.append("")
+
+    return {
+        "ok": True,
+        "correction": correction,
+        "rewrite": rewrite,
+        "why": why,
+        "grammar_notes": grammar_notes,
+        "notes": notes,
+        "examples": examples,
+        "provider": "gemini",
+    }
+
+
 async def generate_learn_feedback(
     *,
     target_language: str,
@@ -467,15 +530,37 @@ async def generate_learn_feedback(
     dict_validation: Optional[dict] = None,
     lexicon: Optional[dict] = None,
 ) -> Dict[str, Any]:
-    # Cache key: same term + same sentence = reuse
-    raw_key = f"learn_feedback|{target_language}|{term}|{user_sentence.strip()}"
-    cache_key = hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
+    cache_key = _learn_feedback_key(target_language, term, user_sentence)
 
-    cached = ai_cache_get(cache_key)
+    cached = await db.ai_cache_get(cache_key)
     if cached:
         cached["cached"] = True
         return cached
 
+    return await ai_client.single_flight(
+        cache_key,
+        lambda: _generate_learn_feedback_ai(
+            cache_key,
+            term=term,
+            chunk=chunk,
+            translation_en=translation_en,
+            user_sentence=user_sentence,
+            dict_validation=dict_validation,
+            lexicon=lexicon,
+        ),
+    )
+
+
+async def _generate_learn_feedback_ai(
+    cache_key: str,
+    *,
+    term: str,
+    chunk: str,
+    translation_en: Optional[str],
+    user_sentence: str,
+    dict_validation: Optional[dict],
+    lexicon: Optional[dict],
+) -> Dict[str, Any]:
     # Always safe: never raise to caller
     try:
         if AI_PROVIDER != "gemini":
@@ -484,7 +569,7 @@ async def generate_learn_feedback(
         if not (GEMINI_API_KEYS or GEMINI_API_KEY):
             return _fallback_feedback(user_sentence, reason="GEMINI_API_KEY(S) missing/empty")
 
-        prompt = _build_prompt(
+        system, prompt = _build_prompt(
             term=term,
             chunk=chunk,
             translation_en=translation_en,
@@ -493,61 +578,26 @@ async def generate_learn_feedback(
         )
 
         last_err: Exception | None = None
-        for model in _gemini_models():
-            for _ in range(_num_keys()):
-                try:
-                    client = genai.Client(api_key=_next_gemini_key())
-                    resp = client.models.generate_content(
-                        model=model,
-                        contents=prompt,
-                    )
-
-                    text = (resp.text or "").strip()
-                    data = _extract_json(text)
-                    if not data:
-                        return _fallback_feedback(user_sentence, reason="AI returned invalid JSON")
-
-                    # Normalize
-                    correction = data.get("correction")
-                    rewrite = data.get("rewrite")
-                    why = data.get("why") or []
-                    if not isinstance(why, list):
-                        why = []
-                    why = [str(x).strip() for x in why if x][:2]
-
-                    grammar_notes = data.get("grammar_notes") or []
-                    if not isinstance(grammar_notes, list):
-                        grammar_notes = []
-                    grammar_notes = grammar_notes[:2]
-
-                    notes = data.get("notes") or ""
-                    examples = data.get("examples") or []
-                    if not isinstance(examples, list):
-                        examples = []
-
-                    # Ensure 3 examples
-                    examples = [str(x) for x in examples][:3]
-                    while len(examples) < 3:
-                        examples.append("")
-
-                    result = {
-                        "ok": True,
-                        "correction": correction,
-                        "rewrite": rewrite,
-                        "why": why,
-                        "grammar_notes": grammar_notes,
-                        "notes": notes,
-                        "examples": examples,
-                        "provider": "gemini",
-                    }
-                    ai_cache_set(cache_key, result)
-                    return result
-
-                except Exception as e:
-                    last_err = e
-                    if _is_quota_or_rate_error(e):
-                        continue
-                    raise
+        for api_key, model in _routes("learn_feedback"):
+            try:
+                resp = await ai_client.generate_content(
+                    model, prompt, api_key=api_key, system=system, kind="learn_feedback",
+                )
+
+                text = (resp.text or "").strip()
+                data = _parse_response(text, "learn_feedback")
+                if not data:
+                    return _fallback_feedback(user_sentence, reason="AI returned invalid JSON")
+
+                result = _normalize_learn_feedback(data)
+                await db.ai_cache_set(cache_key, result)
+                return result
+
+            except Exception as e:
+                last_err = e
+                if _is_quota_or_rate_error(e):
+                    continue
+                raise
 
         return _fallback_feedback(
             user_sentence,
@@ -559,8 +609,7 @@ async def generate_learn_feedback(
 
 def debug_list_models() -> str:
     try:
-        import google.genai as genai  # type: ignore
-        client = genai.Client(api_key=_next_gemini_key())
+        client = ai_client.get_client(_next_gemini_key())
         models = client.models.list()
         names = []
         for m in models:
@@ -602,83 +651,56 @@ async def _generate_reverse_context_quiz_ai(
         }
 
     try:
-        import google.genai as genai  # type: ignore
-
-        lex_str = json.dumps(lexicon or {}, ensure_ascii=False)
-
-        prompt = f"""
-        Create a reverse-context meaning quiz for an Italian beginner.
-        FIXED CONTEXT (if provided, USE IT as the context sentence):
-        "{context_it or ""}"
-
-
-        TARGET WORD (TERM): "{term}"
-        Related chunk (reference only, DO NOT teach chunk meaning): "{chunk or ""}"
-        English hint (may be empty or may describe the chunk): "{translation_en or ""}"
-
-        GROUNDING FACTS (if present, treat as truth):
-        {lex_str}
-
-        NON-NEGOTIABLE RULES:
-        - If FIXED CONTEXT is provided and non-empty, you MUST use it as "context_it" exactly.
-        - The quiz is ONLY about the TERM meaning, not the chunk.
-        - For "andare", meaning must be "to go" (NOT "to go home").
-        - If the hint seems chunk-specific (e.g., 'to go home'), IGNORE it and still quiz the TERM.
-        - Context sentence must clearly support the TERM meaning.
-        - Provide exactly 3 English options and exactly one correct.
-
-        Output MUST be valid JSON only with this schema:
-        {{
-        "context_it": "...",
-        "meaning_en": "...",
-        "options_en": ["...","...","..."],
-        "correct_index": 0,
-        "clue": "short explanation of the clue"
-        }}
-        """.strip()
+        system, prompt = prompts.reverse_quiz(
+            term=term,
+            chunk=chunk,
+            translation_en=translation_en,
+            lexicon=lexicon,
+            context_it=context_it,
+        )
         last_err: Exception | None = None
-        for model in _gemini_models():
-            for _ in range(_num_keys()):
-                try:
-                    client = genai.Client(api_key=_next_gemini_key())
-                    resp = client.models.generate_content(model=model, contents=prompt)
-                    data = _extract_json((resp.text or "").strip())
-                    if not data:
-                        return {
-                            "ok": False,
-                            "context_it": f"Uso comune: {term}.",
-                            "meaning_en": translation_en or "(meaning not available)",
-                            "options_en": [translation_en or "Meaning", "Other", "Other"],
-                            "correct_index": 0,
-                            "clue": "AI returned invalid JSON.",
-                        }
-                    meaning_en = str(data.get("meaning_en") or (translation_en or "")).strip()
-
-                    # Guardrail: prevent chunk meaning leaking into term meaning
-                    if term.lower() == "andare" and "home" in meaning_en.lower():
-                        meaning_en = "to go"
-
-                    options = data.get("options_en") or []
-                    if not isinstance(options, list) or len(options) != 3:
-                        options = [translation_en or "Meaning", "Other", "Other"]
-
-                    idx = data.get("correct_index")
-                    if idx not in [0, 1, 2]:
-                        idx = 0
-
+        for api_key, model in _routes("reverse_quiz"):
+            try:
+                resp = await ai_client.generate_content(
+                    model, prompt, api_key=api_key, system=system, kind="reverse_quiz",
+                )
+                data = _parse_response((resp.text or "").strip(), "reverse_quiz")
+                if not data:
                     return {
-                        "ok": True,
-                        "context_it": str(data.get("context_it") or "").strip(),
-                        "meaning_en": meaning_en,  # ✅ use the guarded one
-                        "options_en": [str(x).strip() for x in options],
-                        "correct_index": idx,
-                        "clue": str(data.get("clue") or "").strip(),
+                        "ok": False,
+                        "context_it": f"Uso comune: {term}.",
+                        "meaning_en": translation_en or "(meaning not available)",
+                        "options_en": [translation_en or "Meaning", "Other", "Other"],
+                        "correct_index": 0,
+                        "clue": "AI returned invalid JSON.",
                     }
-                except Exception as e:
-                    last_err = e
-                    if _is_quota_or_rate_error(e):
-                        continue
-                    raise
+                meaning_en = str(data.get("meaning_en") or (translation_en or "")).strip()
+
+                # Guardrail: prevent chunk meaning leaking into term meaning
+                if term.lower() == "andare" and "home" in meaning_en.lower():
+                    meaning_en = "to go"
+
+                options = data.get("options_en") or []
+                if not isinstance(options, list) or len(options) != 3:
+                    options = [translation_en or "Meaning", "Other", "Other"]
+
+                idx = data.get("correct_index")
+                if idx not in [0, 1, 2]:
+                    idx = 0
+
+                return {
+                    "ok": True,
+                    "context_it": str(data.get("context_it") or "").strip(),
+                    "meaning_en": meaning_en,  # ✅ use the guarded one
+                    "options_en": [str(x).strip() for x in options],
+                    "correct_index": idx,
+                    "clue": str(data.get("clue") or "").strip(),
+                }
+            except Exception as e:
+                last_err = e
+                if _is_quota_or_rate_error(e):
+                    continue
+                raise
 
         meaning = translation_en or "(meaning not available)"
         return {
@@ -750,6 +772,61 @@ async def generate_reverse_context_quiz(
     }
 
 
+def _roleplay_prompt(
+    *,
+    user_sentence: str,
+    setting: str,
+    bot_role: str,
+    expected_phrase: str | None,
+    ui_language: str,
+    helper_language: str | None,
+) -> tuple[str, str]:
+    return prompts.roleplay_feedback(
+        user_sentence=user_sentence,
+        setting=setting,
+        bot_role=bot_role,
+        expected_phrase=expected_phrase,
+        ui_language=ui_language,
+        helper_language=helper_language,
+    )
+
+
+def _normalize_roleplay_feedback(data: dict) -> dict:
+    ok = data.get("ok")
+    if ok is None:
+        ok = True
+    if isinstance(ok, str):
+        ok = ok.strip().lower() in ("true", "yes", "1")
+
+    examples = data.get("examples") or []
+    if not isinstance(examples, list):
+        examples = []
+    examples = [str(x) for x in examples][:3]
+    while len(examples) < 3:
+        examples.append("")
+
+    tips = data.get("tips") or []
+    if not isinstance(tips, list):
+        tips = []
+    tips = [str(x) for x in tips if x][:2]
+
+    grammar = data.get("grammar") or []
+    if not isinstance(grammar, list):
+        grammar = []
+    grammar = [str(x) for x in grammar if x][:2]
+
+    return {
+        "ok": bool(ok),
+        "correction": data.get("correction"),
+        "rewrite": data.get("rewrite"),
+        "notes": data.get("notes") or "",
+        "examples": examples,
+        "tips": tips,
+        "grammar": grammar,
+        "provider": "gemini",
+    }
+
+
 async def generate_roleplay_feedback(
     *,
     target_language: str,
@@ -771,99 +848,32 @@ async def generate_roleplay_feedback(
         if not (GEMINI_API_KEYS or GEMINI_API_KEY):
             return _fallback_feedback(user_sentence, reason="GEMINI_API_KEY(S) missing/empty")
 
-        expected = (expected_phrase or "").strip()
-        lang_primary = ui_language or "en"
-        lang_helper = helper_language or ""
-        prompt = f"""
-You are a friendly native Italian tutor.
-The user is a beginner.
-
-ROLEPLAY CONTEXT:
-- setting: {setting}
-- bot role: {bot_role}
-
-User message:
-"{user_sentence}"
-
-Expected phrase (if any):
-{expected or "(none)"}
-
-OUTPUT LANGUAGE:
-- Write notes/tips/grammar in {lang_primary}.
-- If {lang_helper or "no secondary language"} is provided, include a second line in that language in notes/tips/grammar (prefix each line with the language code, e.g. "EN:" / "FA:").
-
-RULES:
-- If an expected phrase is provided, set ok=false if the user did not use it (or a clear equivalent).
-- Accept minor typos or extra words if the expected phrase is clearly present.
-- If ok=false, notes should briefly say to use the expected phrase.
-- Keep correction minimal.
-- If acceptable, do not correct.
-- rewrite is optional (more natural, same meaning).
-- notes max 2 short lines.
-- examples MUST be exactly 3 short sentences.
-- Provide short "tips" and "grammar" only if helpful (max 2 bullets each).
-
-Return JSON ONLY:
-{{
-  "ok": true/false,
-  "correction": string | null,
-  "rewrite": string | null,
-  "notes": string,
-  "examples": [string, string, string],
-  "tips": [string, string],
-  "grammar": [string, string]
-}}
-""".strip()
+        system, prompt = _roleplay_prompt(
+            user_sentence=user_sentence,
+            setting=setting,
+            bot_role=bot_role,
+            expected_phrase=expected_phrase,
+            ui_language=ui_language,
+            helper_language=helper_language,
+        )
         last_err: Exception | None = None
-        for model in _gemini_models():
-            for _ in range(_num_keys()):
-                try:
-                    client = genai.Client(api_key=_next_gemini_key())
-                    resp = client.models.generate_content(model=model, contents=prompt)
-                    text = (resp.text or "").strip()
-
-                    data = _extract_json(text)
-                    if not data:
-                        return _fallback_feedback(user_sentence, reason="AI returned invalid JSON")
-
-                    ok = data.get("ok")
-                    if ok is None:
-                        ok = True
-                    if isinstance(ok, str):
-                        ok = ok.strip().lower() in ("true", "yes", "1")
-
-                    examples = data.get("examples") or []
-                    if not isinstance(examples, list):
-                        examples = []
-                    examples = [str(x) for x in examples][:3]
-                    while len(examples) < 3:
-                        examples.append("")
-
-                    tips = data.get("tips") or []
-                    if not isinstance(tips, list):
-                        tips = []
-                    tips = [str(x) for x in tips if x][:2]
-
-                    grammar = data.get("grammar") or []
-                    if not isinstance(grammar, list):
-                        grammar = []
-                    grammar = [str(x) for x in grammar if x][:2]
-
-                    return {
-                        "ok": bool(ok),
-                        "correction": data.get("correction"),
-                        "rewrite": data.get("rewrite"),
-                        "notes": data.get("notes") or "",
-                        "examples": examples,
-                        "tips": tips,
-                        "grammar": grammar,
-                        "provider": "gemini",
-                    }
-                except Exception as e:
-                    last_err = e
-                    if _is_quota_or_rate_error(e):
-                        continue
-                    raise
+        for api_key, model in _routes("roleplay_feedback"):
+            try:
+                resp = await ai_client.generate_content(
+                    model, prompt, api_key=api_key, system=system, kind="roleplay_feedback",
+                )
+                text = (resp.text or "").strip()
+
+                data = _parse_response(text, "roleplay_feedback")
+                if not data:
+                    return _fallback_feedback(user_sentence, reason="AI returned invalid JSON")
+
+                return _normalize_roleplay_feedback(data)
+            except Exception as e:
+                last_err = e
+                if _is_quota_or_rate_error(e):
+                    continue
+                raise
 
         return _fallback_feedback(
             user_sentence,
@@ -872,3 +882,158 @@ Return JSON ONLY:
 
     except Exception as e:
         return _fallback_feedback(user_sentence, reason=f"exception: {type(e).__name__}: {e}")
+
+
+async def _stream_gemini_json(
+    prompt: str,
+    *,
+    system: str | None = None,
+    kind: str = "stream",
+) -> AsyncIterator[tuple[bool, Optional[dict]]]:
+    """
+    Stream one JSON answer. Yields (False, fields so far) whenever they change,
+    then (True, the parsed object or None). Quota/rate errors before the first
+    chunk move on to the next key/model; any other error is raised.
+    """
+    last_err: Exception | None = None
+    for api_key, model in _routes(kind):
+        text = ""
+        last: Optional[dict] = None
+        try:
+            async for piece in ai_client.generate_content_stream(
+                model, prompt, api_key=api_key, system=system, kind=kind,
+            ):
+                text += piece
+                partial = _partial_json(text)
+                if partial and partial != last:
+                    last = partial
+                    yield False, partial
+        except Exception as e:
+            last_err = e
+            if not text and _is_quota_or_rate_error(e):
+                continue
+            raise
+        yield True, _parse_response(text.strip(), kind)
+        return
+    raise RuntimeError(
+        f"quota/rate limit across keys/models: {type(last_err).__name__ if last_err else 'unknown'}"
+    )
+
+
+async def stream_learn_feedback(
+    *,
+    target_language: str,
+    term: str,
+    chunk: str,
+    translation_en: Optional[str],
+    user_sentence: str,
+    dict_validation: Optional[dict] = None,
+    lexicon: Optional[dict] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Streaming generate_learn_feedback. Yields partial snapshots (raw fields so
+    far, with "partial": True) while the model writes, then exactly what
+    generate_learn_feedback would return. A cache hit, AI off or any failure
+    yields only that final result. Never raises.
+    Identical requests share one upstream stream (ai_client.single_flight_stream),
+    and join a generate_learn_feedback call already in flight for the same key.
+    """
+    cache_key = _learn_feedback_key(target_language, term, user_sentence)
+    cached = await db.ai_cache_get(cache_key)
+    if cached:
+        cached["cached"] = True
+        yield cached
+        return
+
+    async for snapshot in ai_client.single_flight_stream(
+        cache_key,
+        lambda: _stream_learn_feedback_ai(
+            cache_key,
+            term=term,
+            chunk=chunk,
+            translation_en=translation_en,
+            user_sentence=user_sentence,
+            lexicon=lexicon or dict_validation,
+        ),
+    ):
+        yield snapshot
+
+
+async def _stream_learn_feedback_ai(
+    cache_key: str,
+    *,
+    term: str,
+    chunk: str,
+    translation_en: Optional[str],
+    user_sentence: str,
+    lexicon: Optional[dict],
+) -> AsyncIterator[Dict[str, Any]]:
+    if AI_PROVIDER != "gemini":
+        yield _fallback_feedback(user_sentence, reason=f"AI_PROVIDER={AI_PROVIDER!r}")
+        return
+    if not (GEMINI_API_KEYS or GEMINI_API_KEY):
+        yield _fallback_feedback(user_sentence, reason="GEMINI_API_KEY(S) missing/empty")
+        return
+
+    system, prompt = _build_prompt(
+        term=term,
+        chunk=chunk,
+        translation_en=translation_en,
+        user_sentence=user_sentence,
+        lexicon=lexicon,
+    )
+    try:
+        async for done, data in _stream_gemini_json(prompt, system=system, kind="learn_feedback"):
+            if not done:
+                yield {**data, "partial": True}
+                continue
+            if not data:
+                yield _fallback_feedback(user_sentence, reason="AI returned invalid JSON")
+                return
+            result = _normalize_learn_feedback(data)
+            await db.ai_cache_set(cache_key, result)
+            yield result
+    except Exception as e:
+        yield _fallback_feedback(user_sentence, reason=f"exception: {type(e).__name__}: {e}")
+
+
+async def stream_roleplay_feedback(
+    *,
+    target_language: str,
+    user_sentence: str,
+    setting: str = "",
+    bot_role: str = "",
+    expected_phrase: str | None = None,
+    ui_language: str = "en",
+    helper_language: str | None = None,
+) -> AsyncIterator[dict]:
+    """
+    Streaming generate_roleplay_feedback: partial snapshots ("partial": True),
+    then the final result. Never raises.
+    """
+    if AI_PROVIDER != "gemini":
+        yield _fallback_feedback(user_sentence, reason=f"AI_PROVIDER={AI_PROVIDER!r}")
+        return
+    if not (GEMINI_API_KEYS or GEMINI_API_KEY):
+        yield _fallback_feedback(user_sentence, reason="GEMINI_API_KEY(S) missing/empty")
+        return
+
+    system, prompt = _roleplay_prompt(
+        user_sentence=user_sentence,
+        setting=setting,
+        bot_role=bot_role,
+        expected_phrase=expected_phrase,
+        ui_language=ui_language,
+        helper_language=helper_language,
+    )
+    try:
+        async for done, data in _stream_gemini_json(prompt, system=system, kind="roleplay_feedback"):
+            if not done:
+                yield {**data, "partial": True}
+                continue
+            if not data:
+                yield _fallback_feedback(user_sentence, reason="AI returned invalid JSON")
+                return
+            yield _normalize_roleplay_feedback(data)
+    except Exception as e:
+        yield _fallback_feedback(user_sentence, reason=f"exception: {type(e).__name__}: {e}")
@@ -0,0 +1,118 @@
+# bot/services/ai_metrics.py
+"""
+In-process telemetry for AI calls.
+
+ai_client records every upstream call (observe_call): latency into a
+fixed-bucket histogram per (model, key), and the outcome (ok, error, quota
+error, timeout). ai_feedback records request-level events per call kind
+(note): a request started, a retry on the next key/model, every route
+exhausted, a response whose JSON could not be parsed.
+
+snapshot() joins these with the AI cache counters, the key pool and the token
+usage into one JSON-able dict. The bot publishes it to the ai_metrics table
+(bot.main), where the webapp's /api/metrics serves it. The two are separate
+processes, so the table is the hand-over.
+
+Keys are shortened to their last 4 characters everywhere.
+"""
+from __future__ import annotations
+
+import threading
+import time
+
+# upper bounds in seconds; the last bucket catches everything slower
+LATENCY_BUCKETS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 30.0, float("inf"))
+
+EVENTS = ("requests", "retries", "exhausted", "json_errors")
+
+_lock = threading.Lock()
+_calls: dict[tuple[str, str], dict] = {}    # (model, key suffix) -> counters + histogram
+_kinds: dict[str, dict] = {}                # call kind -> request events
+_started_at = time.time()
+
+
+def _key_label(api_key: str) -> str:
+    return f"...{(api_key or '')[-4:]}"
+
+
+def observe_call(model: str, api_key: str, seconds: float, *, error: Exception | None = None, quota: bool = False):
+    """One upstream call finished (or failed) after `seconds`."""
+    with _lock:
+        c = _calls.get((model, _key_label(api_key)))
+        if c is None:
+            c = _calls[(model, _key_label(api_key))] = {
+                "calls": 0,
+                "ok": 0,
+                "errors": 0,
+                "quota_errors": 0,
+                "timeouts": 0,
+                "latency_sum": 0.0,
+                "buckets": [0] * len(LATENCY_BUCKETS),
+            }
+        c["calls"] += 1
+        c["latency_sum"] += seconds
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                c["buckets"][i] += 1
+                break
+        if error is None:
+            c["ok"] += 1
+        elif quota:
+            c["quota_errors"] += 1
+        elif isinstance(error, TimeoutError):
+            c["timeouts"] += 1
+        else:
+            c["errors"] += 1
+
+
+def note(kind: str, event: str):
+    """Count a request-level event ("requests", "retries", "exhausted", "json_errors") for a call kind."""
+    with _lock:
+        k = _kinds.get(kind)
+        if k is None:
+            k = _kinds[kind] = dict.fromkeys(EVENTS, 0)
+        k[event] = k.get(event, 0) + 1
+
+
+def _quantile(buckets: list[int], q: float) -> float | None:
+    # upper bound of the bucket holding the q-quantile (None for the open last bucket)
+    total = sum(buckets)
+    if not total:
+        return None
+    rank = q * total
+    seen = 0
+    for bound, count in zip(LATENCY_BUCKETS, buckets):
+        seen += count
+        if seen >= rank:
+            return None if bound == float("inf") else bound
+    return None
+
+
+def snapshot() -> dict:
+    """Calls per model and key (with histogram and p50/p95 bounds) and events per kind."""
+    with _lock:
+        calls = {k: {**v, "buckets": list(v["buckets"])} for k, v in _calls.items()}
+        kinds = {k: dict(v) for k, v in _kinds.items()}
+    models: dict[str, dict] = {}
+    for (model, key), c in sorted(calls.items()):
+        c["latency_avg"] = round(c["latency_sum"] / c["calls"], 3) if c["calls"] else None
+        c["latency_sum"] = round(c["latency_sum"], 3)
+        c["p50"] = _quantile(c["buckets"], 0.5)
+        c["p95"] = _quantile(c["buckets"], 0.95)
+        c["buckets"] = {
+            ("+Inf" if bound == float("inf") else str(bound)): count
+            for bound, count in zip(LATENCY_BUCKETS, c["buckets"])
+        }
+        models.setdefault(model, {})[key] = c
+    return {
+        "started_at": _started_at,
+        "taken_at": time.time(),
+        "models": models,
+        "kinds": kinds,
+    }
+
+
+def reset():
+    with _lock:
+        _calls.clear()
+        _kinds.clear()
@@ -1,6 +1,7 @@
 # bot/services/dictionary_it.py
 from __future__ import annotations
 
+import functools
 import json
 import re
 from typing import Optional, Dict, Any
@@ -98,9 +99,16 @@ def validate_it_term(term: str) -> dict:
       {"ok": False, "suggestion": "..."} OR
       {"ok": False, "suggestion": None}
     """
+    ok, title = _validate_it_term(term)
+    if ok:
+        return {"ok": True, "title": title}
+    return {"ok": False, "suggestion": title}
+
+
+@functools.lru_cache(maxsize=4096)
+def _validate_it_term(term: str) -> tuple[bool, str | None]:
+    # Wiktionary answers rarely change; errors raise and are not cached
     hit = validate_it_title(term)
     if hit:
-        return {"ok": True, "title": hit["title"]}
-
-    sug = suggest_it_title(term)
-    return {"ok": False, "suggestion": sug}
+        return True, hit["title"]
+    return False, suggest_it_title(term)
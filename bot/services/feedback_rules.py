@@ -0,0 +1,433 @@
+# bot/services/feedback_rules.py
+"""
+Offline, deterministic sentence feedback: the instant tier in front of the AI.
+
+quick_feedback() checks a learner sentence in well under a millisecond, with
+no network, for the mistakes beginners make most:
+  - missing target term (anchors from bot.services.validation),
+  - accents written without (or with the wrong) accent: perche, piu, e',
+  - article form and gender: "la acqua", "il zaino", "una problema",
+  - noun/adjective agreement: "la casa bello", "la camera è pulito",
+  - subject/verb agreement: "io è", "io andare", "noi ha".
+
+Gender and number come from a small morphology table, extended per call with
+what the card's own chunk and context sentences show ("il biglietto" teaches
+that biglietto is masculine).
+
+The result has the same shape as generate_learn_feedback(), with
+provider="rules", so handlers can show it first and let the AI answer replace
+it when (and if) it arrives.
+"""
+from __future__ import annotations
+
+import re
+from typing import Any, Dict, Optional
+
+from bot.services.validation import normalize, tokens, validate_sentence
+
+# --- morphology tables --------------------------------------------------------
+
+# singular -> (gender, plural); plural == singular for invariable nouns
+NOUNS: dict[str, tuple[str, str]] = {
+    "acqua": ("f", "acque"), "aereo": ("m", "aerei"), "aeroporto": ("m", "aeroporti"),
+    "albergo": ("m", "alberghi"), "amica": ("f", "amiche"), "amico": ("m", "amici"),
+    "anno": ("m", "anni"), "autobus": ("m", "autobus"), "bagaglio": ("m", "bagagli"),
+    "bambina": ("f", "bambine"), "bambino": ("m", "bambini"), "bar": ("m", "bar"),
+    "biglietto": ("m", "biglietti"), "birra": ("f", "birre"), "caffè": ("m", "caffè"),
+    "camera": ("f", "camere"), "casa": ("f", "case"), "cena": ("f", "cene"),
+    "chiave": ("f", "chiavi"), "città": ("f", "città"), "colazione": ("f", "colazioni"),
+    "documento": ("m", "documenti"), "donna": ("f", "donne"), "euro": ("m", "euro"),
+    "famiglia": ("f", "famiglie"), "farmacia": ("f", "farmacie"), "figlia": ("f", "figlie"),
+    "figlio": ("m", "figli"), "foto": ("f", "foto"), "fratello": ("m", "fratelli"),
+    "gelato": ("m", "gelati"), "giornale": ("m", "giornali"), "giorno": ("m", "giorni"),
+    "gnocco": ("m", "gnocchi"), "informazione": ("f", "informazioni"), "latte": ("m", "latti"),
+    "libro": ("m", "libri"), "macchina": ("f", "macchine"), "madre": ("f", "madri"),
+    "mano": ("f", "mani"), "mattina": ("f", "mattine"), "menu": ("m", "menu"),
+    "mese": ("m", "mesi"), "negozio": ("m", "negozi"), "notte": ("f", "notti"),
+    "orologio": ("m", "orologi"), "ospedale": ("m", "ospedali"), "padre": ("m", "padri"),
+    "pane": ("m", "pani"), "passaporto": ("m", "passaporti"), "pasta": ("f", "paste"),
+    "piazza": ("f", "piazze"), "pizza": ("f", "pizze"), "prenotazione": ("f", "prenotazioni"),
+    "problema": ("m", "problemi"), "psicologo": ("m", "psicologi"), "radio": ("f", "radio"),
+    "ragazza": ("f", "ragazze"), "ragazzo": ("m", "ragazzi"), "ristorante": ("m", "ristoranti"),
+    "scuola": ("f", "scuole"), "sera": ("f", "sere"), "settimana": ("f", "settimane"),
+    "sorella": ("f", "sorelle"), "specchio": ("m", "specchi"), "sport": ("m", "sport"),
+    "stazione": ("f", "stazioni"), "strada": ("f", "strade"), "studente": ("m", "studenti"),
+    "tavolo": ("m", "tavoli"), "telefono": ("m", "telefoni"), "treno": ("m", "treni"),
+    "ufficio": ("m", "uffici"), "uomo": ("m", "uomini"),
+    "uscita": ("f", "uscite"), "valigia": ("f", "valigie"), "vino": ("m", "vini"),
+    "volo": ("m", "voli"), "zaino": ("m", "zaini"), "zio": ("m", "zii"),
+    "zucchero": ("m", "zuccheri"),
+}
+
+# adjective lemma -> (m sg, f sg, m pl, f pl)
+ADJECTIVES: dict[str, tuple[str, str, str, str]] = {}
+for _lemma in (
+    "alto", "americano", "aperto", "basso", "bello", "bravo", "caldo", "caro", "chiuso",
+    "contento", "corto", "famoso", "freddo", "giallo", "italiano", "libero", "nero",
+    "nuovo", "occupato", "piccolo", "pieno", "pronto", "pulito", "rosso", "stanco",
+    "tranquillo", "vecchio", "vuoto", "buono", "lungo", "bianco", "sporco", "simpatico",
+    "economico", "stretto", "ultimo", "primo",
+):
+    _stem = _lemma[:-1]
+    if _lemma.endswith(("co", "go")) and _lemma not in ("simpatico", "economico"):
+        _m_pl, _f_pl = _stem + "hi", _stem + "he"
+    elif _lemma.endswith("co"):
+        _m_pl, _f_pl = _stem[:-1] + "ci", _stem + "he"
+    elif _lemma.endswith("io"):
+        _m_pl, _f_pl = _stem, _stem + "e"
+    else:
+        _m_pl, _f_pl = _stem + "i", _stem + "e"
+    ADJECTIVES[_lemma] = (_lemma, _stem + "a", _m_pl, _f_pl)
+for _lemma in (
+    "grande", "verde", "interessante", "gentile", "facile", "difficile", "felice",
+    "veloce", "inglese", "francese", "importante", "dolce",
+):
+    ADJECTIVES[_lemma] = (_lemma, _lemma, _lemma[:-1] + "i", _lemma[:-1] + "i")
+
+# present tense: infinitive -> forms for io, tu, lui/lei, noi, voi, loro
+VERBS: dict[str, tuple[str, ...]] = {
+    "essere": ("sono", "sei", "è", "siamo", "siete", "sono"),
+    "avere": ("ho", "hai", "ha", "abbiamo", "avete", "hanno"),
+    "andare": ("vado", "vai", "va", "andiamo", "andate", "vanno"),
+    "fare": ("faccio", "fai", "fa", "facciamo", "fate", "fanno"),
+    "stare": ("sto", "stai", "sta", "stiamo", "state", "stanno"),
+    "volere": ("voglio", "vuoi", "vuole", "vogliamo", "volete", "vogliono"),
+    "potere": ("posso", "puoi", "può", "possiamo", "potete", "possono"),
+    "dovere": ("devo", "devi", "deve", "dobbiamo", "dovete", "devono"),
+    "venire": ("vengo", "vieni", "viene", "veniamo", "venite", "vengono"),
+    "dire": ("dico", "dici", "dice", "diciamo", "dite", "dicono"),
+    "sapere": ("so", "sai", "sa", "sappiamo", "sapete", "sanno"),
+    "uscire": ("esco", "esci", "esce", "usciamo", "uscite", "escono"),
+    "bere": ("bevo", "bevi", "beve", "beviamo", "bevete", "bevono"),
+    "dare": ("do", "dai", "dà", "diamo", "date", "danno"),
+}
+_ISC_VERBS = {"capire", "finire", "preferire", "pulire", "spedire", "costruire"}
+
+SUBJECTS = {"io": 0, "tu": 1, "lui": 2, "lei": 2, "noi": 3, "voi": 4, "loro": 5}
+_PRONOUN_GENDER = {"lui": ("m", "sg"), "lei": ("f", "sg")}
+# a pronoun right after one of these is its object, not the subject ("con lei", "per lui", "di lei")
+_PREPOSITIONS = {
+    "di", "a", "da", "in", "con", "su", "per", "tra", "fra",
+    "verso", "senza", "contro", "dopo", "secondo", "tranne", "presso",
+    *(p + a for p in ("de", "a", "da", "ne", "su") for a in ("l", "llo", "lla", "i", "gli", "lle", "ll'")),
+    "col", "coi",
+}
+# "lui e lei", "il vino e la pizza": a coordinated subject is plural, and the
+# rules can't tell its person/gender, so they leave it alone
+_CONJUNCTIONS = {"e", "ed", "o", "od", "né"}
+# words that may sit between a subject and its verb
+_CLITICS = {"non", "mi", "ti", "ci", "vi", "si", "lo", "la", "li", "le", "ne", "gli"}
+
+# written without an accent (or with the wrong one); never ambiguous
+ACCENTS = {
+    "perche": "perché", "perchè": "perché", "poiche": "poiché", "poichè": "poiché",
+    "benche": "benché", "benchè": "benché", "finche": "finché", "finchè": "finché",
+    "affinche": "affinché", "affinchè": "affinché", "piu": "più", "piú": "più",
+    "gia": "già", "cosi": "così", "cosí": "così", "puo": "può", "pero": "però",
+    "caffe": "caffè", "caffé": "caffè", "citta": "città", "universita": "università",
+    "eta": "età", "verita": "verità", "liberta": "libertà", "lunedi": "lunedì",
+    "martedi": "martedì", "mercoledi": "mercoledì", "giovedi": "giovedì",
+    "venerdi": "venerdì", "virtu": "virtù", "menù": "menu", "qualcosè": "qualcos'è",
+}
+# "e" after these elided words is the verb: c'è, dov'è, com'è, cos'è
+_E_AFTER = {"c'", "dov'", "com'", "cos'", "quest'", "quell'", "chi", "ch'"}
+
+_ARTICLES = {
+    # article -> (definite, gender or None, number)
+    "il": (True, "m", "sg"), "lo": (True, "m", "sg"), "la": (True, "f", "sg"),
+    "l'": (True, None, "sg"), "i": (True, "m", "pl"), "gli": (True, "m", "pl"),
+    "le": (True, "f", "pl"), "un": (False, "m", "sg"), "uno": (False, "m", "sg"),
+    "una": (False, "f", "sg"), "un'": (False, "f", "sg"),
+}
+_COPULA = {"è", "e'", "sono", "era", "erano", "sembra", "sembrano", "resta", "restano"}
+
+_WORD = re.compile(r"[^\W\d_]+'?")
+_VOWELS = "aeiouàèéìòóù"
+_H_WORDS = {"hotel"}   # h is silent: l'hotel
+
+
+def _starts_like_lo(word: str) -> bool:
+    """Masculine words that take lo/uno/gli: s+consonant, z, gn, ps, pn, x, y."""
+    w = word.lower()
+    return (
+        (len(w) > 1 and w[0] == "s" and w[1] not in _VOWELS)
+        or w[:1] in ("z", "x", "y")
+        or w[:2] in ("gn", "ps", "pn")
+    )
+
+
+def _starts_with_vowel(word: str) -> bool:
+    w = word.lower()
+    return w[:1] in _VOWELS or w in _H_WORDS
+
+
+def article_for(gender: str, number: str, next_word: str, definite: bool) -> str:
+    """The article form Italian uses before `next_word` (the word right after it)."""
+    vowel = _starts_with_vowel(next_word)
+    lo_like = _starts_like_lo(next_word)
+    if definite:
+        if number == "pl":
+            if gender == "f":
+                return "le"
+            return "gli" if vowel or lo_like else "i"
+        if vowel:
+            return "l'"
+        if gender == "f":
+            return "la"
+        return "lo" if lo_like else "il"
+    if gender == "f":
+        return "un'" if vowel else "una"
+    return "uno" if lo_like else "un"
+
+
+def _regular_present(infinitive: str) -> tuple[str, ...] | None:
+    if infinitive in VERBS:
+        return VERBS[infinitive]
+    if len(infinitive) < 5:
+        return None
+    stem, ending = infinitive[:-3], infinitive[-3:]
+    if ending == "are":
+        # cercare -> cerchi, mangiare -> mangi
+        tu = stem + ("hi" if stem.endswith(("c", "g")) else "i")
+        if stem.endswith("i"):
+            tu = stem
+        noi = stem + ("hiamo" if stem.endswith(("c", "g")) else "iamo")
+        if stem.endswith("i"):
+            noi = stem + "amo"
+        return (stem + "o", tu, stem + "a", noi, stem + "ate", stem + "ano")
+    if ending == "ere":
+        noi = stem + ("iamo" if not stem.endswith("i") else "amo")
+        return (stem + "o", stem + "i", stem + "e", noi, stem + "ete", stem + "ono")
+    if ending == "ire":
+        if infinitive in _ISC_VERBS:
+            return (stem + "isco", stem + "isci", stem + "isce", stem + "iamo", stem + "ite", stem + "iscono")
+        return (stem + "o", stem + "i", stem + "e", stem + "iamo", stem + "ite", stem + "ono")
+    return None
+
+
+_FORM_PERSONS: dict[str, set[int]] = {}
+for _forms in VERBS.values():
+    for _person, _form in enumerate(_forms):
+        _FORM_PERSONS.setdefault(_form, set()).add(_person)
+_FORM_VERB = {form: verb for verb, forms in VERBS.items() for form in forms}
+
+_NOUN_FORMS: dict[str, tuple[str, str | None]] = {}   # form -> (gender, number or None if invariable)
+for _sg, (_gender, _pl) in NOUNS.items():
+    if _sg == _pl:
+        _NOUN_FORMS[_sg] = (_gender, None)
+    else:
+        _NOUN_FORMS[_sg] = (_gender, "sg")
+        _NOUN_FORMS[_pl] = (_gender, "pl")
+
+_ADJ_FORMS: dict[str, str] = {}   # any form -> lemma
+for _lemma, _forms in ADJECTIVES.items():
+    for _form in _forms:
+        _ADJ_FORMS.setdefault(_form, _lemma)
+
+
+def _adjective(lemma: str, gender: str, number: str) -> str:
+    m_sg, f_sg, m_pl, f_pl = ADJECTIVES[lemma]
+    if number == "pl":
+        return f_pl if gender == "f" else m_pl
+    return f_sg if gender == "f" else m_sg
+
+
+def _learn_nouns(texts: list[str]) -> dict[str, tuple[str, str | None]]:
+    """Gender/number of nouns seen right after an unambiguous article in the card's own texts."""
+    learned: dict[str, tuple[str, str | None]] = {}
+    for text in texts:
+        words = [m.group(0).lower() for m in _WORD.finditer(text or "")]
+        for art, word in zip(words, words[1:]):
+            info = _ARTICLES.get(art)
+            if not info or info[1] is None or word in _ARTICLES or word in _ADJ_FORMS:
+                continue
+            if word in _FORM_PERSONS or art in ("lo", "la", "le"):
+                continue   # lo/la/le before a verb are pronouns, not articles
+            learned.setdefault(word, (info[1], info[2]))
+    return learned
+
+
+def _term_forms(term: str) -> set[str]:
+    """Inflected forms of a one-word term we can generate (verb present, noun plural, adjective)."""
+    word = normalize(term)
+    forms = {word}
+    if " " in word:
+        return forms
+    present = _regular_present(word) if word.endswith(("are", "ere", "ire")) else None
+    forms.update(normalize(f) for f in present or ())
+    if word in NOUNS:
+        forms.add(normalize(NOUNS[word][1]))
+    if word in ADJECTIVES:
+        forms.update(ADJECTIVES[word])
+    return forms
+
+
+def _uses_term(term: str, sentence: str) -> bool:
+    if set(tokens(sentence)) & _term_forms(term):
+        return True
+    ok, _ = validate_sentence(sentence, term, min_hits=1)
+    return ok
+
+
+def _match_case(original: str, replacement: str) -> str:
+    if original[:1].isupper():
+        return replacement[:1].upper() + replacement[1:]
+    return replacement
+
+
+def quick_feedback(
+    *,
+    term: str,
+    user_sentence: str,
+    chunk: Optional[str] = None,
+    contexts: Optional[list[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Rule-based feedback for one learner sentence. Same keys as the AI feedback;
+    "correction" is the corrected sentence when any rule fired, else None.
+    """
+    sentence = (user_sentence or "").strip()
+    words = [(m.start(), m.end(), m.group(0)) for m in _WORD.finditer(sentence)]
+    lower = [w.lower() for _, _, w in words]
+    nouns = dict(_NOUN_FORMS)
+    nouns.update({k: v for k, v in _learn_nouns([chunk or "", *(contexts or [])]).items() if k not in nouns})
+
+    edits: dict[int, tuple[int, int, str]] = {}   # start -> (start, end, replacement)
+    why: list[str] = []
+
+    def edit(i: int, replacement: str, reason: str, upto: int | None = None):
+        start, end, original = words[i]
+        if upto is not None:
+            end = words[upto][0]   # article + the space/apostrophe before the noun
+        if start in edits:
+            return
+        edits[start] = (start, end, _match_case(original, replacement))
+        if reason not in why:
+            why.append(reason)
+
+    # accents
+    for i, w in enumerate(lower):
+        if w in ACCENTS:
+            edit(i, ACCENTS[w], f"“{words[i][2]}” is written “{ACCENTS[w]}”.")
+        elif w == "e'":
+            edit(i, "è", "“is” is written “è” (with the accent), not e'.")
+        elif w == "e" and i > 0 and lower[i - 1] in _E_AFTER:
+            edit(i, "è", f"“{words[i - 1][2]}e” → “{words[i - 1][2]}è”: here “è” is the verb “is”.")
+
+    # articles, then adjectives agreeing with the noun
+    noun_at: dict[int, tuple[str, str]] = {}   # word index -> (gender, number) of a noun phrase
+    for i in range(len(words) - 1):
+        info = _ARTICLES.get(lower[i])
+        noun = nouns.get(lower[i + 1])
+        if not info or not noun:
+            continue
+        definite, art_gender, art_number = info
+        gender, number = noun
+        number = number or art_number   # invariable noun: trust the article's number
+        noun_at[i + 1] = (gender, number)
+        expected = article_for(gender, number, lower[i + 1], definite)
+        if expected != lower[i]:
+            article_text = expected if expected.endswith("'") else expected + " "
+            edit(
+                i,
+                article_text,
+                f"“{lower[i + 1]}” is {'feminine' if gender == 'f' else 'masculine'}"
+                f"{' plural' if number == 'pl' else ''}: “{expected}{'' if expected.endswith(chr(39)) else ' '}{lower[i + 1]}”.",
+                upto=i + 1,
+            )
+    for i, w in enumerate(lower):
+        if i not in noun_at and w in nouns and nouns[w][1]:
+            noun_at[i] = nouns[w]
+
+    def head_of_subject(i: int) -> bool:
+        # the noun (or its article) must not follow a preposition ("la pizza con il vino")
+        # or a conjunction ("il vino e la pizza"): then it is not the subject of the verb
+        start = i - 1 if i > 0 and lower[i - 1] in _ARTICLES else i
+        before = {lower[k] for k in (start - 1, i - 1) if k >= 0}
+        return not before & (_PREPOSITIONS | _CONJUNCTIONS)
+
+    for i, (gender, number) in noun_at.items():
+        # noun + adjective, or noun + è/sono + adjective
+        for j in (i + 1, i + 2):
+            if j >= len(words):
+                break
+            if j == i + 2 and (lower[i + 1] not in _COPULA or not head_of_subject(i)):
+                break
+            lemma = _ADJ_FORMS.get(lower[j])
+            if not lemma:
+                continue
+            expected = _adjective(lemma, gender, number)
+            if expected != lower[j]:
+                edit(j, expected, f"“{lower[j]}” must agree with “{lower[i]}”: “{expected}”.")
+            break
+
+    # subject pronoun + verb
+    for i, w in enumerate(lower):
+        person = SUBJECTS.get(w)
+        if person is None or (i > 0 and lower[i - 1] in _PREPOSITIONS | _CONJUNCTIONS):
+            continue
+        if (
+            i + 2 < len(words) and lower[i + 1] in _CONJUNCTIONS
+            and (lower[i + 2] in SUBJECTS or lower[i + 2] in _ARTICLES or lower[i + 2] in nouns
+                 or words[i + 2][2][:1].isupper())
+        ):
+            continue   # "io e lui …", "lui e Maria …": coordinated subject
+        j = i + 1
+        while j < len(words) and lower[j] in _CLITICS:
+            j += 1
+        if j >= len(words):
+            continue
+        v = lower[j]
+        if v in _FORM_PERSONS and person not in _FORM_PERSONS[v]:
+            verb = _FORM_VERB[v]
+            expected = VERBS[verb][person]
+            edit(j, expected, f"with “{w}” the verb is “{expected}” ({verb}).")
+        elif v == "e" and person == 2 and j == i + 1 and j + 1 < len(words) and _ADJ_FORMS.get(lower[j + 1]):
+            edit(j, "è", f"“{w} e …” → “{w} è …”: “è” is the verb “is”.")
+        elif v.endswith(("are", "ere", "ire")) and len(v) > 4:
+            forms = _regular_present(v)
+            if forms:
+                edit(j, forms[person], f"conjugate the verb: “{w} {forms[person]}”, not “{w} {v}”.")
+        # pronoun + è + adjective agreement (lui/lei only: gender is known)
+        if w in _PRONOUN_GENDER and j + 1 < len(words) and lower[j] in ("è", "e'", "e"):
+            lemma = _ADJ_FORMS.get(lower[j + 1])
+            if lemma:
+                g, n = _PRONOUN_GENDER[w]
+                expected = _adjective(lemma, g, n)
+                if expected != lower[j + 1]:
+                    edit(j + 1, expected, f"“{lower[j + 1]}” must agree with “{w}”: “{expected}”.")
+
+    correction = None
+    if edits:
+        out = sentence
+        for start, end, replacement in sorted(edits.values(), reverse=True):
+            out = out[:start] + replacement + out[end:]
+        correction = out
+
+    grammar_notes = []
+    if term and not _uses_term(term, sentence):
+        grammar_notes.append(f"Use “{term}” in your sentence — that's the point of this card.")
+
+    examples = [c for c in (contexts or []) if c][:3]
+    if not examples and chunk:
+        examples = [chunk]
+    while len(examples) < 3:
+        examples.append("")
+
+    if correction:
+        notes = "Quick check: " + ("1 thing to fix." if len(edits) == 1 else f"{len(edits)} things to fix.")
+    elif grammar_notes:
+        notes = grammar_notes[0]
+    else:
+        notes = "No common mistakes found."
+
+    return {
+        "ok": True,
+        "correction": correction,
+        "rewrite": None,
+        "why": why[:2],
+        "grammar_notes": grammar_notes[:2],
+        "notes": notes,
+        "examples": examples,
+        "provider": "rules",
+    }
@@ -0,0 +1,148 @@
+# bot/services/learn_prefetch.py
+"""
+Speculative preparation of a user's next learn card.
+
+Building a learn card is a chain of lookups: pick the next new item, a
+context sentence, the holographic meta, the lexicon entry (Wiktionary on a
+cold cache), distractors and the offline quiz. prepare() does that chain;
+bot.handlers.learn calls it for the card it is about to show.
+
+Right after card N is sent, schedule() runs prepare() for card N+1 in the
+background (and renders its pronunciation into the TTS disk cache), while the
+user is still answering. take() hands the staged card over when the handler
+needs it. It awaits the prefetch if it is still running, and drops it if the
+user's next pick is no longer the staged item (switched pack, reloaded
+packs, a card skipped elsewhere).
+
+Nothing with side effects is staged: the review row, progress counters and
+the session are still written by the handler when the card is actually shown.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from bot import db_async as db
+from bot.services.ai_feedback import generate_reverse_context_quiz
+from bot.services.lexicon_it import get_or_fetch_lexicon_it
+from bot.services.tts_edge import tts_it
+
+logger = logging.getLogger(__name__)
+
+_tasks: dict[int, asyncio.Task] = {}   # user_id -> prefetch of their next card
+
+
+async def _pick(user_id: int, target: str, pack_id: str | None):
+    if pack_id:
+        return await db.pick_next_new_item_for_user_in_pack(user_id, pack_id)
+    return await db.pick_next_new_item_for_user(user_id, target_language=target)
+
+
+async def prepare(user_id: int, target: str, pack_id: str | None) -> dict | None:
+    """
+    Everything the next learn card needs, or None when there is no new item:
+    {"item", "pack_id", "ctx_it", "holo", "lexicon", "distractors", "quiz", "pack_info"}.
+    """
+    item = await _pick(user_id, target, pack_id)
+    if not item:
+        return None
+
+    # Support older tuple shapes
+    if len(item) >= 7:
+        item_id, term, chunk, translation_en, note, pack_id_row, focus = item[:7]
+    else:
+        item_id, term, chunk, translation_en, note = item[:5]
+        pack_id_row = None
+    if not pack_id and pack_id_row:
+        pack_id = pack_id_row
+
+    # the Wiktionary lookup (network on a cold cache) overlaps the DB reads
+    lexicon_fetch = asyncio.ensure_future(asyncio.to_thread(get_or_fetch_lexicon_it, term))
+    ctx_it = await db.get_random_context_for_item(item_id)
+    holo = await db.get_item_holographic_meta(item_id)
+    if pack_id:
+        distractors = await db.get_random_meanings_from_pack(pack_id, item_id, limit=2)
+    else:
+        distractors = await db.get_random_meanings_from_active_packs(user_id, target, item_id, limit=2)
+    pack_info = await db.get_pack_info(pack_id) if pack_id else None
+    try:
+        await lexicon_fetch
+    except Exception:
+        pass
+    lexicon = await db.get_lexicon_cache_it(term)
+
+    quiz = await generate_reverse_context_quiz(
+        term=term,
+        chunk=chunk,
+        translation_en=translation_en,
+        lexicon=lexicon,
+        context_it=ctx_it,
+        distractors_en=distractors,
+    )
+    return {
+        "item": item,
+        "pack_id": pack_id,
+        "ctx_it": ctx_it,
+        "holo": holo,
+        "lexicon": lexicon,
+        "distractors": distractors,
+        "quiz": quiz,
+        "pack_info": pack_info,
+    }
+
+
+async def _prefetch(user_id: int, target: str, pack_id: str | None) -> dict | None:
+    card = await prepare(user_id, target, pack_id)
+    if card:
+        term = (card["item"][1] or "").strip()
+        if term:
+            try:
+                await tts_it(term)   # warms the disk cache for the 🔊 button
+            except Exception:
+                logger.debug("TTS prefetch failed for %r", term, exc_info=True)
+    return card
+
+
+def schedule(user_id: int, target: str, pack_id: str | None):
+    """Start preparing the user's next card in the background (replaces any older prefetch)."""
+    cancel(user_id)
+    task = asyncio.ensure_future(_prefetch(user_id, target, pack_id))
+    task.add_done_callback(_log_failure)
+    _tasks[user_id] = task
+
+
+async def take(user_id: int, target: str, pack_id: str | None) -> dict | None:
+    """
+    The staged card if it is what prepare(user_id, target, pack_id) would build
+    now, else None. Costs one pick query to confirm the staged item is still next.
+    """
+    task = _tasks.pop(user_id, None)
+    if task is None:
+        return None
+    try:
+        card = await task
+    except asyncio.CancelledError:
+        # our own handler being cancelled (shutdown) must still propagate
+        current = asyncio.current_task()
+        if current is not None and current.cancelling():
+            raise
+        return None
+    except Exception:
+        return None
+    if not card or (pack_id and card["pack_id"] != pack_id):
+        return None
+    item = await _pick(user_id, target, pack_id)
+    if not item or item[0] != card["item"][0]:
+        return None
+    return card
+
+
+def cancel(user_id: int):
+    task = _tasks.pop(user_id, None)
+    if task is not None:
+        task.cancel()
+
+
+def _log_failure(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning("Learn card prefetch failed", exc_info=task.exception())
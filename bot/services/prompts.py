@@ -0,0 +1,325 @@
+# bot/services/prompts.py
+"""
+Prompt builder for bot.services.ai_feedback.
+
+Every call type ("kind") is split into
+  - a fixed system instruction (role, rules, JSON schema): identical on every
+    call, so it is sent as the model's system_instruction and can be served
+    from a shared context cache (see ai_client.generate_content), and
+  - a short per-call part with only the fields that change.
+
+The per-call part has a token budget (PROMPT_BUDGETS, estimated at ~4 chars
+per token). Free-text fields are clipped, longest first, until it fits, so a
+pasted paragraph can't blow up latency or quota. Real prompt/response token
+counts come back in the response's usage metadata and are logged and summed
+per kind by ai_client (usage_stats()); compare them with the budgets here
+when tuning.
+
+Lexicon payloads are not dumped verbatim: compact_lexicon() keeps only the
+facts the prompts use (does the dictionary know the word, under which title,
+what it suggests otherwise, and the few sense/grammar fields if present).
+"""
+from __future__ import annotations
+
+import os
+from typing import Optional
+
+CHARS_PER_TOKEN = 4
+
+# estimated tokens for the per-call part of each prompt (system part excluded)
+PROMPT_BUDGETS = {
+    "learn_feedback": 220,
+    "roleplay_feedback": 220,
+    "sentence_upgrade": 120,
+    "word_card": 60,
+    "conjugation": 30,
+    "phrase_scenario": 90,
+    "reverse_quiz": 200,
+}
+for _kind in PROMPT_BUDGETS:
+    _env = os.getenv(f"PROMPT_BUDGET_{_kind.upper()}")
+    if _env:
+        PROMPT_BUDGETS[_kind] = int(_env)
+
+_MIN_FIELD_CHARS = 40
+
+SYSTEM = {
+    "learn_feedback": """
+You are a professional Italian tutor. The user is a BEGINNER practicing a WORD
+in a free sentence (any person or tense). Help naturally, never overcorrect.
+
+RULES:
+1) Keep the user's grammatical person/subject unless the sentence is impossible.
+2) Acceptable Italian gets correction = null. "correction" is ONLY for real
+   grammar/spelling errors, as a minimal fix (articles, prepositions, verb form, spelling).
+3) Style (politeness, register, naturalness) goes in optional "rewrite", same meaning.
+4) Never invent meanings. LEXICON facts are ground truth; if missing or uncertain,
+   say so briefly in notes.
+5) If correction is null, why = [] and grammar_notes = [].
+6) why: max 2 one-sentence items. grammar_notes: max 2, short, practical.
+7) notes: max 2 short lines (meaning, register or a real-life tip).
+8) examples: exactly 3 short natural Italian sentences with the SAME meaning of the word.
+Be supportive and practical; no grammar lectures.
+
+Output valid JSON ONLY, exactly these keys:
+{"correction": string|null, "rewrite": string|null, "why": [string],
+ "grammar_notes": [{"issue": string, "explain": string, "example": string}],
+ "notes": string, "examples": [string, string, string]}
+""".strip(),
+    "roleplay_feedback": """
+You are a friendly native Italian tutor in a roleplay with a beginner.
+
+RULES:
+- If an expected phrase is given, ok=false when the user did not use it (or a clear
+  equivalent); then notes briefly say to use it. Accept minor typos or extra words.
+- Keep correction minimal; acceptable Italian is not corrected.
+- rewrite is optional (more natural, same meaning). notes max 2 short lines.
+- examples: exactly 3 short sentences. tips and grammar: max 2 bullets each, only if helpful.
+- Write notes/tips/grammar in the OUTPUT language; if a SECOND language is given,
+  add a second line in it, each line prefixed with its code (e.g. "EN:" / "FA:").
+
+Return JSON ONLY:
+{"ok": true/false, "correction": string|null, "rewrite": string|null, "notes": string,
+ "examples": [string, string, string], "tips": [string], "grammar": [string]}
+""".strip(),
+    "sentence_upgrade": """
+You are an Italian tutor. Improve a learner sentence that uses a given term.
+
+Return JSON only:
+{"ok": true, "better": "corrected or more natural same-level sentence",
+ "level_up": "more natural version at the target level",
+ "native_sentence": "native-like sentence using the term",
+ "tip": "one short tip for improvement"}
+""".strip(),
+    "word_card": """
+You are a professional Italian tutor. Return a compact word/phrase card in JSON only.
+
+Rules:
+- Italian first, then English, then the helper language. Short and practical.
+- Multiple meanings go in "senses".
+- Exactly 3 examples, each with it + en + helper.
+- A short grammar note only if relevant; for a verb (focus=word) add a short
+  present-tense conjugation note.
+- suggested_categories: 2-4 of Verbs, Travel, Food & Drink, Shopping, Daily Life,
+  Work & Study, Emotions, Time & Dates, Politeness, General.
+- risk is "safe" unless clearly risky slang.
+
+JSON schema:
+{"ok": true, "term": "...", "focus": "word|phrase", "meaning_en": "...", "meaning_helper": "...",
+ "senses": [{"meaning_en": "...", "meaning_helper": "...", "usage": "..."}],
+ "examples": [{"it": "...", "en": "...", "helper": "..."}],
+ "grammar": "...", "conjugation": "...", "cultural_note": "...", "native_sauce": "...",
+ "trap": "...", "register": "neutral|polite|slang", "risk": "safe|caution|avoid",
+ "suggested_categories": ["...", "..."]}
+""".strip(),
+    "conjugation": """
+You are an Italian tutor. Conjugate the verb in the given tense.
+
+Return JSON only:
+{"ok": true, "tense": "<the tense>",
+ "conjugation": "io ...\\ntu ...\\nlui/lei ...\\nnoi ...\\nvoi ...\\nloro ..."}
+""".strip(),
+    "phrase_scenario": """
+Create a very short mini-scene to practice an Italian phrase.
+Tone: funny but real-life (not absurd). Keep vocabulary and structure at the given level.
+
+Output JSON only:
+{"ok": true, "setting": "one short line", "npc_line": "one short line",
+ "task": "what the user should say", "hint": "short hint",
+ "meaning_en": "short meaning in English", "meaning_helper": "short meaning in helper language"}
+""".strip(),
+    "reverse_quiz": """
+Create a reverse-context meaning quiz for an Italian beginner.
+
+RULES:
+- If a FIXED CONTEXT is given, use it as "context_it" exactly.
+- The quiz is ONLY about the TERM's meaning, not the related chunk; if the hint is
+  chunk-specific (e.g. "to go home" for andare), ignore it and quiz the term ("to go").
+- The context sentence must clearly support the term's meaning.
+- Exactly 3 English options, exactly one correct. GROUNDING facts are truth.
+
+Output valid JSON only:
+{"context_it": "...", "meaning_en": "...", "options_en": ["...", "...", "..."],
+ "correct_index": 0, "clue": "short explanation of the clue"}
+""".strip(),
+}
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text or "") + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _clip(text: str, max_chars: int) -> str:
+    text = " ".join((text or "").split())
+    if len(text) <= max_chars:
+        return text
+    return text[: max(0, max_chars - 1)].rstrip() + "…"
+
+
+def _fit(kind: str, template: str, fields: dict[str, str], trimmable: tuple[str, ...]) -> str:
+    """template.format(**fields), clipping `trimmable` fields (longest first) to the kind's budget."""
+    fields = {k: " ".join(str(v or "").split()) for k, v in fields.items()}
+    budget = PROMPT_BUDGETS[kind]
+    text = template.format(**fields)
+    while estimate_tokens(text) > budget:
+        name = max(trimmable, key=lambda k: len(fields[k]))
+        current = len(fields[name])
+        if current <= _MIN_FIELD_CHARS:
+            break   # nothing sensible left to cut; go over budget rather than lose the input
+        excess = (estimate_tokens(text) - budget) * CHARS_PER_TOKEN
+        fields[name] = _clip(fields[name], max(_MIN_FIELD_CHARS, current - excess, current // 2))
+        text = template.format(**fields)
+    return text
+
+
+def compact_lexicon(lexicon: Optional[dict]) -> str:
+    """
+    The dictionary facts the prompts use, as one short line. Accepts a
+    lexicon_cache_it row or a bare validate_it_term() result.
+    """
+    if not lexicon:
+        return "(none)"
+    validation = lexicon.get("validation") if isinstance(lexicon.get("validation"), dict) else lexicon
+    parts = []
+    source = lexicon.get("source") or "dictionary"
+    if validation.get("ok") and validation.get("title"):
+        parts.append(f'{source} has an entry "{validation["title"]}"')
+    elif validation.get("ok") is False:
+        suggestion = validation.get("suggestion")
+        parts.append(f'{source} has no entry' + (f'; closest "{suggestion}"' if suggestion else ""))
+    if lexicon.get("error"):
+        parts.append("lookup failed")
+    for key in ("pos", "gender", "ipa"):
+        if lexicon.get(key):
+            parts.append(f"{key}: {_clip(str(lexicon[key]), 40)}")
+    senses = lexicon.get("senses")
+    if isinstance(senses, list) and senses:
+        glosses = [_clip(s if isinstance(s, str) else str(s.get("gloss") or s.get("meaning") or ""), 60) for s in senses[:2]]
+        glosses = [g for g in glosses if g]
+        if glosses:
+            parts.append("senses: " + "; ".join(glosses))
+    return ". ".join(parts) if parts else "(none)"
+
+
+def learn_feedback(
+    *,
+    term: str,
+    chunk: Optional[str],
+    translation_en: Optional[str],
+    user_sentence: str,
+    lexicon: Optional[dict],
+) -> tuple[str, str]:
+    user = _fit(
+        "learn_feedback",
+        'Target word: "{term}"\n'
+        'Related chunk (reference only): "{chunk}"\n'
+        'English hint: "{hint}"\n'
+        "LEXICON: {lexicon}\n"
+        'User sentence: "{sentence}"',
+        {
+            "term": term,
+            "chunk": chunk or "",
+            "hint": translation_en or "",
+            "lexicon": compact_lexicon(lexicon),
+            "sentence": user_sentence,
+        },
+        ("sentence", "chunk", "hint", "lexicon"),
+    )
+    return SYSTEM["learn_feedback"], user
+
+
+def roleplay_feedback(
+    *,
+    user_sentence: str,
+    setting: str,
+    bot_role: str,
+    expected_phrase: Optional[str],
+    ui_language: str,
+    helper_language: Optional[str],
+) -> tuple[str, str]:
+    user = _fit(
+        "roleplay_feedback",
+        "Setting: {setting}\n"
+        "Bot role: {role}\n"
+        "Expected phrase: {expected}\n"
+        "OUTPUT language: {lang}\n"
+        "SECOND language: {helper}\n"
+        'User message: "{sentence}"',
+        {
+            "setting": setting,
+            "role": bot_role,
+            "expected": (expected_phrase or "").strip() or "(none)",
+            "lang": ui_language or "en",
+            "helper": helper_language or "(none)",
+            "sentence": user_sentence,
+        },
+        ("sentence", "setting", "expected", "role"),
+    )
+    return SYSTEM["roleplay_feedback"], user
+
+
+def sentence_upgrade(*, term: str, user_sentence: str, level_from: str, level_to: str) -> tuple[str, str]:
+    user = _fit(
+        "sentence_upgrade",
+        'TERM: "{term}"\nLearner sentence: "{sentence}"\nLearner level: {level_from}\nTarget level: {level_to}',
+        {"term": term, "sentence": user_sentence, "level_from": level_from, "level_to": level_to},
+        ("sentence",),
+    )
+    return SYSTEM["sentence_upgrade"], user
+
+
+def word_card(*, term: str, focus: str, helper_language: str) -> tuple[str, str]:
+    user = _fit(
+        "word_card",
+        'TERM: "{term}"\nFOCUS: {focus}\nHELPER LANGUAGE: {helper}',
+        {"term": term, "focus": focus, "helper": helper_language},
+        ("term",),
+    )
+    return SYSTEM["word_card"], user
+
+
+def conjugation(*, term: str, tense: str) -> tuple[str, str]:
+    user = _fit(
+        "conjugation",
+        'Verb: "{term}"\nTense: "{tense}"',
+        {"term": term, "tense": tense},
+        ("term", "tense"),
+    )
+    return SYSTEM["conjugation"], user
+
+
+def phrase_scenario(*, term: str, meaning_en: Optional[str], level: str) -> tuple[str, str]:
+    user = _fit(
+        "phrase_scenario",
+        'Level: {level}\nPHRASE: "{term}"\nMeaning (EN): "{meaning}"',
+        {"level": level, "term": term, "meaning": meaning_en or ""},
+        ("meaning", "term"),
+    )
+    return SYSTEM["phrase_scenario"], user
+
+
+def reverse_quiz(
+    *,
+    term: str,
+    chunk: Optional[str],
+    translation_en: Optional[str],
+    lexicon: Optional[dict],
+    context_it: Optional[str],
+) -> tuple[str, str]:
+    user = _fit(
+        "reverse_quiz",
+        'FIXED CONTEXT: "{context}"\n'
+        'TERM: "{term}"\n'
+        'Related chunk (reference only): "{chunk}"\n'
+        'English hint (may describe the chunk): "{hint}"\n'
+        "GROUNDING: {lexicon}",
+        {
+            "context": context_it or "",
+            "term": term,
+            "chunk": chunk or "",
+            "hint": translation_en or "",
+            "lexicon": compact_lexicon(lexicon),
+        },
+        ("context", "chunk", "hint", "lexicon"),
+    )
+    return SYSTEM["reverse_quiz"], user
@@ -0,0 +1,120 @@
+# bot/services/tts_bank.py
+"""
+Pre-rendered pronunciation audio.
+
+tts_it() renders lazily, so the first user to tap 🔊 on a phrase waits for an
+edge-tts round trip. prerender() fills the same disk cache ahead of time for
+every text a card or scenario can be spoken with:
+  - pack_items term, chunk and pronunciation_text,
+  - scenario expected_phrase (data/scenarios),
+  - the /ttscheck sample sentence.
+
+Rendering is bounded (TTS_PRERENDER_CONCURRENCY at a time) and resumable:
+texts whose audio is already cached are skipped without a network call, so
+an interrupted run just continues where it stopped.
+
+Run it offline with `python -m bot.tools.prerender_tts`, or let the bot do it
+in the background for freshly imported packs (TTS_PRERENDER_ON_IMPORT=1).
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Callable, Iterable
+
+from bot import db
+from bot.scenarios import _pack_key_for_id, load_scenarios
+from bot.services.tts_edge import cached_path, tts_it
+
+TTS_PRERENDER_CONCURRENCY = int(os.getenv("TTS_PRERENDER_CONCURRENCY", "4"))
+TTS_PRERENDER_ON_IMPORT = os.getenv("TTS_PRERENDER_ON_IMPORT", "0") == "1"
+
+# spoken by /ttscheck and its Retry button
+TTS_CHECK_TEXT = "Ciao! Questo è un test."
+
+logger = logging.getLogger(__name__)
+
+
+def _expected_phrases(node: Any) -> Iterable[str]:
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if key == "expected_phrase" and isinstance(value, str):
+                yield value
+            else:
+                yield from _expected_phrases(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _expected_phrases(value)
+
+
+def collect_texts(pack_ids: list[str] | None = None) -> list[str]:
+    """Distinct texts to render; limited to the given packs (and their scenarios) when pack_ids is set."""
+    texts = db.get_pronunciation_texts(pack_ids)
+    pack_keys = {_pack_key_for_id(pid) for pid in pack_ids} if pack_ids else None
+    for scenario in load_scenarios():
+        if pack_keys is not None and scenario.get("pack_key") not in pack_keys:
+            continue
+        texts.extend(_expected_phrases(scenario.get("turns") or []))
+    if not pack_ids:
+        texts.append(TTS_CHECK_TEXT)
+
+    seen = set()
+    out = []
+    for text in texts:
+        text = (text or "").strip()
+        if text and text not in seen:
+            seen.add(text)
+            out.append(text)
+    return out
+
+
+async def prerender(
+    texts: list[str],
+    *,
+    concurrency: int | None = None,
+    progress: Callable[[dict], None] | None = None,
+) -> dict:
+    """
+    Render every text that is not cached yet. progress(counts) is called after
+    each text; counts = {"total", "done", "cached", "rendered", "failed",
+    "elapsed"}. Failures are logged and counted, never raised.
+    """
+    counts = {"total": len(texts), "done": 0, "cached": 0, "rendered": 0, "failed": 0, "elapsed": 0.0}
+    started = time.monotonic()
+    semaphore = asyncio.Semaphore(max(1, concurrency or TTS_PRERENDER_CONCURRENCY))
+
+    async def render(text: str):
+        if cached_path(text) is not None:
+            counts["cached"] += 1
+        else:
+            async with semaphore:
+                try:
+                    await tts_it(text)
+                    counts["rendered"] += 1
+                except Exception as e:
+                    counts["failed"] += 1
+                    logger.warning("TTS pre-render failed for %r: %s", text, e)
+        counts["done"] += 1
+        counts["elapsed"] = time.monotonic() - started
+        if progress is not None:
+            progress(dict(counts))
+
+    await asyncio.gather(*(render(text) for text in texts))
+    counts["elapsed"] = time.monotonic() - started
+    return counts
+
+
+async def prerender_packs(pack_ids: list[str]):
+    """Background pre-render for packs the bot just imported (TTS_PRERENDER_ON_IMPORT)."""
+    texts = await asyncio.to_thread(collect_texts, pack_ids)
+    missing = [t for t in texts if cached_path(t) is None]
+    if not missing:
+        return
+    logger.info("TTS pre-render: %d of %d texts for %d packs", len(missing), len(texts), len(pack_ids))
+    counts = await prerender(missing)
+    logger.info(
+        "TTS pre-render done: %d rendered, %d failed in %.1fs",
+        counts["rendered"], counts["failed"], counts["elapsed"],
+    )
@@ -1,38 +1,150 @@
 # bot/services/tts_edge.py
+"""
+Italian text-to-speech with a disk cache (bot_cache/tts).
+
+The renderer is pluggable (TTS_ENGINE, see ENGINES):
+  - edge (default): edge-tts, WAV where the installed version accepts
+    output_format, MP3 otherwise (edge-tts 7.x);
+  - tone: bot.services.tts_tone, a local deterministic stand-in for CI, load
+    tests and `python -m bot.tools.bench_tts`. No network, no edge-tts.
+An engine maps a text to (suffix, save), save(path) being a coroutine that
+writes the clip; caching, transcoding and eviction are shared. The engine is
+part of the cache key, so stand-in clips never answer for real ones.
+
+With TTS_CODEC=opus (the default) and ffmpeg on
+PATH the clip is then transcoded to Opus in OGG: Telegram's native voice
+format and roughly a tenth of the WAV size. Without ffmpeg, or with
+TTS_CODEC=native, the edge-tts output is kept as is.
+
+The cache has a disk budget (TTS_CACHE_MAX_MB). Every cache hit bumps the
+file's access time explicitly (relatime/noatime mounts don't), and when the
+directory grows past the budget the least recently used clips are removed
+down to TTS_CACHE_LOW_WATER of it. Evicted clips that were already sent keep
+working through their Telegram file_id (bot.utils.tts).
+
+Concurrent taps on the same phrase share one render (single flight per cache
+key), at most TTS_MAX_CONCURRENCY renders run at once, and every file is
+written under a temporary dot-name and renamed into place, so a reader never
+sees a half-written clip.
+
+verify_cache() and evict() back the maintenance command
+`python -m bot.tools.tts_cache`.
+"""
 from __future__ import annotations
 
+import asyncio
 import os
 import logging
+import shutil
+import time
+import uuid
 from pathlib import Path
 import hashlib
-import edge_tts
+from typing import Awaitable, Callable
+
+from bot.services import tts_tone
 
 CACHE_DIR = Path("bot_cache/tts")
 CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
+TTS_ENGINE = os.getenv("TTS_ENGINE", "edge").strip().lower()      # edge | tone
 VOICE_IT = os.getenv("TTS_VOICE_IT", "it-IT-DiegoNeural")
 
 # ✅ WAV PCM (most compatible with Telegram)
 OUTPUT_FORMAT = "riff-16khz-16bit-mono-pcm"
 
+TTS_CODEC = os.getenv("TTS_CODEC", "opus").strip().lower()          # opus | native
+TTS_OPUS_BITRATE = os.getenv("TTS_OPUS_BITRATE", "24k")
+TTS_CACHE_MAX_BYTES = int(float(os.getenv("TTS_CACHE_MAX_MB", "500")) * 1024 * 1024)
+TTS_CACHE_LOW_WATER = float(os.getenv("TTS_CACHE_LOW_WATER", "0.9"))
+TTS_MAX_CONCURRENCY = int(os.getenv("TTS_MAX_CONCURRENCY", "4"))
+
+AUDIO_SUFFIXES = ("ogg", "wav", "mp3")
+MIN_AUDIO_BYTES = 512
+STALE_TEMP_SECONDS = 3600      # a temp file this old belongs to a render that died
 
 logger = logging.getLogger(__name__)
 
+_cache_bytes: int | None = None     # running size of CACHE_DIR; None = scan on next check
+_renders: dict[str, asyncio.Task] = {}   # cache key -> render in flight
+_semaphore = asyncio.Semaphore(TTS_MAX_CONCURRENCY)
+
+
+def cache_key(text: str) -> str:
+    # Include engine/voice + format in cache key to avoid stale audio after changes.
+    # Not the codec: cached_path() accepts any stored format, and keeping the
+    # key stable lets existing clips (and their Telegram file_ids) be reused.
+    voice = VOICE_IT if TTS_ENGINE == "edge" else TTS_ENGINE
+    key = f"{voice}|{OUTPUT_FORMAT}|{(text or '').strip()}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
 
 def _cache_path(text: str, suffix: str) -> Path:
-    # Include voice + format in cache key to avoid stale audio after changes.
-    key = f"{VOICE_IT}|{OUTPUT_FORMAT}|{text}"
-    h = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
-    return CACHE_DIR / f"{h}.{suffix}"
+    return CACHE_DIR / f"{cache_key(text)}.{suffix}"
 
 
-async def tts_it(text: str) -> Path:
+def cached_path(text: str) -> Path | None:
+    """The cached audio for `text` if it is already rendered (any format), without touching edge-tts."""
     text = (text or "").strip()
-    if not text:
-        raise ValueError("Empty text for TTS")
+    for suffix in AUDIO_SUFFIXES:
+        out = _cache_path(text, suffix)
+        try:
+            if out.stat().st_size >= MIN_AUDIO_BYTES:
+                return out
+        except OSError:
+            continue
+    return None
+
+
+def _temp_path(final: Path) -> Path:
+    # same directory (rename stays atomic), same suffix (ffmpeg picks the muxer from it)
+    return final.with_name(f".{final.stem}.{uuid.uuid4().hex[:8]}{final.suffix}")
+
+
+def _touch(path: Path):
+    # LRU clock: bump atime only, mtime keeps the render time
+    try:
+        st = path.stat()
+        os.utime(path, ns=(time.time_ns(), st.st_mtime_ns))
+    except OSError:
+        pass
+
+
+def _ffmpeg() -> str | None:
+    return shutil.which("ffmpeg") if TTS_CODEC == "opus" else None
+
+
+async def _transcode_opus(src: Path, dst: Path) -> bool:
+    ffmpeg = _ffmpeg()
+    if not ffmpeg:
+        return False
+    tmp = _temp_path(dst)
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            ffmpeg, "-y", "-loglevel", "error", "-i", str(src),
+            "-ac", "1", "-c:a", "libopus", "-b:a", TTS_OPUS_BITRATE, "-application", "voip",
+            str(tmp),
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        _, err = await proc.communicate()
+        if proc.returncode != 0 or not tmp.exists() or tmp.stat().st_size < MIN_AUDIO_BYTES:
+            logger.warning("Opus transcode failed (%s): %s", proc.returncode, (err or b"").decode(errors="replace")[:200])
+            return False
+        os.replace(tmp, dst)
+        return True
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+# text -> (file suffix, save(path) coroutine function)
+Engine = Callable[[str], tuple[str, Callable[[str], Awaitable[None]]]]
+
+
+def _edge_engine(text: str):
+    import edge_tts
 
     # Prefer WAV if supported; fall back to MP3 for older edge-tts.
-    suffix = "wav"
     try:
         communicate = edge_tts.Communicate(
             text=text,
@@ -41,38 +153,238 @@ async def tts_it(text: str) -> Path:
             output_format=OUTPUT_FORMAT,
         )
     except TypeError:
-        suffix = "mp3"
         communicate = edge_tts.Communicate(
             text=text,
             voice=VOICE_IT,
             rate="+0%",
         )
+        logger.info("TTS generating: voice=%s format=mp3 (fallback) text=%r", VOICE_IT, text)
+        return "mp3", communicate.save
+    logger.info("TTS generating: voice=%s format=%s text=%r", VOICE_IT, OUTPUT_FORMAT, text)
+    return "wav", communicate.save
+
+
+def _tone_engine(text: str):
+    logger.info("TTS generating: engine=tone text=%r", text)
+    return "wav", lambda path: tts_tone.save(text, path)
+
 
-    out = _cache_path(text, suffix)
-    if out.exists():
-        size = out.stat().st_size
-        if size >= 512:
-            logger.info("TTS cache hit: %s (%d bytes)", out, size)
-            return out
-        # Stale/corrupt cache file: delete and regenerate.
+ENGINES: dict[str, Engine] = {
+    "edge": _edge_engine,
+    "tone": _tone_engine,
+}
+
+
+async def tts_it(text: str) -> Path:
+    text = (text or "").strip()
+    if not text:
+        raise ValueError("Empty text for TTS")
+
+    hit = cached_path(text)
+    if hit is not None:
+        logger.info("TTS cache hit: %s (%d bytes)", hit, hit.stat().st_size)
+        _touch(hit)
+        return hit
+
+    # one render per key: later callers await the one in flight. Shielded, so a
+    # caller giving up doesn't cancel the render for the others.
+    key = cache_key(text)
+    task = _renders.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_render(text))
+        _renders[key] = task
+        task.add_done_callback(lambda t, key=key: _render_done(key, t))
+    return await asyncio.shield(task)
+
+
+def _render_done(key: str, task: asyncio.Task):
+    if _renders.get(key) is task:
+        del _renders[key]
+    if not task.cancelled():
+        task.exception()   # retrieved: every waiter may be gone
+
+
+async def _render(text: str) -> Path:
+    async with _semaphore:
+        # rendered by a previous flight while this one queued
+        hit = cached_path(text)
+        if hit is not None:
+            return hit
+
+        engine = ENGINES.get(TTS_ENGINE)
+        if engine is None:
+            raise RuntimeError(f"Unknown TTS_ENGINE={TTS_ENGINE!r} (expected one of {', '.join(ENGINES)})")
+        suffix, save = engine(text)
+        out = _cache_path(text, suffix)
+
+        tmp = _temp_path(out)
         try:
-            out.unlink(missing_ok=True)
-        except Exception:
-            pass
+            await save(str(tmp))
 
-    if suffix == "wav":
-        logger.info("TTS generating: voice=%s format=%s text=%r", VOICE_IT, OUTPUT_FORMAT, text)
+            # sanity check (avoid false negatives on very short words)
+            if (not tmp.exists()) or tmp.stat().st_size < MIN_AUDIO_BYTES:
+                raise RuntimeError("TTS produced an empty/bad audio file")
+
+            ogg = _cache_path(text, "ogg")
+            if await _transcode_opus(tmp, ogg):
+                out = ogg
+            else:
+                os.replace(tmp, out)   # replaces a stale/corrupt file cached_path rejected
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    await _account(out.stat().st_size)
+    return out
+
+
+async def _account(added: int):
+    """Track the cache size and evict once it passes the budget."""
+    global _cache_bytes
+    if _cache_bytes is None:
+        _cache_bytes = (await asyncio.to_thread(cache_usage))[1]
     else:
-        logger.info("TTS generating: voice=%s format=mp3 (fallback) text=%r", VOICE_IT, text)
+        _cache_bytes += added
+    if TTS_CACHE_MAX_BYTES > 0 and _cache_bytes > TTS_CACHE_MAX_BYTES:
+        await asyncio.to_thread(evict)
 
-    await communicate.save(str(out))
 
-    # sanity check (avoid false negatives on very short words)
-    if (not out.exists()) or out.stat().st_size < 512:
-        try:
-            out.unlink(missing_ok=True)
-        except Exception:
-            pass
-        raise RuntimeError("TTS produced an empty/bad audio file")
+def _audio_files() -> list[Path]:
+    # dot-names are temp files of renders in progress
+    return [p for p in CACHE_DIR.iterdir() if p.is_file() and not p.name.startswith(".")]
 
+
+def _stale_temp_files() -> list[Path]:
+    cutoff = time.time() - STALE_TEMP_SECONDS
+    out = []
+    for p in CACHE_DIR.iterdir():
+        try:
+            if p.name.startswith(".") and p.is_file() and p.stat().st_mtime < cutoff:
+                out.append(p)
+        except OSError:
+            continue
     return out
+
+
+def cache_usage() -> tuple[int, int]:
+    """(files, bytes) in the TTS cache directory."""
+    files = total = 0
+    for path in _audio_files():
+        try:
+            total += path.stat().st_size
+            files += 1
+        except OSError:
+            continue
+    return files, total
+
+
+def evict(max_bytes: int | None = None, low_water: float | None = None) -> tuple[int, int]:
+    """
+    Remove least recently used clips (by atime) until the cache is at most
+    low_water * max_bytes. Returns (files removed, bytes freed).
+    """
+    global _cache_bytes
+    max_bytes = TTS_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    low_water = TTS_CACHE_LOW_WATER if low_water is None else low_water
+    entries = []
+    total = 0
+    for path in _audio_files():
+        try:
+            st = path.stat()
+        except OSError:
+            continue
+        entries.append((st.st_atime, st.st_size, path))
+        total += st.st_size
+    removed = freed = 0
+    if max_bytes > 0 and total > max_bytes:
+        target = int(max_bytes * low_water)
+        for _, size, path in sorted(entries, key=lambda e: e[0]):
+            if total - freed <= target:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            removed += 1
+            freed += size
+        if removed:
+            logger.info("TTS cache eviction: %d files, %.1f MB freed", removed, freed / 1048576)
+    _cache_bytes = total - freed
+    return removed, freed
+
+
+def _looks_like_audio(path: Path) -> bool:
+    try:
+        with open(path, "rb") as f:
+            head = f.read(12)
+    except OSError:
+        return False
+    suffix = path.suffix.lower().lstrip(".")
+    if suffix == "ogg":
+        return head[:4] == b"OggS"
+    if suffix == "wav":
+        return head[:4] == b"RIFF" and head[8:12] == b"WAVE"
+    if suffix == "mp3":
+        return head[:3] == b"ID3" or (len(head) >= 2 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0)
+    return False
+
+
+def verify_cache(fix: bool = True) -> dict:
+    """
+    Check every file in the cache: a known audio suffix, at least
+    MIN_AUDIO_BYTES and the right container header. Bad files (truncated
+    renders, leftovers, foreign files) and temp files of renders that died
+    (older than STALE_TEMP_SECONDS) are deleted when fix=True.
+    """
+    global _cache_bytes
+    report = {"files": 0, "bytes": 0, "bad": 0, "bad_bytes": 0, "by_format": {}}
+    for path in _stale_temp_files():
+        try:
+            size = path.stat().st_size
+        except OSError:
+            continue
+        report["bad"] += 1
+        report["bad_bytes"] += size
+        if fix:
+            path.unlink(missing_ok=True)
+    for path in _audio_files():
+        try:
+            size = path.stat().st_size
+        except OSError:
+            continue
+        report["files"] += 1
+        report["bytes"] += size
+        suffix = path.suffix.lower().lstrip(".")
+        ok = suffix in AUDIO_SUFFIXES and size >= MIN_AUDIO_BYTES and _looks_like_audio(path)
+        if ok:
+            fmt = report["by_format"].setdefault(suffix, {"files": 0, "bytes": 0})
+            fmt["files"] += 1
+            fmt["bytes"] += size
+            continue
+        report["bad"] += 1
+        report["bad_bytes"] += size
+        if fix:
+            path.unlink(missing_ok=True)
+    _cache_bytes = None
+    return report
+
+
+async def transcode_cache() -> tuple[int, int]:
+    """
+    Re-encode cached WAV/MP3 clips (rendered while ffmpeg was missing) as Opus
+    under the same key. Needs ffmpeg and TTS_CODEC=opus. Returns (files, bytes saved).
+    """
+    global _cache_bytes
+    if not _ffmpeg():
+        return 0, 0
+    done = saved = 0
+    for path in _audio_files():
+        if path.suffix.lower() not in (".wav", ".mp3"):
+            continue
+        ogg = path.with_suffix(".ogg")
+        before = path.stat().st_size
+        if ogg.exists() or await _transcode_opus(path, ogg):
+            saved += before - ogg.stat().st_size
+            path.unlink(missing_ok=True)
+            done += 1
+    _cache_bytes = None
+    return done, saved
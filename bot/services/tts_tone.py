@@ -0,0 +1,86 @@
+# bot/services/tts_tone.py
+"""
+Local stand-in for edge-tts: a deterministic "speech" of synthesized tones.
+
+Every letter becomes a short sine tone (vowels longer and louder than
+consonants), spaces and punctuation become pauses. The same text always gives
+byte-identical WAV output in the edge format (16 kHz, 16-bit mono PCM) with
+about the length real speech of that text would have, so cache sizes, Opus
+transcodes and Telegram uploads behave like production without any network.
+
+Selected with TTS_ENGINE=tone (bot.services.tts_edge). TTS_TONE_LATENCY_MS
+adds a fixed delay per render to stand in for the edge round trip in load
+tests; rendering itself takes a few milliseconds.
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import io
+import math
+import os
+import wave
+from array import array
+
+SAMPLE_RATE = 16000
+TTS_TONE_LATENCY_MS = int(os.getenv("TTS_TONE_LATENCY_MS", "0"))
+
+VOWELS = set("aeiouàèéìíòóùú")
+VOWEL_SECONDS = 0.11
+CONSONANT_SECONDS = 0.05
+PAUSE_SECONDS = 0.08
+LONG_PAUSE_SECONDS = 0.25     # after . , ! ? ; :
+RAMP_SECONDS = 0.005          # fade in/out per tone, avoids clicks
+
+
+@functools.lru_cache(maxsize=256)
+def _tone(freq: float, seconds: float, amplitude: float) -> bytes:
+    n = int(SAMPLE_RATE * seconds)
+    ramp = max(1, int(SAMPLE_RATE * RAMP_SECONDS))
+    step = 2 * math.pi * freq / SAMPLE_RATE
+    samples = array("h", (
+        int(amplitude * min(1.0, i / ramp, (n - i) / ramp) * math.sin(step * i))
+        for i in range(n)
+    ))
+    return samples.tobytes()
+
+
+def _pause(seconds: float) -> bytes:
+    return bytes(2 * int(SAMPLE_RATE * seconds))
+
+
+def render_wav(text: str) -> bytes:
+    """WAV bytes for `text`; deterministic."""
+    # letters repeat, so every tone is computed once per process
+    chunks = [_pause(PAUSE_SECONDS)]
+    for ch in (text or "").strip().lower():
+        if ch in VOWELS:
+            chunks.append(_tone(180 + 9 * (ord(ch) % 40), VOWEL_SECONDS, 9000))
+        elif ch.isalpha():
+            chunks.append(_tone(320 + 7 * (ord(ch) % 60), CONSONANT_SECONDS, 4000))
+        elif ch in ".,!?;:":
+            chunks.append(_pause(LONG_PAUSE_SECONDS))
+        else:
+            chunks.append(_pause(PAUSE_SECONDS))
+    chunks.append(_pause(PAUSE_SECONDS))
+
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(SAMPLE_RATE)
+        w.writeframes(b"".join(chunks))
+    return buf.getvalue()
+
+
+async def save(text: str, path: str):
+    """Render `text` into the WAV file `path` (same call shape as edge_tts.Communicate.save)."""
+    if TTS_TONE_LATENCY_MS > 0:
+        await asyncio.sleep(TTS_TONE_LATENCY_MS / 1000)
+    data = await asyncio.to_thread(render_wav, text)
+    await asyncio.to_thread(_write, path, data)
+
+
+def _write(path: str, data: bytes):
+    with open(path, "wb") as f:
+        f.write(data)
@@ -0,0 +1,119 @@
+"""
+In-process cache in front of the user_session table.
+
+Every update reads the user's session at least once and most stage changes
+rewrite it, so bot.db keeps the rows here and only touches SQLite on a miss
+or when dirty rows are flushed.
+
+Entries are keyed by user_id and hold the raw row
+    (mode, item_id, stage, meta_json, updated_at)
+or None for "this user has no session" (also cached, and also flushed: a
+dirty None becomes a DELETE). meta stays serialized in the cache so every
+reader still gets its own dict to mutate, exactly as with a DB read.
+
+Size is bounded (least recently used clean entries go first) and clean
+entries expire after a TTL. Dirty entries are never evicted or expired;
+they leave the dirty set only through take_dirty().
+
+bot.db owns the SQL and the flush; this module only holds the rows.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+
+_lock = threading.Lock()
+_entries: OrderedDict[int, tuple[tuple | None, float]] = OrderedDict()  # user_id -> (row, expires_at)
+_dirty: set[int] = set()
+
+max_size = 10_000
+ttl_seconds = 1800.0
+
+
+def configure(size: int | None = None, ttl: float | None = None):
+    global max_size, ttl_seconds
+    with _lock:
+        if size is not None:
+            max_size = max(1, int(size))
+        if ttl is not None:
+            ttl_seconds = float(ttl)
+        _evict()
+
+
+def get(user_id: int) -> tuple[bool, tuple | None]:
+    """(hit, row). row is None both on a miss and for a cached "no session"."""
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(user_id)
+        if entry is None:
+            return False, None
+        row, expires_at = entry
+        if expires_at < now and user_id not in _dirty:
+            del _entries[user_id]
+            return False, None
+        _entries[user_id] = (row, now + ttl_seconds)
+        _entries.move_to_end(user_id)
+        return True, row
+
+
+def put(user_id: int, row: tuple | None):
+    """Store a new session state (None = cleared) and mark it for the next flush."""
+    with _lock:
+        _entries[user_id] = (row, time.monotonic() + ttl_seconds)
+        _entries.move_to_end(user_id)
+        _dirty.add(user_id)
+        _evict()
+
+
+def fill(user_id: int, row: tuple | None):
+    """Cache a row just read from the DB, unless a newer state is already cached."""
+    with _lock:
+        if user_id in _entries:
+            return
+        _entries[user_id] = (row, time.monotonic() + ttl_seconds)
+        _evict()
+
+
+def take_dirty() -> list[tuple[int, tuple | None]]:
+    """Hand over every dirty (user_id, row) and mark them clean."""
+    with _lock:
+        out = [(user_id, _entries[user_id][0]) for user_id in _dirty]
+        _dirty.clear()
+        return out
+
+
+def restore_dirty(batch: list[tuple[int, tuple | None]]):
+    """Put a batch from take_dirty() back after a failed flush (newer writes win)."""
+    with _lock:
+        for user_id, row in batch:
+            if user_id not in _entries:
+                _entries[user_id] = (row, time.monotonic() + ttl_seconds)
+            _dirty.add(user_id)
+
+
+def dirty_count() -> int:
+    with _lock:
+        return len(_dirty)
+
+
+def clear():
+    """Forget everything, dirty rows included. Flush first if they matter."""
+    with _lock:
+        _entries.clear()
+        _dirty.clear()
+
+
+def _evict():
+    # caller holds _lock; walk from the least recently used end, skipping dirty rows
+    excess = len(_entries) - max_size
+    if excess <= 0:
+        return
+    victims = []
+    for user_id in _entries:
+        if len(victims) >= excess:
+            break
+        if user_id not in _dirty:
+            victims.append(user_id)
+    for user_id in victims:
+        del _entries[user_id]
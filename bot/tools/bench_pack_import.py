@@ -0,0 +1,94 @@
+"""
+Pack import throughput benchmark.
+
+Writes a synthetic v2 pack (50k cards by default, two context sentences each)
+into a throwaway packs folder and database, then times:
+  - the first import (every card inserted),
+  - a re-import of the untouched folder (manifest skip),
+  - a re-import after editing 1% of the cards (diff + update).
+
+    python -m bot.tools.bench_pack_import
+    python -m bot.tools.bench_pack_import --cards 200000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import bot.db as db
+
+PACK_ID = "it_bench_synthetic"
+
+
+def make_pack(cards: int) -> dict:
+    return {
+        "pack_id": PACK_ID,
+        "target_language": "it",
+        "level": "A1",
+        "title": "Benchmark",
+        "description": "Synthetic pack for import benchmarks.",
+        "cards": [
+            {
+                "source_uid": f"bench_{i}",
+                "focus": "phrase" if i % 2 else "word",
+                "lemma": f"parola{i}",
+                "phrase": f"Questa è la frase numero {i}." if i % 2 else None,
+                "meaning_en": f"This is sentence number {i}.",
+                "contexts_it": [f"Esempio {i}.", f"Un altro esempio {i}."],
+                "meta": {"register": "neutral", "risk": "safe", "tags": ["bench"]},
+            }
+            for i in range(cards)
+        ],
+    }
+
+
+def timed(label: str, cards: int) -> float:
+    start = time.perf_counter()
+    imported, unchanged, removed = db.import_packs_from_folder()
+    elapsed = time.perf_counter() - start
+    rate = cards / elapsed if elapsed else float("inf")
+    print(f"  {label:<22} {elapsed:8.3f}s  {rate:12,.0f} cards/sec  (updated {len(imported)}, unchanged {len(unchanged)})")
+    return elapsed
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cards", type=int, default=50_000)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = Path(tmp) / "bench.db"
+        db.PACKS_DIR = Path(tmp) / "packs"
+        db.PACKS_DIR.mkdir()
+        db.init_db()
+
+        pack = make_pack(args.cards)
+        pack_file = db.PACKS_DIR / f"{PACK_ID}.json"
+        pack_file.write_text(json.dumps(pack, ensure_ascii=False), encoding="utf-8")
+
+        print(f"📦 {args.cards:,} cards, {2 * args.cards:,} context sentences")
+        timed("first import", args.cards)
+        timed("unchanged re-import", args.cards)
+
+        for card in pack["cards"][::100]:
+            card["meaning_en"] += " (edited)"
+        pack_file.write_text(json.dumps(pack, ensure_ascii=False), encoding="utf-8")
+        timed("1% edited re-import", args.cards)
+
+        with db.db_conn() as conn:
+            (items,) = conn.execute("SELECT COUNT(*) FROM pack_items").fetchone()
+            (contexts,) = conn.execute("SELECT COUNT(*) FROM card_contexts").fetchone()
+        db.close_all_connections()
+
+    if items != args.cards or contexts != 2 * args.cards:
+        print(f"❌ expected {args.cards} cards / {2 * args.cards} contexts, got {items} / {contexts}")
+        return 1
+    print("✅ import benchmark done")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,173 @@
+"""
+TTS capacity benchmark.
+
+Renders into a throwaway cache directory and replays a skewed (Zipf) stream
+of pronunciation requests through tts_it(), the path the 🔊 buttons use. It
+reports:
+  - synthesis latency of cache misses (renders) and of hits (p50/p95/max),
+  - the cache hit rate of the request stream, with or without a disk budget,
+  - bytes per phrase on disk (per format) and the projected cache size.
+
+The default engine is the local tone stand-in (bot.services.tts_tone), so it
+runs offline; --latency-ms stands in for the edge round trip. Use
+--engine edge to measure the real service.
+
+    python -m bot.tools.bench_tts
+    python -m bot.tools.bench_tts --phrases 2000 --requests 20000 --cache-mb 5
+    python -m bot.tools.bench_tts --source packs --codec native --latency-ms 600
+    python -m bot.tools.bench_tts --engine edge --phrases 50 --requests 200
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from bot.services import tts_edge, tts_tone
+
+WORDS = (
+    "ciao buongiorno grazie prego scusi biglietto stazione aeroporto valigia "
+    "passaporto treno binario ritardo colazione caffè acqua conto ristorante "
+    "camera prenotazione chiave albergo farmacia medico destra sinistra dritto "
+    "vorrei posso dove quanto costa quando parte arriva sono siamo abbiamo"
+).split()
+
+
+def synthetic_texts(count: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    texts = []
+    seen = set()
+    while len(texts) < count:
+        words = rng.sample(WORDS, rng.choice((1, 1, 2, 3, 4, 6, 8)))
+        text = " ".join(words).capitalize() + ("." if len(words) > 2 else "")
+        if text not in seen:
+            seen.add(text)
+            texts.append(text)
+    return texts
+
+
+def pack_texts(limit: int) -> list[str]:
+    import bot.db as db
+    from bot.services.tts_bank import collect_texts
+
+    db.init_db()
+    texts = collect_texts()
+    return texts[:limit] if limit else texts
+
+
+def zipf_stream(texts: list[str], requests: int, s: float, seed: int) -> list[str]:
+    """A few phrases are tapped a lot, most rarely: rank r is drawn with weight 1/r**s."""
+    weights = [1 / (rank ** s) for rank in range(1, len(texts) + 1)]
+    return random.Random(seed).choices(texts, weights=weights, k=requests)
+
+
+def _quantiles(values: list[float]) -> str:
+    if not values:
+        return "—"
+    values = sorted(values)
+    p50 = values[len(values) // 2]
+    p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+    return f"p50 {p50 * 1000:8.1f} ms  p95 {p95 * 1000:8.1f} ms  max {values[-1] * 1000:8.1f} ms"
+
+
+def _mb(n: float) -> str:
+    return f"{n / 1048576:,.2f} MB"
+
+
+async def replay(stream: list[str], users: int) -> dict:
+    """Send the stream through tts_it() from `users` concurrent callers."""
+    res = {"hits": 0, "misses": 0, "failed": 0, "hit_latency": [], "miss_latency": []}
+    queue = iter(stream)
+
+    async def user():
+        for text in queue:
+            hit = tts_edge.cached_path(text) is not None
+            start = time.perf_counter()
+            try:
+                await tts_edge.tts_it(text)
+            except Exception:
+                res["failed"] += 1
+                continue
+            elapsed = time.perf_counter() - start
+            res["hits" if hit else "misses"] += 1
+            res["hit_latency" if hit else "miss_latency"].append(elapsed)
+
+    await asyncio.gather(*(user() for _ in range(max(1, users))))
+    return res
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engine", choices=sorted(tts_edge.ENGINES), default="tone")
+    parser.add_argument("--codec", choices=("opus", "native"), default=tts_edge.TTS_CODEC)
+    parser.add_argument("--source", choices=("synthetic", "packs"), default="synthetic")
+    parser.add_argument("--phrases", type=int, default=500, help="distinct phrases (packs: 0 = all)")
+    parser.add_argument("--requests", type=int, default=5000, help="taps to replay")
+    parser.add_argument("--zipf", type=float, default=1.1, help="skew of the tap distribution")
+    parser.add_argument("--users", type=int, default=16, help="concurrent callers")
+    parser.add_argument("--renders", type=int, default=tts_edge.TTS_MAX_CONCURRENCY, help="concurrent renders (TTS_MAX_CONCURRENCY)")
+    parser.add_argument("--cache-mb", type=float, default=0, help="disk budget; 0 = unlimited")
+    parser.add_argument("--latency-ms", type=int, default=0, help="tone engine: simulated render round trip")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    texts = pack_texts(args.phrases) if args.source == "packs" else synthetic_texts(args.phrases, args.seed)
+    if not texts:
+        print("❌ No phrases to render.")
+        return 1
+    stream = zipf_stream(texts, args.requests, args.zipf, args.seed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tts_edge.CACHE_DIR = Path(tmp)
+        tts_edge.TTS_ENGINE = args.engine
+        tts_edge.TTS_CODEC = args.codec
+        tts_edge.TTS_CACHE_MAX_BYTES = int(args.cache_mb * 1024 * 1024)
+        tts_edge._cache_bytes = None
+        tts_edge._semaphore = asyncio.Semaphore(max(1, args.renders))
+        tts_tone.TTS_TONE_LATENCY_MS = args.latency_ms
+
+        codec = args.codec if args.codec == "native" or tts_edge._ffmpeg() else "native (no ffmpeg)"
+        budget = f"{args.cache_mb:g} MB" if args.cache_mb else "unlimited"
+        print(
+            f"🔊 engine {args.engine}, codec {codec}, {len(texts):,} phrases, "
+            f"{len(stream):,} taps (zipf {args.zipf:g}), {args.users} users, {args.renders} renders at a time, cache {budget}"
+        )
+
+        start = time.perf_counter()
+        res = asyncio.run(replay(stream, args.users))
+        elapsed = time.perf_counter() - start
+
+        by_format: dict[str, list[int]] = {}
+        for path in tts_edge._audio_files():
+            by_format.setdefault(path.suffix.lstrip("."), []).append(path.stat().st_size)
+
+    served = res["hits"] + res["misses"]
+    print(f"  elapsed      {elapsed:8.2f}s  {served / elapsed if elapsed else 0:10,.0f} taps/sec")
+    print(f"  misses       {res['misses']:>8,}  {_quantiles(res['miss_latency'])}")
+    print(f"  cache hits   {res['hits']:>8,}  {_quantiles(res['hit_latency'])}")
+    print(f"  hit rate     {res['hits'] / served if served else 0:8.1%}")
+    if res["failed"]:
+        print(f"  failed       {res['failed']:>8,}")
+
+    files = sum(len(sizes) for sizes in by_format.values())
+    total = sum(sum(sizes) for sizes in by_format.values())
+    for fmt, sizes in sorted(by_format.items()):
+        print(f"  {fmt:<4} on disk  {len(sizes):>6,} files  {sum(sizes) / len(sizes):10,.0f} bytes/phrase")
+    if files:
+        per_phrase = total / files
+        print(f"  cache now    {_mb(total):>12}  {files:,} files")
+        print(f"  projected    {_mb(per_phrase * 10_000):>12} per 10,000 phrases")
+
+    if res["failed"]:
+        print("❌ some renders failed")
+        return 1
+    print("✅ TTS benchmark done")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
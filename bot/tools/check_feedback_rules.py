@@ -0,0 +1,87 @@
+"""
+Regression check for the offline feedback rules (bot.services.feedback_rules).
+
+quick_feedback() is shown before the AI answer and stays as the final
+feedback when the AI fails, so a wrong "fix" teaches wrong Italian. This runs
+a list of correct sentences that must come back untouched and a list of
+common mistakes with the correction the rules must give.
+
+    python -m bot.tools.check_feedback_rules            # exit 1 on any mismatch
+    python -m bot.tools.check_feedback_rules --verbose  # also print passing cases
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+
+from bot.services.feedback_rules import quick_feedback
+
+# correct Italian: the rules must not edit these
+CORRECT = [
+    # a pronoun after a preposition is not the subject
+    "Con lei sono felice.",
+    "Per lui ho comprato un libro.",
+    "Il libro di lei è nuovo.",
+    "Secondo lui è vero.",
+    "Tra noi siamo amici.",
+    "Senza di lei sono triste.",
+    "Vado da lui domani.",
+    "A lei piace il caffè.",
+    "Parlo con lui e lei è contenta.",
+    "Vado al cinema con loro.",
+    # coordinated subjects are plural
+    "Lui e lei sono sposati.",
+    "Io e lui siamo amici.",
+    "Tu o lei avete ragione.",
+    "Marco e io siamo amici.",
+    "Il vino e la pizza sono buoni.",
+    "La ragazza e il ragazzo sono alti.",
+    # the head noun is not the one inside a prepositional phrase
+    "La pizza con il vino è buona.",
+    "Il libro della ragazza è nuovo.",
+    # plain subjects
+    "Lei ha comprato una casa.",
+    "Loro sono italiani.",
+    "Io sono stanco.",
+    "Lui è stanco.",
+    "Il libro è bello.",
+    "Ciao, come stai?",
+]
+
+# (sentence, expected correction)
+MISTAKES = [
+    ("Lei è contento.", "Lei è contenta."),
+    ("Io sei stanco.", "Io sono stanco."),
+    ("Lui e stanco.", "Lui è stanco."),
+    ("Io parlare italiano.", "Io parlo italiano."),
+    ("La libro è bello.", "Il libro è bello."),
+    ("La pizza è buono.", "La pizza è buona."),
+    ("Il ragazzo è alta.", "Il ragazzo è alto."),
+    ("Perche sei qui?", "Perché sei qui?"),
+]
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    cases = [(s, None) for s in CORRECT] + MISTAKES
+    failures = 0
+    for sentence, expected in cases:
+        got = quick_feedback(term="", user_sentence=sentence)["correction"]
+        if got != expected:
+            failures += 1
+            print(f"❌ {sentence!r}: expected {expected!r}, got {got!r}")
+        elif args.verbose:
+            print(f"   {sentence!r} -> {got!r}")
+
+    if failures:
+        print(f"❌ {failures} of {len(cases)} sentences wrong")
+        return 1
+    print(f"✅ {len(cases)} sentences checked ({len(CORRECT)} correct, {len(MISTAKES)} mistakes)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+"""
+EXPLAIN QUERY PLAN regression check for every SQL statement in bot/db.py.
+
+Builds a throwaway database with the real migrations, extracts each literal
+query passed to .execute()/.executemany() in bot/db.py, and fails if a query
+full-scans one of the hot tables or a pinned hot-path query stops using its
+index.
+
+    python -m bot.tools.check_query_plans            # check, exit 1 on regressions
+    python -m bot.tools.check_query_plans --verbose  # also print every plan
+"""
+from __future__ import annotations
+
+import ast
+import re
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+import bot.db as db
+
+DB_SOURCE = Path(db.__file__)
+
+# Tables that grow with users/content; a SCAN on them is a regression.
+HOT_TABLES = {
+    "reviews",
+    "pack_items",
+    "card_contexts",
+    "user_packs",
+    "pack_scenes",
+    "user_session",
+    "scenario_progress",
+    "user_pack_progress",
+}
+
+# Hot-path queries pinned to the index that must serve them:
+# function -> (text identifying the pinned statement, index name).
+EXPECTED_INDEXES = {
+    "get_due_item": ("due_date <=", "idx_reviews_user_due"),
+    "get_due_item_in_pack": ("due_date <=", "idx_reviews_user_due"),
+    "get_due_count": ("due_date <=", "idx_reviews_user_due"),
+    "get_due_count_in_pack": ("due_date <=", "idx_reviews_user_due"),
+    "get_due_queue": ("due_date <=", "idx_reviews_user_due"),
+    "get_random_context_for_item": ("FROM card_contexts", "idx_card_contexts_item"),
+}
+
+# Functions whose scans are intentional (maintenance paths, not per-update queries).
+ALLOWED_SCANS = {
+    "import_packs_from_folder": "pack import walks whole tables by design",
+    "_purge_pack_reviews": "all-users purge only runs when import drops a pack",
+    "sweep_stale_reviews": "background sweeper walks every review row by design",
+    "get_pronunciation_texts": "TTS pre-render reads every card once, offline",
+}
+
+_DML = re.compile(r"^\s*(SELECT|INSERT|UPDATE|DELETE|WITH|REPLACE)\b", re.IGNORECASE)
+_SCAN = re.compile(r"\bSCAN (\w+)(?: AS \w+)?(.*)$")
+
+
+def _sql_text(node: ast.AST, constants: dict[str, str]) -> str | None:
+    """
+    Literal SQL from a str constant or an f-string. {NAME} parts naming a
+    module-level str constant (shared SQL fragments) are inlined; any other
+    {...} part becomes ?.
+    """
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if isinstance(node, ast.JoinedStr):
+        parts = []
+        for v in node.values:
+            if isinstance(v, ast.Constant):
+                parts.append(str(v.value))
+            elif isinstance(v, ast.FormattedValue) and isinstance(v.value, ast.Name) and v.value.id in constants:
+                parts.append(constants[v.value.id])
+            else:
+                parts.append("?")
+        return "".join(parts)
+    return None
+
+
+def _module_constants(tree: ast.Module) -> dict[str, str]:
+    out = {}
+    for node in tree.body:
+        if (
+            isinstance(node, ast.Assign)
+            and len(node.targets) == 1
+            and isinstance(node.targets[0], ast.Name)
+            and isinstance(node.value, ast.Constant)
+            and isinstance(node.value.value, str)
+        ):
+            out[node.targets[0].id] = node.value.value
+    return out
+
+
+def extract_queries(source: str) -> list[tuple[str, int, str]]:
+    """Return (function, line, sql) for every literal DML statement executed in source."""
+    tree = ast.parse(source)
+    constants = _module_constants(tree)
+    out: list[tuple[str, int, str]] = []
+
+    def visit(node: ast.AST, func: str):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                visit(child, child.name)
+                continue
+            if (
+                isinstance(child, ast.Call)
+                and isinstance(child.func, ast.Attribute)
+                and child.func.attr in ("execute", "executemany")
+                and child.args
+            ):
+                sql = _sql_text(child.args[0], constants)
+                if sql and _DML.match(sql):
+                    out.append((func, child.lineno, sql))
+            visit(child, func)
+
+    visit(tree, "<module>")
+    return out
+
+
+def explain(conn: sqlite3.Connection, sql: str) -> list[str]:
+    params = (None,) * sql.count("?")
+    rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+    return [r[-1] for r in rows]
+
+
+def hot_scans(plan: list[str]) -> list[str]:
+    bad = []
+    for line in plan:
+        m = _SCAN.search(line)
+        if m and m.group(1) in HOT_TABLES:
+            bad.append(line)
+    return bad
+
+
+def missing_index(func: str, sql: str, plan: list[str]) -> str | None:
+    """Name of the pinned index if this statement should use it but doesn't."""
+    if func not in EXPECTED_INDEXES:
+        return None
+    marker, index = EXPECTED_INDEXES[func]
+    if marker not in sql or any(index in step for step in plan):
+        return None
+    return index
+
+
+def main(argv: list[str] | None = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    verbose = "--verbose" in argv or "-v" in argv
+
+    queries = extract_queries(DB_SOURCE.read_text(encoding="utf-8"))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = Path(tmp) / "plans.db"
+        db.init_db()
+        conn = db.get_connection()
+        failures = 0
+        for func, line, sql in queries:
+            try:
+                plan = explain(conn, sql)
+            except sqlite3.Error as e:
+                print(f"❌ {func} (db.py:{line}) does not prepare: {e}")
+                failures += 1
+                continue
+            problems = [] if func in ALLOWED_SCANS else hot_scans(plan)
+            index = missing_index(func, sql, plan)
+            if index:
+                problems.append(f"expected {index}")
+            if verbose or problems:
+                mark = "⚠️ " if problems else "  "
+                print(f"{mark}{func} (db.py:{line})")
+                for step in plan:
+                    print(f"      {step}")
+                for problem in problems:
+                    print(f"      -> {problem}")
+            if problems:
+                failures += 1
+        conn.close()
+
+    if failures:
+        print(f"❌ {failures} of {len(queries)} queries scan a hot table or miss their index")
+        return 1
+    print(f"✅ {len(queries)} queries checked, no full scans on hot tables")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
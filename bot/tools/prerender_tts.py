@@ -0,0 +1,65 @@
+"""
+Fill the TTS disk cache (bot_cache/tts) for every pack and scenario phrase.
+
+Walks pack_items (term, chunk, pronunciation_text) and scenario
+expected_phrase texts and renders the ones that are not cached yet, a few at
+a time. Safe to interrupt and re-run: cached texts are skipped.
+
+    python -m bot.tools.prerender_tts
+    python -m bot.tools.prerender_tts --pack it_a1_mission_airport_v2 --concurrency 8
+    python -m bot.tools.prerender_tts --dry-run
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import sys
+
+import bot.db as db
+from bot.services.tts_bank import TTS_PRERENDER_CONCURRENCY, collect_texts, prerender
+from bot.services.tts_edge import cached_path
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pack", action="append", dest="packs", help="only this pack_id (repeatable)")
+    parser.add_argument("--concurrency", type=int, default=TTS_PRERENDER_CONCURRENCY)
+    parser.add_argument("--limit", type=int, default=0, help="render at most this many texts")
+    parser.add_argument("--dry-run", action="store_true", help="only count what is missing")
+    args = parser.parse_args(argv)
+
+    db.init_db()
+    texts = collect_texts(args.packs)
+    missing = [t for t in texts if cached_path(t) is None]
+    print(f"🔊 {len(texts):,} texts, {len(texts) - len(missing):,} already cached, {len(missing):,} to render")
+    if args.limit:
+        missing = missing[:args.limit]
+    if args.dry_run or not missing:
+        return 0
+
+    step = max(1, len(missing) // 20)
+
+    def progress(c: dict):
+        if c["done"] % step == 0 or c["done"] == c["total"]:
+            rate = c["done"] / c["elapsed"] if c["elapsed"] else 0.0
+            print(
+                f"  {c['done']:>6,}/{c['total']:,}  rendered {c['rendered']:,}  "
+                f"failed {c['failed']:,}  {rate:5.1f}/s",
+                flush=True,
+            )
+
+    try:
+        counts = asyncio.run(prerender(missing, concurrency=args.concurrency, progress=progress))
+    except KeyboardInterrupt:
+        print("⏸ Interrupted; re-run to continue.")
+        return 130
+    status = "✅" if not counts["failed"] else "⚠️"
+    print(
+        f"{status} rendered {counts['rendered']:,}, failed {counts['failed']:,} "
+        f"in {counts['elapsed']:.1f}s"
+    )
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+"""
+Maintenance for the TTS disk cache (bot_cache/tts).
+
+    python -m bot.tools.tts_cache              # stats: files, size, budget
+    python -m bot.tools.tts_cache verify       # report bad files (truncated, wrong header)
+    python -m bot.tools.tts_cache compact      # delete bad files, re-encode WAV/MP3 as Opus,
+                                               # then evict LRU clips down to the budget
+    python -m bot.tools.tts_cache compact --max-mb 200
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import shutil
+import sys
+
+from bot.services import tts_edge
+
+
+def _mb(n: int) -> str:
+    return f"{n / 1048576:,.1f} MB"
+
+
+def _print_report(report: dict):
+    print(f"🔊 {report['files']:,} files, {_mb(report['bytes'])} in {tts_edge.CACHE_DIR}")
+    for fmt, c in sorted(report["by_format"].items()):
+        print(f"  {fmt:<4} {c['files']:>7,} files  {_mb(c['bytes']):>10}")
+    if report["bad"]:
+        print(f"  bad  {report['bad']:>7,} files  {_mb(report['bad_bytes']):>10}")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("action", nargs="?", choices=("stats", "verify", "compact"), default="stats")
+    parser.add_argument("--max-mb", type=float, default=None, help="budget for compact (default TTS_CACHE_MAX_MB)")
+    args = parser.parse_args(argv)
+
+    budget = tts_edge.TTS_CACHE_MAX_BYTES if args.max_mb is None else int(args.max_mb * 1048576)
+    print(f"Budget {_mb(budget)} · codec {tts_edge.TTS_CODEC} · ffmpeg {'yes' if shutil.which('ffmpeg') else 'no'}")
+
+    if args.action == "stats":
+        _print_report(tts_edge.verify_cache(fix=False))
+        return 0
+
+    if args.action == "verify":
+        report = tts_edge.verify_cache(fix=False)
+        _print_report(report)
+        print("✅ Cache OK." if not report["bad"] else "⚠️ Bad files found; run compact to delete them.")
+        return 1 if report["bad"] else 0
+
+    report = tts_edge.verify_cache(fix=True)
+    print(f"🧹 Deleted {report['bad']:,} bad files ({_mb(report['bad_bytes'])})")
+    files, saved = asyncio.run(tts_edge.transcode_cache())
+    print(f"🎚 Re-encoded {files:,} clips as Opus, saved {_mb(saved)}")
+    removed, freed = tts_edge.evict(budget)
+    print(f"🗑 Evicted {removed:,} least recently used clips ({_mb(freed)})")
+    files, total = tts_edge.cache_usage()
+    print(f"✅ {files:,} files, {_mb(total)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
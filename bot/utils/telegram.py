@@ -1,4 +1,63 @@
+import asyncio
+import os
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable
+
 from telegram import Update
+from telegram.error import BadRequest, RetryAfter
+from telegram.ext import BaseUpdateProcessor
+
+# Telegram allows roughly one edit per second per chat (less in groups), so
+# streamed replies are re-rendered at most this often.
+STREAM_EDIT_INTERVAL_SECONDS = float(os.getenv("STREAM_EDIT_INTERVAL_SECONDS", "1.5"))
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """
+    Concurrent updates across users, strictly ordered per user.
+
+    Handlers read the session, await Telegram/DB/AI, then write it back
+    (e.g. on_grade_button checks stage == "await_grade"), so two updates of the
+    same user running side by side would both pass the check: a double-tapped
+    grade button grades the card twice. Each user's updates therefore wait for
+    the previous one; updates without a user run right away.
+
+    on_new_message(user_id) is called for a new message *before* it queues, so
+    the bot can drop work the user no longer wants (ai_client.cancel_user)
+    instead of finishing it first.
+    """
+
+    def __init__(self, max_concurrent_updates: int, on_new_message: Callable[[int], Any] | None = None):
+        super().__init__(max_concurrent_updates)
+        self._on_new_message = on_new_message
+        self._locks: dict[int, list] = {}   # user_id -> [lock, updates holding or waiting]
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        user = update.effective_user if isinstance(update, Update) else None
+        if user is None:
+            await coroutine
+            return
+        if self._on_new_message is not None and update.message is not None:
+            self._on_new_message(user.id)
+
+        entry = self._locks.get(user.id)
+        if entry is None:
+            entry = self._locks[user.id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                await coroutine
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[user.id]
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
 
 def get_chat_sender(update: Update):
     """
@@ -12,3 +71,65 @@ def get_chat_sender(update: Update):
     if update.callback_query and update.callback_query.message:
         return update.callback_query.message
     return None
+
+
+async def stream_reply(
+    msg,
+    snapshots: AsyncIterator[dict],
+    render: Callable[[dict], str | None],
+    *,
+    parse_mode: str | None = None,
+    min_interval: float | None = None,
+    sent=None,
+):
+    """
+    Show a streamed AI answer while it is being written.
+
+    Every partial snapshot (snapshot.get("partial")) goes through render(); the
+    first non-empty text is sent as a reply, later ones edit that message, at
+    most once per `min_interval` seconds (an edit that would come too early is
+    skipped, the next snapshot carries it). The final snapshot is not rendered.
+    Pass `sent` to stream into a message that is already shown (a quick answer
+    the AI is upgrading) instead of replying.
+
+    Returns (message or None, final snapshot). The caller edits the message into
+    the final reply with reply_or_edit(); None means nothing was shown yet.
+    """
+    interval = STREAM_EDIT_INTERVAL_SECONDS if min_interval is None else min_interval
+    shown = None
+    last_at = 0.0
+    final: dict = {}
+    async for snap in snapshots:
+        if not snap.get("partial"):
+            final = snap
+            continue
+        text = render(snap)
+        now = time.monotonic()
+        if not text or text == shown or (sent is not None and now - last_at < interval):
+            continue
+        try:
+            if sent is None:
+                sent = await msg.reply_text(text, parse_mode=parse_mode)
+            else:
+                await sent.edit_text(text, parse_mode=parse_mode)
+            shown = text
+            last_at = now
+        except RetryAfter as e:
+            last_at = now + float(getattr(e, "retry_after", 1) or 1)
+        except BadRequest:
+            pass   # "message is not modified", or markup cut mid-tag: the next snapshot retries
+    return sent, final
+
+
+async def reply_or_edit(msg, sent, text: str, **kwargs):
+    """Turn the streamed message `sent` into the final reply, or reply normally when nothing was streamed."""
+    if sent is not None:
+        try:
+            return await sent.edit_text(text, **kwargs)
+        except RetryAfter as e:
+            await asyncio.sleep(float(getattr(e, "retry_after", 1) or 1))
+            return await sent.edit_text(text, **kwargs)
+        except BadRequest as e:
+            if "not modified" in str(e).lower():
+                return sent
+    return await msg.reply_text(text, **kwargs)
@@ -0,0 +1,47 @@
+import logging
+
+from telegram import InputFile
+from telegram.error import BadRequest
+
+from bot import db_async as db
+from bot.services.tts_edge import cache_key, tts_it
+
+logger = logging.getLogger(__name__)
+
+
+async def send_tts(message, text: str, *, caption: str | None = None, title: str | None = None, filename: str | None = None):
+    """
+    Reply with the pronunciation of `text`: OGG as a voice note, WAV/MP3 as audio.
+
+    The first send of a clip uploads the file and remembers Telegram's file_id
+    in tts_media; later sends reuse the file_id, so the bytes are uploaded once
+    and a cached clip costs a single API call. A file_id Telegram no longer
+    accepts is forgotten and the clip is uploaded again.
+    """
+    key = cache_key(text)
+    known = await db.get_tts_media(key)
+    if known:
+        media_type, file_id = known
+        try:
+            return await _reply(message, media_type, file_id, text, caption, title)
+        except BadRequest as e:
+            logger.info("Stale TTS file_id for %r (%s); uploading again", text, e)
+            await db.delete_tts_media(key)
+
+    path = await tts_it(text)
+    suffix = path.suffix.lower()
+    media_type = "voice" if suffix == ".ogg" else "audio"
+    with open(path, "rb") as f:
+        upload = InputFile(f, filename=f"{filename or text}{suffix}")
+        sent = await _reply(message, media_type, upload, text, caption, title)
+
+    media = getattr(sent, media_type, None)
+    if media is not None and getattr(media, "file_id", None):
+        await db.set_tts_media(key, media_type, media.file_id)
+    return sent
+
+
+async def _reply(message, media_type: str, media, text: str, caption: str | None, title: str | None):
+    if media_type == "voice":
+        return await message.reply_voice(voice=media, caption=caption)
+    return await message.reply_audio(audio=media, title=title or text, caption=caption)
@@ -3,12 +3,17 @@ from fastapi.responses import HTMLResponse, JSONResponse
 from bot.config import BOT_TOKEN
 from webapp.telegram_auth import verify_telegram_webapp_init_data
 from pathlib import Path
+import hmac
 import json
-from bot.db import init_db, import_packs_from_folder, get_due_count, get_status_counts  
+import os
+from bot.db import init_db, import_packs_from_folder, get_due_count, get_status_counts, get_ai_metrics
 
 
 app = FastAPI()
 
+# /api/metrics is off unless a token is configured
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "").strip()
+
 print("BOT_TOKEN loaded, length:", len(BOT_TOKEN or ""))
 
 
@@ -65,6 +70,21 @@ def api_stats(x_telegram_init_data: str = Header(default="")):
     return {"user_id": user_id, "due_today": due_today, "counts": counts}
 
 
+@app.get("/api/metrics")
+def api_metrics(x_metrics_token: str = Header(default="")):
+    """
+    AI telemetry published by the bot: latency histograms per model and key,
+    request/retry/exhausted/JSON-error counts per call kind, AI cache hit
+    ratio, key pool state and token usage. Send the METRICS_TOKEN value in
+    the X-Metrics-Token header.
+    """
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    if not hmac.compare_digest(x_metrics_token.encode(), METRICS_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return get_ai_metrics()
+
+
 @app.get("/stats", response_class=HTMLResponse)
 
 def stats_page():